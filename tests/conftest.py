@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# The app imports its modules as "utils.x" from its install directory
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                       "usr", "share", "biglinux", "big-digicam")
+sys.path.insert(0, APP_DIR)
+
+
+@pytest.fixture(autouse=True)
+def user_dirs(tmp_path, monkeypatch):
+    """Settings and caches go to a temporary home, never the user's."""
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    return tmp_path
@@ -0,0 +1,80 @@
+from utils import camera_config
+from utils.camera_config import (
+    camera_args, cached_config, load_config, panel_entries, parse_config_tree, set_config_args,
+)
+
+LIST_ALL_CONFIG = """/main/imgsettings/iso
+Label: ISO Speed
+Readonly: 0
+Type: RADIO
+Current: 400
+Choice: 0 Auto
+Choice: 1 100
+Choice: 2 400
+END
+/main/capturesettings/f-number
+Label: F-Number
+Readonly: 0
+Type: RADIO
+Current: f/5.6
+Choice: 0 f/3.5
+Choice: 1 f/5.6
+END
+/main/capturesettings/shutterspeed
+Label: Shutter Speed
+Readonly: 1
+Type: RADIO
+Current: 1/125
+Choice: 0 1/125
+END
+/main/status/serialnumber
+Label: Serial Number
+Readonly: 0
+Type: TEXT
+Current: 1234
+END
+"""
+
+
+def test_parse_config_tree():
+    tree = parse_config_tree(LIST_ALL_CONFIG)
+    assert list(tree) == ["iso", "f-number", "shutterspeed", "serialnumber"]
+    assert tree["iso"] == {
+        "path": "/main/imgsettings/iso", "label": "ISO Speed", "type": "RADIO",
+        "readonly": False, "current": "400", "choices": ["Auto", "100", "400"],
+    }
+    assert tree["shutterspeed"]["readonly"]
+    assert tree["serialnumber"]["choices"] == []
+
+
+def test_parse_ignores_lines_outside_entries():
+    tree = parse_config_tree("*** Error: busy ***\n" + LIST_ALL_CONFIG + "Current: stray\n")
+    assert tree["serialnumber"]["current"] == "1234"
+
+
+def test_panel_entries_use_vendor_names_and_skip_readonly():
+    entries = panel_entries(parse_config_tree(LIST_ALL_CONFIG))
+    assert [(key, name) for key, _label, name, _entry in entries] == [
+        ("iso", "iso"), ("aperture", "f-number")]
+
+
+def test_camera_args():
+    assert camera_args("Canon EOS 600D", "usb:001,005") == ["--port", "usb:001,005"]
+    assert camera_args("Canon EOS 600D") == ["--camera", "Canon EOS 600D"]
+    assert camera_args() == []
+
+
+def test_set_config_args_keep_the_order():
+    assert set_config_args({"iso": "400", "aperture": "5.6"}) == [
+        "--set-config-value", "iso=400", "--set-config-value", "aperture=5.6"]
+
+
+def test_cache_is_shown_until_read_this_session(monkeypatch):
+    monkeypatch.setattr(camera_config, "_read_this_session", set())
+    assert load_config("Canon EOS 600D") == ({}, True)
+    camera_config.save_json(camera_config._cache_path("Canon EOS 600D"),
+                            parse_config_tree(LIST_ALL_CONFIG))
+    tree, needs_refresh = load_config("Canon EOS 600D")
+    assert tree == cached_config("Canon EOS 600D") and needs_refresh
+    camera_config._read_this_session.add("Canon EOS 600D")
+    assert load_config("Canon EOS 600D")[1] is False
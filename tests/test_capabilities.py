@@ -0,0 +1,76 @@
+import pytest
+
+from utils.capabilities import (
+    _path, CAPTURE_TIMEOUT_MIN, DELAY_GROW, DELAY_MAX, DELAY_MIN, DELAY_SHRINK, capture_timeout,
+    lookup, record_delay, record_liveview, record_timing, viewfinder_args,
+)
+from utils.settings import load_json
+
+
+@pytest.fixture
+def caps():
+    return lookup("Canon EOS 600D")
+
+
+def test_lookup_layers_vendor_and_model_defaults(caps):
+    assert caps["liveview_size"] == [1056, 704]   # model
+    assert caps["viewfinder_off"]                 # Canon vendor, from the brand name
+    assert caps["key"] == "canon-eos-600d"
+    assert lookup("Unknown Cam")["stop_delay"] == 2.0
+
+
+def test_record_delay_shrinks_after_success(caps):
+    record_delay(caps, "stop_delay", True)
+    assert caps["stop_delay"] == round(3.0 * DELAY_SHRINK, 2)
+    # Learned values survive a new lookup
+    assert lookup("Canon EOS 600D")["stop_delay"] == caps["stop_delay"]
+
+
+def test_record_delay_grows_after_failure_and_remembers_it(caps):
+    record_delay(caps, "stop_delay", False)
+    assert caps["stop_delay"] == 3.0 * DELAY_GROW
+    assert caps["failed_delays"] == {"stop_delay": 3.0}
+
+
+def test_record_delay_never_shrinks_back_to_a_failed_value(caps):
+    record_delay(caps, "stop_delay", False)   # 3.0 failed -> 4.5
+    record_delay(caps, "stop_delay", True)    # 3.83
+    record_delay(caps, "stop_delay", True)    # 3.26
+    worked = caps["stop_delay"]
+    record_delay(caps, "stop_delay", True)    # 2.77 <= 3.0: stays
+    assert caps["stop_delay"] == worked > 3.0
+
+
+def test_record_delay_bounds(caps):
+    for _ in range(20):
+        record_delay(caps, "recovery_delay", False)
+    assert caps["recovery_delay"] == DELAY_MAX
+    fresh = lookup("Unknown Cam")
+    for _ in range(20):
+        record_delay(fresh, "recovery_delay", True)
+    assert fresh["recovery_delay"] == DELAY_MIN
+
+
+def test_record_timing_and_capture_timeout(caps):
+    assert capture_timeout(caps) == CAPTURE_TIMEOUT_MIN
+    record_timing(caps, "capture", 20.0)
+    record_timing(caps, "capture", 30.0)
+    assert caps["timings"]["capture"] == pytest.approx(23.0)
+    assert capture_timeout(caps) == pytest.approx(92.0)
+
+
+def test_record_liveview_stores_only_changes(caps):
+    record_liveview(caps, (1056, 704), 29.6)
+    assert load_json(_path(), {}) == {}
+    record_liveview(caps, (960, 640), 24.8)
+    learned = lookup("Canon EOS 600D")
+    assert learned["liveview_size"] == [960, 640] and learned["liveview_fps"] == 25
+
+
+def test_viewfinder_args(caps):
+    tree = {"viewfinder": {}}
+    assert viewfinder_args(caps, tree) == ["--set-config", "viewfinder=0"]
+    # No tree cached yet: sent, a refusal is retried without it
+    assert viewfinder_args(caps, None) == ["--set-config", "viewfinder=0"]
+    assert viewfinder_args(caps, {"iso": {}}) == []
+    assert viewfinder_args(lookup("Unknown Cam"), tree) == []
@@ -0,0 +1,106 @@
+import os
+import stat
+
+import pytest
+
+from utils import frame_ring
+from utils.frame_ring import SLOT, SLOTS_OFFSET, FrameRingReader, FrameRingWriter, i420_size
+
+
+@pytest.fixture
+def ring(tmp_path):
+    writer = FrameRingWriter(str(tmp_path / "ring"), 8, 4, fps=25.0)
+    reader = FrameRingReader(writer.path)
+    yield writer, reader
+    reader.close()
+    writer.close()
+
+
+def frame(writer, value):
+    return bytes([value]) * writer.frame_size
+
+
+def test_header(ring):
+    writer, reader = ring
+    assert (reader.width, reader.height, reader.fps, reader.fourcc) == (8, 4, 25.0, "I420")
+    assert reader.frame_size == i420_size(8, 4) == 48
+    assert stat.S_IMODE(os.stat(writer.path).st_mode) == 0o600
+    assert reader.alive and reader.head() == 0
+
+
+def test_reads_frames_in_order(ring):
+    writer, reader = ring
+    buf = reader.new_buffer()
+    assert reader.read_next(buf) is None
+    writer.publish(frame(writer, 1), timestamp=1.0)
+    writer.publish(frame(writer, 2), timestamp=2.0)
+    assert reader.read_next(buf) == (1, 1.0) and buf[0] == 1
+    assert reader.read_next(buf) == (2, 2.0) and buf[0] == 2
+    assert reader.read_next(buf) is None
+    assert reader.skipped == 0
+
+
+def test_lapped_reader_skips_ahead(ring):
+    writer, reader = ring
+    buf = reader.new_buffer()
+    for value in range(1, 11):
+        writer.publish(frame(writer, value))
+    seq, _timestamp = reader.read_next(buf)
+    # Only frames still in the ring (and not the slot being rewritten next)
+    assert seq == 10 - writer.slots + 2
+    assert buf[0] == seq
+    assert reader.skipped == seq - 1
+
+
+def test_read_latest(ring):
+    writer, reader = ring
+    buf = reader.new_buffer()
+    for value in range(1, 4):
+        writer.publish(frame(writer, value))
+    assert reader.read_latest(buf)[0] == 3 and buf[0] == 3
+    assert reader.read_latest(buf) is None
+
+
+def test_slot_being_written_is_not_read(ring):
+    writer, reader = ring
+    buf = reader.new_buffer()
+    writer.publish(frame(writer, 1))
+    # Writer caught between its two lock updates: odd lock
+    offset = SLOTS_OFFSET + (1 % writer.slots) * writer._stride
+    lock, seq, timestamp = SLOT.unpack_from(writer._map, offset)
+    SLOT.pack_into(writer._map, offset, lock + 1, seq, timestamp)
+    assert reader.read_latest(buf) is None
+    assert reader.retries == 3
+    SLOT.pack_into(writer._map, offset, lock + 2, seq, timestamp)
+    assert reader.read_latest(buf)[0] == 1
+
+
+def test_overwritten_slot_is_not_read(ring):
+    writer, reader = ring
+    buf = reader.new_buffer()
+    writer.publish(frame(writer, 1))
+    # Frame 1's slot now holds a newer frame
+    assert reader._copy(1 + writer.slots, buf) is None
+
+
+def test_close_marks_the_ring_and_removes_it(ring):
+    writer, reader = ring
+    writer.close()
+    assert not reader.alive
+    assert not os.path.exists(writer.path)
+
+
+def test_reader_rejects_other_files(tmp_path):
+    path = tmp_path / "other"
+    path.write_bytes(b"\0" * 256)
+    with pytest.raises(ValueError):
+        FrameRingReader(str(path))
+
+
+def test_list_rings(tmp_path, monkeypatch):
+    monkeypatch.setattr(frame_ring, "RING_FILE", str(tmp_path / "ring-{port}"))
+    writer = FrameRingWriter(frame_ring.ring_path(5000), 8, 4)
+    try:
+        assert frame_ring.list_rings() == [str(tmp_path / "ring-5000")]
+    finally:
+        writer.close()
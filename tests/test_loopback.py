@@ -0,0 +1,92 @@
+import os
+
+import pytest
+
+from utils.loopback import (
+    DEFAULT_LABEL, LABEL_MAX, MAX_DEVICES, MAX_PER_OWNER, FakeLoopback, LoopbackError,
+    LoopbackService,
+)
+
+
+@pytest.fixture
+def service():
+    return LoopbackService(FakeLoopback())
+
+
+def test_add_creates_a_device_owned_by_the_caller(service):
+    number, path = service.add(":1.10", "Canon EOS 600D")
+    assert os.path.exists(path)
+    assert service.backend.labels[number] == "Canon EOS 600D"
+    assert service.list() == [(number, path, ":1.10")]
+
+
+def test_labels_are_cleaned(service):
+    number, _path = service.add(":1.10", "   ")
+    assert service.backend.labels[number] == DEFAULT_LABEL
+    number, _path = service.add(":1.10", "x" * 100)
+    assert len(service.backend.labels[number]) == LABEL_MAX
+
+
+def test_per_owner_and_global_limits(service):
+    for _ in range(MAX_PER_OWNER):
+        service.add(":1.10", "cam")
+    with pytest.raises(LoopbackError):
+        service.add(":1.10", "cam")
+    owner = 11
+    while service.count() < MAX_DEVICES:
+        service.add(f":1.{owner}", "cam")
+        if len(service.owners[f":1.{owner}"]) == MAX_PER_OWNER:
+            owner += 1
+    with pytest.raises(LoopbackError):
+        service.add(":1.99", "cam")
+
+
+def test_only_the_owner_removes_a_device(service):
+    number, path = service.add(":1.10", "cam")
+    with pytest.raises(LoopbackError):
+        service.remove(":1.11", number)
+    service.remove(":1.10", number)
+    assert not os.path.exists(path)
+    assert service.owners == {} and service.count() == 0
+
+
+def test_release_removes_everything_of_a_departed_owner(service):
+    mine = [service.add(":1.10", "cam")[1] for _ in range(2)]
+    other = service.add(":1.11", "cam")[1]
+    service.release(":1.10")
+    assert not any(os.path.exists(path) for path in mine)
+    assert os.path.exists(other)
+    assert list(service.owners) == [":1.11"]
+
+
+def test_busy_device_becomes_an_orphan_until_closed(service):
+    number, path = service.add(":1.10", "cam")
+    service.backend.busy.add(number)   # a video call still has it open
+    service.release(":1.10")
+    assert service.orphans == {number} and os.path.exists(path)
+    # Still counted: the device exists
+    assert service.count() == 1
+    assert service.retry_orphans() is True
+    service.backend.busy.clear()
+    assert service.retry_orphans() is False
+    assert not os.path.exists(path) and service.count() == 0
+
+
+def test_release_reports_failures_after_trying_all(service):
+    first, _ = service.add(":1.10", "cam")
+    second, second_path = service.add(":1.10", "cam")
+    # Gone behind the helper's back: the kernel says EINVAL
+    del service.backend.labels[first]
+    with pytest.raises(LoopbackError, match=f"device {first}"):
+        service.release(":1.10")
+    assert not os.path.exists(second_path)
+
+
+def test_backend_errors_become_loopback_errors(service):
+    def refuse(label):
+        raise OSError(28, "No space left on device")
+
+    service.backend.add = refuse
+    with pytest.raises(LoopbackError, match="could not add"):
+        service.add(":1.10", "cam")
+    assert service.count() == 0
@@ -0,0 +1,112 @@
+import pytest
+
+from utils.frame_stage import split_spec
+from utils.output_profiles import (
+    DEFAULT_PROFILE, ffmpeg_filter, ffmpeg_pacing_args, load_profile, plugin_spec,
+    rate_converted_outputs, roi_scaler_sizes, roi_scalers, save_profile, script_env,
+)
+from utils.roi import SCALERS_SHARED, SCALERS_SPLIT
+
+
+def profile(**values):
+    p = dict(DEFAULT_PROFILE)
+    p.update(values)
+    return p
+
+
+ZOOMED = {"zoom": 2.0, "x": 0.5, "y": 0.5}
+
+
+def test_native_yuv420p_shares_one_scaler():
+    graph = ffmpeg_filter(profile())
+    assert graph.startswith("[0:v]crop@roi=")
+    assert graph.count("scale@roi_v4l2=") == 1
+    assert "scale@roi_preview" not in graph
+    assert graph.endswith("split=2[v1][v2]")
+    assert roi_scalers(profile()) == SCALERS_SHARED
+
+
+def test_native_keeps_the_crop_size():
+    graph = ffmpeg_filter(profile(roi=ZOOMED))
+    # The crop is never scaled back up to the full frame
+    assert "scale@roi_v4l2=w=trunc(iw/2)*2:h=trunc(ih/2)*2:" in graph
+    assert "zoom" not in graph and "iw*" not in graph
+
+
+def test_fixed_size_crops_to_fill_by_default():
+    graph = ffmpeg_filter(profile(width=1280, height=720))
+    v4l2, preview = graph.split(";")[1:]
+    assert "scale@roi_v4l2=w=1280:h=720:force_original_aspect_ratio=increase" in v4l2
+    assert "crop=1280:720" in v4l2
+    assert v4l2.endswith("[v1]")
+    # The preview keeps the crop's size, only the webcam needs 16:9
+    assert "scale@roi_preview=w=trunc(iw/2)*2:h=trunc(ih/2)*2:" in preview
+    assert preview.endswith("format=yuv420p[v2]")
+
+
+def test_fixed_size_pad_keeps_the_whole_picture():
+    graph = ffmpeg_filter(profile(width=1280, height=720, fit="pad"))
+    assert "force_original_aspect_ratio=decrease" in graph
+    assert "pad=1280:720:(ow-iw)/2:(oh-ih)/2" in graph
+
+
+def test_pixel_format_of_the_v4l2_branch():
+    graph = ffmpeg_filter(profile(format="YUYV"))
+    assert "format=yuyv422[v1]" in graph
+    assert "format=yuv420p[v2]" in graph
+    assert roi_scalers(profile(format="YUYV")) == SCALERS_SPLIT
+
+
+def test_extra_outputs_branch_off_the_crop():
+    p = profile(extra_outputs=[{"width": 640, "height": 360, "fps": 15},
+                               {"width": 0, "height": 0, "fps": 10}])
+    graph = ffmpeg_filter(p)
+    assert graph.count("crop@roi=") == 1
+    assert ",split=3[main][e0][e1];" in graph
+    assert "[e0]fps=15,scale=w=640:h=360:" in graph
+    assert "[e1]fps=10,scale=w=trunc(iw/2)*2" in graph
+    assert graph.endswith("[x1];[main]scale@roi_v4l2=w=trunc(iw/2)*2:h=trunc(ih/2)*2:"
+                          "flags=bilinear,format=yuv420p,split=2[v1][v2]")
+
+
+def test_zmq_filter_comes_before_the_crop():
+    graph = ffmpeg_filter(profile(), zmq_port=15000)
+    assert graph.startswith("[0:v]zmq=")
+    assert graph.index("zmq=") < graph.index("crop@roi=")
+
+
+def test_roi_scaler_sizes():
+    assert roi_scaler_sizes(profile(), (528, 352)) == {"scale@roi_v4l2": (528, 352)}
+    assert roi_scaler_sizes(profile(width=1280, height=720), (528, 352)) == {
+        "scale@roi_v4l2": (1280, 720), "scale@roi_preview": (528, 352)}
+
+
+@pytest.mark.parametrize("pacing, outputs", [("fixed", 2), ("source", 0)])
+def test_rate_converted_outputs(pacing, outputs):
+    assert rate_converted_outputs(profile(pacing=pacing)) == outputs
+
+
+def test_preview_rate_follows_the_live_view():
+    assert ffmpeg_pacing_args(profile(), 25)[2] == ["-r", "25"]
+    assert ffmpeg_pacing_args(profile())[2] == ["-r", "30"]
+    assert ffmpeg_pacing_args(profile(), 60)[2] == ["-r", "30"]
+
+
+def test_plugin_spec_survives_commas_in_paths():
+    plugins = ["mirror", "watermark:/home/a,b/logo\\x.png"]
+    assert split_spec(plugin_spec(plugins)) == plugins
+
+
+def test_script_env():
+    env = script_env(profile(pacing="source", min_fps=10, plugins=["mirror"]))
+    assert env["IN_OPTS"] == "-use_wallclock_as_timestamps 1"
+    assert env["V4L2_RATE"] == env["UDP_RATE"] == "-fps_mode passthrough"
+    assert env["MIN_FPS"] == "10"
+    assert env["PLUGINS"] == "mirror"
+    assert script_env(profile(min_fps=10))["MIN_FPS"] == "0"
+
+
+def test_profiles_are_saved_per_model():
+    save_profile("Canon EOS 600D", profile(width=640, height=360))
+    assert load_profile("Canon EOS 600D")["width"] == 640
+    assert load_profile("Canon EOS 1100D") == DEFAULT_PROFILE
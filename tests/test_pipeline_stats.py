@@ -0,0 +1,66 @@
+import os
+
+from utils import pipeline_stats
+from utils.pipeline_stats import parse_progress, read_stats, stats_from_progress
+
+BLOCK = """frame={frame}
+fps={fps}
+dup_frames={dup}
+drop_frames={drop}
+out_time=00:00:0{frame}.000000
+progress=continue
+"""
+
+
+def block(frame=10, fps="30.00", dup=0, drop=0):
+    return BLOCK.format(frame=frame, fps=fps, dup=dup, drop=drop)
+
+
+def test_parse_progress_takes_the_last_complete_block():
+    text = block(frame=1) + block(frame=2) + "frame=3\nfps=29.0\n"
+    assert parse_progress(text)["frame"] == "2"
+
+
+def test_parse_progress_without_a_complete_block():
+    assert parse_progress("frame=3\nfps=29.0\n") == {}
+    assert parse_progress("") == {}
+
+
+def test_duplicates_and_drops_are_shared_over_the_outputs():
+    stats = stats_from_progress(parse_progress(block(frame=300, dup=120, drop=20)), 2)
+    assert stats == {"frames": 300, "fps": 30.0, "dup": 60, "drop": 10, "real": 250}
+
+
+def test_passthrough_outputs_count_everything_real():
+    stats = stats_from_progress(parse_progress(block(frame=300, dup=0)), 0)
+    assert stats["real"] == 300
+
+
+def test_garbage_values_read_as_zero():
+    stats = stats_from_progress({"frame": "N/A", "fps": "nan?"}, 1)
+    assert stats["frames"] == 0 and stats["fps"] == 0.0
+
+
+def test_read_stats(tmp_path, monkeypatch):
+    monkeypatch.setattr(pipeline_stats, "PROGRESS_FILE", str(tmp_path / "progress_{port}.txt"))
+    assert read_stats(5000, 2) is None
+    (tmp_path / "progress_5000.txt").write_text(block(frame=90, dup=20))
+    assert read_stats(5000, 2)["dup"] == 10
+
+
+def test_read_stats_empties_a_large_file(tmp_path, monkeypatch):
+    path = tmp_path / "progress_5000.txt"
+    monkeypatch.setattr(pipeline_stats, "PROGRESS_FILE", str(tmp_path / "progress_{port}.txt"))
+    monkeypatch.setattr(pipeline_stats, "PROGRESS_MAX_BYTES", 64 * 1024)
+    path.write_text(block() * 2000)
+    # The newest block is still read before the file is emptied
+    assert read_stats(5000, 1)["frames"] == 10
+    assert os.path.getsize(path) == 0
+
+
+def test_read_stats_skips_the_hole_left_by_truncation(tmp_path, monkeypatch):
+    # ffmpeg keeps writing at its old offset: zeros up to there
+    path = tmp_path / "progress_5000.txt"
+    monkeypatch.setattr(pipeline_stats, "PROGRESS_FILE", str(tmp_path / "progress_{port}.txt"))
+    path.write_bytes(b"\0" * 8192 + block(frame=7).encode())
+    assert read_stats(5000, 1)["frames"] == 7
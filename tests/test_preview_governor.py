@@ -0,0 +1,104 @@
+import pytest
+
+from utils import preview_governor
+from utils.preview_governor import DOWN_TICKS, PREVIEW_LEVELS, UP_TICKS, PreviewGovernor
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class Cpu:
+    busy = 0.1
+
+    def sample(self):
+        return self.busy
+
+
+@pytest.fixture
+def governor(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(preview_governor.time, "monotonic", clock)
+    monkeypatch.setattr(preview_governor, "load_per_cpu", lambda: 0.1)
+    changes = []
+    gov = PreviewGovernor(changes.append, source_fps=30)
+    gov._cpu = Cpu()
+    gov.clock = clock
+    gov.changes = changes
+    return gov
+
+
+def second(gov, shown=30, lateness=0.005):
+    """One second of preview: shown frames arrive and are drawn, then tick()."""
+    for _ in range(shown):
+        gov.frame_arrived()
+        gov.frame_shown(lateness)
+    gov.clock.now += 1.0
+    gov.tick()
+
+
+def test_calm_stays_full(governor):
+    for _ in range(10):
+        second(governor)
+    assert governor.level["name"] == "full"
+    assert governor.changes == []
+
+
+def test_steps_down_after_down_ticks_of_pressure(governor):
+    governor._cpu.busy = 0.95
+    for _ in range(DOWN_TICKS - 1):
+        second(governor)
+    assert governor.index == 0
+    second(governor)
+    assert governor.level is PREVIEW_LEVELS[1]
+    assert governor.changes == [PREVIEW_LEVELS[1]]
+
+
+def test_late_frames_count_as_pressure(governor):
+    for _ in range(DOWN_TICKS):
+        second(governor, lateness=0.2)
+    assert governor.index == 1
+
+
+def test_no_frames_is_not_starvation(governor):
+    # A hidden or stalled stream must not push the preview down
+    for _ in range(DOWN_TICKS * 3):
+        second(governor, shown=0)
+    assert governor.index == 0
+
+
+def test_steps_back_up_when_calm(governor):
+    governor._cpu.busy = 0.95
+    for _ in range(DOWN_TICKS):
+        second(governor)
+    assert governor.index == 1
+    governor._cpu.busy = 0.1
+    for _ in range(UP_TICKS):
+        second(governor)
+    assert governor.index == 0
+    assert [level["name"] for level in governor.changes] == [PREVIEW_LEVELS[1]["name"], "full"]
+
+
+def test_quick_relapse_backs_off_the_next_step_up(governor):
+    governor._cpu.busy = 0.95
+    for _ in range(DOWN_TICKS):
+        second(governor)
+    governor._cpu.busy = 0.1
+    for _ in range(UP_TICKS):
+        second(governor)
+    governor._cpu.busy = 0.95
+    for _ in range(DOWN_TICKS):
+        second(governor)
+    assert governor._up_ticks == UP_TICKS * 2
+
+
+def test_paused_level_judges_system_only(governor):
+    governor.index = len(PREVIEW_LEVELS) - 1
+    assert governor.level["fps"] == 0
+    for _ in range(UP_TICKS):
+        second(governor, shown=0)
+    assert governor.index == len(PREVIEW_LEVELS) - 2
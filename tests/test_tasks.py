@@ -0,0 +1,153 @@
+import asyncio
+import os
+import queue
+import subprocess
+
+import pytest
+
+from utils import tasks
+from utils.tasks import TaskRunner, run_process
+
+
+@pytest.fixture
+def runner():
+    runner = TaskRunner(glib_loop=False)
+    yield runner
+    runner.close()
+    runner.loop.call_soon_threadsafe(runner.loop.stop)
+
+
+class Done:
+    """on_done callback that lets the test wait for the operations."""
+
+    def __init__(self):
+        self.ops = queue.Queue()
+
+    def __call__(self, op):
+        self.ops.put(op)
+
+    def next(self, timeout=5):
+        return self.ops.get(timeout=timeout)
+
+
+def test_result_and_error(runner):
+    done = Done()
+
+    async def ok(value):
+        return value * 2
+
+    async def fail():
+        raise RuntimeError("camera busy")
+
+    runner.submit("ok", ok, 21, on_done=done)
+    op = done.next()
+    assert op.result == 42 and op.error is None and not op.cancelled
+    runner.submit("fail", fail, on_done=done)
+    op = done.next()
+    assert isinstance(op.error, RuntimeError) and op.result is None
+
+
+def test_same_lane_runs_in_submission_order(runner):
+    done = Done()
+    events = []
+
+    async def step(name, delay):
+        events.append(f"{name} start")
+        await asyncio.sleep(delay)
+        events.append(f"{name} end")
+
+    runner.submit("a", step, "a", 0.05, lane="usb:001,005", on_done=done)
+    runner.submit("b", step, "b", 0.0, lane="usb:001,005", on_done=done)
+    first, second = done.next(), done.next()
+    assert events == ["a start", "a end", "b start", "b end"]
+    assert (first.name, second.name) == ("a", "b")
+    assert second.waited >= 0.04
+
+
+def test_different_lanes_run_in_parallel(runner):
+    done = Done()
+    events = []
+
+    async def step(name, delay):
+        events.append(f"{name} start")
+        await asyncio.sleep(delay)
+        events.append(f"{name} end")
+
+    runner.submit("a", step, "a", 0.05, lane="usb:001,005", on_done=done)
+    runner.submit("b", step, "b", 0.0, lane="usb:001,006", on_done=done)
+    done.next(), done.next()
+    assert events == ["a start", "b start", "b end", "a end"]
+
+
+def test_deadline(runner):
+    done = Done()
+    runner.submit("slow", asyncio.sleep, 5, deadline=0.05, on_done=done)
+    op = done.next()
+    assert isinstance(op.error, TimeoutError)
+    assert "slow" in str(op.error)
+
+
+def test_cancel_by_tag_kills_the_process_group(runner):
+    done = Done()
+    started = queue.Queue()
+
+    async def wait_camera():
+        task = asyncio.ensure_future(run_process(["sh", "-c", "sleep 30 & wait"]))
+        await asyncio.sleep(0.2)
+        started.put(set(tasks._groups))
+        return await task
+
+    runner.submit("scan", wait_camera, tags=("hotplug",), on_done=done)
+    runner.submit("other", asyncio.sleep, 0.3, on_done=done)
+    groups = started.get(timeout=5)
+    assert len(groups) == 1
+    runner.cancel("hotplug")
+    ops = {op.name: op for op in (done.next(), done.next())}
+    assert ops["scan"].cancelled
+    assert not ops["other"].cancelled and ops["other"].error is None
+    assert not tasks._group_alive(groups.pop())
+
+
+def test_cancelled_before_start_never_runs(runner):
+    done = Done()
+    ran = []
+
+    async def work():
+        ran.append(True)
+
+    runner.submit("hold", asyncio.sleep, 0.1, lane="usb", on_done=done)
+    op = runner.submit("queued", work, lane="usb", on_done=done)
+    op.cancel()
+    ops = {o.name: o for o in (done.next(), done.next())}
+    assert ops["queued"].cancelled and not ran
+
+
+def test_run_process():
+    result = asyncio.run(run_process(["sh", "-c", "echo out; echo err >&2; exit 3"]))
+    assert (result.returncode, result.stdout, result.stderr) == (3, "out\n", "err\n")
+
+
+def test_run_process_timeout_kills_the_group():
+    async def main():
+        with pytest.raises(subprocess.TimeoutExpired):
+            await run_process(["sh", "-c", "sleep 30 & echo $$; wait"], timeout=0.2)
+
+    asyncio.run(main())
+    assert not tasks._groups
+
+
+def test_close_stops_running_processes(runner):
+    started = queue.Queue()
+
+    async def long_capture():
+        task = asyncio.ensure_future(run_process(["sleep", "30"]))
+        await asyncio.sleep(0.2)
+        started.put(set(tasks._groups))
+        return await task
+
+    runner.submit("capture", long_capture)
+    pgid = started.get(timeout=5).pop()
+    runner.close()
+    assert not tasks._group_alive(pgid)
+    with pytest.raises(ProcessLookupError):
+        os.killpg(pgid, 0)
@@ -1,3 +1,4 @@
+import asyncio
 import os
 import sys
 
@@ -15,12 +16,68 @@ gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
 gi.require_version('Gst', '1.0')
 gi.require_version('GstVideo', '1.0')
-from gi.repository import Gtk, Adw, Gio, GLib, Gdk, GdkPixbuf, Gst, GstVideo
+from gi.repository import Gtk, Adw, Gio, GLib, GObject, Gdk, GdkPixbuf, Gst, GstVideo
+from utils import backends, procs, tracing
+from utils.camera_config import (
+    cached_config as cached_camera_config,
+    camera_args,
+    load_config as load_camera_config,
+    panel_entries,
+)
+from utils.capabilities import (
+    capture_timeout, lookup as lookup_caps, probe as probe_caps, ptp_ports,
+    record_delay as record_caps_delay, record_liveview as record_caps_liveview,
+    record_timing as record_caps_timing, script_env as caps_script_env, timing as caps_timing,
+    viewfinder_args,
+)
+from utils.compositor import (
+    LAYOUTS as COMPOSITOR_LAYOUTS, load_settings as load_compositor_settings,
+    save_settings as save_compositor_settings,
+)
+from utils.demand import GRACE, DemandController, idle_flag
+from utils.exposure_aids import ExposureAids, frame_view as exposure_frame_view
 from utils.i18n import _
+from utils.loopback import DEFAULT_LABEL as LOOPBACK_LABEL, LABEL_MAX, LoopbackClient, LoopbackError
+from utils.opencv_capture import OpenCvCapture
+from utils.output_profiles import (
+    FIT_MODES, FRAMERATES, MIN_FRAMERATES, PACING_MODES, PIXEL_FORMATS, RESOLUTIONS,
+    load_profile, save_profile, extra_outputs,
+    describe as describe_profile, describe_output, rate_converted_outputs, roi_scaler_sizes,
+    roi_scalers,
+    script_env as profile_script_env,
+)
+from utils.frame_ring import list_rings
+from utils.pipeline_stats import (
+    COMPOSITOR_FILE, read_compositor_stats, read_net_stats,
+    read_stats as read_pipeline_stats, read_stage_stats,
+)
+from utils.preview_governor import PreviewGovernor
+from utils.raw_preview import PHOTO_EXTENSIONS, is_raw, previews as raw_previews, shot_files
+from utils.roi import (
+    DEFAULT_ROI, ZOOM_MAX, RoiController, ffmpeg_has_zmq, stage_savings, zmq_port,
+)
+from utils.shutter import (
+    ShutterSession, load_settings as load_shutter_settings,
+    save_settings as save_shutter_settings,
+)
+from utils.stream_server import http_port as net_http_port, stream_url as net_stream_url
+from utils.sysstat import ProcessCpuMeter
+from utils.tasks import TaskRunner, run_process
+from utils.timelapse import (
+    LOG_NAME as TIMELAPSE_LOG, Intervalometer, StreamingAssembler, assemble as assemble_timelapse,
+    camera_shooter, load_settings as load_timelapse_settings,
+    save_settings as save_timelapse_settings, video_frame,
+)
+from utils.watchdog import Watchdog, enabled as watchdog_enabled
 
 # Initialize GStreamer
 Gst.init(None)
 
+# Deadlines (seconds) of whole camera operations, retries included
+DETECT_DEADLINE = 30
+CAPTURE_DEADLINE = 180
+WEBCAM_START_DEADLINE = 90
+
 class WebcamApp(Adw.Application):
     def __init__(self):
         # Unique application_id per instance so multiple windows are truly independent
@@ -37,9 +94,25 @@ class WebcamApp(Adw.Application):
         self.current_mode = "photo"  # "photo" or "video"
         self.last_photo = None
         self.my_video_device = None  # The /dev/videoX assigned to THIS instance
+        self.extra_video_devices = []  # Devices of the profile's extra outputs
+        self._net_clients = 0  # Watching the network stream (utils/stream_server.py)
+        self.compositor_process = None  # Multi-camera compositor started here
+        # Virtual webcams of this instance from the loopback helper (utils/loopback.py),
+        # kept until the app exits so apps see the same /dev/videoN on every start
+        self.loopback = None
+        self.loopback_devices = []  # (number, path)
+        self.compositor_device = None
         self._hotplug_timer = None
         self.is_capturing = False # True if photo or webcam is starting/running
         self._detecting = False # Lock for detect_camera
+        # Camera operations (utils/tasks.py); results come back on the UI thread
+        self.tasks = TaskRunner(dispatch=GLib.idle_add)
+        self._capture_op = None
+        self._webcam_op = None
+        self._demand_op = None
+        self._poll_op = None
+        # Main-loop stall detector (BIG_DIGICAM_WATCHDOG=1)
+        self.watchdog = Watchdog(GLib.timeout_add) if watchdog_enabled() else None
         
         # Setup Style Manager correctly
         style_manager = Adw.StyleManager.get_default()
@@ -153,6 +226,16 @@ class WebcamApp(Adw.Application):
         self.fps_label.set_visible(False)
         overlay.add_overlay(self.fps_label)
 
+        # Virtual webcam output counters (real vs duplicated frames)
+        self.stats_label = Gtk.Label(label="")
+        self.stats_label.set_css_classes(["osd", "stats-osd"])
+        self.stats_label.set_halign(Gtk.Align.END)
+        self.stats_label.set_valign(Gtk.Align.START)
+        self.stats_label.set_margin_top(60)
+        self.stats_label.set_margin_end(20)
+        self.stats_label.set_visible(False)
+        overlay.add_overlay(self.stats_label)
+
         # ===== TOP TOAST (OVERLAY) =====
         self.top_toast_revealer = Gtk.Revealer()
         self.top_toast_revealer.set_transition_type(Gtk.RevealerTransitionType.SLIDE_DOWN)
@@ -201,6 +284,14 @@ class WebcamApp(Adw.Application):
         self.btn_action.set_css_classes(["circular", "action-button"])
         self.btn_action.set_size_request(48, 48)
         self.btn_action.connect("clicked", self.on_action_clicked)
+        # Low-latency shutter: focus is armed on press (or hover), the shot fires on release
+        press = Gtk.GestureClick(propagation_phase=Gtk.PropagationPhase.CAPTURE)
+        press.connect("pressed", lambda *args: self._arm_shutter())
+        self.btn_action.add_controller(press)
+        hover = Gtk.EventControllerMotion()
+        hover.connect("enter", self._on_shutter_enter)
+        hover.connect("leave", self._on_shutter_leave)
+        self.btn_action.add_controller(hover)
         floating_toolbar.append(self.btn_action)
         
         # Stop button (only visible during video)
@@ -212,6 +303,28 @@ class WebcamApp(Adw.Application):
         self.btn_stop.set_visible(False)
         self.btn_stop.connect("clicked", self.on_stop_clicked)
         floating_toolbar.append(self.btn_stop)
+
+        # Digital zoom / pan (shown together with the stop button)
+        self.btn_roi = Gtk.MenuButton()
+        self.btn_roi.set_icon_name("zoom-in-symbolic")
+        self.btn_roi.set_css_classes(["circular"])
+        self.btn_roi.set_size_request(48, 48)
+        self.btn_roi.set_tooltip_text(_("Zoom digital"))
+        self.btn_roi.set_direction(Gtk.ArrowType.UP)
+        self.btn_roi.set_popover(self._create_roi_popover())
+        self.btn_stop.bind_property("visible", self.btn_roi, "visible", GObject.BindingFlags.SYNC_CREATE)
+        floating_toolbar.append(self.btn_roi)
+
+        # Histogram / zebra / focus peaking overlays
+        self.btn_aids = Gtk.MenuButton()
+        self.btn_aids.set_icon_name("display-brightness-symbolic")
+        self.btn_aids.set_css_classes(["circular"])
+        self.btn_aids.set_size_request(48, 48)
+        self.btn_aids.set_tooltip_text(_("Auxílios de exposição e foco"))
+        self.btn_aids.set_direction(Gtk.ArrowType.UP)
+        self.btn_aids.set_popover(self._create_aids_popover())
+        self.btn_stop.bind_property("visible", self.btn_aids, "visible", GObject.BindingFlags.SYNC_CREATE)
+        floating_toolbar.append(self.btn_aids)
         
         # Stack for switching between photo preview and video status
         self.preview_stack = Adw.ViewStack()
@@ -243,7 +356,23 @@ class WebcamApp(Adw.Application):
         self.video_picture.set_vexpand(True)
         self.video_picture.set_hexpand(True)
         self.video_picture.set_content_fit(Gtk.ContentFit.CONTAIN)
-        video_box.append(self.video_picture)
+        # Exposure aids are drawn on pictures stacked over the preview; same
+        # content fit, so the low resolution masks line up with the frame
+        video_overlay = Gtk.Overlay()
+        video_overlay.set_child(self.video_picture)
+        self.aids_picture = Gtk.Picture(can_target=False)
+        self.aids_picture.set_content_fit(Gtk.ContentFit.CONTAIN)
+        video_overlay.add_overlay(self.aids_picture)
+        self.histogram_picture = Gtk.Picture(can_target=False, can_shrink=False)
+        self.histogram_picture.set_halign(Gtk.Align.START)
+        self.histogram_picture.set_valign(Gtk.Align.START)
+        self.histogram_picture.set_margin_start(12)
+        self.histogram_picture.set_margin_top(12)
+        video_overlay.add_overlay(self.histogram_picture)
+        video_box.append(video_overlay)
+        # Gate preview decoding on the picture actually being on screen
+        self.video_picture.connect("map", self._update_preview_gate)
+        self.video_picture.connect("unmap", self._update_preview_gate)
         
         video_page = self.preview_stack.add_titled(video_box, "video", _("Webcam"))
         video_page.set_icon_name("camera-video-symbolic")
@@ -254,12 +383,34 @@ class WebcamApp(Adw.Application):
         
         # GStreamer pipeline (initialized as None)
         self.gst_pipeline = None
+        self.preview_governor = None
+        self.preview_visible = True
+        self.preview_src_size = None
+        self.preview_fps = 0
+        self.webcam_profile = None
+        self.roi_controller = None
+        self.opencv_capture = None
+        self.camera_caps = None
+        self._liveview_recorded = False
+        self.demand = None
+        self.timelapse = None
+        # Low-latency shutter: gphoto2 shell kept open in photo mode (utils/shutter.py)
+        self.shutter = None
+        self.shutter_settings = load_shutter_settings()
+        self._startup_trace = None
+        self._first_frame_trace = None
+        self._await_keyframe = False
+        self._visibility_cpu = ProcessCpuMeter()
         
         # Initialize UI state
         self.update_mode_ui()
         self.load_last_photo()
         
         self.win.present()
+        if self.watchdog:
+            self.watchdog.start()
+        # Minimize / compositor "suspended" (covered, other workspace) state
+        self.win.get_surface().connect("notify::state", self._update_preview_gate)
         
         # Check for background session
         self.check_existing_session()
@@ -274,6 +425,13 @@ class WebcamApp(Adw.Application):
         menu = Gio.Menu.new()
         section = Gio.Menu.new()
         section.append(_("Atualizar Câmeras"), "app.refresh")
+        section.append(_("Saída da webcam virtual"), "app.output_profile")
+        section.append(_("Configurações da câmera"), "app.camera_settings")
+        section.append(_("Timelapse"), "app.timelapse")
+        section.append(_("Obturador rápido"), "app.shutter")
+        section.append(_("Compositor multicâmera"), "app.compositor")
+        if tracing.enabled():
+            section.append(_("Exportar rastreamento"), "app.export_trace")
         section.append(_("Abrir outra câmera (Nova Janela)"), "app.new_window")
         section.append(_("Sobre"), "app.about")
         section.append(_("Sair"), "app.quit")
@@ -285,6 +443,121 @@ class WebcamApp(Adw.Application):
         menu_button.set_css_classes(["flat"])
         return menu_button
 
+    def _create_roi_popover(self):
+        grid = Gtk.Grid(row_spacing=6, column_spacing=12)
+        grid.set_margin_top(12)
+        grid.set_margin_bottom(12)
+        grid.set_margin_start(12)
+        grid.set_margin_end(12)
+
+        self.roi_scales = {}
+        rows = [
+            ("zoom", _("Zoom"), 1.0, ZOOM_MAX, 0.05),
+            ("x", _("Horizontal"), 0.0, 1.0, 0.01),
+            ("y", _("Vertical"), 0.0, 1.0, 0.01),
+        ]
+        for i, (key, title, lower, upper, step) in enumerate(rows):
+            label = Gtk.Label(label=title, xalign=0)
+            scale = Gtk.Scale.new_with_range(Gtk.Orientation.HORIZONTAL, lower, upper, step)
+            scale.set_size_request(200, -1)
+            scale.set_hexpand(True)
+            scale.connect("value-changed", self._on_roi_changed)
+            grid.attach(label, 0, i, 1, 1)
+            grid.attach(scale, 1, i, 1, 1)
+            self.roi_scales[key] = scale
+
+        reset_btn = Gtk.Button(label=_("Redefinir"))
+        reset_btn.connect("clicked", lambda b: self._set_roi_scales(DEFAULT_ROI))
+        grid.attach(reset_btn, 0, len(rows), 2, 1)
+
+        popover = Gtk.Popover()
+        popover.set_child(grid)
+        popover.connect("show", lambda p: self._set_roi_scales(self._current_roi()))
+        popover.connect("closed", self._on_roi_closed)
+        self._roi_syncing = False
+        self._roi_timer = None
+        return popover
+
+    def _create_aids_popover(self):
+        box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=6)
+        box.set_margin_top(12)
+        box.set_margin_bottom(12)
+        box.set_margin_start(12)
+        box.set_margin_end(12)
+
+        # Analysis runs on a worker thread at a few Hz, see utils/exposure_aids.py
+        self.exposure_aids = ExposureAids(lambda result: GLib.idle_add(self._show_aids, result))
+        for key, title in (("histogram", _("Histograma")),
+                           ("zebra", _("Zebra (superexposição)")),
+                           ("peaking", _("Realce de foco"))):
+            check = Gtk.CheckButton(label=title)
+            check.connect("toggled", self._on_aid_toggled, key)
+            box.append(check)
+
+        popover = Gtk.Popover()
+        popover.set_child(box)
+        return popover
+
+    def _on_aid_toggled(self, check, key):
+        setattr(self.exposure_aids, key, check.get_active())
+        if not (self.exposure_aids.zebra or self.exposure_aids.peaking):
+            self.aids_picture.set_paintable(None)
+        if not self.exposure_aids.histogram:
+            self.histogram_picture.set_paintable(None)
+
+    def _show_aids(self, result):
+        if not self.preview_active or not self.exposure_aids.enabled:
+            return False
+        for picture, image in ((self.aids_picture, result["overlay"]),
+                               (self.histogram_picture, result["histogram"])):
+            if image is None:
+                picture.set_paintable(None)
+                continue
+            h, w = image.shape[:2]
+            texture = Gdk.MemoryTexture.new(
+                w, h, Gdk.MemoryFormat.R8G8B8A8, GLib.Bytes.new(image.tobytes()), w * 4
+            )
+            picture.set_paintable(texture)
+        return False
+
+    def _current_roi(self):
+        return dict((self.webcam_profile or {}).get("roi", DEFAULT_ROI))
+
+    def _set_roi_scales(self, roi):
+        self._roi_syncing = True
+        for key, scale in self.roi_scales.items():
+            scale.set_value(roi[key])
+        self._roi_syncing = False
+        self._on_roi_changed()
+
+    def _on_roi_changed(self, *args):
+        if self._roi_syncing or self.webcam_profile is None:
+            return
+        # Sliders fire on every pixel moved; send at most one update per 40 ms
+        if self._roi_timer is None:
+            self._roi_timer = GLib.timeout_add(40, self._apply_roi)
+
+    def _apply_roi(self):
+        self._roi_timer = None
+        roi = {key: scale.get_value() for key, scale in self.roi_scales.items()}
+        if roi == self.webcam_profile["roi"]:
+            return False
+        self.webcam_profile["roi"] = roi
+
+        sizes = roi_scaler_sizes(self.webcam_profile, self.preview_src_size)
+        if not (self.roi_controller and self.roi_controller.apply(roi, sizes)):
+            self.show_toast(_("O zoom será aplicado ao reiniciar a webcam"), "warning")
+        return False
+
+    def _on_roi_closed(self, popover):
+        if self.webcam_profile is not None:
+            # The running profile may be older than the saved one (edited in
+            # the profile dialog meanwhile): only the ROI comes from it
+            model = self.get_selected_camera_name()
+            profile = load_profile(model)
+            profile["roi"] = dict(self.webcam_profile["roi"])
+            save_profile(model, profile)
+
     def _setup_actions(self):
         about_action = Gio.SimpleAction.new("about", None)
         about_action.connect("activate", self._on_about)
@@ -300,6 +573,42 @@ class WebcamApp(Adw.Application):
         refresh_action.connect("activate", self._on_refresh)
         self.add_action(refresh_action)
 
+        profile_action = Gio.SimpleAction.new("output_profile", None)
+        profile_action.connect("activate", self._on_output_profile)
+        self.add_action(profile_action)
+
+        camera_settings_action = Gio.SimpleAction.new("camera_settings", None)
+        camera_settings_action.connect("activate", self._on_camera_settings)
+        self.add_action(camera_settings_action)
+
+        timelapse_action = Gio.SimpleAction.new("timelapse", None)
+        timelapse_action.connect("activate", self._on_timelapse)
+        self.add_action(timelapse_action)
+
+        shutter_action = Gio.SimpleAction.new("shutter", None)
+        shutter_action.connect("activate", self._on_shutter)
+        self.add_action(shutter_action)
+
+        compositor_action = Gio.SimpleAction.new("compositor", None)
+        compositor_action.connect("activate", self._on_compositor)
+        self.add_action(compositor_action)
+
+        export_trace_action = Gio.SimpleAction.new("export_trace", None)
+        export_trace_action.connect("activate", self._on_export_trace)
+        self.add_action(export_trace_action)
+
+    def _on_export_trace(self, action=None, param=None):
+        """Write the recorded spans (BIG_DIGICAM_TRACE=1) as Chrome trace JSON."""
+        path = os.path.abspath(time.strftime("big-digicam-trace-%Y%m%d-%H%M%S.json"))
+        try:
+            count = tracing.export(path)
+        except OSError as e:
+            print(f"[Trace] Export failed: {e}")
+            self.show_toast(_("Erro ao exportar rastreamento"), "error")
+            return
+        print(f"[Trace] {count} spans written to {path} (open in chrome://tracing or ui.perfetto.dev)")
+        self.show_toast(f"{_('Rastreamento salvo:')} {os.path.basename(path)}", "success")
+
     def _on_about(self, action=None, param=None):
         about = Adw.AboutDialog(
             application_name="Big DigiCam",
@@ -331,6 +640,636 @@ class WebcamApp(Adw.Application):
         self.show_toast(_("Buscando câmeras..."), "accent")
         self.detect_camera(callback=self._update_camera_dropdown)
 
+    def _on_output_profile(self, action=None, param=None):
+        """Per-camera-model pixel format, resolution and framerate of /dev/videoN."""
+        model = self.get_selected_camera_name()
+        profile = load_profile(model)
+
+        dialog = Adw.PreferencesDialog(title=_("Saída da webcam virtual"))
+        page = Adw.PreferencesPage()
+        group = Adw.PreferencesGroup(
+            title=model or _("Câmera Genérica"),
+            description=_("Aplicado na próxima vez que a webcam for iniciada")
+        )
+        page.add(group)
+        dialog.add(page)
+
+        formats = list(PIXEL_FORMATS)
+        format_row = Adw.ComboRow(title=_("Formato de pixel"), model=Gtk.StringList.new(formats))
+        if profile["format"] in formats:
+            format_row.set_selected(formats.index(profile["format"]))
+
+        sizes = [_("Nativa") if not w else f"{w}x{h}" for w, h in RESOLUTIONS]
+        size_row = Adw.ComboRow(title=_("Resolução"), model=Gtk.StringList.new(sizes))
+        current_size = (profile["width"], profile["height"])
+        if current_size in RESOLUTIONS:
+            size_row.set_selected(RESOLUTIONS.index(current_size))
+
+        fit_labels = [_("Cortar para preencher"), _("Imagem inteira com bordas")]
+        fit_row = Adw.ComboRow(
+            title=_("Ajuste à resolução"),
+            subtitle=_("Quando a proporção difere da câmera (3:2 para 16:9)"),
+            model=Gtk.StringList.new(fit_labels)
+        )
+        if profile["fit"] in FIT_MODES:
+            fit_row.set_selected(FIT_MODES.index(profile["fit"]))
+
+        rates = [f"{fps} fps" for fps in FRAMERATES]
+        fps_row = Adw.ComboRow(title=_("Taxa de quadros"), model=Gtk.StringList.new(rates))
+        if profile["fps"] in FRAMERATES:
+            fps_row.set_selected(FRAMERATES.index(profile["fps"]))
+
+        pacing_labels = [_("Taxa fixa (duplica quadros)"), _("Ritmo da câmera")]
+        pacing_row = Adw.ComboRow(title=_("Ritmo dos quadros"), model=Gtk.StringList.new(pacing_labels))
+        if profile["pacing"] in PACING_MODES:
+            pacing_row.set_selected(PACING_MODES.index(profile["pacing"]))
+
+        min_labels = [_("Nenhuma") if not fps else f"{fps} fps" for fps in MIN_FRAMERATES]
+        min_row = Adw.ComboRow(
+            title=_("Taxa mínima para os apps"),
+            subtitle=_("Repete o último quadro só quando a câmera fica abaixo dela"),
+            model=Gtk.StringList.new(min_labels)
+        )
+        if profile["min_fps"] in MIN_FRAMERATES:
+            min_row.set_selected(MIN_FRAMERATES.index(profile["min_fps"]))
+
+        share_row = Adw.SwitchRow(
+            title=_("Compartilhar quadros decodificados"),
+            subtitle=_("Outros programas locais leem os quadros sem decodificar de novo")
+        )
+        share_row.set_active(profile["share_frames"])
+
+        net_row = Adw.SwitchRow(
+            title=_("Transmitir na rede local"),
+            subtitle=net_stream_url(self.udp_port)
+        )
+        net_row.set_active(profile["network_stream"])
+
+        # A second virtual webcam from the same decode (the first extra
+        # output; more can be listed in output_profiles.json)
+        extras = extra_outputs(profile)
+        extra_sizes = RESOLUTIONS[1:]
+        extra_row = Adw.ComboRow(
+            title=_("Segunda webcam virtual"),
+            subtitle=_("Outra resolução para apps que não aceitam a principal"),
+            model=Gtk.StringList.new([_("Desativada")] + [f"{w}x{h}" for w, h in extra_sizes])
+        )
+        extra_fps_row = Adw.ComboRow(title=_("Taxa da segunda webcam"), model=Gtk.StringList.new(rates))
+        if extras:
+            extra_size = (extras[0]["width"], extras[0]["height"])
+            if extra_size in extra_sizes:
+                extra_row.set_selected(extra_sizes.index(extra_size) + 1)
+            if extras[0]["fps"] in FRAMERATES:
+                extra_fps_row.set_selected(FRAMERATES.index(extras[0]["fps"]))
+
+        def sync_rows():
+            source = PACING_MODES[pacing_row.get_selected()] == "source"
+            fps_row.set_sensitive(not source)
+            min_row.set_sensitive(source)
+            fit_row.set_sensitive(RESOLUTIONS[size_row.get_selected()] != (0, 0))
+            extra_fps_row.set_sensitive(extra_row.get_selected() > 0)
+
+        def on_changed(*args):
+            sync_rows()
+            w, h = RESOLUTIONS[size_row.get_selected()]
+            extras = extra_outputs(profile)
+            if extra_row.get_selected() > 0:
+                ew, eh = extra_sizes[extra_row.get_selected() - 1]
+                second = {"width": ew, "height": eh, "fps": FRAMERATES[extra_fps_row.get_selected()]}
+                extras[:1] = [second]
+            else:
+                extras = []
+            profile.update({
+                "format": formats[format_row.get_selected()],
+                "width": w,
+                "height": h,
+                "fit": FIT_MODES[fit_row.get_selected()],
+                "fps": FRAMERATES[fps_row.get_selected()],
+                "pacing": PACING_MODES[pacing_row.get_selected()],
+                "min_fps": MIN_FRAMERATES[min_row.get_selected()],
+                "share_frames": share_row.get_active(),
+                "extra_outputs": extras,
+                "network_stream": net_row.get_active(),
+            })
+            save_profile(model, profile)
+
+        sync_rows()
+        for row in (format_row, size_row, fit_row, fps_row, pacing_row, min_row):
+            row.connect("notify::selected", on_changed)
+            group.add(row)
+        for row in (share_row, net_row):
+            row.connect("notify::active", on_changed)
+            group.add(row)
+        for row in (extra_row, extra_fps_row):
+            row.connect("notify::selected", on_changed)
+            group.add(row)
+
+        self._add_effects_group(page, model, profile)
+        dialog.present(self.win)
+
+    def _add_effects_group(self, page, model, profile):
+        """Frame stage plugins (auto-framing, mirror, colour LUT, watermark) of a profile."""
+        group = Adw.PreferencesGroup(
+            title=_("Efeitos"),
+            description=_("Processados quadro a quadro antes da webcam virtual")
+        )
+        page.add(group)
+
+        specs = {spec.partition(":")[0]: spec.partition(":")[2] for spec in profile["plugins"]}
+
+        autoframe_row = Adw.SwitchRow(
+            title=_("Enquadramento automático"),
+            subtitle=_("Segue o rosto do apresentador (requer OpenCV)")
+        )
+        autoframe_row.set_active("autoframe" in specs)
+
+        mirror_row = Adw.SwitchRow(title=_("Espelhar imagem"))
+        mirror_row.set_active("mirror" in specs)
+
+        luts = [None, "warm", "cool", "contrast", "mono"]
+        lut_labels = [_("Nenhum"), _("Quente"), _("Frio"), _("Contraste"), _("Preto e branco")]
+        lut_row = Adw.ComboRow(title=_("Filtro de cor"), model=Gtk.StringList.new(lut_labels))
+        if specs.get("lut") in luts:
+            lut_row.set_selected(luts.index(specs["lut"]))
+
+        watermark = {"path": specs.get("watermark") or None}
+        watermark_row = Adw.ActionRow(title=_("Marca d'água"))
+        clear_btn = Gtk.Button(icon_name="edit-clear-symbolic", valign=Gtk.Align.CENTER)
+        clear_btn.add_css_class("flat")
+        choose_btn = Gtk.Button(icon_name="document-open-symbolic", valign=Gtk.Align.CENTER)
+        choose_btn.add_css_class("flat")
+        watermark_row.add_suffix(clear_btn)
+        watermark_row.add_suffix(choose_btn)
+
+        def save():
+            plugins = []
+            # Framing first, so the effects below apply to the cropped picture
+            if autoframe_row.get_active():
+                plugins.append("autoframe")
+            if mirror_row.get_active():
+                plugins.append("mirror")
+            if luts[lut_row.get_selected()]:
+                plugins.append(f"lut:{luts[lut_row.get_selected()]}")
+            if watermark["path"]:
+                plugins.append(f"watermark:{watermark['path']}")
+            profile["plugins"] = plugins
+            save_profile(model, profile)
+            watermark_row.set_subtitle(os.path.basename(watermark["path"]) if watermark["path"] else _("Nenhuma"))
+            clear_btn.set_sensitive(bool(watermark["path"]))
+
+        def on_chosen(file_dialog, result):
+            try:
+                watermark["path"] = file_dialog.open_finish(result).get_path()
+                save()
+            except GLib.Error:
+                pass
+
+        def on_choose(btn):
+            image_filter = Gtk.FileFilter(name=_("Imagens"))
+            image_filter.add_mime_type("image/*")
+            filters = Gio.ListStore.new(Gtk.FileFilter)
+            filters.append(image_filter)
+            file_dialog = Gtk.FileDialog(title=_("Marca d'água"), filters=filters)
+            file_dialog.open(self.win, None, on_chosen)
+
+        def on_clear(btn):
+            watermark["path"] = None
+            save()
+
+        autoframe_row.connect("notify::active", lambda *a: save())
+        mirror_row.connect("notify::active", lambda *a: save())
+        lut_row.connect("notify::selected", lambda *a: save())
+        choose_btn.connect("clicked", on_choose)
+        clear_btn.connect("clicked", on_clear)
+        watermark_row.set_subtitle(os.path.basename(watermark["path"]) if watermark["path"] else _("Nenhuma"))
+        clear_btn.set_sensitive(bool(watermark["path"]))
+
+        for row in (autoframe_row, mirror_row, lut_row, watermark_row):
+            group.add(row)
+
+    def _on_camera_settings(self, action=None, param=None):
+        """ISO, shutter, aperture, white balance and capture target.
+
+        Shown straight from the on-disk cache of the config tree; the tree is
+        re-read from the camera once per session in background. Changes are
+        collected and sent together in a single gphoto2 call.
+        """
+        model = self.get_selected_camera_name()
+        port = self.get_selected_camera_port()
+        camera = {"name": model, "port": port, "backend": self.get_selected_camera_backend()}
+        tree, needs_refresh = load_camera_config(model)
+
+        dialog = Adw.PreferencesDialog(title=_("Configurações da câmera"))
+        page = Adw.PreferencesPage()
+        group = Adw.PreferencesGroup(title=model or _("Câmera Genérica"))
+        page.add(group)
+        dialog.add(page)
+
+        apply_btn = Gtk.Button(label=_("Aplicar"), valign=Gtk.Align.CENTER, sensitive=False)
+        apply_btn.add_css_class("suggested-action")
+        group.set_header_suffix(apply_btn)
+
+        rows = []
+        pending = {}
+
+        def on_selected(row, pspec, name, choices):
+            pending[name] = choices[row.get_selected()]
+            apply_btn.set_sensitive(True)
+
+        def fill(tree):
+            for row in rows:
+                group.remove(row)
+            rows.clear()
+            pending.clear()
+            apply_btn.set_sensitive(False)
+            entries = panel_entries(tree)
+            if not entries:
+                row = Adw.ActionRow(
+                    title=_("Nenhuma configuração disponível"),
+                    subtitle=_("Conecte a câmera com a webcam parada")
+                )
+                group.add(row)
+                rows.append(row)
+            for key, label, name, entry in entries:
+                choices = entry["choices"]
+                row = Adw.ComboRow(title=label, model=Gtk.StringList.new(choices))
+                if entry["current"] in choices:
+                    row.set_selected(choices.index(entry["current"]))
+                row.connect("notify::selected", on_selected, name, choices)
+                group.add(row)
+                rows.append(row)
+            return False
+
+        def on_refreshed(tree, error):
+            group.set_description(None)
+            if error:
+                print(f"[Config] Could not read camera config: {error}")
+                if not rows:
+                    fill({})
+            else:
+                fill(tree)
+            return False
+
+        def refresh():
+            group.set_description(_("Lendo configurações da câmera..."))
+
+            def on_done(op):
+                if not op.cancelled:
+                    on_refreshed(op.result, str(op.error) if op.error else None)
+                return False
+
+            # Queued behind any capture on this camera
+            self._close_shutter()
+            self.tasks.submit("read_config", asyncio.to_thread, backends.read_config, camera,
+                              lane=port, tags=("camera",), on_done=on_done)
+
+        def on_applied(changes, elapsed, error):
+            if error:
+                self.show_toast(_("A câmera recusou a configuração"), "error")
+                print(f"[Config] {error}")
+                apply_btn.set_sensitive(True)
+                return False
+            for name, value in changes.items():
+                if pending.get(name) == value:
+                    del pending[name]
+            apply_btn.set_sensitive(bool(pending))
+            self.show_toast(f"{len(changes)} {_('ajustes aplicados em')} {elapsed:.1f}s", "success")
+            return False
+
+        def on_apply(btn):
+            # The live view stream holds the camera's USB interface
+            if self.btn_stop.get_visible():
+                self.show_toast(_("Pare a webcam para alterar as configurações"), "warning")
+                return
+            changes = dict(pending)
+            apply_btn.set_sensitive(False)
+
+            def on_done(op):
+                if not op.cancelled:
+                    on_applied(changes, op.result or 0.0, str(op.error) if op.error else None)
+                return False
+
+            self._close_shutter()
+            self.tasks.submit("apply_config", asyncio.to_thread, backends.apply_config, changes, camera,
+                              lane=port, tags=("camera",), on_done=on_done)
+
+        apply_btn.connect("clicked", on_apply)
+        fill(tree)
+        if needs_refresh and not self.btn_stop.get_visible():
+            refresh()
+        dialog.present(self.win)
+
+    def _on_timelapse(self, action=None, param=None):
+        """Interval, number of frames and video options of a timelapse."""
+        settings = load_timelapse_settings()
+        dialog = Adw.PreferencesDialog(title=_("Timelapse"))
+        page = Adw.PreferencesPage()
+        group = Adw.PreferencesGroup(title=self.get_selected_camera_name() or _("Câmera Genérica"))
+        page.add(group)
+        dialog.add(page)
+
+        if self.timelapse and self.timelapse.running:
+            done = len(self.timelapse.records)
+            group.set_description(f"{_('Foto')} {done} {_('de')} {self.timelapse.frames}")
+            stop_btn = Gtk.Button(label=_("Parar"), valign=Gtk.Align.CENTER)
+            stop_btn.add_css_class("destructive-action")
+            group.set_header_suffix(stop_btn)
+
+            def on_stop(btn):
+                self.timelapse.stop()
+                self.show_toast(_("Parando timelapse após a foto atual..."), "warning")
+                dialog.close()
+
+            stop_btn.connect("clicked", on_stop)
+            dialog.present(self.win)
+            return
+
+        start_btn = Gtk.Button(label=_("Iniciar"), valign=Gtk.Align.CENTER)
+        start_btn.add_css_class("suggested-action")
+        group.set_header_suffix(start_btn)
+
+        interval_row = Adw.SpinRow.new_with_range(1, 3600, 1)
+        interval_row.set_title(_("Intervalo (segundos)"))
+        interval_row.set_subtitle(_("O tempo de captura e download é descontado da espera"))
+        interval_row.set_value(settings["interval"])
+        frames_row = Adw.SpinRow.new_with_range(2, 10000, 1)
+        frames_row.set_title(_("Número de fotos"))
+        frames_row.set_value(settings["frames"])
+        fps_row = Adw.SpinRow.new_with_range(1, 60, 1)
+        fps_row.set_title(_("Quadros por segundo do vídeo"))
+        fps_row.set_value(settings["fps"])
+        stream_row = Adw.SwitchRow(
+            title=_("Montar o vídeo durante a captura"),
+            subtitle=_("Cada foto entra no vídeo assim que chega, sem etapa final longa")
+        )
+        stream_row.set_active(settings["stream"])
+        for row in (interval_row, frames_row, fps_row, stream_row):
+            group.add(row)
+
+        def on_start(btn):
+            if self.is_capturing or self.btn_stop.get_visible():
+                self.show_toast(_("Pare a webcam para iniciar o timelapse"), "warning")
+                return
+            settings.update({
+                "interval": int(interval_row.get_value()),
+                "frames": int(frames_row.get_value()),
+                "fps": int(fps_row.get_value()),
+                "stream": stream_row.get_active(),
+            })
+            save_timelapse_settings(settings)
+            dialog.close()
+            self.start_timelapse(settings)
+
+        start_btn.connect("clicked", on_start)
+        dialog.present(self.win)
+
+    def _on_shutter(self, action=None, param=None):
+        """Low-latency shutter options (utils/shutter.py)."""
+        dialog = Adw.PreferencesDialog(title=_("Obturador rápido"))
+        page = Adw.PreferencesPage()
+        group = Adw.PreferencesGroup(
+            title=self.get_selected_camera_name() or _("Câmera Genérica"),
+            description=_("Mantém a câmera aberta no modo foto e baixa da memória interna da câmera, "
+                          "sem gravar no cartão")
+        )
+        page.add(group)
+        dialog.add(page)
+
+        enabled_row = Adw.SwitchRow(
+            title=_("Ativar"),
+            subtitle=_("Segure o botão para focar; a foto é tirada ao soltar")
+        )
+        enabled_row.set_active(self.shutter_settings["enabled"])
+        hover_row = Adw.SwitchRow(
+            title=_("Focar ao passar o mouse"),
+            subtitle=_("O foco fica pronto antes do clique")
+        )
+        hover_row.set_active(self.shutter_settings["arm_on_hover"])
+        hover_row.set_sensitive(enabled_row.get_active())
+        group.add(enabled_row)
+        group.add(hover_row)
+
+        def on_changed(row, param):
+            self.shutter_settings.update({
+                "enabled": enabled_row.get_active(),
+                "arm_on_hover": hover_row.get_active(),
+            })
+            save_shutter_settings(self.shutter_settings)
+            hover_row.set_sensitive(enabled_row.get_active())
+            if not enabled_row.get_active():
+                self._close_shutter()
+
+        enabled_row.connect("notify::active", on_changed)
+        hover_row.connect("notify::active", on_changed)
+        dialog.present(self.win)
+
+    def _on_compositor(self, action=None, param=None):
+        """Layout, size and rate of the virtual webcam composed of every camera."""
+        settings = load_compositor_settings()
+        rings = list_rings()
+        running = procs.compositors()
+        dialog = Adw.PreferencesDialog(title=_("Compositor multicâmera"))
+        page = Adw.PreferencesPage()
+        group = Adw.PreferencesGroup(
+            title=_("Câmeras em uma webcam virtual"),
+            description=_("Usa as câmeras com \"Compartilhar quadros decodificados\" ativado")
+        )
+        page.add(group)
+        dialog.add(page)
+
+        if running:
+            stats = read_compositor_stats()
+            if stats:
+                ages = ", ".join(_("parada") if item["stale"] else f"{item['fps']:.0f} fps"
+                                 for item in stats["inputs"])
+                group.set_description(
+                    f"{stats['size']} {stats['fps']:.0f} fps | {_('composição')} "
+                    f"{stats['composite_avg_ms']:.1f} ms ({_('máx.')} {stats['composite_max_ms']:.1f} ms) | {ages}"
+                )
+            stop_btn = Gtk.Button(label=_("Parar"), valign=Gtk.Align.CENTER)
+            stop_btn.add_css_class("destructive-action")
+            group.set_header_suffix(stop_btn)
+
+            def on_stop(btn):
+                self._stop_compositor()
+                dialog.close()
+
+            stop_btn.connect("clicked", on_stop)
+            dialog.present(self.win)
+            return
+
+        start_btn = Gtk.Button(label=_("Iniciar"), valign=Gtk.Align.CENTER)
+        start_btn.add_css_class("suggested-action")
+        start_btn.set_sensitive(bool(rings))
+        group.set_header_suffix(start_btn)
+
+        layout_labels = [_("Imagem na imagem"), _("Lado a lado"), _("Grade")]
+        layout_row = Adw.ComboRow(
+            title=_("Disposição"),
+            subtitle=f"{len(rings)} {_('câmera(s) compartilhando quadros')}",
+            model=Gtk.StringList.new(layout_labels)
+        )
+        if settings["layout"] in COMPOSITOR_LAYOUTS:
+            layout_row.set_selected(COMPOSITOR_LAYOUTS.index(settings["layout"]))
+        sizes = RESOLUTIONS[1:]
+        size_row = Adw.ComboRow(title=_("Resolução"), model=Gtk.StringList.new([f"{w}x{h}" for w, h in sizes]))
+        if (settings["width"], settings["height"]) in sizes:
+            size_row.set_selected(sizes.index((settings["width"], settings["height"])))
+        fps_row = Adw.ComboRow(title=_("Taxa de quadros"),
+                               model=Gtk.StringList.new([f"{fps} fps" for fps in FRAMERATES]))
+        if settings["fps"] in FRAMERATES:
+            fps_row.set_selected(FRAMERATES.index(settings["fps"]))
+        for row in (layout_row, size_row, fps_row):
+            group.add(row)
+
+        def on_start(btn):
+            w, h = sizes[size_row.get_selected()]
+            settings.update({
+                "layout": COMPOSITOR_LAYOUTS[layout_row.get_selected()],
+                "width": w,
+                "height": h,
+                "fps": FRAMERATES[fps_row.get_selected()],
+            })
+            save_compositor_settings(settings)
+            dialog.close()
+            self._start_compositor(settings, rings)
+
+        start_btn.connect("clicked", on_start)
+        dialog.present(self.win)
+
+    def _start_compositor(self, settings, rings):
+        def on_device(op):
+            self._launch_compositor(settings, rings, op.result or "auto")
+            return False
+
+        self.tasks.submit("compositor_device", asyncio.to_thread, self._provision_compositor_device,
+                          lane="loopback", on_done=on_device)
+
+    def _launch_compositor(self, settings, rings, device):
+        script = os.path.join(os.path.dirname(os.path.realpath(__file__)), "utils", "compositor.py")
+        try:
+            self.compositor_process = subprocess.Popen(
+                [sys.executable, script, "--rings", ",".join(rings), "--layout", settings["layout"],
+                 "--size", f"{settings['width']}x{settings['height']}", "--fps", str(settings["fps"]),
+                 "--device", device, "--stats", COMPOSITOR_FILE],
+                start_new_session=True,
+            )
+        except OSError as e:
+            print(f"[Compositor] Could not start: {e}")
+            self.show_toast(_("Erro ao iniciar o compositor"), "error")
+            return
+        print(f"[Compositor] {len(rings)} cameras, {settings['layout']} "
+              f"{settings['width']}x{settings['height']}@{settings['fps']}")
+        self.show_toast(_("Compositor iniciado"), "success")
+
+    def _stop_compositor(self):
+        if self.compositor_process:
+            self.compositor_process.terminate()
+            self.compositor_process = None
+        else:
+            procs.terminate(procs.compositors())
+
+    def start_timelapse(self, settings):
+        if self._close_shutter(lambda: self.start_timelapse(settings)):
+            return
+        model = self.get_selected_camera_name()
+        port = self.get_selected_camera_port()
+        caps = lookup_caps(model, port)
+        directory = os.path.abspath(time.strftime("timelapse-%Y%m%d-%H%M%S"))
+        os.makedirs(directory, exist_ok=True)
+        video = os.path.join(directory, os.path.basename(directory) + ".mp4")
+
+        assembler = None
+        if settings["stream"]:
+            try:
+                assembler = StreamingAssembler(video, settings["fps"])
+            except OSError as e:
+                print(f"[Timelapse] Encoder unavailable: {e}")
+                self.show_toast(_("Erro ao iniciar o ffmpeg"), "error")
+                return
+
+        backend = self.get_selected_camera_backend()
+        camera = None
+        if backend == backends.DEFAULT:
+            pre_config = viewfinder_args(caps, cached_camera_config(model))
+            camera_shoot = camera_shooter(camera_args(model, port), directory, pre_config,
+                                          capture_timeout(caps))
+        else:
+            # Other backends keep the camera open for the whole timelapse
+            camera = backends.open_camera({"name": model, "port": port, "backend": backend})
+
+            def camera_shoot(index):
+                return camera.capture(os.path.join(directory, f"frame{index:05d}"))
+
+        def shoot(index):
+            if index == 0:
+                self._release_gvfs()
+            return camera_shoot(index)
+
+        def on_frame(index, files, record):
+            if assembler and files:
+                assembler.add(video_frame(files))
+            preview = thumb = None
+            if files:
+                try:
+                    preview, thumb = self._photo_textures(sorted(files, key=lambda f: not is_raw(f))[0])
+                except Exception as e:
+                    print(f"[Timelapse] No preview for frame {index}: {e}")
+            GLib.idle_add(self._on_timelapse_frame, index, files, record, preview, thumb)
+
+        def on_done(stats):
+            # Runs on the intervalometer thread: encoding can take a while
+            result, error = None, None
+            try:
+                if assembler:
+                    result = assembler.finish()
+                elif stats["shots"] - stats["failed"] > 1:
+                    result = assemble_timelapse(directory, video, settings["fps"])
+            except (OSError, RuntimeError) as e:
+                error = str(e)
+            if camera:
+                camera.close()
+                print(f"[Timelapse] {backend}: {camera.stats()}")
+            GLib.idle_add(self._on_timelapse_done, stats, result, error)
+
+        self.is_capturing = True
+        self.btn_action.set_sensitive(False)
+        self.current_mode = "photo"
+        self.update_mode_ui()
+        self.timelapse = Intervalometer(shoot, settings["interval"], settings["frames"],
+                                        on_frame, on_done, os.path.join(directory, TIMELAPSE_LOG))
+        self.timelapse.start()
+        print(f"[Timelapse] {settings['frames']} frames every {settings['interval']}s into {directory}")
+        capture_s = caps_timing(caps, "capture")
+        if capture_s and capture_s > settings["interval"]:
+            # Every shot would overrun its slot: the grid can't be held
+            self.show_toast(f"{_('Timelapse iniciado, mas cada captura leva')} ~{capture_s:.0f}s", "warning")
+        else:
+            self.show_toast(_("Timelapse iniciado"), "accent")
+
+    def _on_timelapse_frame(self, index, files, record, preview, thumb):
+        if preview:
+            self.last_photo = files[0]
+            self._show_photo(preview, thumb)
+        if "error" in record:
+            print(f"[Timelapse] Frame {index} failed: {record['error']}")
+            self.show_toast(f"{_('Timelapse: falha na foto')} {index + 1}", "error")
+        else:
+            self.show_toast(f"{_('Timelapse:')} {index + 1}/{self.timelapse.frames}", "accent")
+        return False
+
+    def _on_timelapse_done(self, stats, video, error):
+        self.is_capturing = False
+        self.btn_action.set_sensitive(True)
+        if error:
+            print(f"[Timelapse] Video failed: {error}")
+            self.show_toast(_("Erro ao montar o vídeo do timelapse"), "error")
+        elif video:
+            self.show_toast(f"{_('Timelapse salvo:')} {os.path.basename(video)}", "success")
+        else:
+            self.show_toast(_("Timelapse encerrado"), "warning")
+        return False
+
     def _on_new_window(self, action=None, param=None):
         import sys
         subprocess.Popen([sys.executable, sys.argv[0]])
@@ -343,13 +1282,49 @@ class WebcamApp(Adw.Application):
             return self.camera_list[selected_idx]['port']
         return None
 
-    def _kill_my_processes(self):
-        port = self.get_selected_camera_port()
+    def get_selected_camera_backend(self):
+        """Backend of the selected camera (utils/backends), gphoto2 when none is."""
+        if not hasattr(self, 'camera_list') or not self.camera_list:
+            return backends.DEFAULT
+        selected_idx = self.camera_dropdown.get_selected()
+        if selected_idx != Gtk.INVALID_LIST_POSITION and selected_idx < len(self.camera_list):
+            return self.camera_list[selected_idx].get('backend', backends.DEFAULT)
+        return backends.DEFAULT
+
+    def get_selected_camera_name(self):
+        if not hasattr(self, 'camera_list') or not self.camera_list:
+            return None
+        selected_idx = self.camera_dropdown.get_selected()
+        if selected_idx != Gtk.INVALID_LIST_POSITION and selected_idx < len(self.camera_list):
+            return self.camera_list[selected_idx]['name']
+        return None
+
+    def _kill_my_processes(self, timeout=0.0, port=None):
+        """Stop this instance's gphoto2/ffmpeg; with a timeout, wait for them to exit."""
+        port = port or self.get_selected_camera_port()
+        name = self.get_selected_camera_name()
         if port:
-            subprocess.run(["pkill", "-f", f"gphoto2.*{port}"], check=False)
+            mine = procs.find("gphoto2", ["--port", port]) + procs.backend_streams(port)
         else:
-            subprocess.run(["pkill", "-f", "gphoto2 --stdout"], check=False)
-        subprocess.run(["pkill", "-f", f"ffmpeg.*udp://127.0.0.1:{self.udp_port}"], check=False)
+            mine = procs.live_view_readers()
+            if name:
+                # Without a port, the commands select the camera by model (camera_args)
+                pids = {p.pid for p in mine}
+                mine += [p for p in procs.find("gphoto2", ["--camera", name]) if p.pid not in pids]
+        mine += procs.reader_loops(idle_flag(self.udp_port))
+        mine += procs.stream_encoders(self.udp_port) + procs.stream_servers(self.udp_port)
+        return procs.terminate(mine, timeout=timeout)
+
+    def _release_gvfs(self):
+        """Keep gvfs off the camera. Returns True if anything had to be released."""
+        with tracing.span("gvfs_kill"):
+            released = procs.terminate(procs.find("gvfs-gphoto2-volume-monitor"), signal.SIGKILL) > 0
+        # gio is only spawned when gvfs actually holds a camera mount
+        if procs.running("gvfsd-gphoto2"):
+            with tracing.span("gio_unmount"):
+                subprocess.run(["gio", "mount", "-u", "gphoto2://*"], capture_output=True, check=False)
+            released = True
+        return released
 
     def _on_quit(self, action=None, param=None):
         # Stop hot-plug polling
@@ -357,7 +1332,21 @@ class WebcamApp(Adw.Application):
             GLib.source_remove(self._hotplug_timer)
             self._hotplug_timer = None
         
+        # The UI is going away: resume an idled live view right here
+        self._stop_demand_control(block=True)
         self.stop_video_preview()
+        self.exposure_aids.close()
+        if self.timelapse:
+            self.timelapse.stop()
+        if self.compositor_process:
+            self._stop_compositor()
+        if self.shutter:
+            # Capture target back to what it was, before the tasks are cancelled
+            self.shutter.close_nowait()
+        self.tasks.close()
+        if self.watchdog:
+            self.watchdog.stop()
+            print(self.watchdog.summary())
         if self.process:
             try:
                 os.killpg(os.getpgid(self.process.pid), signal.SIGTERM)
@@ -448,6 +1437,14 @@ class WebcamApp(Adw.Application):
             color: #00ff00;
         }
         
+        .stats-osd {
+            padding: 4px 10px;
+            border-radius: 8px;
+            font-size: 11px;
+            background: alpha(black, 0.6);
+            color: white;
+        }
+        
         .top-toast {
             padding: 8px 18px;
             border-radius: 20px;
@@ -516,6 +1513,7 @@ class WebcamApp(Adw.Application):
         else:
             self.btn_action.set_sensitive(True)
 
+        self.btn_action.set_tooltip_text(None)
         if self.current_mode == "photo":
             self.btn_action.set_icon_name("camera-photo-symbolic")
             self.preview_stack.set_visible_child_name("photo")
@@ -531,122 +1529,197 @@ class WebcamApp(Adw.Application):
             if not self.is_capturing:
                 self.btn_action.set_sensitive(True)
             self.fps_label.set_visible(False)
+            self.stats_label.set_visible(False)
         else:
             self.current_mode = "video"
             self.btn_action.set_icon_name("media-record-symbolic")
             if not self.is_capturing:
                 self.btn_action.set_sensitive(True)
+            self._close_shutter()
 
     def on_action_clicked(self, btn):
+        if self._capture_op:
+            self._capture_op.cancel()
+            return
         if self.is_capturing:
             return
         if self.current_mode == "photo":
-            self.take_photo()
+            if self._fast_shutter_ready():
+                self.take_photo_fast(time.monotonic())
+            else:
+                self.take_photo()
         else:
             self.start_webcam()
 
     def on_thumbnail_clicked(self, btn):
         if self.last_photo and os.path.exists(self.last_photo):
-            subprocess.run(["xdg-open", self.last_photo])
+            self._open_file(self.last_photo)
+
+    def _open_file(self, path):
+        """Open a file in the default app without waiting for it (no xdg-open run)."""
+        def on_launched(_source, result):
+            try:
+                Gio.AppInfo.launch_default_for_uri_finish(result)
+            except GLib.Error as e:
+                print(f"[Open] {path}: {e.message}")
+                self.show_toast(_("Não foi possível abrir o arquivo"), "error")
+
+        uri = Gio.File.new_for_path(os.path.abspath(path)).get_uri()
+        Gio.AppInfo.launch_default_for_uri_async(uri, None, None, on_launched)
 
     def load_last_photo(self):
-        try:
-            files = glob.glob("capt*.jpg")
-            if files:
-                self.last_photo = max(files, key=os.path.getctime)
-                self.photo_preview.set_filename(self.last_photo)
-                try:
-                    texture = Gdk.Texture.new_from_filename(self.last_photo)
-                    self.thumbnail_avatar.set_custom_image(texture)
-                except:
-                    pass
-        except Exception as e:
-            pass
+        def find_and_decode():
+            files = [f for f in glob.glob("capt*.*") if f.lower().endswith(PHOTO_EXTENSIONS)]
+            if not files:
+                return None, None, None
+            newest = max(files, key=os.path.getctime)
+            path = self._shot_files(os.path.splitext(newest)[0])[0]
+            try:
+                return (path, *self._photo_textures(path))
+            except Exception:
+                return path, None, None
+
+        def on_done(op):
+            if op.result and op.result[0] and not self.last_photo:
+                path, preview, thumb = op.result
+                self.last_photo = path
+                if preview:
+                    self._show_photo(preview, thumb)
+            return False
+
+        # Listing and decoding stay off the UI thread while the window opens
+        self.tasks.submit("load_last_photo", asyncio.to_thread, find_and_decode, on_done=on_done)
+
+    def _shot_files(self, base):
+        """Files of one capture (capt0007.cr2, capt0007.jpg...), RAW first."""
+        return shot_files(base)
+
+    def _photo_textures(self, path):
+        """(preview, thumbnail) textures of a photo.
+
+        RAW files are never decoded: both come from the JPEGs the camera
+        embedded in them (utils/raw_preview.py).
+        """
+        if is_raw(path):
+            thumb, preview = raw_previews(path)
+            if preview is None:
+                return None, None
+            return (Gdk.Texture.new_from_bytes(GLib.Bytes.new(preview)),
+                    Gdk.Texture.new_from_bytes(GLib.Bytes.new(thumb)))
+        texture = Gdk.Texture.new_from_filename(path)
+        return texture, texture
+
+    def _show_photo(self, preview, thumb):
+        self.photo_preview.set_paintable(preview)
+        self.thumbnail_avatar.set_custom_image(thumb)
 
     def detect_camera(self, callback=None, retry=1):
-        """Asynchronous camera detection to avoid blocking the UI."""
+        """Asynchronous camera detection to avoid blocking the UI.
+
+        Runs as a background task: a user action (shutter, webcam start)
+        cancels it, keeping the camera list it had.
+        """
         if self._detecting:
             if callback: callback()
             return
         
         self._detecting = True
-        
-        def run_detection():
-            self.camera_list = []
-            try:
-                # Be more aggressive killing GVFS
-                print("[Detection] Killing GVFS and probing USB...")
-                subprocess.run(["pkill", "-f", "gvfs-gphoto2-volume-monitor"], check=False)
-                subprocess.run(["gio", "mount", "-u", "gphoto2://*"], capture_output=True, check=False)
-                
-                # Small wait for device release
-                time.sleep(1.0)
 
-                result = subprocess.run(
-                    ["gphoto2", "--auto-detect"],
-                    capture_output=True, text=True, timeout=10
-                )
-                output = result.stdout
-                print(f"[Detection] Output:\n{output}")
-                lines = output.strip().split('\n')
-                for line in lines[2:]:
-                    line = line.strip()
-                    if line and 'usb:' in line:
-                        parts = line.split('usb:')
-                        if len(parts) >= 2:
-                            name = parts[0].strip() or _("Câmera Genérica")
-                            port = "usb:" + parts[1].strip()
-                            self.camera_list.append({"name": name, "port": port})
-                
-                if self.camera_list:
-                    self.camera_detected = True
-                    self.camera_name = self.camera_list[0]['name']
-                else:
-                    self.camera_name = _("Câmera não detectada")
-                    self.camera_detected = False
-                    # Retry once if failed and not a manual request
-                    if retry > 0:
-                        self._detecting = False
-                        GLib.idle_add(lambda: self.detect_camera(callback, retry=retry-1))
-                        return
-
-            except Exception as e:
-                print(f"Detection error: {e}")
+        def on_done(op):
+            self._detecting = False
+            if op.cancelled:
+                print("[Detection] Cancelled by a camera action")
+                return False
+            if op.error:
+                print(f"Detection error: {op.error}")
+                self.camera_list = []
+            else:
+                self.camera_list = op.result
+            if self.camera_list:
+                self.camera_detected = True
+                self.camera_name = self.camera_list[0]['name']
+            else:
                 self.camera_name = _("Câmera não detectada")
                 self.camera_detected = False
-            finally:
-                self._detecting = False
-                if callback:
-                    GLib.idle_add(callback)
+                # Retry once if failed and not a manual request
+                if retry > 0 and not op.error:
+                    self.detect_camera(callback, retry=retry-1)
+                    return False
+            if callback:
+                callback()
+            return False
 
-        import threading
-        threading.Thread(target=run_detection, daemon=True).start()
+        self.tasks.submit("detect_camera", self._detect, retry, lane="detect",
+                          tags=("detect",), deadline=DETECT_DEADLINE, on_done=on_done)
+
+    async def _detect(self, retry):
+        cameras = []
+        trace = tracing.start("detect_camera", retry=retry)
+        try:
+            print("[Detection] Releasing GVFS and probing USB...")
+            with tracing.span("release_gvfs"):
+                if await asyncio.to_thread(self._release_gvfs):
+                    # Small wait for device release
+                    await asyncio.sleep(1.0)
+
+            enabled = backends.enabled()
+            if backends.DEFAULT in enabled:
+                with tracing.span("auto_detect"):
+                    result = await run_process(["gphoto2", "--auto-detect"], timeout=10)
+                output = result.stdout
+                print(f"[Detection] Output:\n{output}")
+                cameras += backends.parse_auto_detect(output)
+            # Cameras of the other backends (BIG_DIGICAM_BACKENDS)
+            others = [name for name in enabled if name != backends.DEFAULT]
+            if others:
+                with tracing.span("enumerate_backends", backends=",".join(others)):
+                    cameras += await asyncio.to_thread(backends.enumerate_cameras, others)
+            return cameras
+        finally:
+            trace.end(cameras=len(cameras))
 
     def _poll_cameras(self):
         """Periodically poll for USB camera changes (hot-plug detection)."""
         # CRITICAL: Skip polling if ANY capture or start-up process is active
         # OR if gphoto2 is already running (don't interfere with ourselves)
-        if self.is_capturing or (hasattr(self, 'loading') and self.loading) or self._detecting:
+        if self._busy_for_polling() or self._poll_op:
             return True
 
-        try:
-            # Check for any active gphoto2 process
-            res = subprocess.run(["pgrep", "-f", "gphoto2"], capture_output=True)
-            if res.returncode == 0:
-                return True
-        except:
-            pass
-
         old_ports = set(c['port'] for c in self.camera_list)
-        
+        # Only the gphoto2 cameras are compared with the PTP devices in sysfs
+        ptp_known = set(c['port'] for c in self.camera_list if c.get('backend') == backends.DEFAULT)
+
+        def cameras_changed():
+            # Any active gphoto2 process
+            if procs.running("gphoto2"):
+                return False
+            # Only run gphoto2 --auto-detect when the attached cameras changed
+            # (sysfs read, no process spawned while nothing happens)
+            attached = ptp_ports()
+            return attached is None or attached != ptp_known
+
         def on_detection_done():
             new_ports = set(c['port'] for c in self.camera_list)
             if old_ports != new_ports:
                 self._update_camera_dropdown()
-        
-        self.detect_camera(callback=on_detection_done)
+
+        def on_done(op):
+            self._poll_op = None
+            # A capture or start-up may have begun while /proc was scanned
+            if op.result and not self._busy_for_polling():
+                self.detect_camera(callback=on_detection_done)
+            return False
+
+        # The /proc and sysfs scans run off the UI thread
+        self._poll_op = self.tasks.submit(
+            "poll_cameras", asyncio.to_thread, cameras_changed,
+            lane="detect", tags=("detect",), on_done=on_done
+        )
         return True  # Keep polling
 
+    def _busy_for_polling(self):
+        return self.is_capturing or (hasattr(self, 'loading') and self.loading) or self._detecting
+
     def _update_camera_dropdown(self):
         """Rebuild the dropdown model with current camera_list."""
         # Safeguard: UI might not be ready yet
@@ -697,147 +1770,434 @@ class WebcamApp(Adw.Application):
             self.show_toast(_("Câmera detectada!"), "success")
 
     def check_existing_session(self):
+        port = self.get_selected_camera_port()
+        if not port:
+            return
+
+        def on_done(op):
+            if op.error:
+                print(f"Erro ao verificar sessão: {op.error}")
+            elif op.result and not self.is_capturing:
+                self._restore_session()
+            return False
+
+        def running():
+            # A pipeline idled with live view off has no reader, only its loop
+            return procs.live_view_readers(port) or procs.reader_loops(idle_flag(self.udp_port))
+
+        # Check for a live view process specifically for THIS camera's port
+        # (a /proc scan, done off the UI thread)
+        self.tasks.submit("check_session", asyncio.to_thread, running, lane=port, on_done=on_done)
+
+    def _restore_session(self):
         try:
-            port = self.get_selected_camera_port()
-            if not port:
-                return
+            self.current_mode = "video"
+            self.update_mode_ui()
             
-            # Check for a gphoto2 process specifically for THIS camera's port
-            res = subprocess.run(["pgrep", "-af", f"gphoto2.*{port}"], capture_output=True, text=True)
+            # Update state
+            self.btn_action.set_visible(False)
+            self.btn_stop.set_visible(True)
             
-            if res.returncode == 0 and res.stdout.strip():
-                self.current_mode = "video"
-                self.update_mode_ui()
-                
-                # Update state
-                self.btn_action.set_visible(False)
-                self.btn_stop.set_visible(True)
-                
-                self.show_toast(_("Sessão restaurada"), "accent")
-                
-                # Show status without trying preview (keeps v4l2loopback free for OBS)
-                GLib.idle_add(self.show_webcam_active_status)
+            self.show_toast(_("Sessão restaurada"), "accent")
+
+            # Assume the running pipeline was started with the saved profile
+            self.webcam_profile = load_profile(self.get_selected_camera_name())
+            self.roi_controller = RoiController(self.udp_port, roi_scalers(self.webcam_profile), True)
+            
+            # Show status without trying preview (keeps v4l2loopback free for OBS)
+            GLib.idle_add(self.show_webcam_active_status)
         except Exception as e:
             print(f"Erro ao verificar sessão: {e}")
 
     def take_photo(self):
+        # The shutter wins over a hot-plug scan still running
+        self.tasks.cancel("detect")
         self.is_capturing = True
-        self.btn_action.set_sensitive(False)
         self.set_loading(True)
         
-        # Determine if webcam was running via our internal state or process check
-        try:
-            res = subprocess.run(["pgrep", "-f", "gphoto2.*stdout"], capture_output=True)
-            was_webcam_running = res.returncode == 0
-        except:
-            was_webcam_running = False
-
-        if was_webcam_running:
-            self.show_toast(_("Parando webcam..."), "warning")
-            self.stop_video_preview()
-            self._kill_my_processes()
-            time.sleep(3) # Wait for mirror to lower on T3
-        
         self.current_mode = "photo"
         self.update_mode_ui()
-        
-        def do_capture():
-            try:
-                # 1. Radical cleanup of GVFS
-                # We do this twice to ensure it doesn't respawn fast enough
-                for i in range(2):
-                    subprocess.run(["pkill", "-9", "-f", "gvfs-gphoto2-volume-monitor"], check=False)
-                    subprocess.run(["gio", "mount", "-u", "gphoto2://*"], capture_output=True, check=False)
-                
-                # 2. Identify camera by MODEL NAME (more stable than dynamic ports)
-                selected_idx = self.camera_dropdown.get_selected()
-                camera_model_name = None
-                if selected_idx != Gtk.INVALID_LIST_POSITION and selected_idx < len(self.camera_list):
-                    camera_model_name = self.camera_list[selected_idx]['name']
-                
-                # If we don't have a model, we'll let gphoto2 auto-detect
-                camera_arg = ["--camera", camera_model_name] if camera_model_name else []
-                
-                target_filename = self.get_next_filename()
-                GLib.idle_add(lambda: self.show_toast(f"{_('Capturando')} {target_filename}...", "accent"))
-                
-                # 3. Capture command with retries
-                success = False
-                error_msg = ""
-                
-                # Retry loop for photography
-                for attempt in range(2):
-                    # For Canon, force viewfinder off before capture
-                    if camera_model_name and "Canon" in camera_model_name:
-                        subprocess.run(["gphoto2"] + camera_arg + ["--set-config", "viewfinder=0"], capture_output=True)
-                    
-                    result = subprocess.run(
-                        ["gphoto2"] + camera_arg + ["--capture-image-and-download", "--filename", target_filename, "--force-overwrite", "--keep"],
-                        capture_output=True, text=True, timeout=60
-                    )
-                    
-                    if result.returncode == 0:
-                        success = True
-                        break
-                    else:
-                        error_msg = result.stderr or result.stdout
-                        print(f"[Capture Attempt {attempt+1}] Failed: {error_msg}")
-                        # If busy, try a hard reset of the USB bus (ONLY for Canon, Nikons freeze on reset)
-                        if camera_model_name and "Canon" in camera_model_name:
-                            subprocess.run(["gphoto2"] + camera_arg + ["--reset"], capture_output=True)
-                            time.sleep(4) # Wait for re-registration
-                        else:
-                            time.sleep(2) # Just wait a bit for Nikons
-                
-                if success:
-                    GLib.idle_add(self.on_photo_captured, target_filename)
+        # The action button cancels the capture meanwhile
+        self.btn_action.set_sensitive(True)
+        self.btn_action.set_icon_name("process-stop-symbolic")
+        self.btn_action.set_tooltip_text(_("Cancelar captura"))
+
+        # Identify camera by MODEL NAME (more stable than dynamic ports)
+        camera_model_name = self.get_selected_camera_name()
+        port = self.get_selected_camera_port()
+        target_filename = self.get_next_filename()
+
+        def on_done(op):
+            self._capture_op = None
+            if op.cancelled:
+                self.on_photo_cancelled()
+            elif op.error:
+                if isinstance(op.error, (subprocess.TimeoutExpired, TimeoutError)):
+                    self.on_photo_error(_("Timeout - câmera demorou muito"))
                 else:
-                    GLib.idle_add(self.on_photo_error, error_msg)
+                    self.on_photo_error(str(op.error))
+            else:
+                self.on_photo_captured(*op.result)
+            return False
+
+        backend = self.get_selected_camera_backend()
+        if backend == backends.DEFAULT:
+            capture, args = self._capture, (camera_model_name, port, target_filename)
+        else:
+            capture, args = self._capture_backend, (camera_model_name, port, target_filename, backend)
+        self._capture_op = self.tasks.submit(
+            "take_photo", capture, *args,
+            lane=port, deadline=CAPTURE_DEADLINE, tags=("camera",), on_done=on_done
+        )
+
+    async def _capture(self, camera_model_name, port, target_filename):
+        # Determine if webcam was running via a process check (a /proc scan)
+        was_webcam_running = bool(await asyncio.to_thread(procs.live_view_readers)
+                                  or await asyncio.to_thread(procs.reader_loops, idle_flag(self.udp_port)))
+        trace = tracing.start("take_photo", webcam_was_running=was_webcam_running)
+        try:
+            if was_webcam_running:
+                GLib.idle_add(self._stop_webcam_for_capture)
+                await asyncio.to_thread(self._kill_my_processes, 0.0, port)
+            # Delays and quirks learned for this model (utils/capabilities.py)
+            caps = await asyncio.to_thread(lookup_caps, camera_model_name, port)
+            if was_webcam_running:
+                with tracing.span("stop_delay", seconds=caps["stop_delay"]):
+                    await asyncio.sleep(caps["stop_delay"]) # Mirror must come down after live view
+
+            # 1. Cleanup of GVFS
+            with tracing.span("release_gvfs"):
+                await asyncio.to_thread(self._release_gvfs)
+            
+            # 2. If we don't have a model, we'll let gphoto2 auto-detect
+            camera_arg = ["--camera", camera_model_name] if camera_model_name else []
+            
+            GLib.idle_add(lambda: self.show_toast(f"{_('Capturando')} {target_filename}...", "accent"))
+            
+            # 3. Capture command with retries
+            success = False
+            error_msg = ""
+            
+            # Some models (Canon) need the viewfinder off before a
+            # capture; done in the same gphoto2 session as the capture
+            pre_config = viewfinder_args(caps, await asyncio.to_thread(cached_camera_config, camera_model_name))
+
+            # Retry loop for photography
+            for attempt in range(2):
+                t0 = time.monotonic()
+                capture = tracing.start("capture", attempt=attempt + 1, viewfinder_off=bool(pre_config))
+                result = await run_process(
+                    ["gphoto2"] + camera_arg + pre_config + ["--capture-image-and-download", "--filename", f"{target_filename}.%C", "--force-overwrite", "--keep"],
+                    timeout=capture_timeout(caps)
+                )
+                capture.end(ok=result.returncode == 0)
                 
-            except subprocess.TimeoutExpired:
-                GLib.idle_add(self.on_photo_error, _("Timeout - câmera demorou muito"))
-            except Exception as e:
-                GLib.idle_add(self.on_photo_error, str(e))
-        
-        import threading
-        threading.Thread(target=do_capture, daemon=True).start()
+                if result.returncode == 0:
+                    success = True
+                    record_caps_timing(caps, "capture", time.monotonic() - t0)
+                    if attempt > 0:
+                        record_caps_delay(caps, "recovery_delay", True)
+                    elif was_webcam_running:
+                        record_caps_delay(caps, "stop_delay", True)
+                    break
+                else:
+                    error_msg = result.stderr or result.stdout
+                    print(f"[Capture Attempt {attempt+1}] Failed: {error_msg}")
+                    if pre_config and "viewfinder" in error_msg:
+                        # The body refused the setting: retry the capture alone
+                        pre_config = []
+                    if attempt > 0:
+                        record_caps_delay(caps, "recovery_delay", False)
+                    elif was_webcam_running:
+                        record_caps_delay(caps, "stop_delay", False)
+                    # If busy, try a hard reset of the USB bus (only where it is safe, Nikons freeze on reset)
+                    if caps["reset_safe"]:
+                        with tracing.span("reset"):
+                            await run_process(["gphoto2"] + camera_arg + ["--reset"])
+                    with tracing.span("recovery_delay", seconds=caps["recovery_delay"]):
+                        await asyncio.sleep(caps["recovery_delay"]) # Wait for re-registration
+            
+            if not success:
+                raise RuntimeError(error_msg)
+            # RAW+JPEG downloads two files with the same base name
+            files = self._shot_files(target_filename)
+            if not files:
+                raise RuntimeError(_("Nenhum arquivo recebido da câmera"))
+            preview, thumb, decode = await self._decode_preview(files[0])
+            return files, preview, thumb, caps, t0, decode
+        finally:
+            trace.end()
+
+    async def _capture_backend(self, camera_model_name, port, target_filename, backend):
+        """take_photo through a camera backend other than the gphoto2 tool (utils/backends)."""
+        was_webcam_running = bool(await asyncio.to_thread(procs.backend_streams, port))
+        trace = tracing.start("take_photo", backend=backend, webcam_was_running=was_webcam_running)
+        try:
+            if was_webcam_running:
+                GLib.idle_add(self._stop_webcam_for_capture)
+                await asyncio.to_thread(self._kill_my_processes, 2.0, port)
+            caps = await asyncio.to_thread(lookup_caps, camera_model_name, port)
+            camera = backends.open_camera({"name": camera_model_name, "port": port, "backend": backend})
+            GLib.idle_add(lambda: self.show_toast(f"{_('Capturando')} {target_filename}...", "accent"))
+
+            def shoot():
+                with camera:
+                    return camera.capture(target_filename)
+
+            t0 = time.monotonic()
+            with tracing.span("capture", backend=backend):
+                files = await asyncio.to_thread(shoot)
+            record_caps_timing(caps, "capture", time.monotonic() - t0)
+            print(f"[Capture] {backend}: {camera.stats()}")
+            if not files:
+                raise RuntimeError(_("Nenhum arquivo recebido da câmera"))
+            preview, thumb, decode = await self._decode_preview(files[0])
+            return files, preview, thumb, caps, t0, decode
+        finally:
+            trace.end()
+
+    async def _decode_preview(self, path):
+        """(preview, thumb, seconds) of a new photo, decoded off the UI thread."""
+        t_decode = time.monotonic()
+        try:
+            with tracing.span("preview_decode", file=path):
+                preview, thumb = await asyncio.to_thread(self._photo_textures, path)
+        except Exception as e:
+            print(f"[Capture] No preview for {path}: {e}")
+            preview = thumb = None
+        return preview, thumb, time.monotonic() - t_decode
+
+    def _stop_webcam_for_capture(self):
+        self.show_toast(_("Parando webcam..."), "warning")
+        self.stop_video_preview()
+        return False
 
-    def on_photo_captured(self, filename):
+    def on_photo_captured(self, files, preview, thumb, caps, t0, decode):
         self.is_capturing = False
-        self.btn_action.set_sensitive(True)
-        self.last_photo = filename
-        self.load_last_photo()
+        self.update_mode_ui()
+        self.last_photo = files[0]
+        if preview:
+            self._show_photo(preview, thumb)
+
+        # Shutter to preview on screen, per format ("CR2+JPG", "NEF", "JPG"...)
+        shown = time.monotonic() - t0
+        fmt = "+".join(os.path.splitext(f)[1][1:].upper() for f in files)
+        record_caps_timing(caps, f"capture_to_preview_{fmt.lower()}", shown)
+        print(f"[Capture] {fmt}: preview on screen {shown:.2f}s after capture start "
+              f"(preview decode {decode * 1000:.0f} ms)")
+
         self.set_loading(False)
-        self.show_toast(f"{_('Foto salva:')} {filename}", "success")
-        self.ask_open_photo(filename)
+        self.show_toast(f"{_('Foto salva:')} {', '.join(files)}", "success")
+        self.ask_open_photo(self.last_photo)
         return False
 
     def on_photo_error(self, error):
         self.is_capturing = False
-        self.btn_action.set_sensitive(True)
+        self.update_mode_ui()
         self.set_loading(False)
         self.show_toast(_("Erro ao capturar foto"), "error")
         print(f"[Photo Error] {error}")
         return False
 
+    def on_photo_cancelled(self):
+        self.is_capturing = False
+        self.update_mode_ui()
+        self.set_loading(False)
+        self.show_toast(_("Captura cancelada"), "warning")
+        print("[Capture] Cancelled")
+        return False
+
+    def _fast_shutter_ready(self):
+        """The low-latency shutter is on and nothing else holds the camera."""
+        return (self.shutter_settings["enabled"] and self.current_mode == "photo"
+                and self.get_selected_camera_backend() == backends.DEFAULT
+                and not self.is_capturing and not self.btn_stop.get_visible()
+                and not (self.timelapse and self.timelapse.running))
+
+    def _on_shutter_enter(self, controller, x, y):
+        if self.shutter_settings["arm_on_hover"]:
+            self._arm_shutter()
+
+    def _on_shutter_leave(self, controller):
+        if self.shutter and self.shutter.armed and not self.is_capturing:
+            self.tasks.submit("shutter_disarm", self.shutter.disarm, lane=self.get_selected_camera_port(),
+                              on_done=self._on_shutter_op_done)
+
+    def _arm_shutter(self):
+        """Focus ahead of the shot; the release queues behind it on the camera's lane."""
+        if not self._fast_shutter_ready():
+            return
+        port = self.get_selected_camera_port()
+        self.tasks.submit("shutter_arm", self._shutter_arm, self.get_selected_camera_name(), port,
+                          lane=port, tags=("camera",), on_done=self._on_shutter_op_done)
+
+    def _on_shutter_op_done(self, op):
+        if op.error:
+            print(f"[Shutter] {op.name}: {op.error}")
+        return False
+
+    async def _shutter_arm(self, model, port):
+        session = await self._open_shutter(model, port)
+        t0 = time.monotonic()
+        try:
+            if await session.arm():
+                print(f"[Shutter] Focus armed in {(time.monotonic() - t0) * 1000:.0f} ms")
+        except BaseException:
+            self._drop_shutter()
+            raise
+
+    async def _open_shutter(self, model, port):
+        """The shell session on this camera, opened (capture target to RAM) if needed."""
+        args = camera_args(model, port)
+        if self.shutter and self.shutter.open and self.shutter.camera_args == args:
+            return self.shutter
+        if self.shutter:
+            await self.shutter.close()
+        caps = await asyncio.to_thread(lookup_caps, model, port)
+        await asyncio.to_thread(self._release_gvfs)
+        session = ShutterSession(args, os.getcwd(), caps)
+        t0 = time.monotonic()
+        with tracing.span("shutter_open"):
+            await session.start()
+        record_caps_timing(caps, "shutter_open", time.monotonic() - t0)
+        self.shutter = session
+        return session
+
+    def _drop_shutter(self):
+        """Forget a session left in an unknown state; the next shot opens a new one."""
+        if self.shutter:
+            self.shutter.kill()
+            self.shutter = None
+
+    def _close_shutter(self, then=None):
+        """Close the session before something else uses the camera.
+
+        Returns True when then() was deferred until the session is closed.
+        """
+        if not (self.shutter and self.shutter.open):
+            self.shutter = None
+            return False
+        session, self.shutter = self.shutter, None
+
+        def on_done(op):
+            self._on_shutter_op_done(op)
+            if then:
+                then()
+            return False
+
+        self.tasks.submit("shutter_close", session.close, lane=self.get_selected_camera_port(),
+                          on_done=on_done)
+        return then is not None
+
+    def take_photo_fast(self, released):
+        """Shot through the open session: no process start, no card write."""
+        self.tasks.cancel("detect")
+        self.is_capturing = True
+        self.set_loading(True)
+        self.btn_action.set_sensitive(False)
+        model = self.get_selected_camera_name()
+        port = self.get_selected_camera_port()
+
+        def on_done(op):
+            self._capture_op = None
+            if op.cancelled:
+                self.on_photo_cancelled()
+            elif op.error:
+                self.on_photo_error(str(op.error))
+            else:
+                self.on_fast_photo_captured(*op.result)
+            return False
+
+        self._capture_op = self.tasks.submit(
+            "take_photo_fast", self._capture_fast, model, port, self.get_next_filename(), released,
+            lane=port, deadline=CAPTURE_DEADLINE, tags=("camera",), on_done=on_done
+        )
+
+    async def _capture_fast(self, model, port, target_filename, released):
+        trace = tracing.start("take_photo_fast")
+        try:
+            session = await self._open_shutter(model, port)
+            try:
+                with tracing.span("fire", armed=session.armed):
+                    shot = await session.fire(released)
+            except BaseException:
+                # Cancelled or failed halfway through a command: start over next time
+                self._drop_shutter()
+                raise
+            files = await asyncio.to_thread(self._rename_shot, shot.files, target_filename)
+            files.sort(key=lambda f: (not is_raw(f), f))
+            preview, thumb, _decode = await self._decode_preview(files[0])
+            return files, preview, thumb, session.caps, shot, target_filename
+        finally:
+            trace.end()
+
+    async def _shutter_drain(self, shot, target_filename):
+        if not (self.shutter and self.shutter.open):
+            return []
+        try:
+            extra = await self.shutter.drain(shot)
+        except BaseException:
+            self._drop_shutter()
+            raise
+        files = await asyncio.to_thread(self._rename_shot, extra, target_filename)
+        if files:
+            print(f"[Shutter] Also saved {', '.join(files)}")
+        return files
+
+    def _rename_shot(self, paths, base):
+        """Same names as the normal capture (capt0007.cr2, capt0007.jpg...)."""
+        files = []
+        for path in paths:
+            name = base + os.path.splitext(path)[1].lower()
+            os.replace(path, name)
+            files.append(name)
+        return files
+
+    def on_fast_photo_captured(self, files, preview, thumb, caps, shot, target_filename):
+        self.is_capturing = False
+        self.update_mode_ui()
+        self.last_photo = files[0]
+        if preview:
+            self._show_photo(preview, thumb)
+
+        # Release to the camera taking it, and to the thumbnail on screen
+        lag = shot.lag
+        shown = time.monotonic() - shot.released
+        record_caps_timing(caps, "shutter_lag" if shot.armed else "shutter_lag_unarmed", lag)
+        record_caps_timing(caps, "capture_to_thumbnail", shown)
+        print(f"[Shutter] {', '.join(files)}: shutter lag {lag * 1000:.0f} ms "
+              f"({'focus armed' if shot.armed else 'focus on release'}), "
+              f"thumbnail {shown * 1000:.0f} ms")
+
+        if caps["shutter_drain"]:
+            self.tasks.submit("shutter_drain", self._shutter_drain, shot, target_filename,
+                              lane=self.get_selected_camera_port(), tags=("camera",),
+                              on_done=self._on_shutter_op_done)
+
+        self.set_loading(False)
+        # No "open photo?" dialog: it would stand between quick successive shots
+        self.show_toast(f"{_('Foto salva:')} {os.path.basename(files[0])} · "
+                        f"{_('atraso')} {lag * 1000:.0f} ms · {_('miniatura')} {shown * 1000:.0f} ms",
+                        "success")
+        return False
+
     def get_next_filename(self):
-        files = glob.glob("capt*.jpg")
+        """Base name of the next capture; gphoto2 adds each file's extension."""
+        files = glob.glob("capt*.*")
         max_idx = 0
         for f in files:
-            try:
-                num_part = f[4:-4]
-                idx = int(num_part)
-                if idx > max_idx:
-                    max_idx = idx
-            except:
-                pass
-        return f"capt{max_idx+1:04d}.jpg"
+            match = re.match(r"capt(\d+)\.", f)
+            if match:
+                max_idx = max(max_idx, int(match.group(1)))
+        return f"capt{max_idx+1:04d}"
 
     def start_webcam(self):
         self.is_capturing = True
         self.btn_action.set_sensitive(False)
         self.set_loading(True)
         self.show_toast(_("Iniciando webcam..."), "warning")
+        # Startup span, closed when the first preview frame is shown
+        self._startup_trace = tracing.start("start_webcam")
         self.btn_action.set_visible(False)
         self.btn_stop.set_visible(True)
         
@@ -851,50 +2211,154 @@ class WebcamApp(Adw.Application):
                 os.chmod(script_path, 0o755)
             except:
                 pass
+
+        # Output profile of the virtual webcam for this camera model
+        model = self.get_selected_camera_name()
+        profile = load_profile(model)
+        self.webcam_profile = profile
+        print(f"[Webcam] Output profile: {describe_profile(profile)}")
                 
-        def run_script_thread():
-            try:
-                port = self.get_selected_camera_port()
-                port_arg = port if port else ""
-                
-                # Run the script and wait for it to finish (it waits for device ready)
-                # We use subprocess.run so we block this thread until script exits
-                res = subprocess.run(
-                    [script_path, port_arg, str(self.udp_port)],
-                    capture_output=True,
-                    text=True
-                )
-                
-                # Check retuncode
-                if res.returncode == 0:
-                    # Success path - script outputs "SUCCESS: /dev/videoX"
-                    output = res.stdout.strip()
-                    dev = None
-                    for line in output.split('\n'):
-                        if line.startswith('SUCCESS:'):
-                            dev = line.split('SUCCESS:')[1].strip()
-                            break
-                    GLib.idle_add(self.on_webcam_started_success, dev)
+        port = self.get_selected_camera_port()
+
+        def on_done(op):
+            self._webcam_op = None
+            if op.cancelled:
+                print("[Webcam] Start cancelled")
+            elif op.error:
+                self.on_webcam_started_error(str(op.error))
+            else:
+                ok, value = op.result
+                if ok:
+                    self.on_webcam_started_success(*value)
                 else:
-                    # Failure path
-                    # Capture stdout as well since run_webcam.sh logs there (exec 2>&1)
-                    error_msg = res.stdout.strip() if res.stdout else res.stderr.strip()
-                    if not error_msg:
-                        error_msg = "Unknown Error (No Output)"
-                        
-                    print(f"Script failed: {error_msg}")
-                    GLib.idle_add(self.on_webcam_started_error, error_msg)
-                    
-            except Exception as e:
-                GLib.idle_add(self.on_webcam_started_error, str(e))
+                    self.on_webcam_started_error(value)
+            return False
 
-        import threading
-        threading.Thread(target=run_script_thread, daemon=True).start()
+        # A hot-plug scan still running would compete for the camera
+        self.tasks.cancel("detect")
+        self._close_shutter()
+        self._webcam_op = self.tasks.submit(
+            "start_webcam", self._run_webcam_script, script_path, model, port, profile,
+            self.get_selected_camera_backend(),
+            lane=port, deadline=WEBCAM_START_DEADLINE, tags=("camera",), on_done=on_done
+        )
 
-    def on_webcam_started_success(self, video_device=None):
+    async def _run_webcam_script(self, script_path, model, port, profile, backend):
+        """(True, device) once run_webcam.sh has the pipeline up, else (False, message)."""
+        port_arg = port if port else ""
+
+        # One-time probe per camera; afterwards the script trusts the
+        # capability database instead of probing on every start
+        caps = await asyncio.to_thread(lookup_caps, model, port)
+        if not caps["probed"] and backend == backends.DEFAULT:
+            with tracing.span("probe"):
+                await asyncio.to_thread(probe_caps, caps, camera_args(model, port), cached_camera_config(model))
+
+        # Live zoom/pan needs the zmq filter in this ffmpeg build
+        live_roi = await asyncio.to_thread(ffmpeg_has_zmq)
+        env = dict(os.environ)
+        env.update(profile_script_env(profile, zmq_port(self.udp_port) if live_roi else None,
+                                      caps["liveview_fps"]))
+        env.update(caps_script_env(caps))
+        env["CAMERA_BACKEND"] = backend
+        # Devices from the loopback helper take milliseconds and no password;
+        # without the helper the script loads the module itself
+        with tracing.span("loopback"):
+            devices = await asyncio.to_thread(
+                self._provision_devices, 1 + len(extra_outputs(profile)), model or LOOPBACK_LABEL)
+        if devices:
+            env["VIDEO_DEVICES"] = " ".join(devices)
+        if profile["network_stream"]:
+            env["NET_HTTP_PORT"] = str(net_http_port(self.udp_port))
+        # Old instances and gvfs are cleared here, so the script
+        # can skip its own pkill round and fixed sleeps
+        with tracing.span("cleanup"):
+            await asyncio.to_thread(self._kill_my_processes, 2.0)
+            await asyncio.to_thread(self._release_gvfs)
+        env["PROCS_CLEANED"] = "1"
+        # The script marks its phases (device allocation...) in this file
+        trace_file = f"/tmp/canon_webcam_trace_{self.udp_port}.txt"
+        if tracing.enabled():
+            if os.path.exists(trace_file):
+                os.remove(trace_file)
+            env["TRACE_FILE"] = trace_file
+        self.roi_controller = RoiController(self.udp_port, roi_scalers(profile), live_roi)
+        self.camera_caps = caps
+        # Outputs keep the crop's size, so a session started zoomed never
+        # shows the camera's whole frame
+        self._liveview_recorded = profile["roi"]["zoom"] > 1.0
+        t0 = time.monotonic()
+        
+        # Run the script and wait for it to finish (it waits for device ready);
+        # cancelling the task terminates the script and what it started
+        with tracing.span("run_webcam.sh"):
+            res = await run_process([script_path, port_arg, str(self.udp_port)], env=env)
+        tracing.import_marks(trace_file, "script:")
+        
+        # Check retuncode
+        if res.returncode == 0:
+            # Success path - script outputs "SUCCESS: /dev/videoX", then
+            # "EXTRA: /dev/videoY ..." for the extra outputs
+            output = res.stdout.strip()
+            dev = None
+            extras = []
+            for line in output.split('\n'):
+                if line.startswith('SUCCESS:'):
+                    dev = line.split('SUCCESS:')[1].strip()
+                elif line.startswith('EXTRA:'):
+                    extras = line.split('EXTRA:')[1].split()
+            record_caps_timing(caps, "stream_start", time.monotonic() - t0)
+            return True, (dev, extras)
+
+        # Failure path
+        # Capture stdout as well since run_webcam.sh logs there (exec 2>&1)
+        error_msg = res.stdout.strip() if res.stdout else res.stderr.strip()
+        if not error_msg:
+            error_msg = "Unknown Error (No Output)"
+            
+        print(f"Script failed: {error_msg}")
+        return False, error_msg
+
+    def _loopback_client(self):
+        if self.loopback is None:
+            self.loopback = LoopbackClient()
+        return self.loopback
+
+    def _provision_devices(self, count, label):
+        """Paths of count virtual webcams of this instance, or None without the helper.
+
+        Blocking D-Bus calls: run off the UI thread.
+        """
+        try:
+            client = self._loopback_client()
+            while len(self.loopback_devices) < count:
+                suffix = f" {len(self.loopback_devices) + 1}" if self.loopback_devices else ""
+                self.loopback_devices.append(client.add(label[:LABEL_MAX - len(suffix)] + suffix))
+        except LoopbackError as e:
+            print(f"[Loopback] Helper unavailable ({e}), run_webcam.sh will load the module")
+            return None
+        return [path for _number, path in self.loopback_devices[:count]]
+
+    def _provision_compositor_device(self):
+        try:
+            if self.compositor_device is None:
+                self.compositor_device = self._loopback_client().add("Big DigiCam Compositor")
+        except LoopbackError as e:
+            print(f"[Loopback] Helper unavailable ({e}), compositor picks a free device")
+            return None
+        return self.compositor_device[1]
+
+    def on_webcam_started_success(self, video_device=None, extra_devices=()):
         self.set_loading(False)
         if video_device:
             self.my_video_device = video_device
+        self.extra_video_devices = list(extra_devices)
+        if extra_devices:
+            outputs = extra_outputs(self.webcam_profile)
+            print("[Webcam] Extra outputs: " + ", ".join(
+                f"{dev} {describe_output(out)}" for dev, out in zip(extra_devices, outputs)))
+        if self._startup_trace:
+            self._first_frame_trace = tracing.start("first_frame", device=video_device)
         self.show_webcam_active_status()
 
     def show_webcam_active_status(self):
@@ -910,8 +2374,143 @@ class WebcamApp(Adw.Application):
         
         # Try to start preview (with exclusive_caps=1, this should work)
         GLib.timeout_add(1000, self.start_video_preview)
+        self._start_demand_control()
+
+        if not getattr(self, '_stats_timer', None):
+            self._stats_timer = GLib.timeout_add(1000, self._update_pipeline_stats)
+
+    def _update_pipeline_stats(self):
+        net = read_net_stats(self.udp_port)
+        self._net_clients = net["clients"] if net else 0
+        if self.demand:
+            self._update_demand()
+            if self.demand.state != "streaming":
+                self.stats_label.set_label(f"{_('Em espera: nenhum app usando a webcam')}\n{self.demand.last_report}")
+                self.stats_label.set_visible(self.current_mode == "video")
+                return True
+        stats = read_pipeline_stats(self.udp_port, rate_converted_outputs(self.webcam_profile))
+        if not stats:
+            self.stats_label.set_visible(False)
+            return True
+        self._learn_liveview(stats)
+        text = (f"{_('Saída')} {stats['fps']:.0f} fps · "
+                f"{stats['real']} {_('reais')} / {stats['dup']} {_('duplicados')}")
+        full_size = self.camera_caps and self.camera_caps["liveview_size"]
+        if self._current_roi()["zoom"] > 1.0 and full_size and self.preview_src_size:
+            # Sizes measured after the crop (the decoded preview, which native
+            # outputs match) against the camera's frame, at each stage's rate
+            w, h = self.preview_src_size
+            stages = {_("Prévia"): (self.preview_src_size, self.preview_fps)}
+            if not self.webcam_profile["width"]:
+                stages["v4l2"] = (self.preview_src_size, stats["fps"])
+            saved = stage_savings(full_size, stages)
+            text += (f"\nROI {w}x{h} / {full_size[0]}x{full_size[1]} · " + " · ".join(
+                f"{name} −{px / 1e6:.1f} Mpx/s" for name, px in saved.items()))
+
+        if net:
+            text += (f"\n{_('Rede')}: {net['clients']} {_('clientes')} · "
+                     f"{net['out_kbps'] / 1000:.1f} Mbit/s")
+            if net["dropped"]:
+                text += f" · {net['dropped']} {_('lentos desconectados')}"
+        if self.extra_video_devices:
+            outputs = extra_outputs(self.webcam_profile)
+            text += "\n" + " · ".join(
+                f"{os.path.basename(dev)} {describe_output(out)}"
+                for dev, out in zip(self.extra_video_devices, outputs))
+
+        stage = read_stage_stats(self.udp_port)
+        if stage and stage.get("plugins"):
+            parts = []
+            for name, p in stage["plugins"].items():
+                part = f"{name} {p['avg_ms']:.1f}ms"
+                if p["degraded"]:
+                    part += "↓"
+                if p["skipped"]:
+                    part += f" ({p['skipped']} {_('pulados')})"
+                parts.append(part)
+            text += "\n" + " · ".join(parts)
+        self.stats_label.set_label(text)
+        self.stats_label.set_visible(self.current_mode == "video")
+        return True
+
+    def _start_demand_control(self):
+        """Idle the live view while no app has the virtual webcam open."""
+        if self.demand or self._demand_op or not self.preview_device:
+            return
+        profile = self.webcam_profile or {}
+        sustain = profile.get("pacing") == "source" and profile.get("min_fps", 0) > 0
+
+        def on_done(op):
+            if op is not self._demand_op:
+                # Stopped while it was being set up
+                if op.result:
+                    self._demand_call(op.result.close)
+                return False
+            self._demand_op = None
+            if op.error:
+                print(f"[Demand] Not available: {op.error}")
+                return False
+            self.demand = op.result
+            if self.demand.watch:
+                self._demand_watch = GLib.io_add_watch(
+                    self.demand.fileno(), GLib.PRIORITY_DEFAULT, GLib.IOCondition.IN,
+                    self._on_demand_events
+                )
+            return False
+
+        # The controller scans /proc and runs v4l2-ctl: all of its work goes
+        # through one lane off the UI thread, which also keeps it serialized
+        self._demand_op = self.tasks.submit(
+            "demand_start", asyncio.to_thread, DemandController,
+            self.preview_device, self.udp_port, self.get_selected_camera_port(), sustain,
+            GRACE, tuple(self.extra_video_devices), lane="demand", on_done=on_done
+        )
+
+    def _demand_call(self, method, *args):
+        self.tasks.submit("demand", asyncio.to_thread, method, *args, lane="demand")
+
+    def _update_demand(self):
+        if self.demand:
+            self._demand_call(self.demand.update, self._app_wants_frames())
+
+    def _on_demand_events(self, fd, condition):
+        if self.demand:
+            # Reading the inotify fd here is instant and clears the condition
+            self._demand_call(self.demand.handle_events, self.demand.watch.read_masks())
+        return True
+
+    def _stop_demand_control(self, block=False):
+        self._demand_op = None
+        if getattr(self, '_demand_watch', None):
+            GLib.source_remove(self._demand_watch)
+            self._demand_watch = None
+        if self.demand:
+            # Continues a paused gphoto2 so it can be stopped normally
+            if block:
+                self.demand.close()
+            else:
+                self._demand_call(self.demand.close)
+            self.demand = None
+
+    def _app_wants_frames(self):
+        # Network clients only get frames while the live view streams
+        return (self.preview_active and self.preview_visible) or self._net_clients > 0
+
+    def _learn_liveview(self, stats):
+        """Store the camera's live view size/rate once per session, when the
+        output shows them unaltered (native size, started and kept unzoomed,
+        source pacing)."""
+        caps = self.camera_caps
+        profile = self.webcam_profile
+        if self._liveview_recorded or not caps or not profile or stats["frames"] < 60:
+            return
+        if profile["pacing"] != "source" or profile["width"] or self._current_roi()["zoom"] > 1.0:
+            return
+        self._liveview_recorded = True
+        record_caps_liveview(caps, self.preview_src_size, stats["fps"])
 
     def on_webcam_started_error(self, error):
+        self._end_startup_trace(error=error[:200])
         self.is_capturing = False
         self.btn_action.set_sensitive(True)
         if "No camera" in error or "Nenhuma câmera" in error:
@@ -961,76 +2560,39 @@ class WebcamApp(Adw.Application):
             # Using packetsize=1316 to match ffmpeg output
             pipeline_attempts = [
                 # Try 1: Explicit MPEG-TS caps with localhost bind
+                # Rate limiting and scaling happen before videoconvert so the
+                # governor can shrink the RGB conversion work as well.
                 (
                     f"udpsrc port={self.udp_port} address=127.0.0.1 caps=\"video/mpegts,packetsize=(int)1316\" ! "
                     "queue max-size-bytes=2097152 ! "
                     "tsdemux ! "
+                    "mpegvideoparse ! "
+                    "valve name=preview_valve drop=False ! "
                     "decodebin ! "
+                    "videorate name=preview_rate drop-only=True ! "
+                    "videoscale ! "
                     "videoconvert ! "
-                    "video/x-raw,format=RGB ! "
+                    "capsfilter name=preview_caps caps=video/x-raw,format=RGB ! "
                     "appsink name=sink emit-signals=True drop=True max-buffers=2 sync=False"
                 ),
                 # Try 2: Bind to ALL interfaces (0.0.0.0) just in case
                 (
                     f"udpsrc port={self.udp_port} caps=\"video/mpegts,packetsize=(int)1316\" ! "
                     "queue max-size-bytes=2097152 ! "
+                    # Same parsing as try 1: the valve's keyframe probe needs
+                    # parsed MPEG frames, not raw TS packets
+                    "tsdemux ! "
+                    "mpegvideoparse ! "
+                    "valve name=preview_valve drop=False ! "
                     "decodebin ! "
+                    "videorate name=preview_rate drop-only=True ! "
+                    "videoscale ! "
                     "videoconvert ! "
-                    "video/x-raw,format=RGB ! "
+                    "capsfilter name=preview_caps caps=video/x-raw,format=RGB ! "
                     "appsink name=sink emit-signals=True drop=True max-buffers=2 sync=False"
                 ),
             ]
-            
-            for i, pipeline_str in enumerate(pipeline_attempts):
-                try:
-                    # print(f"[Preview] Tentando pipeline {i+1}...")
-                    self.gst_pipeline = Gst.parse_launch(pipeline_str)
-                    appsink = self.gst_pipeline.get_by_name("sink")
-                    appsink.connect("new-sample", self.on_gst_sample_with_fps)
-                    
-                    bus = self.gst_pipeline.get_bus()
-                    bus.add_signal_watch()
-                    bus.connect("message::error", self.on_gst_error)
-                    
-                    # Try to start
-                    ret = self.gst_pipeline.set_state(Gst.State.PLAYING)
-                    if ret == Gst.StateChangeReturn.FAILURE:
-                        print(f"[Preview] Pipeline {i+1} falhou ao iniciar")
-                        self.gst_pipeline.set_state(Gst.State.NULL)
-                        self.gst_pipeline = None
-                        continue
-                    
-                    # Wait a bit to see if it errors immediately (MAX 2 seconds)
-                    # Don't use CLOCK_TIME_NONE as it freezes the UI waiting for stream
-                    ret, state, pending = self.gst_pipeline.get_state(2 * Gst.SECOND)
-                    
-                    if ret == Gst.StateChangeReturn.FAILURE:
-                         print(f"[Preview] Pipeline {i+1} falhou state change")
-                         self.gst_pipeline.set_state(Gst.State.NULL)
-                         self.gst_pipeline = None
-                         continue
-                         
-                    if state == Gst.State.PLAYING or ret == Gst.StateChangeReturn.SUCCESS or ret == Gst.StateChangeReturn.ASYNC:
-                        # print(f"[Preview] Pipeline {i+1} iniciado (State: {state}, Ret: {ret})")
-                        # self.show_toast(f"Preview ativo", "accent")
-                        GLib.timeout_add(500, lambda: self.show_toast(_("Webcam disponível!"), "success") or False)
-                        self.set_loading(False)
-                        return False
-                        
-                except Exception as e:
-                    print(f"[Preview] Pipeline {i+1} erro: {e}")
-                    if self.gst_pipeline:
-                        self.gst_pipeline.set_state(Gst.State.NULL)
-                        self.gst_pipeline = None
-                    continue
-            
-            # All pipelines failed - show message but don't block OBS
-            print("[Preview] Todos pipelines falharam")
-            # self.show_toast("Preview indisponível (OBS/Meet funcionam)", "warning")
-            self.preview_active = False
-            self.set_loading(False)
-            # Alternative: Try OpenCV Fallback?
-            # self.try_opencv_fallback()
+            self._start_preview_attempt(pipeline_attempts, 0)
             return False
             
         except Exception as e:
@@ -1040,36 +2602,195 @@ class WebcamApp(Adw.Application):
             self.set_loading(False)
             return False
 
-    def update_opencv_frame(self):
-        if not self.preview_active or not hasattr(self, 'cap'):
+    def _start_preview_attempt(self, pipeline_attempts, first):
+        """Start the first pipeline from index first that does not fail at once."""
+        for i, pipeline_str in enumerate(pipeline_attempts[first:], first):
+            try:
+                # print(f"[Preview] Tentando pipeline {i+1}...")
+                self.gst_pipeline = Gst.parse_launch(pipeline_str)
+                appsink = self.gst_pipeline.get_by_name("sink")
+                appsink.connect("new-sample", self.on_gst_sample_with_fps)
+                valve = self.gst_pipeline.get_by_name("preview_valve")
+                valve.get_static_pad("src").add_probe(
+                    Gst.PadProbeType.BUFFER, self._on_preview_valve_buffer)
+                
+                bus = self.gst_pipeline.get_bus()
+                bus.add_signal_watch()
+                bus.connect("message::error", self.on_gst_error)
+                
+                # Try to start
+                ret = self.gst_pipeline.set_state(Gst.State.PLAYING)
+                if ret == Gst.StateChangeReturn.FAILURE:
+                    print(f"[Preview] Pipeline {i+1} falhou ao iniciar")
+                    self.gst_pipeline.set_state(Gst.State.NULL)
+                    self.gst_pipeline = None
+                    continue
+                
+                # See if it errors immediately (MAX 2 seconds), polling the
+                # state instead of blocking the UI in get_state()
+                deadline = time.monotonic() + 2
+                GLib.timeout_add(50, self._check_preview_state,
+                                 self.gst_pipeline, pipeline_attempts, i, deadline)
+                return
+                    
+            except Exception as e:
+                print(f"[Preview] Pipeline {i+1} erro: {e}")
+                if self.gst_pipeline:
+                    self.gst_pipeline.set_state(Gst.State.NULL)
+                    self.gst_pipeline = None
+                continue
+        
+        # All pipelines failed - show message but don't block OBS
+        print("[Preview] Todos pipelines falharam")
+        # self.show_toast("Preview indisponível (OBS/Meet funcionam)", "warning")
+        self.preview_active = False
+        self.set_loading(False)
+        # Alternative: Try OpenCV Fallback?
+        # self.try_opencv_fallback()
+
+    def _check_preview_state(self, pipeline, pipeline_attempts, i, deadline):
+        if pipeline is not self.gst_pipeline:
+            return False  # Preview stopped (or restarted) meanwhile
+        ret, state, pending = pipeline.get_state(0)
+
+        if ret == Gst.StateChangeReturn.FAILURE:
+            print(f"[Preview] Pipeline {i+1} falhou state change")
+            pipeline.set_state(Gst.State.NULL)
+            self.gst_pipeline = None
+            self._start_preview_attempt(pipeline_attempts, i + 1)
             return False
-            
-        ret, frame = self.cap.read()
-        if ret:
-            # FPS Calc
+
+        # Still ASYNC when the deadline passes is accepted: the stream may
+        # simply not have sent a keyframe yet
+        if state == Gst.State.PLAYING or ret == Gst.StateChangeReturn.SUCCESS or time.monotonic() >= deadline:
+            # print(f"[Preview] Pipeline {i+1} iniciado (State: {state}, Ret: {ret})")
+            GLib.timeout_add(500, lambda: self.show_toast(_("Webcam disponível!"), "success") or False)
+            self.set_loading(False)
+            self._start_preview_governor()
+            self._update_preview_gate()
+            return False
+        return True
+
+    def _start_preview_governor(self):
+        """Watch preview health and degrade it before the encoder starves."""
+        self._stop_preview_governor()
+        self.preview_src_size = None
+        self.preview_governor = PreviewGovernor(self._apply_preview_level)
+        self._governor_timer = GLib.timeout_add(1000, self._governor_tick)
+
+    def _governor_tick(self):
+        # A hidden preview receives no frames, judging it would only step down
+        if self.preview_governor and self.preview_visible:
+            self.preview_governor.tick()
+        return True
+
+    def _stop_preview_governor(self):
+        if getattr(self, '_governor_timer', None):
+            GLib.source_remove(self._governor_timer)
+        self._governor_timer = None
+        self.preview_governor = None
+
+    def _apply_preview_level(self, level):
+        """Apply a governor level to the preview branch only (never the v4l2 output)."""
+        if not self.gst_pipeline:
+            return
+        rate = self.gst_pipeline.get_by_name("preview_rate")
+        capsfilter = self.gst_pipeline.get_by_name("preview_caps")
+
+        self._update_preview_gate()
+        if level["fps"] == 0:
+            self.fps_label.set_label(_("Preview pausado"))
+            return
+        rate.set_property("max-rate", level["fps"] or 2147483647)
+
+        caps = "video/x-raw,format=RGB"
+        if level["scale"] < 1.0 and self.preview_src_size:
+            src_w, src_h = self.preview_src_size
+            # Multiples of 8 keep RGB rows 4-byte aligned (stride == w * 3)
+            w = max(8, int(src_w * level["scale"]) // 8 * 8)
+            h = max(8, int(src_h * level["scale"]) // 8 * 8)
+            caps += f",width={w},height={h}"
+        capsfilter.set_property("caps", Gst.Caps.from_string(caps))
+
+    def _is_preview_visible(self):
+        if not self.video_picture.get_mapped():
+            return False
+        surface = self.win.get_surface()
+        if surface is None:
+            return False
+        hidden = Gdk.ToplevelState.MINIMIZED
+        # SUSPENDED (GTK >= 4.12): the compositor says the window can't be seen
+        suspended = getattr(Gdk.ToplevelState, "SUSPENDED", None)
+        if suspended is not None:
+            hidden |= suspended
+        return not (surface.get_state() & hidden)
+
+    def _update_preview_gate(self, *args):
+        """Stop feeding the decoder while the preview can't be seen.
+
+        Dropping at the valve (before decodebin) means nothing is decoded or
+        converted while hidden; on resume buffers are held back until the next
+        keyframe so the decoder never starts on a partial GOP.
+        """
+        visible = self._is_preview_visible()
+        if visible != self.preview_visible:
+            state = "visible" if self.preview_visible else "hidden"
+            print(f"[Preview] {state} for {self._visibility_cpu.elapsed():.1f}s, "
+                  f"app CPU {self._visibility_cpu.percent():.1f}%")
+            self._visibility_cpu.reset()
+            self.preview_visible = visible
+            if self.demand:
+                # Resume at once when the preview comes back on screen
+                self._update_demand()
+
+        if self.opencv_capture:
+            self.opencv_capture.set_paused(not visible)
+        if not self.gst_pipeline:
+            return
+        valve = self.gst_pipeline.get_by_name("preview_valve")
+        governor = self.preview_governor
+        paused = governor is not None and governor.level["fps"] == 0
+        drop = not visible or paused
+        if valve.get_property("drop") and not drop:
+            self._await_keyframe = True
+        valve.set_property("drop", drop)
+
+    def _on_preview_valve_buffer(self, pad, info):
+        if not self._await_keyframe:
+            return Gst.PadProbeReturn.OK
+        if info.get_buffer().has_flags(Gst.BufferFlags.DELTA_UNIT):
+            return Gst.PadProbeReturn.DROP
+        self._await_keyframe = False
+        return Gst.PadProbeReturn.OK
+
+    def _on_opencv_tick(self, widget, frame_clock):
+        """Show the newest frame of the capture thread, once per display frame."""
+        capture = self.opencv_capture
+        if not self.preview_active or capture is None:
+            self._opencv_tick = None
+            return GLib.SOURCE_REMOVE
+
+        # Copy under the handoff lock; the thread never writes this buffer
+        def consume(buf, w, h):
+            self.exposure_aids.submit(buf, bgr=True)
+            return w, h, GLib.Bytes.new(buf.data)
+
+        frame = capture.take(consume)
+        if frame:
+            w, h, data = frame
+            self.update_texture(w, h, data, memory_format=Gdk.MemoryFormat.B8G8R8)
+            # FPS counts frames that reached the screen, not frames read
             self.fps_counter += 1
-            t = time.time()
-            if t - self.last_fps_time >= 1.0:
-                fps = self.fps_counter
-                self.fps_counter = 0
-                self.last_fps_time = t
-                self.fps_label.set_label(f"FPS {fps}")
-                # Only show FPS in video mode
-                if self.current_mode == "video":
-                    self.fps_label.set_visible(True)
-
-            # Convert BGR to RGB
-            # Frame is numpy array
-            import cv2
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            
-            h, w, ch = rgb_frame.shape
-            data = rgb_frame.tobytes()
-            glib_bytes = GLib.Bytes.new(data)
-            
-            self.update_texture(w, h, glib_bytes)
-            
-        return True # Keep calling
+        t = time.time()
+        if t - self.last_fps_time >= 1.0:
+            fps = self.fps_counter
+            self.fps_counter = 0
+            self.last_fps_time = t
+            self.fps_label.set_label(f"FPS {fps}")
+            # Only show FPS in video mode
+            if self.current_mode == "video":
+                self.fps_label.set_visible(True)
+        return GLib.SOURCE_CONTINUE
 
     def on_gst_sample_with_fps(self, sink):
         if not self.preview_active:
@@ -1078,6 +2799,10 @@ class WebcamApp(Adw.Application):
         if not sample:
             return Gst.FlowReturn.ERROR
         
+        governor = self.preview_governor
+        if governor:
+            governor.frame_arrived()
+
         # FPS Calculation
         self.fps_counter += 1
         t = time.time()
@@ -1085,18 +2810,27 @@ class WebcamApp(Adw.Application):
             fps = self.fps_counter
             self.fps_counter = 0
             self.last_fps_time = t
-            GLib.idle_add(lambda: self.fps_label.set_label(f"FPS {fps}") or self.fps_label.set_visible(self.current_mode == "video"))
+            self.preview_fps = fps
+            level = governor.level["name"] if governor else "full"
+            label = f"FPS {fps}" if level == "full" else f"FPS {fps} ({level})"
+            GLib.idle_add(lambda: self.fps_label.set_label(label) or self.fps_label.set_visible(self.current_mode == "video"))
         
         buf = sample.get_buffer()
         caps = sample.get_caps()
         s = caps.get_structure(0)
         w = s.get_value("width")
         h = s.get_value("height")
+        # Remember the native size while unscaled, the governor scales from it
+        if governor and governor.level["scale"] == 1.0:
+            self.preview_src_size = (w, h)
         result, map_info = buf.map(Gst.MapFlags.READ)
         if result:
+            if self.exposure_aids.enabled:
+                # Takes a subsampled copy at most a few times per second
+                self.exposure_aids.submit(exposure_frame_view(map_info.data, w, h))
             glib_bytes = GLib.Bytes.new(map_info.data)
             buf.unmap(map_info)
-            GLib.idle_add(self.update_texture, w, h, glib_bytes)
+            GLib.idle_add(self.update_texture, w, h, glib_bytes, time.monotonic())
         return Gst.FlowReturn.OK
 
     def on_gst_error(self, bus, msg):
@@ -1107,15 +2841,18 @@ class WebcamApp(Adw.Application):
 
     def try_opencv_fallback(self):
         try:
-            import cv2
             dev_idx = int(re.search(r'\d+$', self.preview_device).group())
-            self.cap = cv2.VideoCapture(dev_idx, cv2.CAP_V4L2)
-            if self.cap.isOpened():
+            capture = OpenCvCapture(dev_idx)
+            if capture.open():
+                self.opencv_capture = capture
                 self.use_opencv = True
                 self.preview_active = True
                 self.fps_counter = 0
                 self.last_fps_time = time.time()
-                GLib.timeout_add(33, self.update_opencv_frame)
+                capture.set_paused(not self.preview_visible)
+                # Reading happens on the capture thread; the UI only picks up
+                # the latest frame on each frame clock tick
+                self._opencv_tick = self.video_picture.add_tick_callback(self._on_opencv_tick)
                 self.show_toast("Preview via OpenCV (acesso exclusivo)", "warning")
             else:
                 self.show_toast("Falha no fallback OpenCV", "error")
@@ -1123,30 +2860,55 @@ class WebcamApp(Adw.Application):
             self.show_toast(f"Fallback falhou: {e}", "error")
 
 
-    def update_texture(self, w, h, glib_bytes):
+    def update_texture(self, w, h, glib_bytes, arrived=None, memory_format=None):
         if not self.preview_active:
             return
+
+        if arrived is not None and self.preview_governor:
+            self.preview_governor.frame_shown(time.monotonic() - arrived)
             
         try:
             texture = Gdk.MemoryTexture.new(
                 w, h, 
-                Gdk.MemoryFormat.R8G8B8, 
+                memory_format or Gdk.MemoryFormat.R8G8B8,
                 glib_bytes, 
                 w * 3
             )
             self.video_picture.set_paintable(texture)
         except:
             pass
+        if self._startup_trace:
+            self._end_startup_trace(size=f"{w}x{h}")
+
+    def _end_startup_trace(self, **args):
+        if self._first_frame_trace:
+            self._first_frame_trace.end()
+            self._first_frame_trace = None
+        if self._startup_trace:
+            self._startup_trace.end(**args)
+            self._startup_trace = None
 
     def stop_video_preview(self):
         """Stop preview (OpenCV or GStreamer)."""
         self.preview_active = False
         self.fps_label.set_visible(False)
+        self._stop_preview_governor()
+        if getattr(self, '_stats_timer', None):
+            GLib.source_remove(self._stats_timer)
+            self._stats_timer = None
+        self.stats_label.set_visible(False)
+        if self.roi_controller:
+            self.roi_controller.close()
+            self.roi_controller = None
+        self._stop_demand_control()
         
         # Stop OpenCV
-        if hasattr(self, 'cap') and self.cap:
-            self.cap.release()
-            self.cap = None
+        if getattr(self, '_opencv_tick', None):
+            self.video_picture.remove_tick_callback(self._opencv_tick)
+            self._opencv_tick = None
+        if self.opencv_capture:
+            self.opencv_capture.stop()
+            self.opencv_capture = None
         
         # Stop GStreamer
         if self.gst_pipeline:
@@ -1154,8 +2916,14 @@ class WebcamApp(Adw.Application):
             self.gst_pipeline = None
             
         self.video_picture.set_paintable(None)
+        self.aids_picture.set_paintable(None)
+        self.histogram_picture.set_paintable(None)
     def on_stop_clicked(self, btn):
+        if self._webcam_op:
+            # Still starting: terminate run_webcam.sh and what it launched
+            self._webcam_op.cancel()
         self.is_capturing = False
+        self._end_startup_trace(stopped=True)
         self.btn_action.set_sensitive(True)
         self.stop_video_preview()
         
@@ -1166,9 +2934,12 @@ class WebcamApp(Adw.Application):
             except:
                 pass
 
-        # Only kill THIS instance's processes (not other cameras)
-        self._kill_my_processes()
+        # Only kill THIS instance's processes (not other cameras); queued on
+        # the camera's lane, after a cancelled start-up has unwound
+        port = self.get_selected_camera_port()
+        self.tasks.submit("stop_webcam", asyncio.to_thread, self._kill_my_processes, 0.0, port, lane=port)
         self.my_video_device = None
+        self.extra_video_devices = []
         
         self.btn_action.set_visible(True)
         self.btn_stop.set_visible(False)
@@ -1181,7 +2952,7 @@ class WebcamApp(Adw.Application):
             try:
                 response = dialog.choose_finish(result)
                 if response == "open":
-                    subprocess.run(["xdg-open", filename])
+                    self._open_file(filename)
             except:
                 pass
 
@@ -3,64 +3,124 @@ exec 2>&1
 
 USB_PORT="$1"
 UDP_PORT="${2:-5000}"
+APP_DIR="$(cd "$(dirname "$(readlink -f "${BASH_SOURCE[0]}")")/.." && pwd)"
 
+# Phase marks for the app's startup trace (utils/tracing.py): "<phase> <epoch us>"
+trace_mark() {
+  [ -n "$TRACE_FILE" ] && echo "$1 ${EPOCHREALTIME/[.,]/}" >> "$TRACE_FILE"
+  return 0
+}
+trap 'trace_mark end' EXIT
+trace_mark cleanup
+
+# PROCS_CLEANED=1: the app already stopped the old instances and released
+# gvfs (and waited for them to exit), so skip the pkill round and sleeps
 if [ -n "$USB_PORT" ]; then
   PORT_STR="--port $USB_PORT"
-  # Kill only THIS camera's previous instances
-  pkill -f "gphoto2.*--port $USB_PORT" 2>/dev/null
-  pkill -f "ffmpeg.*udp://127.0.0.1:$UDP_PORT" 2>/dev/null
-  sleep 1
+  if [ "$PROCS_CLEANED" != "1" ]; then
+    # Kill only THIS camera's previous instances
+    pkill -f "gphoto2.*--port $USB_PORT" 2>/dev/null
+    pkill -f "ffmpeg.*udp://127.0.0.1:$UDP_PORT" 2>/dev/null
+    pkill -f "stream_server.py --udp $((UDP_PORT + 1000)) " 2>/dev/null
+    sleep 1
+  fi
 else
   PORT_STR=""
 fi
 
 # Kill gvfs interference more effectively
 systemctl --user stop gvfs-gphoto2-volume-monitor.service 2>/dev/null
-pkill -9 -f "gvfs-gphoto2-volume-monitor" 2>/dev/null
-gio mount -u gphoto2://* 2>/dev/null
-sleep 2
+if [ "$PROCS_CLEANED" != "1" ]; then
+  pkill -9 -f "gvfs-gphoto2-volume-monitor" 2>/dev/null
+  gio mount -u gphoto2://* 2>/dev/null
+  sleep 2
+fi
 
 # USB reset disabled globally for compatibility with Nikon cameras.
 # Canons will rely on the process kills to clean up the state instead.
 
-# Load v4l2loopback with 4 virtual devices if not loaded
-if ! lsmod | grep -q v4l2loopback; then
-  bigsudo modprobe v4l2loopback devices=4 exclusive_caps=1 max_buffers=4 card_label="Canon DSLR Webcam,Canon DSLR Webcam 2,Canon DSLR Webcam 3,Canon DSLR Webcam 4"
-  sleep 1
+trace_mark v4l2loopback
+# Extra outputs of the profile (utils/output_profiles.py) each take one more
+# device; they are fed by the same ffmpeg, from the same decode
+EXTRA_OUTPUTS="${EXTRA_OUTPUTS:-0}"
+# VIDEO_DEVICES: devices the app got from the loopback helper
+# (utils/loopback.py), one per output, created for this instance. Without
+# the helper the module is loaded here and free devices are looked up.
+if [ -n "$VIDEO_DEVICES" ]; then
+  read -r -a DEVICES <<< "$VIDEO_DEVICES"
 else
-  # If loaded with exclusive_caps=0, reload only if no device is in use
-  if [ "$(cat /sys/module/v4l2loopback/parameters/exclusive_caps 2>/dev/null)" = "0" ]; then
-    if ! fuser /dev/video* >/dev/null 2>&1; then
-      bigsudo modprobe -r v4l2loopback 2>/dev/null
-      sleep 1
-      bigsudo modprobe v4l2loopback devices=4 exclusive_caps=1 max_buffers=4 card_label="Canon DSLR Webcam,Canon DSLR Webcam 2,Canon DSLR Webcam 3,Canon DSLR Webcam 4"
-      sleep 1
+  # Load v4l2loopback with 4 virtual devices if not loaded
+  if ! lsmod | grep -q v4l2loopback; then
+    bigsudo modprobe v4l2loopback devices=4 exclusive_caps=1 max_buffers=4 card_label="Canon DSLR Webcam,Canon DSLR Webcam 2,Canon DSLR Webcam 3,Canon DSLR Webcam 4"
+    sleep 1
+  else
+    # If loaded with exclusive_caps=0, reload only if no device is in use
+    if [ "$(cat /sys/module/v4l2loopback/parameters/exclusive_caps 2>/dev/null)" = "0" ]; then
+      if ! fuser /dev/video* >/dev/null 2>&1; then
+        bigsudo modprobe -r v4l2loopback 2>/dev/null
+        sleep 1
+        bigsudo modprobe v4l2loopback devices=4 exclusive_caps=1 max_buffers=4 card_label="Canon DSLR Webcam,Canon DSLR Webcam 2,Canon DSLR Webcam 3,Canon DSLR Webcam 4"
+        sleep 1
+      fi
     fi
   fi
-fi
 
-# Find a free v4l2loopback virtual device
-DEVICE_VIDEO=""
-for dev in $(ls -v /dev/video* 2>/dev/null); do
-  # Check if it's a v4l2loopback device via driver name
-  DRIVER=$(v4l2-ctl -d "$dev" --info 2>/dev/null | grep "Driver name" | awk '{print $NF}')
-  if [ "$DRIVER" = "v4l2" ] || echo "$DRIVER" | grep -qi "loopback"; then
-    # Also check card name
-    CARD=$(v4l2-ctl -d "$dev" --info 2>/dev/null | grep "Card type" | sed 's/.*: //')
-    if echo "$CARD" | grep -qi "v4l2loopback\|Canon DSLR"; then
-      # Check if NOT in use by another ffmpeg
-      if ! fuser "$dev" >/dev/null 2>&1; then
-        DEVICE_VIDEO="$dev"
-        break
+  trace_mark device_allocation
+  # Find free v4l2loopback virtual devices
+  DEVICES=()
+  for dev in $(ls -v /dev/video* 2>/dev/null); do
+    # Check if it's a v4l2loopback device via driver name
+    DRIVER=$(v4l2-ctl -d "$dev" --info 2>/dev/null | grep "Driver name" | awk '{print $NF}')
+    if [ "$DRIVER" = "v4l2" ] || echo "$DRIVER" | grep -qi "loopback"; then
+      # Also check card name
+      CARD=$(v4l2-ctl -d "$dev" --info 2>/dev/null | grep "Card type" | sed 's/.*: //')
+      if echo "$CARD" | grep -qi "v4l2loopback\|Canon DSLR"; then
+        # Check if NOT in use by another ffmpeg
+        if ! fuser "$dev" >/dev/null 2>&1; then
+          DEVICES+=("$dev")
+          [ "${#DEVICES[@]}" -gt "$EXTRA_OUTPUTS" ] && break
+        fi
       fi
     fi
-  fi
-done
+  done
+fi
 
+DEVICE_VIDEO="${DEVICES[0]}"
 [ -z "$DEVICE_VIDEO" ] && echo "ERROR: No free virtual video device found." && exit 1
+if [ "${#DEVICES[@]}" -le "$EXTRA_OUTPUTS" ]; then
+  echo "ERROR: $((EXTRA_OUTPUTS + 1)) virtual video devices needed, only ${#DEVICES[@]} free."
+  exit 1
+fi
+
+# [x0], [x1]... of OUT_FILTER go to the extra devices. Their rate comes from
+# the fps filter of their branch, so ffmpeg adds no duplicates there.
+EXTRA_MAPS=""
+for i in $(seq 0 $((EXTRA_OUTPUTS - 1))); do
+  EXTRA_MAPS="$EXTRA_MAPS -map \"[x$i]\" -fps_mode passthrough -f v4l2 \"${DEVICES[i + 1]}\""
+done
+
+trace_mark camera_check
+
+# Capabilities known by the app (utils/capabilities.py): it has just detected
+# the camera (SKIP_PROBE=1) and knows whether the model has live view at all
+if [ "${MOVIE_CAPTURE:-1}" = "0" ]; then
+  echo "ERROR: This camera model does not support live view (--capture-movie)."
+  exit 1
+fi
+
+# CAMERA_BACKEND: camera backend of the app (utils/backends); other than the
+# gphoto2 tool, the backend's own stream command writes the MJPEG
+CAMERA_BACKEND="${CAMERA_BACKEND:-gphoto2}"
+if [ "$CAMERA_BACKEND" = "gphoto2" ]; then
+  SOURCE="gphoto2 --stdout --capture-movie $PORT_STR"
+else
+  SOURCE="PYTHONPATH=\"$APP_DIR\" python3 -m utils.backends stream --backend $CAMERA_BACKEND --port \"$USB_PORT\""
+fi
 
 # Verify camera is connected with a timeout to prevent hang
-if [ -n "$USB_PORT" ]; then
+if [ "${SKIP_PROBE:-0}" = "1" ] || [ "$CAMERA_BACKEND" != "gphoto2" ]; then
+  :
+elif [ -n "$USB_PORT" ]; then
   if ! timeout 10 gphoto2 --auto-detect 2>&1 | grep -q "$USB_PORT"; then
     echo "ERROR: Camera at $USB_PORT not found or device busy."
     exit 1
@@ -72,25 +132,106 @@ else
   fi
 fi
 
+trace_mark pipeline_start
 # Launch with high quality settings
 LOG="/tmp/canon_webcam_stream_${UDP_PORT}.log"
 ERR_LOG="/tmp/gphoto_err_${UDP_PORT}.log"
 > "$LOG"
 > "$ERR_LOG"
 
+# Output profile (set by the app per camera model, see utils/output_profiles.py)
+# OUT_FILTER must produce [v1] for the virtual webcam and [v2] (yuv420p) for
+# the preview; OUT_CODEC selects the v4l2 codec (empty = raw video).
+OUT_FILTER="${OUT_FILTER:-[0:v]format=yuv420p,split=2[v1][v2]}"
+OUT_CODEC="${OUT_CODEC:-}"
+
+# Pacing: fixed rate (-r, duplicates frames) or the camera's own timing
+# (IN_OPTS="-use_wallclock_as_timestamps 1", *_RATE="-fps_mode passthrough").
+IN_OPTS="${IN_OPTS:-}"
+V4L2_RATE="${V4L2_RATE:--r 30}"
+UDP_RATE="${UDP_RATE:--r 30}"
+MIN_FPS="${MIN_FPS:-0}"
+
+# With source pacing, let v4l2loopback repeat the last frame for readers only
+# when the camera drops below MIN_FPS (no extra work in ffmpeg)
+if [ "$MIN_FPS" -gt 0 ] 2>/dev/null; then
+  v4l2-ctl -d "$DEVICE_VIDEO" -c sustain_framerate=1 --set-output-parm="$MIN_FPS" >/dev/null 2>&1
+else
+  v4l2-ctl -d "$DEVICE_VIDEO" -c sustain_framerate=0 >/dev/null 2>&1
+fi
+
+# Optional per-frame plugin stage (utils/frame_stage.py): decode to y4m,
+# process the frames in Python, then feed them to the output ffmpeg.
+# SHARE_FRAMES=1 also publishes the decoded frames to a shared-memory ring
+# (utils/frame_ring.py) so local readers don't decode the camera again.
+# PLUGINS reaches frame_stage.py through the environment, never through a
+# shell string: a watermark file name may contain any character
+export PLUGINS="${PLUGINS:-}"
+SHARE_FRAMES="${SHARE_FRAMES:-0}"
+RING="/dev/shm/big-digicam-ring-${UDP_PORT}"
+rm -f "$RING"
+STAGE=""
+if [ -n "$PLUGINS" ] || [ "$SHARE_FRAMES" = "1" ]; then
+  STAGE_STATS="/tmp/canon_webcam_stage_${UDP_PORT}.json"
+  rm -f "$STAGE_STATS"
+  RING_ARGS=""
+  [ "$SHARE_FRAMES" = "1" ] && RING_ARGS="--ring \"$RING\""
+  STAGE="ffmpeg -hide_banner -loglevel error -i - -pix_fmt yuv420p -f yuv4mpegpipe - 2>>\"$ERR_LOG\" | python3 \"$APP_DIR/utils/frame_stage.py\" $RING_ARGS --stats \"$STAGE_STATS\" 2>>\"$ERR_LOG\" | "
+fi
+
+# Network stream (NET_HTTP_PORT set by the app): the preview's MPEG-TS is
+# teed to a second local port, where utils/stream_server.py serves it over
+# HTTP. One encode feeds the preview and every network client; a failing
+# relay is ignored by the tee so it never stops the pipeline.
+UDP_FORMAT="mpegts"
+UDP_TARGET="udp://127.0.0.1:${UDP_PORT}?pkt_size=1316"
+NET_STATS="/tmp/canon_webcam_net_${UDP_PORT}.json"
+rm -f "$NET_STATS"
+if [ -n "$NET_HTTP_PORT" ]; then
+  RELAY_PORT=$((UDP_PORT + 1000))
+  UDP_FORMAT="tee"
+  UDP_TARGET="[f=mpegts]$UDP_TARGET|[f=mpegts:onfail=ignore]udp://127.0.0.1:${RELAY_PORT}?pkt_size=1316"
+  setsid nohup python3 "$APP_DIR/utils/stream_server.py" --udp "$RELAY_PORT" --http "$NET_HTTP_PORT" \
+    --stats "$NET_STATS" </dev/null >"/tmp/canon_webcam_net_${UDP_PORT}.log" 2>&1 &
+  disown
+fi
+
+# Live view idled by the app (utils/demand.py): while IDLE_FLAG exists, an
+# ended reader is not an end of stream; the loop holds ffmpeg's input open
+# and starts a new reader once the flag is removed. A reader ending any
+# other way (camera unplugged, app stopping it) ends the pipeline as before.
+IDLE_FLAG="/dev/shm/big-digicam-idle-${UDP_PORT}"
+rm -f "$IDLE_FLAG"
+READER="while :; do $SOURCE; [ -e \"$IDLE_FLAG\" ] || break; while [ -e \"$IDLE_FLAG\" ]; do sleep 0.1; done; done"
+
+# Machine readable counters (frames, dup_frames, drop_frames), see utils/pipeline_stats.py
+PROGRESS="/tmp/canon_webcam_progress_${UDP_PORT}.txt"
+> "$PROGRESS"
+
+# The pipeline gets its own session and none of this script's stdio: the app
+# reads the script's output up to EOF, and stops its process group on a
+# timeout, neither of which may reach the running stream.
 # Quality Upgrades:
 # - Bitrate was 800k (pixilated), now 5000k (sharp)
 # - Removed downscaling (Full native T3 resolution)
 # - Syncing to 30 FPS (Match T3 native output for stability)
-nohup bash -c "gphoto2 --stdout --capture-movie $PORT_STR 2>\"$ERR_LOG\" | ffmpeg -y -hide_banner -loglevel error -stats -i - -filter_complex \"[0:v]format=yuv420p,split=2[v1][v2]\" -map \"[v1]\" -r 30 -f v4l2 \"$DEVICE_VIDEO\" -map \"[v2]\" -f mpegts -r 30 -codec:v mpeg1video -b:v 5000k -bf 0 \"udp://127.0.0.1:${UDP_PORT}?pkt_size=1316\" >\"$LOG\" 2>&1" &
+setsid nohup bash -c "{ $READER; } 2>\"$ERR_LOG\" | $STAGE ffmpeg -y -hide_banner -loglevel error -stats -stats_period 1 -progress \"$PROGRESS\" $IN_OPTS -i - -filter_complex \"$OUT_FILTER\" -map \"[v1]\" $OUT_CODEC $V4L2_RATE -f v4l2 \"$DEVICE_VIDEO\"$EXTRA_MAPS -map \"[v2]\" -f $UDP_FORMAT $UDP_RATE -codec:v mpeg1video -b:v 5000k -bf 0 \"$UDP_TARGET\" >\"$LOG\" 2>&1" </dev/null >/dev/null 2>&1 &
 PID=$!
 disown
 
-# Wait for it to stabilize
-sleep 3
+trace_mark first_frames
+# Wait for it to stabilize: done as soon as ffmpeg reports frames, at most
+# STABILIZE_WAIT seconds (progress is written once per second)
+STABILIZE_WAIT="${STABILIZE_WAIT:-3}"
+for _ in $(seq $((STABILIZE_WAIT * 5))); do
+  sleep 0.2
+  kill -0 $PID 2>/dev/null || break
+  grep -q "^frame=[1-9]" "$PROGRESS" 2>/dev/null && break
+done
 
 if kill -0 $PID 2>/dev/null; then
   echo "SUCCESS: $DEVICE_VIDEO"
+  [ "$EXTRA_OUTPUTS" -gt 0 ] && echo "EXTRA: ${DEVICES[*]:1}"
   exit 0
 else
   echo "ERROR: Pipeline failed."
@@ -0,0 +1,215 @@
+"""Auto-framing: keep the presenter centred without a camera operator.
+
+The "autoframe" frame stage plugin (utils/frame_stage.py) calls update()
+on every frame. Now and then it copies a downscaled luma plane (the Y
+plane already is the grey image a detector wants) to a detector thread
+and carries on: if the detector is still busy the frame is simply not
+sampled, so detection never holds up the frame path.
+
+Detection runs at an adaptive rate: every MIN_INTERVAL while the subject
+moves or is lost, slowing down to MAX_INTERVAL while it stays put, and
+never more often than keeps the detector under MAX_DUTY of one core.
+Each detection gives a target crop (faces at the top third, zoomed to
+FACE_ZOOM face heights); on every frame the crop window eases towards it,
+so the picture glides instead of jumping at the detection rate.
+
+OpenCV is optional, as for the OpenCV preview fallback: without it the
+plugin leaves the frames alone.
+"""
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+# Width of the frames the detector sees
+DETECT_WIDTH = 320
+MIN_INTERVAL = 0.1
+MAX_INTERVAL = 1.0
+# Share of one core the detector may use
+MAX_DUTY = 0.25
+# Crop height in face heights, and the tightest crop (share of the frame)
+FACE_ZOOM = 4.0
+MIN_CROP = 0.4
+# Height of the faces in the crop (rule of thirds)
+EYE_LINE = 0.38
+# Seconds for the crop to (nearly, 95%) reach a new target
+SMOOTHING = 0.6
+# Seconds without a face before zooming back out to the full frame
+LOST_AFTER = 2.0
+# Target moves under this share of the frame width are ignored
+DEAD_ZONE = 0.05
+
+CASCADE = "haarcascade_frontalface_default.xml"
+# Where distributions install the cascades when cv2.data is not shipped
+CASCADE_DIRS = ["/usr/share/opencv4/haarcascades", "/usr/share/opencv/haarcascades"]
+
+
+def load_detector():
+    """detect(grey) -> [(x, y, w, h), ...] with OpenCV, or None without it.
+
+    Faces with a Haar cascade; the HOG people detector when no cascade
+    file is installed.
+    """
+    try:
+        import cv2
+    except ImportError:
+        return None
+    dirs = list(CASCADE_DIRS)
+    if hasattr(cv2, "data"):
+        dirs.insert(0, cv2.data.haarcascades)
+    for directory in dirs:
+        path = os.path.join(directory, CASCADE)
+        if os.path.exists(path):
+            cascade = cv2.CascadeClassifier(path)
+            if not cascade.empty():
+                return lambda grey: cascade.detectMultiScale(
+                    grey, scaleFactor=1.15, minNeighbors=4, minSize=(20, 20))
+    hog = cv2.HOGDescriptor()
+    hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+    return lambda grey: hog.detectMultiScale(grey, winStride=(8, 8))[0]
+
+
+class AutoFramer:
+    """Crop window of a width x height stream, fed by detector on a thread."""
+
+    def __init__(self, width, height, detector):
+        self.width = width
+        self.height = height
+        self.detector = detector
+        self.step = max(1, width // DETECT_WIDTH)
+        self.small = np.empty((-(-height // self.step), -(-width // self.step)), dtype=np.uint8)
+        self.full = (0.0, 0.0, float(width), float(height))
+        self.window = self.full
+        self.target = self.full
+        self.interval = MIN_INTERVAL
+        self.faces = 0
+        self.detections = 0
+        self.detect_total = 0.0
+        self.detect_worst = 0.0
+        self.latency_total = 0.0
+        self.settles = []
+        self._moved_at = None
+        self._last_seen = None
+        self._last_update = None
+        self._next_sample = 0.0
+        self._sampled_at = None
+        self._busy = False
+        self._result = None
+        self._running = True
+        self._cond = threading.Condition()
+        threading.Thread(target=self._run, name="autoframe", daemon=True).start()
+
+    def update(self, luma, now):
+        """Per frame: maybe sample luma, take a finished detection, move the crop.
+
+        Returns the crop (x, y, w, h), even-aligned.
+        """
+        with self._cond:
+            result, self._result = self._result, None
+            if not self._busy and now >= self._next_sample:
+                np.copyto(self.small, luma[::self.step, ::self.step])
+                self._busy = True
+                self._sampled_at = now
+                self._cond.notify()
+        if result:
+            self._aim(*result, now)
+        if self.target != self.full and (self._last_seen is None or now - self._last_seen > LOST_AFTER):
+            self._retarget(self.full, now)
+
+        dt = 0.0 if self._last_update is None else min(0.2, now - self._last_update)
+        self._last_update = now
+        # Exponential easing, 95% of the way (3 time constants) in SMOOTHING seconds
+        ease = 1.0 - math.exp(-3.0 * dt / SMOOTHING)
+        self.window = tuple(w + (t - w) * ease for w, t in zip(self.window, self.target))
+        if self._distance(self.window, self.target) * self.width < 1:
+            self.window = self.target  # arrived (and back to no crop at all when full)
+        if self._moved_at is not None and self._distance(self.window, self.target) < DEAD_ZONE / 2:
+            self.settles.append(now - self._moved_at)
+            self._moved_at = None
+        return self.rect()
+
+    def rect(self):
+        x, y, w, h = self.window
+        w, h = max(2, int(w) // 2 * 2), max(2, int(h) // 2 * 2)
+        x = min(int(x) // 2 * 2, self.width - w)
+        y = min(int(y) // 2 * 2, self.height - h)
+        return x, y, w, h
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and not self._busy:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                sampled_at = self._sampled_at
+            t0 = time.perf_counter()
+            boxes = [tuple(int(v) * self.step for v in box) for box in self.detector(self.small)]
+            elapsed = time.perf_counter() - t0
+            with self._cond:
+                self._result = (boxes, sampled_at, elapsed)
+                self._busy = False
+
+    def _aim(self, boxes, sampled_at, elapsed, now):
+        self.detections += 1
+        self.detect_total += elapsed
+        self.detect_worst = max(self.detect_worst, elapsed)
+        # Framing latency: from the sampled frame to the crop starting to follow it
+        self.latency_total += now - sampled_at
+        self.faces = len(boxes)
+        if boxes:
+            self._last_seen = sampled_at
+            target = self._frame(boxes)
+            if self._distance(target, self.target) > DEAD_ZONE:
+                self._retarget(target, now)
+                self.interval = MIN_INTERVAL
+            else:
+                self.interval = min(MAX_INTERVAL, self.interval * 1.5)
+        else:
+            self.interval = MIN_INTERVAL
+        self._next_sample = sampled_at + max(self.interval, elapsed / MAX_DUTY)
+
+    def _retarget(self, target, now):
+        self.target = target
+        self._moved_at = now
+
+    def _distance(self, a, b):
+        return max(abs(p - q) for p, q in zip(a, b)) / self.width
+
+    def _frame(self, boxes):
+        """Crop with the aspect of the frame around every box."""
+        x0 = min(x for x, y, w, h in boxes)
+        y0 = min(y for x, y, w, h in boxes)
+        x1 = max(x + w for x, y, w, h in boxes)
+        y1 = max(y + h for x, y, w, h in boxes)
+        aspect = self.width / self.height
+        face_h = max(h for x, y, w, h in boxes)
+        # Tall enough for FACE_ZOOM faces and wide enough for the whole group
+        h = max(face_h * FACE_ZOOM, (x1 - x0) * 1.5 / aspect, MIN_CROP * self.height)
+        h = min(h, float(self.height))
+        w = h * aspect
+        cx = (x0 + x1) / 2
+        cy = (y0 + y1) / 2 + h * (0.5 - EYE_LINE)
+        x = min(max(cx - w / 2, 0.0), self.width - w)
+        y = min(max(cy - h / 2, 0.0), self.height - h)
+        return x, y, w, h
+
+    def stats(self):
+        n = self.detections
+        return {
+            "detections": n,
+            "detect_avg_ms": 1000 * self.detect_total / n if n else 0.0,
+            "detect_max_ms": 1000 * self.detect_worst,
+            "latency_avg_ms": 1000 * self.latency_total / n if n else 0.0,
+            "settle_avg_ms": 1000 * sum(self.settles) / len(self.settles) if self.settles else 0.0,
+            "interval_ms": 1000 * self.interval,
+            "faces": self.faces,
+            "crop": self.rect(),
+        }
+
+    def close(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
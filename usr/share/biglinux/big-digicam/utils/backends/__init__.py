@@ -0,0 +1,68 @@
+"""Camera backends: every camera the app talks to goes through one of these.
+
+    gphoto2      the gphoto2 command line tool (the default)
+    libgphoto2   libgphoto2 in process, through python-gphoto2 (optional)
+    simulator    recorded MJPEG/JPEG files replayed with set timing and faults
+    uvc          plain USB webcams through V4L2
+
+Each backend lists its cameras as {"name", "port", "backend"} and opens one
+of them as a Backend (utils/backends/base.py): frames(), capture(),
+get_config()/set_config(), flags and stats(). BIG_DIGICAM_BACKENDS picks
+the backends whose cameras the app lists (default "gphoto2").
+"""
+import os
+import time
+
+from utils.backends.base import FLAGS, Backend, BackendError, split_jpegs
+from utils.backends.gphoto2_cli import GphotoCli, parse_auto_detect
+from utils.backends.libgphoto2 import LibGphoto
+from utils.backends.simulator import Simulator
+from utils.backends.uvc import Uvc
+
+BACKENDS = {cls.name: cls for cls in (GphotoCli, LibGphoto, Simulator, Uvc)}
+DEFAULT = GphotoCli.name
+
+
+def enabled():
+    """Names of the backends whose cameras the app lists, installed ones only."""
+    names = [n.strip() for n in os.environ.get("BIG_DIGICAM_BACKENDS", DEFAULT).split(",")]
+    return [n for n in names if n in BACKENDS and BACKENDS[n].available()]
+
+
+def get(name):
+    cls = BACKENDS.get(name or DEFAULT)
+    if cls is None:
+        raise BackendError(f"unknown camera backend '{name}'")
+    if not cls.available():
+        raise BackendError(f"camera backend '{name}' is not installed")
+    return cls
+
+
+def open_camera(camera):
+    """Backend instance (not opened yet) for a camera dict of enumerate()."""
+    return get(camera.get("backend"))(camera.get("name"), camera.get("port"))
+
+
+def enumerate_cameras(names=None):
+    """Cameras of several backends; one failing backend does not hide the others."""
+    cameras = []
+    for name in enabled() if names is None else names:
+        try:
+            cameras += get(name).enumerate()
+        except (BackendError, OSError) as e:
+            print(f"[Backend] {name}: {e}")
+    return cameras
+
+
+def read_config(camera):
+    """Settings tree of a camera, through its backend."""
+    with open_camera(camera) as backend:
+        return backend.get_config()
+
+
+def apply_config(changes, camera):
+    """Apply several settings through the camera's backend; returns the elapsed seconds."""
+    t0 = time.monotonic()
+    with open_camera(camera) as backend:
+        backend.set_config(changes)
+    return time.monotonic() - t0
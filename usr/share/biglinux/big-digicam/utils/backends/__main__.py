@@ -0,0 +1,60 @@
+"""Command line of the camera backends.
+
+    python3 -m utils.backends list
+    python3 -m utils.backends stream --backend simulator --port sim:0 > live.mjpeg
+
+stream writes the live view as MJPEG to stdout, which is how
+run_webcam.sh feeds ffmpeg from a backend other than the gphoto2 tool
+(CAMERA_BACKEND). Its counters go to stderr when it ends.
+"""
+import argparse
+import json
+import signal
+import sys
+
+from utils.backends import BACKENDS, BackendError, enumerate_cameras, get
+
+
+def cmd_list(args):
+    for name, cls in BACKENDS.items():
+        state = "ok" if cls.available() else "not installed"
+        print(f"{name:12} {state:14} {', '.join(sorted(cls.flags))}")
+        if cls.available():
+            for camera in enumerate_cameras([name]):
+                print(f"    {camera['port']:16} {camera['name']}")
+
+
+def cmd_stream(args):
+    backend = get(args.backend)(args.name, args.port)
+    out = sys.stdout.buffer
+    try:
+        with backend:
+            for frame in backend.frames():
+                out.write(frame)
+                out.flush()
+    except BrokenPipeError:
+        pass  # ffmpeg went away
+    except BackendError as e:
+        print(f"[Backend] {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        print(f"[Backend] {json.dumps(backend.stats())}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="backends, their flags and cameras")
+    p = sub.add_parser("stream", help="live view as MJPEG on stdout")
+    p.add_argument("--backend", default="gphoto2", choices=sorted(BACKENDS))
+    p.add_argument("--port")
+    p.add_argument("--name", help="camera model, when there is no port")
+    args = parser.parse_args(argv)
+
+    # SIGTERM from the app ends the stream the same way as a closed pipe
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    {"list": cmd_list, "stream": cmd_stream}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""Camera backend interface.
+
+A backend enumerates its cameras and, for one of them, streams live view
+frames (JPEG), captures stills and reads/writes settings. Subclasses
+implement the underscored methods; the public ones here keep the
+counters, so every backend reports the same figures.
+"""
+import os
+import signal
+import subprocess
+import time
+
+# Capability flags a backend may report
+FLAGS = (
+    "liveview",   # frames() streams the live view
+    "stills",     # capture() takes a full resolution photo
+    "raw",        # capture() can download RAW files
+    "config",     # get_config()/set_config()
+)
+
+# Largest frame the stream splitter buffers before giving up on a stream
+MAX_FRAME = 16 * 1024 * 1024
+CHUNK = 256 * 1024
+
+
+class BackendError(RuntimeError):
+    pass
+
+
+def _jpeg_end(buf, start):
+    """End offset of the JPEG starting at start, or -1 if not all there yet.
+
+    The marker segments are skipped by their lengths, so an EOI inside an
+    embedded thumbnail (EXIF) is not taken for the end of the frame.
+    """
+    pos = start + 2
+    while pos + 4 <= len(buf):
+        if buf[pos] != 0xFF:
+            break  # not a marker: damaged header, fall back to the first EOI
+        marker = buf[pos + 1]
+        if marker == 0xFF:
+            pos += 1  # fill byte
+            continue
+        if marker == 0xDA:  # start of scan: entropy-coded data up to EOI
+            break
+        pos += 2 + int.from_bytes(buf[pos + 2:pos + 4], "big")
+    else:
+        return -1
+    end = buf.find(b"\xff\xd9", pos)
+    return -1 if end < 0 else end + 2
+
+
+def split_jpegs(read, chunk=CHUNK):
+    """JPEG frames of an MJPEG byte stream; read(n) returns b"" at the end.
+
+    A frame is handed out as soon as its EOI arrives, not when the next
+    one starts.
+    """
+    buf = bytearray()
+    while True:
+        data = read(chunk)
+        if not data:
+            return
+        buf += data
+        while True:
+            start = buf.find(b"\xff\xd8")
+            if start < 0:
+                del buf[:max(0, len(buf) - 1)]
+                break
+            end = _jpeg_end(buf, start)
+            if end < 0:
+                if len(buf) - start > MAX_FRAME:
+                    raise BackendError("no JPEG frame boundary in the stream")
+                del buf[:start]
+                break
+            yield bytes(buf[start:end])
+            del buf[:end]
+
+
+def process_frames(argv):
+    """JPEG frames a command writes to stdout; the command is stopped with the generator."""
+    proc = subprocess.Popen(argv, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            start_new_session=True)
+    try:
+        yield from split_jpegs(proc.stdout.read1)
+        err = proc.stderr.read().decode(errors="replace").strip()
+        if proc.wait() != 0:
+            raise BackendError(err or f"{argv[0]} exited with {proc.returncode}")
+    finally:
+        if proc.poll() is None:
+            try:
+                os.killpg(proc.pid, signal.SIGTERM)
+            except OSError:
+                pass
+            proc.wait()
+        proc.stdout.close()
+        proc.stderr.close()
+
+
+class Backend:
+    """One camera of a backend. Use as a context manager, or open()/close()."""
+
+    name = "backend"
+    label = "Backend"
+    flags = frozenset()
+
+    @classmethod
+    def available(cls):
+        """True if the backend's tools or bindings are installed."""
+        return True
+
+    @classmethod
+    def enumerate(cls):
+        """[{"name", "port", "backend"}] of the cameras attached now."""
+        return []
+
+    def __init__(self, name=None, port=None):
+        self.camera_name = name
+        self.port = port
+        self.is_open = False
+        self.opens = 0
+        self.open_total = 0.0
+        self.frames_count = 0
+        self.frame_bytes = 0
+        self.first_frame = None     # seconds from frames() to the first frame
+        self.stream_started = None
+        self.stream_ended = None
+        self.captures = 0
+        self.capture_total = 0.0
+        self.capture_worst = 0.0
+        self.config_calls = 0
+        self.config_total = 0.0
+        self.errors = 0
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def open(self):
+        if self.is_open:
+            return
+        t0 = time.monotonic()
+        self._count(self._open)
+        self.opens += 1
+        self.open_total += time.monotonic() - t0
+        self.is_open = True
+
+    def close(self):
+        if self.is_open:
+            self.is_open = False
+            self._close()
+
+    def frames(self):
+        """Live view frames (JPEG bytes) until the stream ends or fails."""
+        self._require("liveview")
+        self.stream_started = time.monotonic()
+        self.stream_ended = None
+        try:
+            for frame in self._frames():
+                if self.first_frame is None:
+                    self.first_frame = time.monotonic() - self.stream_started
+                self.frames_count += 1
+                self.frame_bytes += len(frame)
+                yield frame
+        except BackendError:
+            self.errors += 1
+            raise
+        finally:
+            self.stream_ended = time.monotonic()
+
+    def capture(self, base):
+        """Take a photo; base is the path without extension. Returns the files, RAW first."""
+        self._require("stills")
+        t0 = time.monotonic()
+        files = self._count(self._capture, base)
+        elapsed = time.monotonic() - t0
+        self.captures += 1
+        self.capture_total += elapsed
+        self.capture_worst = max(self.capture_worst, elapsed)
+        return files
+
+    def get_config(self):
+        """{name: entry} like utils.camera_config.parse_config_tree."""
+        self._require("config")
+        return self._timed_config(self._get_config)
+
+    def set_config(self, changes):
+        self._require("config")
+        if changes:
+            self._timed_config(self._set_config, changes)
+
+    def stats(self):
+        streamed = ((self.stream_ended or time.monotonic()) - self.stream_started
+                    if self.stream_started else 0.0)
+        return {
+            "backend": self.name,
+            "opens": self.opens,
+            "open_avg_ms": 1000 * self.open_total / self.opens if self.opens else 0.0,
+            "frames": self.frames_count,
+            "fps": self.frames_count / streamed if streamed else 0.0,
+            "frame_kb": self.frame_bytes / self.frames_count / 1024 if self.frames_count else 0.0,
+            "first_frame_ms": 1000 * self.first_frame if self.first_frame is not None else None,
+            "captures": self.captures,
+            "capture_avg_ms": 1000 * self.capture_total / self.captures if self.captures else 0.0,
+            "capture_max_ms": 1000 * self.capture_worst,
+            "config_avg_ms": 1000 * self.config_total / self.config_calls if self.config_calls else 0.0,
+            "errors": self.errors,
+        }
+
+    def _timed_config(self, func, *args):
+        t0 = time.monotonic()
+        result = self._count(func, *args)
+        self.config_calls += 1
+        self.config_total += time.monotonic() - t0
+        return result
+
+    def _count(self, func, *args):
+        try:
+            return func(*args)
+        except BackendError:
+            self.errors += 1
+            raise
+
+    def _require(self, flag):
+        if flag not in self.flags:
+            raise BackendError(f"{self.name}: no {flag} support")
+        if not self.is_open:
+            self.open()
+
+    def _open(self):
+        pass
+
+    def _close(self):
+        pass
+
+    def _frames(self):
+        raise NotImplementedError
+
+    def _capture(self, base):
+        raise NotImplementedError
+
+    def _get_config(self):
+        raise NotImplementedError
+
+    def _set_config(self, changes):
+        raise NotImplementedError
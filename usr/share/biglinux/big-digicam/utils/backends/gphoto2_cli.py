@@ -0,0 +1,63 @@
+"""The gphoto2 command line tool: one process per operation, as run_webcam.sh does."""
+import shutil
+import subprocess
+
+from utils import camera_config
+from utils.backends.base import Backend, BackendError, process_frames
+from utils.i18n import _
+from utils.raw_preview import shot_files
+
+
+def parse_auto_detect(text):
+    """Cameras listed by `gphoto2 --auto-detect` (a two-line header, then "Model  usb:...")."""
+    cameras = []
+    for line in text.strip().split("\n")[2:]:
+        line = line.strip()
+        if line and "usb:" in line:
+            name, _sep, port = line.partition("usb:")
+            cameras.append({"name": name.strip() or _("Câmera Genérica"),
+                            "port": "usb:" + port.strip(), "backend": GphotoCli.name})
+    return cameras
+
+
+class GphotoCli(Backend):
+    name = "gphoto2"
+    label = "gphoto2"
+    flags = frozenset({"liveview", "stills", "raw", "config"})
+
+    @classmethod
+    def available(cls):
+        return shutil.which("gphoto2") is not None
+
+    @classmethod
+    def enumerate(cls):
+        res = subprocess.run(["gphoto2", "--auto-detect"], capture_output=True, text=True, timeout=10)
+        return parse_auto_detect(res.stdout)
+
+    def _args(self):
+        return camera_config.camera_args(self.camera_name, self.port)
+
+    def _frames(self):
+        return process_frames(["gphoto2", "--stdout", "--capture-movie", *self._args()])
+
+    def _capture(self, base):
+        res = subprocess.run(
+            ["gphoto2", *self._args(), "--capture-image-and-download",
+             "--filename", f"{base}.%C", "--force-overwrite", "--keep"],
+            capture_output=True, text=True, timeout=60
+        )
+        if res.returncode != 0:
+            raise BackendError((res.stderr or res.stdout).strip())
+        return shot_files(base)
+
+    def _get_config(self):
+        try:
+            return camera_config.read_config(self.camera_name, self.port)
+        except (RuntimeError, subprocess.TimeoutExpired) as e:
+            raise BackendError(str(e)) from e
+
+    def _set_config(self, changes):
+        try:
+            camera_config.apply_config(changes, self.camera_name, self.port)
+        except (RuntimeError, subprocess.TimeoutExpired) as e:
+            raise BackendError(str(e)) from e
@@ -0,0 +1,137 @@
+"""libgphoto2 through its Python binding (python-gphoto2), in process.
+
+The camera stays open between operations: no process start and no USB
+re-enumeration per shot or per live view frame. The binding is optional,
+as OpenCV is: without it the backend reports itself unavailable.
+"""
+import os
+import time
+
+from utils.backends.base import Backend, BackendError
+from utils.raw_preview import is_raw
+
+try:
+    import gphoto2 as gp
+except ImportError:
+    gp = None
+
+# Seconds to wait for the second file of a RAW+JPEG shot
+EXTRA_FILE_WAIT = 1.0
+
+WIDGET_TYPES = {}
+if gp:
+    WIDGET_TYPES = {
+        gp.GP_WIDGET_RADIO: "RADIO", gp.GP_WIDGET_MENU: "MENU", gp.GP_WIDGET_TEXT: "TEXT",
+        gp.GP_WIDGET_RANGE: "RANGE", gp.GP_WIDGET_TOGGLE: "TOGGLE", gp.GP_WIDGET_DATE: "DATE",
+    }
+
+
+def _error(e):
+    return BackendError(str(e))
+
+
+class LibGphoto(Backend):
+    name = "libgphoto2"
+    label = "libgphoto2"
+    flags = frozenset({"liveview", "stills", "raw", "config"})
+
+    @classmethod
+    def available(cls):
+        return gp is not None
+
+    @classmethod
+    def enumerate(cls):
+        try:
+            found = gp.Camera.autodetect()
+        except gp.GPhoto2Error as e:
+            raise _error(e) from e
+        return [{"name": name, "port": port, "backend": cls.name} for name, port in found]
+
+    def __init__(self, name=None, port=None):
+        super().__init__(name, port)
+        self.camera = None
+
+    def _open(self):
+        camera = gp.Camera()
+        try:
+            if self.port:
+                ports = gp.PortInfoList()
+                ports.load()
+                camera.set_port_info(ports[ports.lookup_path(self.port)])
+            camera.init()
+        except gp.GPhoto2Error as e:
+            raise _error(e) from e
+        self.camera = camera
+
+    def _close(self):
+        try:
+            self.camera.exit()
+        except gp.GPhoto2Error as e:
+            print(f"[Backend] libgphoto2 close: {e}")
+        self.camera = None
+
+    def _frames(self):
+        while True:
+            try:
+                preview = self.camera.capture_preview()
+                yield bytes(memoryview(preview.get_data_and_size()))
+            except gp.GPhoto2Error as e:
+                raise _error(e) from e
+
+    def _capture(self, base):
+        try:
+            path = self.camera.capture(gp.GP_CAPTURE_IMAGE)
+            files = [self._download(path.folder, path.name, base)]
+            # RAW+JPEG: the other file is announced as an event right after
+            deadline = time.monotonic() + EXTRA_FILE_WAIT
+            while time.monotonic() < deadline:
+                event, data = self.camera.wait_for_event(int(1000 * (deadline - time.monotonic())))
+                if event == gp.GP_EVENT_FILE_ADDED:
+                    files.append(self._download(data.folder, data.name, base))
+                elif event == gp.GP_EVENT_TIMEOUT:
+                    break
+        except gp.GPhoto2Error as e:
+            raise _error(e) from e
+        return sorted(files, key=lambda f: (not is_raw(f), f))
+
+    def _download(self, folder, name, base):
+        target = base + os.path.splitext(name)[1].lower()
+        self.camera.file_get(folder, name, gp.GP_FILE_TYPE_NORMAL).save(target)
+        return target
+
+    def _get_config(self):
+        tree = {}
+
+        def walk(widget, path):
+            for child in widget.get_children():
+                name = child.get_name()
+                kind = WIDGET_TYPES.get(child.get_type())
+                if kind is None:  # a section
+                    walk(child, f"{path}/{name}")
+                    continue
+                entry = {"path": f"{path}/{name}", "label": child.get_label(), "type": kind,
+                         "readonly": bool(child.get_readonly()), "current": str(child.get_value()),
+                         "choices": []}
+                if kind in ("RADIO", "MENU"):
+                    entry["choices"] = list(child.get_choices())
+                tree[name] = entry
+
+        try:
+            walk(self.camera.get_config(), "/main")
+        except gp.GPhoto2Error as e:
+            raise _error(e) from e
+        return tree
+
+    def _set_config(self, changes):
+        try:
+            for name, value in changes.items():
+                widget = self.camera.get_single_config(name)
+                kind = widget.get_type()
+                if kind == gp.GP_WIDGET_RANGE:
+                    value = float(value)
+                elif kind == gp.GP_WIDGET_TOGGLE:
+                    value = int(value)
+                widget.set_value(value)
+                self.camera.set_single_config(name, widget)
+        except gp.GPhoto2Error as e:
+            raise _error(e) from e
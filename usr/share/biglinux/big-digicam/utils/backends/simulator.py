@@ -0,0 +1,160 @@
+"""A deterministic stand-in camera: replays recorded MJPEG and JPEG files.
+
+Live view loops the frames of a recorded clip (gphoto2 --stdout
+--capture-movie=10s > clip.mjpeg) at a fixed rate; captures copy the
+recorded stills in turn (or the current live view frame). Every delay and
+fault is an option, and jitter comes from a seeded generator, so a run
+can be repeated exactly:
+
+    open_delay, capture_delay, config_delay   seconds each operation takes
+    jitter         random share (0-1) added to the delays and frame times
+    drop_every     every Nth live view frame is lost
+    fail_every     every Nth capture fails
+    disconnect_after   the stream breaks after N frames
+
+Options come from ~/.config/big-digicam/simulator.json; the camera is
+listed once "clip" points to a file.
+"""
+import copy
+import glob
+import itertools
+import os
+import random
+import shutil
+import time
+
+from utils.backends.base import Backend, BackendError, split_jpegs
+from utils.settings import config_dir, load_json, save_json
+
+SETTINGS_FILE = "simulator.json"
+DEFAULTS = {
+    "clip": "",
+    "stills": "",         # directory of JPEGs; empty: live view frames
+    "cameras": 1,
+    "fps": 30,
+    "open_delay": 0.5,
+    "capture_delay": 1.5,
+    "config_delay": 0.2,
+    "jitter": 0.0,
+    "drop_every": 0,
+    "fail_every": 0,
+    "disconnect_after": 0,
+    "seed": 1,
+}
+NAME = "Big DigiCam Simulator"
+
+# Settings of the simulated body, shaped like utils.camera_config.parse_config_tree
+CONFIG = {
+    name: {"path": f"/main/{section}/{name}", "label": label, "type": "RADIO",
+           "readonly": False, "current": choices[0], "choices": choices}
+    for name, section, label, choices in (
+        ("iso", "imgsettings", "ISO Speed", ["100", "200", "400", "800", "1600"]),
+        ("shutterspeed", "capturesettings", "Shutter Speed", ["1/30", "1/60", "1/125", "1/250"]),
+        ("aperture", "capturesettings", "Aperture", ["4", "5.6", "8", "11"]),
+        ("whitebalance", "imgsettings", "WhiteBalance", ["Auto", "Daylight", "Tungsten"]),
+        ("capturetarget", "settings", "Capture Target", ["Internal RAM", "Memory card"]),
+        ("imageformat", "imgsettings", "Image Format", ["Large Fine JPEG", "Small Normal JPEG"]),
+    )
+}
+
+
+def load_settings():
+    settings = dict(DEFAULTS)
+    settings.update(load_json(os.path.join(config_dir(), SETTINGS_FILE), {}))
+    return settings
+
+
+def save_settings(settings):
+    save_json(os.path.join(config_dir(), SETTINGS_FILE), settings)
+
+
+class Simulator(Backend):
+    name = "simulator"
+    label = "Simulador"
+    flags = frozenset({"liveview", "stills", "config"})
+
+    @classmethod
+    def enumerate(cls):
+        settings = load_settings()
+        if not os.path.isfile(settings["clip"]):
+            return []
+        return [{"name": f"{NAME} {i + 1}", "port": f"sim:{i}", "backend": cls.name}
+                for i in range(settings["cameras"])]
+
+    def __init__(self, name=None, port=None, **options):
+        super().__init__(name, port)
+        self.options = load_settings()
+        self.options.update(options)
+        self.dropped = 0
+        self.frame = None
+        self._clip = None
+        self._stills = []
+        self._shots = 0
+        self._rng = None
+        self._config = None
+
+    def _delay(self, seconds):
+        return seconds * (1 + self.options["jitter"] * self._rng.random())
+
+    def _open(self):
+        # Same seed on every open: the same run each time
+        self._rng = random.Random(self.options["seed"])
+        try:
+            with open(self.options["clip"], "rb") as f:
+                self._clip = list(split_jpegs(f.read))
+        except OSError as e:
+            raise BackendError(f"simulator clip: {e}") from e
+        if not self._clip:
+            raise BackendError(f"no JPEG frames in {self.options['clip']}")
+        self.frame = self._clip[0]
+        if self.options["stills"]:
+            self._stills = sorted(glob.glob(os.path.join(self.options["stills"], "*.[jJ][pP][gG]")))
+        self._config = copy.deepcopy(CONFIG)
+        time.sleep(self._delay(self.options["open_delay"]))
+
+    def _frames(self):
+        period = 1.0 / self.options["fps"]
+        start = time.monotonic()
+        for index in itertools.count():
+            if self.options["disconnect_after"] and index >= self.options["disconnect_after"]:
+                raise BackendError(f"simulated disconnect after {index} frames")
+            # Absolute schedule: jitter delays a frame but does not accumulate
+            late = period * self.options["jitter"] * self._rng.random()
+            wait = start + index * period + late - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self.frame = self._clip[index % len(self._clip)]
+            if self.options["drop_every"] and (index + 1) % self.options["drop_every"] == 0:
+                self.dropped += 1
+                continue
+            yield self.frame
+
+    def _capture(self, base):
+        self._shots += 1
+        time.sleep(self._delay(self.options["capture_delay"]))
+        if self.options["fail_every"] and self._shots % self.options["fail_every"] == 0:
+            raise BackendError(f"simulated capture failure (shot {self._shots})")
+        target = f"{base}.jpg"
+        if self._stills:
+            shutil.copyfile(self._stills[(self._shots - 1) % len(self._stills)], target)
+        else:
+            with open(target, "wb") as f:
+                f.write(self.frame)
+        return [target]
+
+    def _get_config(self):
+        time.sleep(self._delay(self.options["config_delay"]))
+        return copy.deepcopy(self._config)
+
+    def _set_config(self, changes):
+        time.sleep(self._delay(self.options["config_delay"]))
+        for name, value in changes.items():
+            entry = self._config.get(name)
+            if entry is None or value not in entry["choices"]:
+                raise BackendError(f"simulated camera refused {name}={value}")
+            entry["current"] = value
+
+    def stats(self):
+        stats = super().stats()
+        stats["dropped"] = self.dropped
+        return stats
@@ -0,0 +1,123 @@
+"""Plain USB webcams (UVC) through V4L2.
+
+Live view is the camera's own MJPEG stream, copied by ffmpeg without
+decoding; a "capture" is one frame of it at full size. Settings are the
+V4L2 controls (v4l2-ctl). The v4l2loopback devices the app writes to are
+not listed: only devices with a USB parent are.
+"""
+import glob
+import os
+import re
+import shutil
+import subprocess
+
+from utils.backends.base import Backend, BackendError, process_frames
+
+# Frames skipped before a capture, while auto exposure settles
+SETTLE_FRAMES = 5
+
+CONTROL = re.compile(r"^\s*(\w+) 0x[0-9a-f]+ \((\w+)\)\s*:\s*(.*)$")
+MENU_ITEM = re.compile(r"^\s+(\d+): (.+)$")
+CONTROL_TYPES = {"int": "RANGE", "int64": "RANGE", "bool": "TOGGLE", "menu": "MENU", "intmenu": "MENU"}
+
+
+def parse_controls(text):
+    """`v4l2-ctl --list-ctrls-menus` -> {name: entry} like parse_config_tree."""
+    tree = {}
+    entry = None
+    for line in text.splitlines():
+        match = CONTROL.match(line)
+        if match:
+            name, kind, rest = match.groups()
+            fields = dict(f.split("=", 1) for f in rest.split() if "=" in f)
+            entry = {"path": f"/v4l2/{name}", "label": name.replace("_", " ").capitalize(),
+                     "type": CONTROL_TYPES.get(kind, kind.upper()),
+                     "readonly": "read-only" in fields.get("flags", ""),
+                     "current": fields.get("value", ""), "choices": [], "indexes": []}
+            tree[name] = entry
+            continue
+        match = MENU_ITEM.match(line)
+        if match and entry and entry["type"] == "MENU":
+            index, label = match.groups()
+            entry["indexes"].append(index)
+            entry["choices"].append(label.strip())
+            if index == entry["current"]:
+                entry["current"] = label.strip()
+        elif line.strip() and not line.startswith(" ") and not line.startswith("\t"):
+            entry = None  # a class heading ("User Controls")
+    return tree
+
+
+class Uvc(Backend):
+    name = "uvc"
+    label = "UVC/V4L2"
+    flags = frozenset({"liveview", "stills", "config"})
+
+    @classmethod
+    def available(cls):
+        return shutil.which("ffmpeg") is not None
+
+    @classmethod
+    def enumerate(cls):
+        cameras = []
+        for path in sorted(glob.glob("/sys/class/video4linux/video*"),
+                           key=lambda p: int(re.sub(r"\D", "", os.path.basename(p)) or 0)):
+            try:
+                if "/usb" not in os.path.realpath(os.path.join(path, "device")):
+                    continue
+                # Index 0 is the video node; the others are metadata nodes
+                with open(os.path.join(path, "index")) as f:
+                    if f.read().strip() != "0":
+                        continue
+                with open(os.path.join(path, "name")) as f:
+                    name = f.read().strip()
+            except OSError:
+                continue
+            cameras.append({"name": name, "port": f"/dev/{os.path.basename(path)}", "backend": cls.name})
+        return cameras
+
+    def __init__(self, name=None, port=None):
+        super().__init__(name, port)
+        self._tree = None
+
+    def _input(self):
+        if not self.port:
+            raise BackendError("uvc: no device given")
+        return ["-f", "v4l2", "-input_format", "mjpeg", "-i", self.port]
+
+    def _frames(self):
+        return process_frames(["ffmpeg", "-hide_banner", "-loglevel", "error", *self._input(),
+                               "-c:v", "copy", "-f", "mjpeg", "-"])
+
+    def _capture(self, base):
+        target = f"{base}.jpg"
+        res = subprocess.run(
+            ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error", *self._input(),
+             "-vf", f"select=gte(n\\,{SETTLE_FRAMES})", "-frames:v", "1", "-q:v", "2", target],
+            capture_output=True, text=True, timeout=30
+        )
+        if res.returncode != 0:
+            raise BackendError(res.stderr.strip())
+        return [target]
+
+    def _ctl(self, *args):
+        if shutil.which("v4l2-ctl") is None:
+            raise BackendError("v4l2-ctl not installed")
+        res = subprocess.run(["v4l2-ctl", "-d", self.port, *args], capture_output=True, text=True, timeout=10)
+        if res.returncode != 0:
+            raise BackendError(res.stderr.strip())
+        return res.stdout
+
+    def _get_config(self):
+        self._tree = parse_controls(self._ctl("--list-ctrls-menus"))
+        return self._tree
+
+    def _set_config(self, changes):
+        tree = self._tree or self._get_config()
+        values = []
+        for name, value in changes.items():
+            entry = tree.get(name)
+            if entry and entry["type"] == "MENU" and value in entry["choices"]:
+                value = entry["indexes"][entry["choices"].index(value)]
+            values.append(f"{name}={value}")
+        self._ctl("--set-ctrl", ",".join(values))
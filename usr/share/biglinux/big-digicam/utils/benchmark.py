@@ -0,0 +1,1202 @@
+"""Camera-free benchmarks of the Big DigiCam pipeline.
+
+Run from the application directory:
+
+    python3 -m utils.benchmark profiles [--input clip.mjpeg] [--seconds 10]
+    python3 -m utils.benchmark pacing [--input clip.mjpeg] [--source-fps 20]
+    python3 -m utils.benchmark outputs [--main 1920x1080@30] [--extra 640x360@15 ...]
+    python3 -m utils.benchmark plugins --plugins mirror,lut:warm [--input clip.mjpeg]
+    python3 -m utils.benchmark autoframe --input talk.mjpeg [--seconds 20]
+    python3 -m utils.benchmark ring [--readers 8] [--seconds 10]
+    python3 -m utils.benchmark compose [--cameras 30,24,15] [--seconds 5]
+    python3 -m utils.benchmark stream [--clients 16] [--seconds 3]
+    python3 -m utils.benchmark aids [--input clip.mjpeg] [--seconds 10]
+    python3 -m utils.benchmark raw photo.cr2 [photo.nef ...]
+    python3 -m utils.benchmark timelapse [--interval 1] [--frames 20]
+    python3 -m utils.benchmark trace [--spans 100000]
+    python3 -m utils.benchmark tasks [--detect 3] [--capture 0.5]
+    python3 -m utils.benchmark watchdog [--seconds 5] [--block 0.3]
+    python3 -m utils.benchmark spawns --pid <big-digicam pid> [--seconds 60]
+    python3 -m utils.benchmark loopback [--cycles 200] [--kernel]
+    python3 -m utils.benchmark backends [--backends gphoto2,simulator] [--seconds 5] [--captures 3]
+
+Without --input a synthetic MJPEG stream shaped like DSLR live view is
+generated. A real clip can be recorded with:
+
+    gphoto2 --stdout --capture-movie=10s > clip.mjpeg
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from utils import output_profiles, pipeline_stats
+
+SAMPLE_SIZE = "1056x704"  # Canon Rebel T3 live view
+SAMPLE_FPS = 30
+
+
+def make_sample(seconds, size=SAMPLE_SIZE, fps=SAMPLE_FPS):
+    """Synthetic MJPEG clip, cached in /tmp between runs."""
+    path = os.path.join(tempfile.gettempdir(), f"big-digicam-sample-{size}-{fps}-{seconds}s.mjpeg")
+    if not os.path.exists(path):
+        subprocess.run(
+            ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+             "-f", "lavfi", "-i", f"testsrc2=size={size}:rate={fps}:duration={seconds}",
+             "-c:v", "mjpeg", "-q:v", "3", "-f", "mjpeg", path],
+            check=True
+        )
+    return path
+
+
+def run_measured(cmd):
+    """Run a command to completion, return (cpu seconds, wall seconds)."""
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    t0 = time.monotonic()
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    wall = time.monotonic() - t0
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    return cpu, wall
+
+
+def pipeline_cmd(source, seconds, profile, source_fps=SAMPLE_FPS, progress=None):
+    """The ffmpeg command of run_webcam.sh with both outputs discarded.
+
+    A clip has no arrival times, so its own timestamps (-framerate) stand in
+    for the wall clock timestamps used with source pacing.
+    """
+    _in_opts, v4l2_rate, udp_rate = output_profiles.ffmpeg_pacing_args(profile)
+    v4l2_codec = output_profiles.ffmpeg_codec_args(profile) or ["-c:v", "rawvideo"]
+    return [
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        *(["-progress", progress] if progress else []),
+        "-t", str(seconds), "-f", "mjpeg", "-framerate", str(source_fps), "-i", source,
+        "-filter_complex", output_profiles.ffmpeg_filter(profile),
+        "-map", "[v1]", *v4l2_codec, *v4l2_rate, "-f", "null", os.devnull,
+        "-map", "[v2]", *udp_rate, "-codec:v", "mpeg1video", "-b:v", "5000k", "-bf", "0",
+        "-f", "null", os.devnull,
+    ]
+
+
+def print_row(label, cpu, wall, seconds):
+    # CPU needed to keep up in real time, in percent of one core
+    print(f"  {label:<28} {100 * cpu / seconds:7.1f}% CPU  {seconds / wall:6.1f}x realtime")
+
+
+def bench_profiles(args):
+    source = args.input or make_sample(args.seconds)
+    print(f"Output profiles ({source}, {args.seconds}s, preview encode included)")
+    for fmt in output_profiles.PIXEL_FORMATS:
+        for width, height in output_profiles.RESOLUTIONS:
+            profile = dict(output_profiles.DEFAULT_PROFILE,
+                           format=fmt, width=width, height=height, fps=args.fps)
+            cpu, wall = run_measured(pipeline_cmd(source, args.seconds, profile))
+            print_row(output_profiles.describe(profile), cpu, wall, args.seconds)
+
+
+def bench_pacing(args):
+    """Fixed 30 fps output versus following the camera's own frame rate."""
+    source = args.input or make_sample(args.seconds, fps=args.source_fps)
+    print(f"Pacing ({source}, camera at {args.source_fps} fps, {args.seconds}s)")
+    progress = os.path.join(tempfile.gettempdir(), "big-digicam-bench-progress.txt")
+    for pacing in output_profiles.PACING_MODES:
+        profile = dict(output_profiles.DEFAULT_PROFILE, pacing=pacing)
+        cpu, wall = run_measured(pipeline_cmd(source, args.seconds, profile, args.source_fps, progress))
+        with open(progress) as f:
+            stats = pipeline_stats.stats_from_progress(pipeline_stats.parse_progress(f.read()),
+                                                       output_profiles.rate_converted_outputs(profile))
+        print_row(output_profiles.describe(profile), cpu, wall, args.seconds)
+        print(f"  {'':<28} {stats['real']} real, {stats['dup']} duplicated, {stats['drop']} dropped")
+    os.unlink(progress)
+
+
+def _jpeg_frames(path):
+    """The JPEG frames of an MJPEG clip."""
+    with open(path, "rb") as f:
+        data = f.read()
+    starts = []
+    pos = data.find(b"\xff\xd8")
+    while pos >= 0:
+        starts.append(pos)
+        pos = data.find(b"\xff\xd8", pos + 2)
+    return [data[a:b] for a, b in zip(starts, starts[1:] + [len(data)])]
+
+
+def _read_frames(fd, frame_size, arrivals):
+    """Timestamp every complete frame read from a raw video pipe."""
+    with os.fdopen(fd, "rb", buffering=0) as pipe:
+        pending = 0
+        while True:
+            chunk = pipe.read(min(1 << 20, frame_size - pending))
+            if not chunk:
+                return
+            pending += len(chunk)
+            if pending == frame_size:
+                arrivals.append(time.monotonic())
+                pending = 0
+
+
+def _run_outputs(frames, seconds, source_fps, profile, outputs):
+    """Feed frames in real time to the run_webcam.sh filter graph.
+
+    outputs is [(label, (width, height), fps)] of [v1], [x0], [x1]...; each
+    goes to a pipe as raw I420. Returns (ffmpeg CPU seconds, [arrival times])
+    plus the send time of every input frame.
+    """
+    import threading
+
+    pipes = [os.pipe() for _ in outputs]
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error",
+           "-f", "mjpeg", "-framerate", str(source_fps), "-i", "pipe:0",
+           "-filter_complex", output_profiles.ffmpeg_filter(profile),
+           "-map", "[v1]", "-r", str(outputs[0][2]), "-f", "rawvideo", f"pipe:{pipes[0][1]}"]
+    for i, (_read, write) in enumerate(pipes[1:]):
+        cmd += ["-map", f"[x{i}]", "-fps_mode", "passthrough", "-f", "rawvideo", f"pipe:{write}"]
+    cmd += ["-map", "[v2]", "-r", "30", "-codec:v", "mpeg1video", "-b:v", "5000k", "-bf", "0",
+            "-f", "null", os.devnull]
+
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, pass_fds=[w for _r, w in pipes])
+    arrivals = [[] for _ in outputs]
+    readers = []
+    for (read, write), (_label, (width, height), _fps), times in zip(pipes, outputs, arrivals):
+        os.close(write)
+        thread = threading.Thread(target=_read_frames, args=(read, width * height * 3 // 2, times))
+        thread.start()
+        readers.append(thread)
+
+    # Frames arrive at the camera's pace, as from gphoto2
+    sent = []
+    start = time.monotonic()
+    for i in range(int(seconds * source_fps)):
+        delay = start + i / source_fps - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        sent.append(time.monotonic())
+        proc.stdin.write(frames[i % len(frames)])
+        proc.stdin.flush()
+    proc.stdin.close()
+    proc.wait()
+    for thread in readers:
+        thread.join()
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    return cpu, arrivals, sent
+
+
+def bench_outputs(args):
+    """Several virtual webcams fed by one decode: CPU and latency of each output.
+
+    Outputs are added one at a time, so the CPU an output costs is the
+    difference it makes. Latency is from writing a camera frame into the
+    pipe until the output's frame made from it comes out: frame k of an
+    output at r fps is made from camera frame k * source_fps / r (so a lower
+    rate output includes the wait of its fps filter). The last lines show
+    what each extra output would cost as a second ffmpeg decoding the camera
+    again, the only way to get it before (and impossible with one camera).
+    """
+    source = args.input or make_sample(args.seconds)
+    frames = _jpeg_frames(source)
+    native = tuple(map(int, SAMPLE_SIZE.split("x")))
+    main = output_profiles.parse_output(args.main)
+    extras = [output_profiles.parse_output(text) for text in args.extra or ["640x360@15"]]
+    extras = extras[:output_profiles.MAX_EXTRA_OUTPUTS]
+    outputs = [(f"main {output_profiles.describe_output(out)}" if i == 0
+                else f"+ {output_profiles.describe_output(out)}",
+                (out["width"], out["height"]) if out["width"] else native, out["fps"])
+               for i, out in enumerate([main] + extras)]
+    print(f"Outputs from one decode ({source}, camera at {args.source_fps} fps, {args.seconds}s, "
+          f"preview encode included)")
+
+    cpus = []
+    for n in range(len(extras) + 1):
+        profile = dict(output_profiles.DEFAULT_PROFILE, width=main["width"], height=main["height"],
+                       fps=main["fps"], extra_outputs=extras[:n])
+        cpu, arrivals, sent = _run_outputs(frames, args.seconds, args.source_fps, profile, outputs[:n + 1])
+        cpus.append(cpu)
+
+    # Latency and frame counts of the run with every output
+    for i, ((label, _size, fps), times) in enumerate(zip(outputs, arrivals)):
+        latency = []
+        for k, arrived in enumerate(times):
+            source_index = round(k * args.source_fps / fps)
+            if source_index < len(sent):
+                latency.append(arrived - sent[source_index])
+        latency.sort()
+        cost = cpus[i] - (cpus[i - 1] if i else 0.0)
+        avg = sum(latency) / len(latency) if latency else 0.0
+        p95 = latency[int(0.95 * (len(latency) - 1))] if latency else 0.0
+        print(f"  {label:<22} {'+' if i else ' '}{100 * cost / args.seconds:6.1f}% CPU  "
+              f"{len(times) / args.seconds:5.1f} fps  latency avg {1000 * avg:6.1f} ms  "
+              f"p95 {1000 * p95:6.1f} ms")
+    print(f"  {'total, one decode':<22} {100 * cpus[-1] / args.seconds:7.1f}% CPU")
+
+    for label, (width, height), fps in outputs[1:]:
+        cpu, _wall = run_measured([
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-t", str(args.seconds),
+            "-f", "mjpeg", "-framerate", str(args.source_fps), "-i", source,
+            "-vf", f"fps={fps},scale=w={width}:h={height}:flags=bilinear,format=yuv420p",
+            "-f", "null", os.devnull,
+        ])
+        print(f"  {label[2:] + ' own decode':<22} {100 * cpu / args.seconds:7.1f}% CPU")
+
+
+def bench_plugins(args):
+    """Frame stage throughput and per-plugin timings, decoding in ffmpeg."""
+    from utils import frame_stage
+
+    source = args.input or make_sample(args.seconds)
+    print(f"Frame stage ({source}, plugins: {args.plugins})")
+    decoder = subprocess.Popen(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-t", str(args.seconds),
+         "-f", "mjpeg", "-framerate", str(SAMPLE_FPS), "-i", source,
+         "-pix_fmt", "yuv420p", "-f", "yuv4mpegpipe", "-"],
+        stdout=subprocess.PIPE
+    )
+    reader = frame_stage.Y4MReader(decoder.stdout)
+    chain = frame_stage.PluginChain(frame_stage.parse_plugins(args.plugins), reader.fps, args.budget_ms)
+    cpu0 = time.process_time()
+    t0 = time.monotonic()
+    frame_stage.run(reader, None, chain)
+    wall = time.monotonic() - t0
+    cpu = time.process_time() - cpu0
+    decoder.wait()
+
+    print(f"  {chain.frames} frames of {reader.width}x{reader.height}: "
+          f"{chain.frames / wall:.1f} fps, stage CPU {100 * cpu / wall:.1f}%")
+    for name, p in chain.stats().items():
+        print(f"  {name:<12} avg {p['avg_ms']:6.2f} ms  max {p['max_ms']:6.2f} ms  "
+              f"budget {p['budget_ms']:5.2f} ms  overruns {p['overruns']}  "
+              f"skipped {p['skipped']}  degraded {p['degraded']}")
+
+
+def bench_autoframe(args):
+    """Auto-framing on a recorded clip, paced in real time like the camera.
+
+    The frame path cost is the plugin's own time per frame; the detector
+    thread's CPU shows in the process CPU. Framing latency is from a sampled
+    frame to the crop starting to follow it, settle time until the crop
+    has reached its new target.
+    """
+    from utils import autoframe, frame_stage
+
+    if autoframe.load_detector() is None:
+        print("Auto-framing needs OpenCV (python-opencv)")
+        return
+    source = args.input or make_sample(args.seconds)
+    if not args.input:
+        print("  (synthetic clip: no faces, only the idle cost is measured)")
+    decoder = subprocess.Popen(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-t", str(args.seconds),
+         "-f", "mjpeg", "-framerate", str(args.fps), "-i", source,
+         "-pix_fmt", "yuv420p", "-f", "yuv4mpegpipe", "-"],
+        stdout=subprocess.PIPE
+    )
+    reader = frame_stage.Y4MReader(decoder.stdout)
+    chain = frame_stage.PluginChain(frame_stage.parse_plugins("autoframe"), reader.fps)
+    frame = frame_stage.Frame(reader.width, reader.height)
+    chain.setup(frame)
+    print(f"Auto-framing ({source}, {reader.width}x{reader.height} at {reader.fps:g} fps)")
+
+    late = 0
+    cpu0 = time.process_time()
+    start = time.monotonic()
+    while reader.read_into(frame):
+        delay = start + (frame.index - 1) / reader.fps - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            late += 1
+        chain.run(frame)
+    wall = time.monotonic() - start
+    cpu = time.process_time() - cpu0
+    decoder.wait()
+    chain.plugins[0].framer.close()
+
+    p = chain.stats()["autoframe"]
+    print(f"  {chain.frames} frames in {wall:.1f}s, {late} late | process CPU {100 * cpu / wall:.1f}%")
+    print(f"  frame path   avg {p['avg_ms']:6.2f} ms  max {p['max_ms']:6.2f} ms  "
+          f"budget {p['budget_ms']:5.2f} ms  overruns {p['overruns']}")
+    print(f"  detector     {p['detections']} runs ({p['detections'] / wall:.1f}/s)  "
+          f"avg {p['detect_avg_ms']:6.2f} ms  max {p['detect_max_ms']:6.2f} ms  "
+          f"final interval {p['interval_ms']:.0f} ms")
+    print(f"  framing      latency {p['latency_avg_ms']:6.1f} ms  settle {p['settle_avg_ms']:6.1f} ms  "
+          f"faces in last detection {p['faces']}")
+
+
+def _ring_reader(path, results):
+    """One consumer process: read every frame it can until the ring closes."""
+    from utils import frame_ring
+
+    reader = frame_ring.FrameRingReader(path)
+    buf = reader.new_buffer()
+    latency = 0.0
+    cpu0 = time.process_time()
+    while reader.alive:
+        info = reader.read_next(buf, timeout=0.1)
+        if info:
+            latency += time.monotonic() - info[1]
+    cpu = time.process_time() - cpu0
+    results.put((reader.frames, reader.skipped, reader.retries, cpu,
+                 latency / reader.frames if reader.frames else 0.0))
+    reader.close()
+
+
+def bench_ring(args):
+    """Shared frame ring with 1..N reader processes on synthetic I420 frames."""
+    import multiprocessing
+    from utils import frame_ring
+
+    width, height = map(int, SAMPLE_SIZE.split("x"))
+    path = frame_ring.ring_path("bench")
+    frame = os.urandom(frame_ring.i420_size(width, height))
+    total = args.seconds * args.fps
+    print(f"Frame ring ({width}x{height} I420 at {args.fps} fps, {args.seconds}s, "
+          f"{frame_ring.SLOTS} slots)")
+
+    counts = [n for n in (1, 2, 4, 8, 16) if n < args.readers] + [args.readers]
+    for count in counts:
+        writer = frame_ring.FrameRingWriter(path, width, height, args.fps)
+        results = multiprocessing.Queue()
+        readers = [multiprocessing.Process(target=_ring_reader, args=(path, results))
+                   for _ in range(count)]
+        for proc in readers:
+            proc.start()
+        time.sleep(0.5)  # let every reader map the ring
+
+        # Absolute deadlines, so a slow publish doesn't shift later frames
+        publish = []
+        start = time.monotonic()
+        for i in range(total):
+            delay = start + i / args.fps - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            t0 = time.perf_counter()
+            writer.publish(frame)
+            publish.append(time.perf_counter() - t0)
+        writer.close()
+
+        stats = [results.get() for _ in readers]
+        for proc in readers:
+            proc.join()
+        got = sum(s[0] for s in stats) / count
+        skipped = sum(s[1] for s in stats) / count
+        retries = sum(s[2] for s in stats)
+        cpu = sum(s[3] for s in stats) / count
+        latency = sum(s[4] for s in stats) / count
+        print(f"  {count:2d} readers  publish avg {1000 * sum(publish) / total:5.2f} ms "
+              f"max {1000 * max(publish):5.2f} ms | per reader {100 * got / total:5.1f}% frames, "
+              f"{skipped:.0f} skipped, latency {1000 * latency:5.2f} ms, "
+              f"CPU {100 * cpu / args.seconds:5.1f}% | {retries} retries")
+
+
+def _ring_publisher(path, size, fps, seconds, stall_after, stop):
+    """Publishes I420 frames of size at fps; goes silent after stall_after s."""
+    from utils import frame_ring
+
+    width, height = size
+    writer = frame_ring.FrameRingWriter(path, width, height, fps)
+    frame = os.urandom(frame_ring.i420_size(width, height))
+    start = time.monotonic()
+    i = 0
+    while not stop.is_set() and time.monotonic() - start < seconds:
+        delay = start + i / fps - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        if stall_after is None or time.monotonic() - start < stall_after:
+            writer.publish(frame)
+        i += 1
+    stop.wait()
+    writer.close()
+
+
+def bench_compose(args):
+    """Multi-camera compositor on synthetic rings at different rates.
+
+    One publisher thread per camera; the last one stops publishing halfway
+    (a stalled camera), which must not slow the output of the others.
+    """
+    import threading
+    from utils import compositor, frame_ring
+
+    rates = [float(r) for r in args.cameras.split(",")]
+    size = tuple(map(int, SAMPLE_SIZE.split("x")))
+    width, height = map(int, args.size.split("x"))
+    print(f"Compositor ({len(rates)} cameras {SAMPLE_SIZE} at {args.cameras} fps, last one stalls "
+          f"after {args.seconds / 2:g}s; output {args.size}@{args.fps}, {args.seconds}s per layout)")
+    for layout in compositor.LAYOUTS:
+        stop = threading.Event()
+        paths = [frame_ring.ring_path(f"bench-compose-{i}") for i in range(len(rates))]
+        threads = [threading.Thread(target=_ring_publisher, daemon=True,
+                                    args=(path, size, rate, args.seconds + 1,
+                                          args.seconds / 2 if i == len(rates) - 1 else None, stop))
+                   for i, (path, rate) in enumerate(zip(paths, rates))]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.3)  # let every ring be created
+        comp = compositor.Compositor(paths, width, height, args.fps, layout)
+        cpu0 = time.process_time()
+        t0 = time.monotonic()
+        compositor.run(comp, None, None, args.seconds)
+        elapsed = time.monotonic() - t0
+        cpu = time.process_time() - cpu0
+        stop.set()
+        for thread in threads:
+            thread.join()
+        inputs = comp.last_stats["inputs"] if comp.last_stats else []
+        seen = " ".join(f"{item['fps']:4.1f}" for item in inputs) or "-"
+        print(f"  {layout:<5} output {comp.frames / elapsed:5.1f} fps | composite avg "
+              f"{1000 * comp.total / comp.frames:5.2f} ms max {1000 * comp.worst:5.2f} ms | "
+              f"process CPU {100 * cpu / elapsed:5.1f}% | inputs fps (last second) {seen}")
+
+
+def _ts_datagrams(count, pat_every=20):
+    """MPEG-TS shaped datagrams (7 packets): a PAT now and then, and the
+    send time stamped in the first video packet of each."""
+    import struct
+
+    def packet(pid, start):
+        return bytes([0x47, (0x40 if start else 0) | pid >> 8, pid & 0xFF, 0x10]) + bytes(184)
+
+    pat = packet(0, True)
+    video = packet(0x100, False)
+    stamp = bytearray(packet(0x100, True))
+    for i in range(count):
+        struct.pack_into("<q", stamp, 4, time.perf_counter_ns())
+        first = pat if i % pat_every == 0 else video
+        yield first + bytes(stamp) + video * 5
+
+
+def _stream_client(port, results, stop, stall=False):
+    """HTTP client of the relay; records the latency of each stamped packet."""
+    import socket
+    import struct
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    if stall:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 64 * 1024)
+    sock.connect(("127.0.0.1", port))
+    sock.sendall(b"GET /stream.ts HTTP/1.0\r\n\r\n")
+    data = b""
+    while b"\r\n\r\n" not in data:
+        data += sock.recv(4096)
+    data = data.split(b"\r\n\r\n", 1)[1]
+    received, latency, connected = len(data), [], time.monotonic()
+    if stall:
+        # Never reads again: the relay has to drop it. Afterwards, what is
+        # buffered ends in EOF if it was dropped, in a timeout if not.
+        stop.wait()
+        sock.settimeout(1.0)
+        try:
+            while sock.recv(1 << 20):
+                pass
+            dropped = True
+        except OSError:
+            dropped = False
+        results.append(("stalled", time.monotonic() - connected, dropped))
+        sock.close()
+        return
+    sock.settimeout(0.5)
+    pending = data
+    while not stop.is_set():
+        try:
+            chunk = sock.recv(1 << 16)
+        except socket.timeout:
+            continue
+        if not chunk:
+            break
+        now = time.perf_counter_ns()
+        received += len(chunk)
+        pending += chunk
+        usable = len(pending) - len(pending) % 188
+        for i in range(0, usable, 188):
+            if pending[i + 1] == 0x41 and pending[i + 2] == 0x00:
+                latency.append(now - struct.unpack_from("<q", pending, i + 4)[0])
+        pending = pending[usable:]
+    sock.close()
+    results.append(("reader", received, latency))
+
+
+def bench_stream(args):
+    """Network stream relay on loopback: 1..N HTTP clients sharing one stream.
+
+    A sender stands in for ffmpeg's tee, sending MPEG-TS shaped datagrams at
+    the preview bitrate to the relay (utils/stream_server.py, run as its own
+    process like in run_webcam.sh). Per client count it reports the relay's
+    CPU, each client's throughput and the latency of stamped packets. A
+    last run adds a client that stops reading: it is dropped once its queue
+    is full while the others keep their rate.
+    """
+    import threading
+
+    from utils.stream_server import QUEUE_BYTES
+
+    udp_port, http_port = 47000, 47001
+    server = os.path.join(os.path.dirname(os.path.realpath(__file__)), "stream_server.py")
+    rate = args.kbps * 1000 / 8 / 1316      # datagrams per second
+    print(f"Network stream relay ({args.kbps} kbit/s MPEG-TS, {args.seconds}s per run, "
+          f"queue {QUEUE_BYTES // 1024} KiB per client)")
+
+    def run(clients, stalled=False, seconds=args.seconds):
+        before = resource.getrusage(resource.RUSAGE_CHILDREN)
+        relay = subprocess.Popen([sys.executable, server, "--udp", str(udp_port), "--http", str(http_port)],
+                                 stdout=subprocess.DEVNULL)
+        time.sleep(0.5)
+        results, stop = [], threading.Event()
+        threads = [threading.Thread(target=_stream_client, args=(http_port, results, stop))
+                   for _ in range(clients)]
+        if stalled:
+            threads.append(threading.Thread(target=_stream_client, args=(http_port, results, stop, True)))
+        for thread in threads:
+            thread.start()
+        time.sleep(0.2)
+
+        import socket
+        sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        start = time.monotonic()
+        for i, datagram in enumerate(_ts_datagrams(int(seconds * rate))):
+            delay = start + i / rate - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            sender.sendto(datagram, ("127.0.0.1", udp_port))
+        sender.close()
+        time.sleep(0.2)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        relay.terminate()
+        relay.wait()
+        after = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+        return cpu, results
+
+    counts = [n for n in (1, 2, 4, 8, 16) if n < args.clients] + [args.clients]
+    for count in counts:
+        cpu, results = run(count)
+        readers = [r for r in results if r[0] == "reader"]
+        latency = sorted(ns for r in readers for ns in r[2])
+        mbits = [8 * r[1] / args.seconds / 1e6 for r in readers]
+        p99 = latency[int(0.99 * (len(latency) - 1))] / 1e6 if latency else 0.0
+        print(f"  {count:2d} clients  relay CPU {100 * cpu / args.seconds:5.1f}%  "
+              f"per client {min(mbits):5.2f}-{max(mbits):5.2f} Mbit/s  "
+              f"latency avg {sum(latency) / max(1, len(latency)) / 1e6:5.2f} ms p99 {p99:5.2f} ms")
+
+    seconds = max(args.seconds, 8)
+    cpu, results = run(4, stalled=True, seconds=seconds)
+    readers = [r for r in results if r[0] == "reader"]
+    mbits = [8 * r[1] / seconds / 1e6 for r in readers]
+    print(f"  4 clients + 1 stalled: readers {min(mbits):5.2f}-{max(mbits):5.2f} Mbit/s, "
+          f"stalled client dropped: {'yes' if any(r[0] == 'stalled' and r[2] for r in results) else 'no'}")
+
+
+def bench_aids(args):
+    """Preview frame rate with and without the exposure aids on 1080p frames.
+
+    The preview is modelled by its per-frame work on the UI side (one copy
+    of the RGB frame into a texture buffer), paced at the stream rate. The
+    busy time per frame gives the rate the preview could reach flat out.
+    """
+    from utils import exposure_aids
+
+    width, height = 1920, 1080
+    source = args.input or make_sample(2, size=f"{width}x{height}")
+    raw = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-f", "mjpeg", "-i", source,
+         "-frames:v", "30", "-vf", f"scale={width}:{height}", "-pix_fmt", "rgb24",
+         "-f", "rawvideo", "-"],
+        capture_output=True, check=True
+    ).stdout
+    size = width * height * 3
+    frames = [raw[i:i + size] for i in range(0, len(raw) - size + 1, size)]
+    total = args.seconds * args.fps
+    print(f"Exposure aids ({width}x{height} RGB preview at {args.fps} fps, {args.seconds}s, "
+          f"{exposure_aids.RATE:.0f} Hz analysis)")
+
+    baseline = None
+    for label, enabled in (("off", False), ("histogram+zebra+peaking", True)):
+        aids = exposure_aids.ExposureAids(lambda result: None)
+        aids.histogram = aids.zebra = aids.peaking = enabled
+        busy = 0.0
+        cpu0 = time.process_time()
+        start = time.monotonic()
+        for i in range(total):
+            delay = start + i / args.fps - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            t0 = time.perf_counter()
+            data = frames[i % len(frames)]
+            if aids.enabled:
+                aids.submit(exposure_aids.frame_view(data, width, height))
+            bytearray(data)  # the texture copy made for every shown frame
+            busy += time.perf_counter() - t0
+        wall = time.monotonic() - start
+        cpu = time.process_time() - cpu0
+        aids.close()
+        capacity = total / busy
+        baseline = baseline or capacity
+        print(f"  {label:<28} {total / wall:5.1f} fps shown, flat out {capacity:7.1f} fps "
+              f"({100 * capacity / baseline:5.1f}%)  CPU {100 * cpu / wall:5.1f}%  "
+              f"analysis {aids.last_ms:4.1f} ms x {aids.results / wall:.1f}/s")
+
+
+def bench_raw(args):
+    """Time taken to pull the embedded previews out of RAW files."""
+    from utils import raw_preview
+
+    for path in args.files:
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            thumb, preview = raw_preview.previews(path)
+        elapsed = (time.perf_counter() - t0) / args.repeat
+        if preview is None:
+            print(f"  {os.path.basename(path):<24} no embedded JPEG")
+            continue
+        print(f"  {os.path.basename(path):<24} {1000 * elapsed:6.2f} ms  "
+              f"thumbnail {len(thumb) // 1024} KiB, preview {len(preview) // 1024} KiB "
+              f"of {os.path.getsize(path) // 1024 // 1024} MiB")
+
+
+def bench_timelapse(args):
+    """Intervalometer drift against a naive sleep loop, on a simulated camera.
+
+    Shot durations are drawn between --min and --max seconds (scaled down
+    from the 2-60 s real captures take) with the same seed for both runs.
+    """
+    from utils import timelapse
+
+    jpeg = b"\xff\xd8\xff\xd9"  # content doesn't matter to the scheduler
+    print(f"Timelapse every {args.interval}s x {args.frames} frames, "
+          f"shots of {args.min}-{args.max}s (simulated camera)")
+    with tempfile.TemporaryDirectory() as tmp:
+        camera = timelapse.SimulatedCamera(tmp, jpeg, (args.min, args.max), seed=1)
+        starts = []
+        start = time.monotonic()
+        for index in range(args.frames):
+            starts.append(time.monotonic() - start)
+            camera(index)
+            time.sleep(args.interval)
+        drift = starts[-1] - (args.frames - 1) * args.interval
+        print(f"  {'sleep(interval) loop':<22} last shot {drift:+7.2f}s off schedule")
+
+        camera = timelapse.SimulatedCamera(tmp, jpeg, (args.min, args.max), seed=1)
+        meter = timelapse.Intervalometer(camera, args.interval, args.frames)
+        meter.start()
+        meter.join()
+        stats = timelapse.summarize(meter.records, args.interval)
+        print(f"  {'intervalometer':<22} last shot {meter.records[-1]['jitter_ms'] / 1000:+7.2f}s off schedule, "
+              f"jitter avg {stats['jitter_avg_ms']:.1f} ms max {stats['jitter_max_ms']:.1f} ms, "
+              f"{stats['late']} overran")
+
+
+def bench_trace(args):
+    """Cost of a span with tracing disabled and enabled.
+
+    The relative overhead is taken against the cheapest traced operation
+    in the app, a gvfs check of about a millisecond; the real phases
+    (gphoto2 runs, sleeps) take 10 to 1000 times longer.
+    """
+    from utils import tracing
+
+    def run():
+        t0 = time.perf_counter_ns()
+        for _ in range(args.spans):
+            with tracing.span("bench", attempt=1):
+                pass
+        return (time.perf_counter_ns() - t0) / args.spans
+
+    was_enabled = tracing.enabled()
+    t0 = time.perf_counter_ns()
+    for _ in range(args.spans):
+        pass
+    loop = (time.perf_counter_ns() - t0) / args.spans
+    print(f"Tracing, {args.spans} spans (ring of {tracing.CAPACITY}), bare loop {loop:.0f} ns")
+    for label, enabled in (("disabled", False), ("enabled", True)):
+        tracing.set_enabled(enabled)
+        cost = run()
+        print(f"  {label:<9} {cost:7.0f} ns per span, {100 * cost / 1e6:.3f}% of a 1 ms phase")
+    t0 = time.perf_counter()
+    with tempfile.NamedTemporaryFile(suffix=".json") as f:
+        count = tracing.export(f.name)
+    print(f"  export of {count} spans {1000 * (time.perf_counter() - t0):.1f} ms")
+    tracing.clear()
+    tracing.set_enabled(was_enabled)
+
+
+def bench_tasks(args):
+    """Shutter latency while a hot-plug scan holds the camera, threads vs task layer.
+
+    The scan and the capture are `sleep` processes standing in for
+    gphoto2. With plain threads the capture waits until the scan releases
+    the camera; the task layer cancels the scan (killing its process) and
+    runs the capture at once. Also shows two cameras running in parallel
+    while one camera's operations are serialized.
+    """
+    import threading
+
+    from utils.tasks import TaskRunner, run_process
+
+    print(f"Shutter pressed {args.press}s into a {args.detect}s scan, capture {args.capture}s")
+
+    # Before: threads plus a lock for the camera, nothing can be cancelled
+    usb = threading.Lock()
+    scanning = threading.Event()
+
+    def scan():
+        with usb:
+            scanning.set()
+            subprocess.run(["sleep", str(args.detect)])
+
+    threading.Thread(target=scan, daemon=True).start()
+    scanning.wait()
+    time.sleep(args.press)
+    pressed = time.monotonic()
+    with usb:
+        started = time.monotonic()
+        subprocess.run(["sleep", str(args.capture)])
+    done = time.monotonic()
+    print(f"  {'threads':<12} capture started after {1000 * (started - pressed):7.1f} ms, "
+          f"photo after {done - pressed:5.2f}s")
+
+    # After: the shutter cancels the scan queued in the same camera lane
+    runner = TaskRunner(glib_loop=False)
+    finished = threading.Event()
+    result = {}
+
+    def on_capture(op):
+        result["op"] = op
+        finished.set()
+
+    runner.submit("scan", run_process, ["sleep", str(args.detect)], lane="usb", tags=("detect",))
+    time.sleep(args.press)
+    runner.cancel("detect")
+    runner.submit("capture", run_process, ["sleep", str(args.capture)], lane="usb", on_done=on_capture)
+    finished.wait()
+    op = result["op"]
+    print(f"  {'task layer':<12} capture started after {1000 * op.waited:7.1f} ms, "
+          f"photo after {op.finished - op.submitted:5.2f}s")
+
+    # Lanes: two cameras in parallel, one camera serialized
+    for label, lanes in (("two cameras", ("usb:1", "usb:2")), ("one camera", ("usb:1", "usb:1"))):
+        finished.clear()
+        ops = []
+
+        def on_done(op):
+            ops.append(op)
+            if len(ops) == 2:
+                finished.set()
+
+        t0 = time.monotonic()
+        for lane in lanes:
+            runner.submit("capture", run_process, ["sleep", str(args.capture)], lane=lane, on_done=on_done)
+        finished.wait()
+        print(f"  {label:<12} 2 captures in {time.monotonic() - t0:5.2f}s")
+
+    # A capture stuck for a minute, cancelled by the user
+    finished.clear()
+    op = runner.submit("capture", run_process, ["sleep", "60"], lane="usb", on_done=on_capture)
+    time.sleep(0.2)
+    t0 = time.monotonic()
+    op.cancel()
+    finished.wait()
+    print(f"  {'cancel':<12} hung capture released in {1000 * (time.monotonic() - t0):5.1f} ms")
+
+
+def bench_watchdog(args):
+    """Main-loop stalls of UI callbacks doing blocking work inline vs off-thread.
+
+    An asyncio loop stands in for the GLib main loop. Every half second a
+    "callback" does what the old handlers did: a /proc scan for gphoto2
+    (pgrep) and a blocking child process (`sleep`, standing in for
+    xdg-open or a 2 s get_state). The watchdog reports the loop latency
+    with the work inline and with it moved to asyncio.to_thread.
+    """
+    import asyncio
+
+    from utils import procs
+    from utils.watchdog import Watchdog
+
+    def blocking_work():
+        procs.invalidate()
+        procs.running("gphoto2")
+        subprocess.run(["sleep", str(args.block)])
+
+    async def run(offload):
+        loop = asyncio.get_running_loop()
+
+        def timeout_add(ms, func):
+            def fire():
+                if func():
+                    loop.call_later(ms / 1000, fire)
+            loop.call_later(ms / 1000, fire)
+
+        stalls = []
+        watchdog = Watchdog(timeout_add, log=stalls.append)
+        watchdog.start()
+        pending = []
+        end = time.monotonic() + args.seconds
+        while time.monotonic() < end:
+            await asyncio.sleep(0.5)
+            if offload:
+                pending.append(asyncio.ensure_future(asyncio.to_thread(blocking_work)))
+            else:
+                blocking_work()
+        await asyncio.gather(*pending)
+        watchdog.stop()
+        return watchdog, stalls
+
+    first_stall = None
+    for label, offload in (("inline", False), ("off-thread", True)):
+        watchdog, stalls = asyncio.run(run(offload))
+        r = watchdog.report()
+        print(f"  {label:<11} {r['beats']:4d} beats, {r['stalls']:3d} stalls over {r['stall_ms']:.0f} ms, "
+              f"worst {r['max_ms']:7.1f} ms")
+        first_stall = first_stall or (stalls[0] if stalls else None)
+    if first_stall:
+        print(first_stall)
+
+
+def _forks():
+    """Processes created since boot (the "processes" line of /proc/stat)."""
+    with open("/proc/stat") as f:
+        for line in f:
+            if line.startswith("processes "):
+                return int(line.split()[1])
+    return 0
+
+
+def bench_spawns(args):
+    """Processes a running app spawns per minute (leave it idle meanwhile).
+
+    Children of --pid are caught by polling /proc every few milliseconds, so
+    very short-lived ones can slip through; the system-wide fork counter is
+    printed alongside as an upper bound.
+    """
+    from utils import procs
+
+    seen = set()
+    names = {}
+    forks0 = _forks()
+    end = time.monotonic() + args.seconds
+    while time.monotonic() < end:
+        for pid in procs._pids():
+            if pid in seen or procs.parent_pid(pid) != args.pid:
+                continue
+            seen.add(pid)
+            try:
+                with open(f"/proc/{pid}/comm") as f:
+                    name = f.read().strip()
+            except OSError:
+                name = "?"
+            names[name] = names.get(name, 0) + 1
+        time.sleep(0.005)
+    per_minute = 60.0 / args.seconds
+    print(f"Spawns by pid {args.pid} over {args.seconds}s: "
+          f"{len(seen) * per_minute:.1f}/min (system-wide {(_forks() - forks0) * per_minute:.1f}/min)")
+    for name, count in sorted(names.items(), key=lambda item: -item[1]):
+        print(f"  {name:<20} {count}")
+
+
+def _loopback_cycles(client, cycles):
+    """Add/remove round trips (ms) through client (add(label), remove(number))."""
+    add, remove = [], []
+    for i in range(cycles):
+        t0 = time.perf_counter()
+        number, _path = client.add(f"Bench {i}")
+        t1 = time.perf_counter()
+        client.remove(number)
+        t2 = time.perf_counter()
+        add.append(1000 * (t1 - t0))
+        remove.append(1000 * (t2 - t1))
+    return add, remove
+
+
+def _print_cycles(label, add, remove):
+    add, remove = sorted(add), sorted(remove)
+    print(f"  {label:<26} add p50 {add[len(add) // 2]:7.3f} ms  max {add[-1]:7.3f} ms | "
+          f"remove p50 {remove[len(remove) // 2]:7.3f} ms  max {remove[-1]:7.3f} ms")
+
+
+def bench_loopback(args):
+    """Virtual webcam provisioning through the loopback helper (utils/loopback.py).
+
+    The helper's rules run on the fake backend in-process, then the whole
+    protocol runs over D-Bus against a --fake helper on a private bus. With
+    --kernel the installed helper is timed on the system bus (real devices).
+    """
+    import shutil
+    from utils import loopback
+
+    print(f"Loopback helper ({args.cycles} add/remove cycles)")
+    service = loopback.LoopbackService(loopback.FakeLoopback())
+
+    class Local:
+        def add(self, label):
+            return service.add(":bench", label)
+
+        def remove(self, number):
+            service.remove(":bench", number)
+
+    _print_cycles("in-process, fake backend", *_loopback_cycles(Local(), args.cycles))
+
+    # Ownership rules: per-client limit, open devices, clients that vanish
+    for _ in range(loopback.MAX_PER_OWNER):
+        service.add(":a", "")
+    try:
+        service.add(":a", "")
+        limit = "NOT enforced"
+    except loopback.LoopbackError:
+        limit = "enforced"
+    busy, _path = service.add(":b", "Busy")
+    service.backend.busy.add(busy)
+    service.release(":a")
+    service.release(":b")
+    orphaned = busy in service.orphans and not service.list()
+    service.backend.busy.clear()
+    service.retry_orphans()
+    print(f"  per-client limit {limit}; open device kept until closed: "
+          f"{'yes' if orphaned and not service.orphans else 'NO'}; "
+          f"devices left: {len(service.backend.labels)}")
+
+    try:
+        from gi.repository import Gio  # noqa: F401
+    except ImportError:
+        print("  (PyGObject not available: D-Bus round trips skipped)")
+        return
+    if shutil.which("dbus-daemon"):
+        bus = subprocess.Popen(["dbus-daemon", "--session", "--nofork", "--print-address=1"],
+                               stdout=subprocess.PIPE, text=True)
+        os.environ["DBUS_SESSION_BUS_ADDRESS"] = bus.stdout.readline().strip()
+        helper = subprocess.Popen([sys.executable, loopback.__file__, "--fake"])
+        try:
+            client = None
+            deadline = time.monotonic() + 5
+            while client is None:
+                try:
+                    client = loopback.LoopbackClient("session")
+                    client.list()
+                except loopback.LoopbackError:
+                    if time.monotonic() > deadline:
+                        raise
+                    client = None
+                    time.sleep(0.05)
+            _print_cycles("D-Bus, fake helper", *_loopback_cycles(client, args.cycles))
+            # A client that exits without removing its device
+            subprocess.run([sys.executable, "-c",
+                            "from utils.loopback import LoopbackClient; LoopbackClient('session').add('Gone')"],
+                           cwd=os.path.dirname(os.path.dirname(os.path.abspath(loopback.__file__))),
+                           check=True)
+            time.sleep(0.2)
+            print(f"  devices of an exited client removed: {'yes' if not client.list() else 'NO'}")
+        finally:
+            helper.terminate()
+            bus.terminate()
+    else:
+        print("  (dbus-daemon not found: D-Bus round trips skipped)")
+
+    if args.kernel:
+        _print_cycles("D-Bus, kernel (installed)",
+                      *_loopback_cycles(loopback.LoopbackClient("system"), args.cycles))
+
+
+def _bench_backend(backend, seconds, captures, tmp):
+    """Live view, captures and a settings round trip through one backend."""
+    from utils.camera_config import panel_entries
+
+    gaps = []
+    with backend:
+        if "liveview" in backend.flags:
+            last = None
+            end = time.monotonic() + seconds
+            for _frame in backend.frames():
+                now = time.monotonic()
+                if last is not None:
+                    gaps.append(now - last)
+                last = now
+                if now >= end:
+                    break
+        for i in range(captures if "stills" in backend.flags else 0):
+            try:
+                backend.capture(os.path.join(tmp, f"{backend.name}{i:03d}"))
+            except RuntimeError as e:
+                print(f"    capture {i + 1}: {e}")
+        if "config" in backend.flags:
+            entries = panel_entries(backend.get_config())
+            if entries:
+                # Writes the current value back: a round trip that changes nothing
+                _key, _label, name, entry = entries[0]
+                backend.set_config({name: entry["current"]})
+    return gaps
+
+
+def bench_backends(args):
+    """The same live view, capture and settings run against every camera backend.
+
+    Each backend uses its first camera (--port name=port picks one); the
+    simulator replays --input, or the synthetic sample, with the timings
+    of simulator.json. Figures come from the backends' own counters.
+    """
+    from utils import backends
+    from utils.backends.simulator import Simulator
+
+    names = args.backends.split(",") if args.backends else list(backends.BACKENDS)
+    ports = dict(item.split("=", 1) for item in args.port)
+    print(f"Camera backends: {args.seconds}s of live view, {args.captures} captures, settings round trip")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in names:
+            cls = backends.BACKENDS.get(name)
+            if cls is None or not cls.available():
+                print(f"  {name:<11} {'unknown' if cls is None else 'not installed'}, skipped")
+                continue
+            if cls is Simulator:
+                try:
+                    clip = args.input or make_sample(max(args.seconds, 5))
+                except (OSError, subprocess.CalledProcessError) as e:
+                    print(f"  {name:<11} no clip to replay ({e}), skipped")
+                    continue
+                backend = Simulator("Simulator", "sim:0", clip=clip, stills="")
+            else:
+                cameras = [c for c in cls.enumerate() if name not in ports or c["port"] == ports[name]]
+                if not cameras:
+                    print(f"  {name:<11} no camera, skipped")
+                    continue
+                backend = cls(cameras[0]["name"], cameras[0]["port"])
+            try:
+                gaps = _bench_backend(backend, args.seconds, args.captures, tmp)
+            except RuntimeError as e:
+                print(f"  {name:<11} failed: {e}")
+                continue
+            stats = backend.stats()
+            first = stats["first_frame_ms"]
+            print(f"  {name:<11} {backend.camera_name or backend.port}: open {stats['open_avg_ms']:.0f} ms")
+            if gaps:
+                print(f"    live view   first frame {first:.0f} ms, {stats['fps']:.1f} fps, "
+                      f"frame gap max {1000 * max(gaps):.0f} ms, {stats['frame_kb']:.0f} KiB/frame")
+            if stats["captures"]:
+                print(f"    capture     avg {stats['capture_avg_ms']:.0f} ms  max {stats['capture_max_ms']:.0f} ms "
+                      f"({stats['captures']} shots)")
+            if stats["config_avg_ms"]:
+                print(f"    settings    avg {stats['config_avg_ms']:.0f} ms per call")
+            print(f"    errors      {stats['errors']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python3 -m utils.benchmark")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("profiles", help="CPU cost of each virtual webcam output profile")
+    p.add_argument("--input", help="recorded MJPEG live view clip")
+    p.add_argument("--seconds", type=int, default=10)
+    p.add_argument("--fps", type=int, default=30)
+    p.set_defaults(func=bench_profiles)
+
+    p = sub.add_parser("pacing", help="CPU of fixed-rate versus source-rate pacing")
+    p.add_argument("--input", help="recorded MJPEG live view clip")
+    p.add_argument("--seconds", type=int, default=10)
+    p.add_argument("--source-fps", type=int, default=20,
+                   help="live view rate of the camera (T3 often runs below 30)")
+    p.set_defaults(func=bench_pacing)
+
+    p = sub.add_parser("outputs", help="CPU and latency of extra virtual webcams from one decode")
+    p.add_argument("--input", help="recorded MJPEG live view clip")
+    p.add_argument("--seconds", type=int, default=10)
+    p.add_argument("--source-fps", type=int, default=SAMPLE_FPS)
+    p.add_argument("--main", default="1920x1080@30", help="main output, WxH@fps (native@30 keeps the size)")
+    p.add_argument("--extra", action="append", default=None, help="extra output, WxH@fps (repeatable, default 640x360@15)")
+    p.set_defaults(func=bench_outputs)
+
+    p = sub.add_parser("plugins", help="frame stage plugin timings on recorded footage")
+    p.add_argument("--input", help="recorded MJPEG live view clip")
+    p.add_argument("--seconds", type=int, default=10)
+    p.add_argument("--plugins", default="mirror,lut:warm")
+    p.add_argument("--budget-ms", type=float)
+    p.set_defaults(func=bench_plugins)
+
+    p = sub.add_parser("autoframe", help="auto-framing CPU and framing latency on a recorded clip")
+    p.add_argument("--input", help="recorded MJPEG clip with a presenter")
+    p.add_argument("--seconds", type=int, default=20)
+    p.add_argument("--fps", type=int, default=SAMPLE_FPS)
+    p.set_defaults(func=bench_autoframe)
+
+    p = sub.add_parser("ring", help="shared decoded-frame ring with 1 to N readers")
+    p.add_argument("--readers", type=int, default=8)
+    p.add_argument("--seconds", type=int, default=10)
+    p.add_argument("--fps", type=int, default=SAMPLE_FPS)
+    p.set_defaults(func=bench_ring)
+
+    p = sub.add_parser("compose", help="multi-camera compositor cost per layout")
+    p.add_argument("--cameras", default="30,24,15", help="rate of each synthetic camera")
+    p.add_argument("--size", default="1280x720")
+    p.add_argument("--fps", type=int, default=30)
+    p.add_argument("--seconds", type=int, default=5)
+    p.set_defaults(func=bench_compose)
+
+    p = sub.add_parser("stream", help="network stream relay with 1 to N HTTP clients")
+    p.add_argument("--clients", type=int, default=16)
+    p.add_argument("--seconds", type=int, default=3)
+    p.add_argument("--kbps", type=int, default=5000, help="bitrate of the preview stream")
+    p.set_defaults(func=bench_stream)
+
+    p = sub.add_parser("aids", help="preview fps with histogram/zebra/peaking enabled")
+    p.add_argument("--input", help="recorded MJPEG clip (scaled to 1080p)")
+    p.add_argument("--seconds", type=int, default=10)
+    p.add_argument("--fps", type=int, default=SAMPLE_FPS)
+    p.set_defaults(func=bench_aids)
+
+    p = sub.add_parser("raw", help="embedded preview extraction from RAW photos")
+    p.add_argument("files", nargs="+")
+    p.add_argument("--repeat", type=int, default=20)
+    p.set_defaults(func=bench_raw)
+
+    p = sub.add_parser("timelapse", help="intervalometer drift with a simulated camera")
+    p.add_argument("--interval", type=float, default=1.0)
+    p.add_argument("--frames", type=int, default=20)
+    p.add_argument("--min", type=float, default=0.1, help="shortest simulated shot (s)")
+    p.add_argument("--max", type=float, default=0.9, help="longest simulated shot (s)")
+    p.set_defaults(func=bench_timelapse)
+
+    p = sub.add_parser("trace", help="cost of tracing spans, disabled and enabled")
+    p.add_argument("--spans", type=int, default=100000)
+    p.set_defaults(func=bench_trace)
+
+    p = sub.add_parser("tasks", help="shutter latency with a scan in progress, threads vs tasks")
+    p.add_argument("--detect", type=float, default=3.0, help="duration of the hot-plug scan (s)")
+    p.add_argument("--capture", type=float, default=0.5, help="duration of the capture (s)")
+    p.add_argument("--press", type=float, default=0.5, help="shutter press into the scan (s)")
+    p.set_defaults(func=bench_tasks)
+
+    p = sub.add_parser("watchdog", help="main-loop stalls with blocking calls inline vs off-thread")
+    p.add_argument("--seconds", type=float, default=5)
+    p.add_argument("--block", type=float, default=0.3, help="seconds each blocking call takes")
+    p.set_defaults(func=bench_watchdog)
+
+    p = sub.add_parser("spawns", help="processes spawned per minute by a running app")
+    p.add_argument("--pid", type=int, required=True)
+    p.add_argument("--seconds", type=int, default=60)
+    p.set_defaults(func=bench_spawns)
+
+    p = sub.add_parser("loopback", help="virtual webcam provisioning through the loopback helper")
+    p.add_argument("--cycles", type=int, default=200)
+    p.add_argument("--kernel", action="store_true", help="also time the installed helper with real devices")
+    p.set_defaults(func=bench_loopback)
+
+    p = sub.add_parser("backends", help="live view, capture and settings timings of every camera backend")
+    p.add_argument("--backends", help="comma separated (default: all installed)")
+    p.add_argument("--port", action="append", default=[], metavar="BACKEND=PORT",
+                   help="camera of a backend, e.g. uvc=/dev/video2")
+    p.add_argument("--input", help="recorded MJPEG clip for the simulator")
+    p.add_argument("--seconds", type=int, default=5)
+    p.add_argument("--captures", type=int, default=3)
+    p.set_defaults(func=bench_backends)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import os
+import subprocess
+import time
+
+from utils.i18n import _
+from utils.settings import cache_dir, load_json, save_json, slug
+
+# Settings shown in the camera panel: (key, label, config names tried in order).
+# Vendors name some of them differently (Nikon: f-number, Sony: shutterspeed2...).
+PANEL_SETTINGS = [
+    ("iso", _("ISO"), ["iso", "isospeed"]),
+    ("shutterspeed", _("Velocidade do obturador"), ["shutterspeed", "shutterspeed2", "eos-shutterspeed"]),
+    ("aperture", _("Abertura"), ["aperture", "f-number", "eos-aperture"]),
+    ("whitebalance", _("Balanço de branco"), ["whitebalance"]),
+    ("capturetarget", _("Destino da captura"), ["capturetarget"]),
+    # JPEG, RAW or RAW+JPEG; every file the camera produces is downloaded
+    ("imageformat", _("Formato da imagem"), ["imageformat", "imagequality"]),
+]
+
+# Widget types gphoto2 lists with "Choice:" lines
+CHOICE_TYPES = ("RADIO", "MENU")
+
+# Models whose tree was already read from the camera in this session
+_read_this_session = set()
+
+
+def camera_args(camera_model=None, port=None):
+    """gphoto2 arguments selecting one camera (port is the most precise)."""
+    if port:
+        return ["--port", port]
+    if camera_model:
+        return ["--camera", camera_model]
+    return []
+
+
+def parse_config_tree(text):
+    """Parse `gphoto2 --list-all-config` into {name: entry}.
+
+    Each entry keeps the full path, label, type, read-only flag, current
+    value and the list of choices (radio/menu widgets only).
+    """
+    tree = {}
+    entry = None
+    for line in text.splitlines():
+        line = line.rstrip()
+        if line.startswith("/"):
+            entry = {"path": line, "label": "", "type": "", "readonly": False,
+                     "current": "", "choices": []}
+            tree[line.rsplit("/", 1)[-1]] = entry
+        elif entry is None:
+            continue
+        elif line == "END":
+            entry = None
+        else:
+            key, _sep, value = line.partition(": ")
+            if key == "Label":
+                entry["label"] = value
+            elif key == "Type":
+                entry["type"] = value
+            elif key == "Readonly":
+                entry["readonly"] = value.strip() == "1"
+            elif key == "Current":
+                entry["current"] = value
+            elif key == "Choice":
+                # "Choice: 3 1/125" -> "1/125"
+                entry["choices"].append(value.partition(" ")[2])
+    return tree
+
+
+def _cache_path(camera_model):
+    return os.path.join(cache_dir(), f"camera-config-{slug(camera_model)}.json")
+
+
+def cached_config(camera_model):
+    """Config tree saved for this model on disk, or None."""
+    return load_json(_cache_path(camera_model))
+
+
+def read_config(camera_model=None, port=None):
+    """Read the whole tree from the camera (one gphoto2 round trip) and cache it."""
+    res = subprocess.run(
+        ["gphoto2", *camera_args(camera_model, port), "--list-all-config"],
+        capture_output=True, text=True, timeout=30
+    )
+    if res.returncode != 0:
+        raise RuntimeError((res.stderr or res.stdout).strip())
+    tree = parse_config_tree(res.stdout)
+    save_json(_cache_path(camera_model), tree)
+    _read_this_session.add(camera_model)
+    return tree
+
+
+def load_config(camera_model=None):
+    """(tree, needs_refresh): the cached tree at once, if any.
+
+    needs_refresh is True until the tree was read from the camera once in
+    this session, so callers can show the cache and refresh in background.
+    """
+    tree = cached_config(camera_model)
+    needs_refresh = camera_model not in _read_this_session
+    if tree is None:
+        return {}, True
+    return tree, needs_refresh
+
+
+def panel_entries(tree):
+    """[(key, label, config name, entry)] of the panel settings this camera has."""
+    entries = []
+    for key, label, names in PANEL_SETTINGS:
+        for name in names:
+            entry = tree.get(name)
+            if entry and entry["type"] in CHOICE_TYPES and not entry["readonly"]:
+                entries.append((key, label, name, entry))
+                break
+    return entries
+
+
+def set_config_args(changes):
+    """--set-config-value arguments for {name: value}, applied in order."""
+    args = []
+    for name, value in changes.items():
+        args += ["--set-config-value", f"{name}={value}"]
+    return args
+
+
+def apply_config(changes, camera_model=None, port=None):
+    """Apply several settings in one gphoto2 session.
+
+    Returns the elapsed seconds; raises RuntimeError with gphoto2's message
+    when the camera refuses one of them. The cached tree is updated so the
+    panel reopens with the new values.
+    """
+    if not changes:
+        return 0.0
+    t0 = time.monotonic()
+    res = subprocess.run(
+        ["gphoto2", *camera_args(camera_model, port), *set_config_args(changes)],
+        capture_output=True, text=True, timeout=30
+    )
+    elapsed = time.monotonic() - t0
+    if res.returncode != 0:
+        raise RuntimeError((res.stderr or res.stdout).strip())
+
+    tree = cached_config(camera_model)
+    if tree:
+        for name, value in changes.items():
+            if name in tree:
+                tree[name]["current"] = value
+        save_json(_cache_path(camera_model), tree)
+    print(f"[Config] Applied {len(changes)} setting(s) in {elapsed:.2f}s")
+    return elapsed
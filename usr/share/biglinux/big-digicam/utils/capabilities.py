@@ -0,0 +1,262 @@
+import glob
+import os
+import re
+import subprocess
+
+from utils.settings import config_dir, load_json, save_json, slug
+
+CAPABILITIES_FILE = "capabilities.json"
+
+# Used when nothing better is known about a camera
+GENERIC = {
+    "liveview_size": None,        # [width, height] of the live view stream
+    "liveview_fps": 30,
+    "movie": None,                # gphoto2 --capture-movie works (None = not probed)
+    "reset_safe": False,          # gphoto2 --reset recovers the camera (hangs some Nikons)
+    "viewfinder_off": False,      # needs viewfinder=0 before a still capture
+    "stop_delay": 2.0,            # seconds after stopping live view before a capture
+    "recovery_delay": 2.0,        # seconds after a failed capture before retrying
+    "capture_targets": [],
+    "best_target": None,          # capturetarget value with the fastest download
+    "probed": False,              # the one-time probe ran for this camera
+    # gphoto2 --shell commands of the low-latency shutter (utils/shutter.py)
+    "shutter_arm": ["set-config autofocusdrive=1"],   # focus ahead of the shot
+    "shutter_fire": ["capture-image-and-download"],
+    "shutter_disarm": [],
+    "shutter_drain": [],                              # after the first file is shown
+}
+
+# Shipped defaults by USB vendor id, then by model name (gphoto2 naming)
+VENDOR_DEFAULTS = {
+    "04a9": {  # Canon
+        "reset_safe": True,
+        "viewfinder_off": True,
+        "stop_delay": 3.0,        # mirror must come down after live view
+        "recovery_delay": 4.0,    # re-enumeration after --reset
+        "best_target": "Internal RAM",
+        # Half press focuses and holds; the full press then fires at once
+        "shutter_arm": ["set-config eosremoterelease=Press Half"],
+        "shutter_fire": ["set-config eosremoterelease=Press Full",
+                         "set-config eosremoterelease=Release Full",
+                         "wait-event-and-download FILEADDED"],
+        "shutter_disarm": ["set-config eosremoterelease=Release Half"],
+        "shutter_drain": ["wait-event-and-download 1s"],   # JPEG of RAW+JPEG
+    },
+    "04b0": {  # Nikon: --reset freezes several bodies
+        "reset_safe": False,
+        "recovery_delay": 2.0,
+        "best_target": "Internal RAM",
+    },
+}
+
+MODEL_DEFAULTS = {
+    "Canon EOS 1100D": {"liveview_size": [1056, 704], "liveview_fps": 30, "movie": True},
+    "Canon EOS 600D": {"liveview_size": [1056, 704], "liveview_fps": 30, "movie": True},
+}
+
+# Brand names used when the USB id can't be read (e.g. no sysfs access)
+BRAND_VENDORS = {"Canon": "04a9", "Nikon": "04b0"}
+
+# Adaptive delays: shrink after a success (not down to a delay that failed),
+# grow after a failure, within bounds
+DELAY_SHRINK = 0.85
+DELAY_GROW = 1.5
+DELAY_MIN = 0.5
+DELAY_MAX = 10.0
+# Weight of a new sample in the timing averages
+EMA_WEIGHT = 0.3
+# A still capture is given up after this many times its learned average,
+# and never sooner than CAPTURE_TIMEOUT_MIN seconds
+CAPTURE_TIMEOUT_FACTOR = 4
+CAPTURE_TIMEOUT_MIN = 60.0
+
+
+def usb_id(port):
+    """"usb:001,005" -> "04a9:3217" from sysfs, or None."""
+    match = re.match(r"usb:(\d+),(\d+)", port or "")
+    if not match:
+        return None
+    bus, dev = (int(n) for n in match.groups())
+    for path in glob.glob("/sys/bus/usb/devices/*/"):
+        try:
+            with open(os.path.join(path, "busnum")) as f:
+                if int(f.read()) != bus:
+                    continue
+            with open(os.path.join(path, "devnum")) as f:
+                if int(f.read()) != dev:
+                    continue
+            with open(os.path.join(path, "idVendor")) as f:
+                vendor = f.read().strip()
+            with open(os.path.join(path, "idProduct")) as f:
+                product = f.read().strip()
+            return f"{vendor}:{product}"
+        except (OSError, ValueError):
+            continue
+    return None
+
+
+def ptp_ports():
+    """Ports ("usb:001,005") of attached cameras, read from sysfs.
+
+    A camera is a device with a still image (PTP, class 06) interface, or a
+    vendor-specific interface from a known camera vendor. Returns None when
+    sysfs can't be read, so callers fall back to gphoto2 --auto-detect.
+    """
+    if not os.path.isdir("/sys/bus/usb/devices"):
+        return None
+    ports = set()
+    for path in glob.glob("/sys/bus/usb/devices/*:*/bInterfaceClass"):
+        # Interface "1-2:1.0" belongs to device "1-2"
+        interface = os.path.basename(os.path.dirname(path))
+        device = os.path.join("/sys/bus/usb/devices", interface.split(":")[0])
+        try:
+            with open(path) as f:
+                cls = f.read().strip()
+            with open(os.path.join(device, "idVendor")) as f:
+                vendor = f.read().strip()
+            if cls != "06" and not (cls == "ff" and vendor in VENDOR_DEFAULTS):
+                continue
+            with open(os.path.join(device, "busnum")) as f:
+                bus = int(f.read())
+            with open(os.path.join(device, "devnum")) as f:
+                dev = int(f.read())
+        except (OSError, ValueError):
+            continue
+        ports.add(f"usb:{bus:03d},{dev:03d}")
+    return ports
+
+
+def _path():
+    return os.path.join(config_dir(), CAPABILITIES_FILE)
+
+
+def _key(model, usb):
+    return usb or slug(model)
+
+
+def _vendor(model, usb):
+    if usb:
+        return usb.split(":")[0]
+    for brand, vendor in BRAND_VENDORS.items():
+        if model and brand in model:
+            return vendor
+    return None
+
+
+def lookup(model, port=None):
+    """Capabilities of a camera: generic < vendor < model defaults < learned.
+
+    The result carries "key", under which the record_* helpers store what
+    was learned about this camera.
+    """
+    usb = usb_id(port)
+    caps = dict(GENERIC)
+    caps.update(VENDOR_DEFAULTS.get(_vendor(model, usb), {}))
+    caps.update(MODEL_DEFAULTS.get(model, {}))
+    learned = load_json(_path(), {}).get(_key(model, usb))
+    if learned:
+        caps.update(learned)
+    caps.update({"key": _key(model, usb), "model": model, "usb_id": usb})
+    return caps
+
+
+def _update(caps, values):
+    db = load_json(_path(), {})
+    entry = db.setdefault(caps["key"], {"model": caps["model"]})
+    entry.update(values)
+    save_json(_path(), db)
+    caps.update(values)
+
+
+def probe(caps, camera_args, config_tree=None):
+    """One-time probe: movie capture support and capture targets.
+
+    Runs `gphoto2 --abilities` (no capture, a fraction of a second); the
+    capture targets come from the cached config tree when there is one.
+    """
+    values = {}
+    try:
+        res = subprocess.run(["gphoto2", *camera_args, "--abilities"],
+                             capture_output=True, text=True, timeout=10)
+        if res.returncode == 0:
+            # Live view (and so --capture-movie) is listed as "Preview"
+            choices = [line.partition(":")[2].strip() for line in res.stdout.splitlines()]
+            values["movie"] = "Preview" in choices
+            values["probed"] = True
+    except (OSError, subprocess.TimeoutExpired):
+        pass
+    target = (config_tree or {}).get("capturetarget")
+    if target:
+        values["capture_targets"] = target["choices"]
+        if caps["best_target"] not in target["choices"]:
+            values["best_target"] = target["choices"][0] if target["choices"] else None
+    _update(caps, values)
+    print(f"[Caps] Probed {caps['model']} ({caps['usb_id'] or 'no USB id'}): "
+          f"movie={caps['movie']}, targets={caps['capture_targets']}")
+    return caps
+
+
+def record_timing(caps, name, seconds):
+    """Moving average of an observed duration ("capture", "stream_start"...)."""
+    timings = dict(caps.get("timings") or {})
+    old = timings.get(name)
+    timings[name] = seconds if old is None else old + EMA_WEIGHT * (seconds - old)
+    _update(caps, {"timings": timings})
+
+
+def timing(caps, name, default=None):
+    """Learned average of a record_timing() duration, or default."""
+    return (caps.get("timings") or {}).get(name, default)
+
+
+def capture_timeout(caps):
+    """Seconds a still capture may take before it is given up."""
+    return max(CAPTURE_TIMEOUT_MIN, CAPTURE_TIMEOUT_FACTOR * timing(caps, "capture", 0.0))
+
+
+def record_delay(caps, name, ok):
+    """Adapt a delay ("stop_delay", "recovery_delay") to how it worked out.
+
+    After a success the next wait is a bit shorter, but never down to a
+    value that already failed: that one is remembered in "failed_delays",
+    and the delay stays where it last worked. After a failure it grows.
+    """
+    failed = dict(caps.get("failed_delays") or {})
+    if ok:
+        delay = caps[name] * DELAY_SHRINK
+        if name in failed and delay <= failed[name]:
+            return  # keep the last delay that worked
+    else:
+        failed[name] = max(failed.get(name, 0), caps[name])
+        delay = caps[name] * DELAY_GROW
+    _update(caps, {name: round(max(DELAY_MIN, min(DELAY_MAX, delay)), 2), "failed_delays": failed})
+
+
+def record_liveview(caps, size=None, fps=None):
+    values = {}
+    if size and list(size) != caps["liveview_size"]:
+        values["liveview_size"] = list(size)
+    if fps and round(fps) != caps["liveview_fps"]:
+        values["liveview_fps"] = round(fps)
+    if values:
+        _update(caps, values)
+
+
+def script_env(caps):
+    """run_webcam.sh settings: skip its own camera probe, refuse unsupported models."""
+    return {
+        "SKIP_PROBE": "1",
+        "MOVIE_CAPTURE": "0" if caps["movie"] is False else "1",
+    }
+
+
+def viewfinder_args(caps, config_tree):
+    """gphoto2 arguments turning the viewfinder off before a still capture.
+
+    Left out only when the cached config tree shows the body has no such
+    setting; with no tree cached it is sent, and a capture failing on it
+    is retried without.
+    """
+    if caps["viewfinder_off"] and (not config_tree or "viewfinder" in config_tree):
+        return ["--set-config", "viewfinder=0"]
+    return []
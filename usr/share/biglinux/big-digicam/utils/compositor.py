@@ -0,0 +1,373 @@
+"""Multi-camera compositor: several cameras in one virtual webcam.
+
+Each camera instance publishes its decoded frames to a shared-memory ring
+(the "share decoded frames" option, utils/frame_ring.py). The compositor
+maps those rings, places the cameras on one canvas (picture-in-picture,
+side by side or a grid) in a single pass, and pipes the result to one
+ffmpeg writing a v4l2loopback device:
+
+    camera 1 ring --\
+    camera 2 ring ---> compositor.py (I420 canvas, y4m) | ffmpeg -f v4l2 /dev/videoN
+
+The output runs on its own clock. On every tick each input contributes
+its newest frame, taken without waiting: a camera that is slow or stalled
+keeps its last picture (and goes black after STALE_AFTER seconds) while
+the others keep moving. An input is only redrawn when it has a new frame,
+so a 15 fps camera costs half of a 30 fps one. Scaling is nearest-neighbour
+with index tables computed once per layout. The composite time per frame
+and the age of each input's picture go to a JSON stats file every second.
+"""
+import argparse
+import json
+import math
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+try:
+    from utils.frame_ring import FrameRingReader, i420_size, list_rings
+    from utils.procs import open_file_holders
+    from utils.settings import config_dir, load_json, save_json
+except ImportError:  # run as a script from utils/
+    from frame_ring import FrameRingReader, i420_size, list_rings
+    from procs import open_file_holders
+    from settings import config_dir, load_json, save_json
+
+LAYOUTS = ["pip", "side", "grid"]
+# Width of a picture-in-picture inset, relative to the canvas
+PIP_SCALE = 0.3
+PIP_MARGIN = 0.03
+# Seconds without a new frame before an input is shown black
+STALE_AFTER = 2.0
+# Seconds between attempts to reopen a ring that went away
+REOPEN_EVERY = 1.0
+BLACK = (16, 128, 128)
+
+SETTINGS_FILE = "compositor.json"
+DEFAULTS = {"layout": "pip", "width": 1280, "height": 720, "fps": 30}
+
+
+def load_settings():
+    settings = dict(DEFAULTS)
+    settings.update(load_json(os.path.join(config_dir(), SETTINGS_FILE), {}))
+    return settings
+
+
+def save_settings(settings):
+    save_json(os.path.join(config_dir(), SETTINGS_FILE), settings)
+
+
+def _even(value):
+    return int(value) // 2 * 2
+
+
+def _fit(width, height, cell):
+    """Largest rect with width:height aspect centred in cell (x, y, w, h)."""
+    x, y, w, h = cell
+    scale = min(w / width, h / height)
+    fw, fh = max(2, _even(width * scale)), max(2, _even(height * scale))
+    return _even(x + (w - fw) / 2), _even(y + (h - fh) / 2), fw, fh
+
+
+def layout_cells(layout, count, width, height):
+    """Cells (x, y, w, h) of count inputs on a width x height canvas, back to front."""
+    if count <= 0:
+        return []
+    if layout == "pip":
+        cells = [(0, 0, width, height)]
+        inset_w, inset_h = _even(width * PIP_SCALE), _even(height * PIP_SCALE)
+        margin = _even(width * PIP_MARGIN)
+        for i in range(1, count):
+            # Insets stack upwards from the bottom-right corner
+            cells.append((width - inset_w - margin, height - (inset_h + margin) * i, inset_w, inset_h))
+        return cells
+    if layout == "side":
+        columns, rows = count, 1
+    else:
+        columns = math.ceil(math.sqrt(count))
+        rows = math.ceil(count / columns)
+    cw, ch = width // columns, height // rows
+    return [(_even((i % columns) * cw), _even((i // columns) * ch), _even(cw), _even(ch))
+            for i in range(count)]
+
+
+class Input:
+    """One camera ring and where its frames go on the canvas."""
+
+    def __init__(self, path):
+        self.path = path
+        self.reader = None
+        self.buffer = None
+        self.cell = None
+        self.rect = None
+        self.maps = None
+        self.timestamp = None
+        self.frames = 0
+        self.drawn = False
+        self._next_open = 0.0
+        self.open()
+
+    def open(self):
+        now = time.monotonic()
+        if now < self._next_open:
+            return False
+        self._next_open = now + REOPEN_EVERY
+        try:
+            reader = FrameRingReader(self.path)
+        except (OSError, ValueError):
+            return False
+        if self.reader:
+            self.reader.close()
+        self.reader = reader
+        self.buffer = reader.new_buffer()
+        self.maps = None  # the size may have changed
+        return True
+
+    @property
+    def alive(self):
+        return self.reader is not None and self.reader.alive
+
+    def planes(self):
+        w, h = self.reader.width, self.reader.height
+        cw, ch = (w + 1) // 2, (h + 1) // 2
+        data = np.frombuffer(self.buffer, dtype=np.uint8, count=i420_size(w, h))
+        return (data[:w * h].reshape(h, w),
+                data[w * h:w * h + cw * ch].reshape(ch, cw),
+                data[w * h + cw * ch:].reshape(ch, cw))
+
+    def place(self, cell):
+        self.cell = cell
+        self.maps = None
+
+    def _build_maps(self):
+        w, h = self.reader.width, self.reader.height
+        x, y, fw, fh = self.rect = _fit(w, h, self.cell)
+        rows = (np.arange(fh) * h // fh).astype(np.intp)
+        cols = (np.arange(fw) * w // fw).astype(np.intp)
+        crows = (np.arange(fh // 2) * ((h + 1) // 2) // (fh // 2)).astype(np.intp)
+        ccols = (np.arange(fw // 2) * ((w + 1) // 2) // (fw // 2)).astype(np.intp)
+        # Row-gathered planes, reused every frame
+        self.maps = ((rows, cols, np.empty((fh, w), np.uint8)),
+                     (crows, ccols, np.empty((fh // 2, (w + 1) // 2), np.uint8)),
+                     (crows, ccols, np.empty((fh // 2, (w + 1) // 2), np.uint8)))
+
+    def draw(self, canvas):
+        """Scale the current frame into its rect on canvas (planes y, u, v)."""
+        if self.maps is None:
+            self._build_maps()
+        x, y, fw, fh = self.rect
+        targets = (canvas[0][y:y + fh, x:x + fw],
+                   canvas[1][y // 2:(y + fh) // 2, x // 2:(x + fw) // 2],
+                   canvas[2][y // 2:(y + fh) // 2, x // 2:(x + fw) // 2])
+        for src, (rows, cols, gathered), dst in zip(self.planes(), self.maps, targets):
+            np.take(src, rows, axis=0, out=gathered)
+            np.take(gathered, cols, axis=1, out=dst)
+        self.drawn = True
+
+    def close(self):
+        if self.reader:
+            self.reader.close()
+            self.reader = None
+
+
+class Compositor:
+    """Composites the inputs into one I420 canvas at fps frames per second."""
+
+    def __init__(self, paths, width=1280, height=720, fps=30, layout="pip"):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.layout = layout
+        self.frame = bytearray(i420_size(width, height))
+        data = np.frombuffer(self.frame, dtype=np.uint8)
+        cw, ch = width // 2, height // 2
+        self.canvas = (data[:width * height].reshape(height, width),
+                       data[width * height:width * height + cw * ch].reshape(ch, cw),
+                       data[width * height + cw * ch:].reshape(ch, cw))
+        self.inputs = [Input(path) for path in paths]
+        for plane, value in zip(self.canvas, BLACK):
+            plane[:] = value
+        for item, cell in zip(self.inputs, layout_cells(layout, len(self.inputs), width, height)):
+            item.place(cell)
+        self.frames = 0
+        self.total = 0.0
+        self.worst = 0.0
+        self.last_stats = None
+        self._window = []
+
+    def compose(self):
+        """One output frame; returns the seconds spent compositing it."""
+        t0 = time.perf_counter()
+        now = time.monotonic()
+        # The cells overlap only in PiP, where the background comes first:
+        # redrawing it means redrawing everything in front of it too
+        redraw = False
+        for item in self.inputs:
+            if not item.alive and not item.open():
+                info = None
+            else:
+                info = item.reader.read_latest(item.buffer)
+            if info:
+                item.timestamp = info[1]
+                item.frames += 1
+            if item.timestamp is None or now - item.timestamp > STALE_AFTER:
+                if item.drawn:
+                    self._clear(item)
+                    redraw = redraw or self.layout == "pip"
+                continue
+            if info or redraw or item.maps is None:
+                item.draw(self.canvas)
+                redraw = redraw or self.layout == "pip"
+        elapsed = time.perf_counter() - t0
+        self.frames += 1
+        self.total += elapsed
+        self.worst = max(self.worst, elapsed)
+        self._window.append(elapsed)
+        return elapsed
+
+    def _clear(self, item):
+        x, y, w, h = item.cell
+        self.canvas[0][y:y + h, x:x + w] = BLACK[0]
+        self.canvas[1][y // 2:(y + h) // 2, x // 2:(x + w) // 2] = BLACK[1]
+        self.canvas[2][y // 2:(y + h) // 2, x // 2:(x + w) // 2] = BLACK[2]
+        item.drawn = False
+
+    def stats(self, elapsed):
+        """Counters since the last call (composite ms, per-input fps and picture age)."""
+        window, self._window = self._window, []
+        now = time.monotonic()
+        inputs = []
+        for item in self.inputs:
+            age = None if item.timestamp is None else round(1000 * (now - item.timestamp))
+            inputs.append({"path": item.path, "fps": item.frames / elapsed, "age_ms": age,
+                           "stale": age is None or age > 1000 * STALE_AFTER})
+            item.frames = 0
+        return {
+            "fps": len(window) / elapsed,
+            "composite_avg_ms": 1000 * sum(window) / len(window) if window else 0.0,
+            "composite_max_ms": 1000 * max(window, default=0.0),
+            "layout": self.layout,
+            "size": f"{self.width}x{self.height}",
+            "inputs": inputs,
+        }
+
+    def close(self):
+        for item in self.inputs:
+            item.close()
+
+
+def run(compositor, out=None, stats_path=None, seconds=None):
+    """Emit frames on an absolute clock until out closes (or seconds pass)."""
+    if out:
+        out.write(f"YUV4MPEG2 W{compositor.width} H{compositor.height} F{compositor.fps}:1 "
+                  f"Ip A1:1 C420jpeg\n".encode())
+    interval = 1.0 / compositor.fps
+    start = last_report = time.monotonic()
+    index = 0
+    try:
+        while seconds is None or time.monotonic() - start < seconds:
+            deadline = start + index * interval
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -interval:
+                # Fell behind (suspend, overload): skip the missed ticks
+                index = int((time.monotonic() - start) / interval)
+            index += 1
+            compositor.compose()
+            if out:
+                out.write(b"FRAME\n")
+                out.write(compositor.frame)
+            now = time.monotonic()
+            if now - last_report >= 1.0:
+                compositor.last_stats = compositor.stats(now - last_report)
+                last_report = now
+                if stats_path:
+                    _write_stats(stats_path, compositor.last_stats)
+    finally:
+        compositor.close()
+
+
+def free_loopback_device():
+    """First v4l2loopback device nobody has open (the same test as run_webcam.sh)."""
+    base = "/sys/class/video4linux"
+    try:
+        names = sorted(os.listdir(base), key=lambda n: int(n[5:]) if n[5:].isdigit() else 0)
+    except OSError:
+        return None
+    for name in names:
+        try:
+            with open(f"{base}/{name}/name") as f:
+                card = f.read().strip().lower()
+        except OSError:
+            continue
+        device = f"/dev/{name}"
+        if ("loopback" in card or "canon dslr" in card) and not open_file_holders(device):
+            return device
+    return None
+
+
+def _write_stats(path, stats):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(stats, f)
+    os.replace(tmp, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rings", help="comma separated ring paths, back to front "
+                                        "(default: every ring published)")
+    parser.add_argument("--layout", choices=LAYOUTS, default="pip")
+    parser.add_argument("--size", default="1280x720")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--device", help="v4l2loopback device to write with ffmpeg "
+                                         "(\"auto\": first free one; default: y4m on stdout)")
+    parser.add_argument("--stats", help="JSON file for composite timings")
+    args = parser.parse_args(argv)
+
+    paths = args.rings.split(",") if args.rings else list_rings()
+    if not paths:
+        parser.error("no frame rings to composite")
+    width, height = (int(v) for v in args.size.split("x"))
+    device = free_loopback_device() if args.device == "auto" else args.device
+    if args.device and not device:
+        parser.error("no free virtual video device")
+
+    # SIGTERM from the app unwinds like Ctrl+C, so the summary is printed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    compositor = Compositor(paths, width, height, args.fps, args.layout)
+    encoder = None
+    out = sys.stdout.buffer
+    if device:
+        encoder = subprocess.Popen(
+            ["ffmpeg", "-hide_banner", "-loglevel", "error", "-f", "yuv4mpegpipe", "-i", "-",
+             "-pix_fmt", "yuv420p", "-f", "v4l2", device],
+            stdin=subprocess.PIPE,
+        )
+        out = encoder.stdin
+        print(f"[Compositor] {len(paths)} inputs, {args.layout} {args.size}@{args.fps} -> {device}",
+              file=sys.stderr)
+    try:
+        run(compositor, out, args.stats)
+    except (BrokenPipeError, KeyboardInterrupt):
+        pass
+    finally:
+        if encoder:
+            try:
+                encoder.stdin.close()
+            except BrokenPipeError:
+                pass
+            encoder.wait()
+        if compositor.frames:
+            print(f"[Compositor] {compositor.frames} frames, composite "
+                  f"{1000 * compositor.total / compositor.frames:.2f} ms avg, "
+                  f"{1000 * compositor.worst:.2f} ms max", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
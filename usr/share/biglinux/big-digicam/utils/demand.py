@@ -0,0 +1,268 @@
+"""Demand-driven live view: idle the camera stream while nobody watches.
+
+Consumers are found the way `fuser` does it, by looking for the loopback
+device among the open files in /proc/<pid>/fd (and for the shared frame
+ring among the mappings in /proc/<pid>/maps). That scan only runs when
+inotify reports an open or close of the device node, so an idle system
+pays nothing for the detection.
+
+Idling stops (SIGSTOP) the gphoto2 live view reader, so no frames are
+pulled over USB and ffmpeg sleeps on its empty input. Meanwhile
+v4l2loopback keeps repeating the last frame (sustain_framerate), which
+gives a consumer that opens the device a picture at once. SIGCONT
+restarts the flow; the first write to the device marks the end of the
+resume.
+
+A stopped reader only saves host CPU and USB traffic: the camera itself
+stays in live view, mirror up and sensor on. After CAMERA_OFF_AFTER more
+seconds the reader is ended too ("off"), which ends live view on the
+camera; run_webcam.sh keeps ffmpeg's input open and starts a new reader
+once the idle flag file is removed. That resume takes as long as the
+camera needs to start live view again (a second or two on Canon bodies).
+"""
+import ctypes
+import os
+import signal
+import struct
+import subprocess
+import time
+
+from utils import procs
+from utils.frame_ring import ring_path
+from utils.sysstat import PidCpuMeter
+
+# Seconds without consumers before the live view is idled
+GRACE = 10.0
+# Seconds idled before live view is ended on the camera as well
+CAMERA_OFF_AFTER = 60.0
+# A resume without frames after this long is reported as failed
+RESUME_TIMEOUT = 5.0
+# While this file exists, run_webcam.sh doesn't restart the ended reader
+IDLE_FLAG = "/dev/shm/big-digicam-idle-{port}"
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_CLOSE_NOWRITE = 0x00000010
+IN_OPEN = 0x00000020
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT = struct.Struct("iIII")
+
+_libc = None
+
+
+def _inotify():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(None, use_errno=True)
+    return _libc
+
+
+class OpenWatch:
+    """inotify watch reporting opens/closes (and optionally writes) of files."""
+
+    BASE_MASK = IN_OPEN | IN_CLOSE_WRITE | IN_CLOSE_NOWRITE
+
+    def __init__(self, *paths):
+        libc = _inotify()
+        self.paths = paths
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.set_writes(False)
+
+    def set_writes(self, enabled):
+        mask = self.BASE_MASK | (IN_MODIFY if enabled else 0)
+        for path in self.paths:
+            if _inotify().inotify_add_watch(self.fd, os.fsencode(path), mask) < 0:
+                raise OSError(ctypes.get_errno(), f"cannot watch {path}")
+
+    def fileno(self):
+        return self.fd
+
+    def read_masks(self):
+        """Event masks waiting on the watch (empty when there are none)."""
+        masks = []
+        while True:
+            try:
+                data = os.read(self.fd, 4096)
+            except BlockingIOError:
+                return masks
+            offset = 0
+            while offset + _EVENT.size <= len(data):
+                _wd, mask, _cookie, length = _EVENT.unpack_from(data, offset)
+                masks.append(mask)
+                offset += _EVENT.size + length
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def idle_flag(udp_port):
+    return IDLE_FLAG.format(port=udp_port)
+
+
+def pipeline_pids(udp_port, usb_port=None):
+    """(gphoto2 pids, every pid of the live view pipeline) for this camera."""
+    readers = {proc.pid for proc in procs.live_view_readers(usb_port)}
+    members = readers | {proc.pid for proc in procs.stream_encoders(udp_port)}
+    # The frame stage (python3 frame_stage.py ... --ring <path>) maps the ring
+    ring = ring_path(udp_port)
+    members |= {proc.pid for proc in procs.processes() if ring in proc.argv}
+    return readers, members
+
+
+class DemandController:
+    """Idles/resumes one camera's live view according to its consumers.
+
+    Consumers of any of its devices (the main one and the extra outputs)
+    keep it streaming. Call handle_events() when the watch fd is readable and update() about
+    once per second (and whenever the app's own preview changes), passing
+    whether the app itself still needs frames.
+    """
+
+    def __init__(self, device, udp_port, usb_port=None, sustain=False, grace=GRACE, extra_devices=(),
+                 off_after=CAMERA_OFF_AFTER):
+        self.device = device
+        self.devices = (device, *extra_devices)
+        self.udp_port = udp_port
+        self.usb_port = usb_port
+        self.sustain = sustain      # the profile's own sustain_framerate setting
+        self.grace = grace
+        self.off_after = off_after
+        self.flag = idle_flag(udp_port)
+        # A pipeline left off by an earlier instance of the app waits for us
+        self.state = "off" if os.path.exists(self.flag) else "streaming"
+        self.consumers = set()
+        self.app_wants = True
+        self.last_demand = time.monotonic()
+        self.last_report = ""
+        self._resume_t0 = None
+        self._cpu = PidCpuMeter(self._pipeline()[1])
+        try:
+            self.watch = OpenWatch(*self.devices)
+        except OSError as e:
+            print(f"[Demand] inotify unavailable ({e}), polling consumers")
+            self.watch = None
+        self.count_consumers()
+
+    def _pipeline(self):
+        return pipeline_pids(self.udp_port, self.usb_port)
+
+    def fileno(self):
+        return self.watch.fileno() if self.watch else -1
+
+    def count_consumers(self):
+        _readers, members = self._pipeline()
+        holders = procs.open_file_holders(*self.devices) | procs.mapping_holders(ring_path(self.udp_port))
+        self.consumers = holders - members - {os.getpid()}
+        return len(self.consumers)
+
+    def handle_events(self, masks=None):
+        """React to the watch's events (masks already read from it, or read now)."""
+        if masks is None:
+            masks = self.watch.read_masks() if self.watch else []
+        if self._resume_t0 is not None and any(m & IN_MODIFY for m in masks):
+            self._resumed(time.monotonic() - self._resume_t0)
+        if any(m & (IN_OPEN | IN_CLOSE_WRITE | IN_CLOSE_NOWRITE) for m in masks):
+            self.count_consumers()
+            self.update()
+
+    def update(self, app_wants=None):
+        if app_wants is not None:
+            self.app_wants = app_wants
+        if self.watch is None:
+            self.count_consumers()
+        now = time.monotonic()
+        if self.consumers or self.app_wants:
+            self.last_demand = now
+            if self.state != "streaming":
+                self.resume()
+        elif self.state == "streaming" and now - self.last_demand >= self.grace:
+            self.idle()
+        elif self.state == "idle" and now - self.last_demand >= self.grace + self.off_after:
+            self.camera_off()
+        if self._resume_t0 is not None and now - self._resume_t0 > RESUME_TIMEOUT:
+            print(f"[Demand] No frame {RESUME_TIMEOUT:.0f}s after resuming")
+            self._resumed(None)
+
+    def _set_sustain(self, enabled):
+        try:
+            subprocess.run(["v4l2-ctl", "-d", self.device, "-c", f"sustain_framerate={int(enabled)}"],
+                           capture_output=True, check=False, timeout=5)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            print(f"[Demand] Could not set sustain_framerate: {e}")
+
+    def _signal(self, sig):
+        readers, _members = self._pipeline()
+        for pid in readers:
+            try:
+                os.kill(pid, sig)
+            except OSError:
+                pass
+        return readers
+
+    def idle(self):
+        # Readers opening the device meanwhile get the last frame repeated
+        self._set_sustain(True)
+        if not self._signal(signal.SIGSTOP):
+            return
+        self.state = "idle"
+        self.last_report = (f"streamed {self._cpu.elapsed():.0f}s, "
+                            f"pipeline CPU {self._cpu.percent():.1f}%")
+        print(f"[Demand] No consumers for {self.grace:.0f}s, live view idled ({self.last_report})")
+        self._cpu.reset(self._pipeline()[1])
+
+    def camera_off(self):
+        """End the stopped reader, and with it live view on the camera."""
+        with open(self.flag, "w"):
+            pass
+        # A stopped process acts on SIGTERM once it is continued
+        if not self._signal(signal.SIGTERM):
+            self._clear_flag()
+            return
+        self._signal(signal.SIGCONT)
+        self.state = "off"
+        print(f"[Demand] Idle for {self.off_after:.0f}s more, camera live view ended")
+
+    def _clear_flag(self):
+        try:
+            os.unlink(self.flag)
+        except FileNotFoundError:
+            pass
+
+    def resume(self):
+        if self.watch:
+            # Watch for ffmpeg's first write to time the resume
+            self.watch.set_writes(True)
+            self._resume_t0 = time.monotonic()
+        else:
+            self._set_sustain(self.sustain)
+        if self.state == "off":
+            self._clear_flag()  # run_webcam.sh starts a new reader
+        else:
+            self._signal(signal.SIGCONT)
+        self.state = "streaming"
+        self.last_report = f"idle {self._cpu.elapsed():.0f}s, pipeline CPU {self._cpu.percent():.1f}%"
+        print(f"[Demand] Consumer back, resuming live view ({self.last_report})")
+        self._cpu.reset(self._pipeline()[1])
+
+    def _resumed(self, latency):
+        self._resume_t0 = None
+        if self.watch:
+            self.watch.set_writes(False)
+        self._set_sustain(self.sustain)
+        if latency is not None:
+            self.last_report = f"resumed in {latency * 1000:.0f} ms"
+            print(f"[Demand] First frame {latency * 1000:.0f} ms after resume")
+
+    def close(self):
+        if self.state == "idle":
+            self._signal(signal.SIGCONT)
+        elif self.state == "off":
+            self._clear_flag()
+        if self.watch:
+            self.watch.close()
+            self.watch = None
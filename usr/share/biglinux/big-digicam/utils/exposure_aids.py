@@ -0,0 +1,149 @@
+import threading
+import time
+
+import numpy as np
+
+# Analysis runs on a copy this wide (every Nth pixel of the preview frame)
+ANALYSIS_WIDTH = 320
+RATE = 5.0              # results per second
+HIST_SIZE = (256, 96)   # histogram image, one column per level
+ZEBRA_LEVEL = 235       # luma at or above this is striped as overexposed
+PEAKING_MIN = 24        # minimum luma step counted as an in-focus edge
+
+ZEBRA_RGBA = (255, 255, 255, 170)
+PEAKING_RGBA = (255, 40, 40, 255)
+
+
+def subsample(frame, step):
+    """Copy every step-th pixel of an (h, w, 3) frame (cheap, no filtering)."""
+    return np.ascontiguousarray(frame[::step, ::step])
+
+
+def frame_view(data, width, height):
+    """(h, w, 3) view of packed 24-bit pixels, allowing padded rows."""
+    buf = np.frombuffer(data, dtype=np.uint8)
+    stride = len(buf) // height
+    return buf[:stride * height].reshape(height, stride)[:, :width * 3].reshape(height, width, 3)
+
+
+def luma(rgb):
+    """BT.601 luma, integer maths on uint16."""
+    r, g, b = (rgb[..., i].astype(np.uint16) for i in range(3))
+    return ((r * 77 + g * 150 + b * 29) >> 8).astype(np.uint8)
+
+
+def histogram_image(rgb, y, size=HIST_SIZE):
+    """RGBA image of the R, G, B and luma histograms, drawn with NumPy."""
+    width, height = size
+    image = np.zeros((height, width, 4), dtype=np.uint8)
+    image[..., 3] = 96
+    rows = np.arange(height)[:, None]
+    counts = [np.bincount(rgb[..., i].ravel(), minlength=256) for i in range(3)]
+    counts.append(np.bincount(y.ravel(), minlength=256))
+    # Scale on the busiest level that isn't clipped, so a blown-out
+    # highlight doesn't flatten the rest of the curve
+    peak = max(int(c[1:255].max()) for c in counts) or 1
+    bars = []
+    for c in counts:
+        h = np.minimum(height, c[:width] * height // peak)
+        bars.append(rows >= height - h[None, :])
+    for i in range(3):
+        image[..., i][bars[i]] = 200
+    image[..., 3][bars[0] | bars[1] | bars[2]] = 180
+    image[bars[3]] = (230, 230, 230, 220)
+    return image
+
+
+class ExposureAids:
+    """Histogram, zebra stripes and focus peaking on a worker thread.
+
+    submit() is called for every preview frame from whatever thread has
+    it; at most RATE times per second, and only when the worker is idle, it
+    keeps a subsampled copy and wakes the worker. Everything else (the
+    maths and drawing) happens on the worker, which hands RGBA images to
+    on_result(result) from its own thread.
+    """
+
+    def __init__(self, on_result, rate=RATE):
+        self.on_result = on_result
+        self.interval = 1.0 / rate
+        self.histogram = False
+        self.zebra = False
+        self.peaking = False
+        self.results = 0
+        self.last_ms = 0.0
+        self._last_submit = 0.0
+        self._pending = None
+        self._busy = False
+        self._cond = threading.Condition()
+        self._running = True
+        self._stripes = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def enabled(self):
+        return self.histogram or self.zebra or self.peaking
+
+    def submit(self, frame, bgr=False):
+        """Offer an (h, w, 3) frame; returns at once if it isn't needed."""
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        if self._busy or now - self._last_submit < self.interval:
+            return
+        self._last_submit = now
+        step = max(1, frame.shape[1] // ANALYSIS_WIDTH)
+        small = subsample(frame, step)
+        if bgr:
+            small = small[..., ::-1]
+        with self._cond:
+            self._pending = small
+            self._busy = True
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and self._pending is None:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                rgb, self._pending = self._pending, None
+            t0 = time.perf_counter()
+            result = self.analyze(rgb)
+            self.last_ms = 1000 * (time.perf_counter() - t0)
+            self.results += 1
+            self._busy = False
+            self.on_result(result)
+
+    def analyze(self, rgb):
+        y = luma(rgb)
+        h, w = y.shape
+        result = {"size": (w, h), "overlay": None, "histogram": None}
+        if self.histogram:
+            result["histogram"] = histogram_image(rgb, y)
+
+        if self.zebra or self.peaking:
+            overlay = np.zeros((h, w, 4), dtype=np.uint8)
+            if self.zebra:
+                if self._stripes is None or self._stripes.shape != (h, w):
+                    yy, xx = np.mgrid[0:h, 0:w]
+                    self._stripes = ((xx + yy) // 3) % 2 == 0
+                overlay[(y >= ZEBRA_LEVEL) & self._stripes] = ZEBRA_RGBA
+            if self.peaking:
+                # Strongest horizontal/vertical luma step at each pixel
+                y16 = y.astype(np.int16)
+                edge = np.zeros((h, w), dtype=np.int16)
+                edge[:, :-1] = np.abs(np.diff(y16, axis=1))
+                np.maximum(edge[:-1], np.abs(np.diff(y16, axis=0)), out=edge[:-1])
+                threshold = max(PEAKING_MIN, 4 * int(edge.mean()))
+                overlay[edge >= threshold] = PEAKING_RGBA
+            result["overlay"] = overlay
+        return result
+
+    def close(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join(timeout=1.0)
@@ -0,0 +1,210 @@
+"""Shared-memory ring of decoded frames, one per camera.
+
+The frame stage (utils/frame_stage.py) publishes every decoded I420 frame
+into a file in /dev/shm; any number of local processes can map it read-only
+and take frames without decoding the camera stream again.
+
+Layout: a header, the sequence number of the newest frame, then SLOTS slots
+of (lock, sequence, timestamp, frame data). Each slot is guarded by a
+seqlock: the writer makes the lock odd while it copies a frame in and even
+again when done, and a reader keeps a copy only if the lock was even and
+unchanged around it. The writer never waits for anyone; a reader that falls
+more than SLOTS frames behind just skips ahead.
+"""
+import glob
+import mmap
+import os
+import struct
+import time
+
+RING_FILE = "/dev/shm/big-digicam-ring-{port}"
+SLOTS = 4
+
+MAGIC = b"BDCRING1"
+# magic, fourcc, width, height, frame size, slots, fps, closed
+HEADER = struct.Struct("<8s4sIIIIdI")
+# Slot locks and the newest sequence number
+U64 = struct.Struct("<Q")
+HEAD_OFFSET = 64
+# lock, frame sequence, CLOCK_MONOTONIC timestamp (seconds)
+SLOT = struct.Struct("<QQd")
+SLOTS_OFFSET = 128
+# Frame data starts on a cache line
+SLOT_DATA = 64
+
+
+def ring_path(udp_port):
+    return RING_FILE.format(port=udp_port)
+
+
+def list_rings():
+    """Paths of the rings currently published on this machine."""
+    return sorted(glob.glob(RING_FILE.format(port="*")))
+
+
+def i420_size(width, height):
+    cw, ch = (width + 1) // 2, (height + 1) // 2
+    return width * height + 2 * cw * ch
+
+
+def _slot_stride(frame_size):
+    return (SLOT_DATA + frame_size + 63) // 64 * 64
+
+
+class FrameRingWriter:
+    """Producer side; only one writer per ring."""
+
+    def __init__(self, path, width, height, fps=30.0, slots=SLOTS):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.frame_size = i420_size(width, height)
+        self.fps = float(fps)
+        self.slots = slots
+        self.seq = 0
+        self._stride = _slot_stride(self.frame_size)
+
+        # Build the file aside and rename it in place, so readers never map
+        # a half-initialised ring
+        tmp = f"{path}.{os.getpid()}.tmp"
+        # Private to this user: the frames are the camera picture
+        fd = os.open(tmp, os.O_RDWR | os.O_CREAT | os.O_TRUNC | os.O_NOFOLLOW, 0o600)
+        os.fchmod(fd, 0o600)  # a stale file keeps its mode through O_CREAT
+        try:
+            os.ftruncate(fd, SLOTS_OFFSET + slots * self._stride)
+            self._map = mmap.mmap(fd, 0)
+        finally:
+            os.close(fd)
+        HEADER.pack_into(self._map, 0, MAGIC, b"I420", width, height,
+                         self.frame_size, slots, self.fps, 0)
+        os.replace(tmp, path)
+        self._inode = os.stat(path).st_ino
+
+    def publish(self, data, timestamp=None):
+        """Copy one frame (frame_size bytes) into the next slot."""
+        seq = self.seq + 1
+        offset = SLOTS_OFFSET + (seq % self.slots) * self._stride
+        lock = SLOT.unpack_from(self._map, offset)[0]
+        U64.pack_into(self._map, offset, lock + 1)
+        start = offset + SLOT_DATA
+        self._map[start:start + self.frame_size] = data
+        SLOT.pack_into(self._map, offset, lock + 2, seq,
+                       time.monotonic() if timestamp is None else timestamp)
+        U64.pack_into(self._map, HEAD_OFFSET, seq)
+        self.seq = seq
+
+    def close(self):
+        if self._map is None:
+            return
+        HEADER.pack_into(self._map, 0, MAGIC, b"I420", self.width, self.height,
+                         self.frame_size, self.slots, self.fps, 1)
+        self._map.close()
+        self._map = None
+        # A newer producer may already have replaced the file
+        try:
+            if os.stat(self.path).st_ino == self._inode:
+                os.unlink(self.path)
+        except OSError:
+            pass
+
+
+class FrameRingReader:
+    """Read-only consumer; never slows the producer down.
+
+    Typical use:
+
+        reader = FrameRingReader(ring_path(5000))
+        buf = reader.new_buffer()
+        while reader.alive:
+            info = reader.read_next(buf, timeout=1.0)
+            if info:
+                seq, timestamp = info
+                ...
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        magic, fourcc, self.width, self.height, self.frame_size, self.slots, self.fps, _ = \
+            HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a frame ring")
+        self.fourcc = fourcc.decode()
+        self._stride = _slot_stride(self.frame_size)
+        self.last_seq = self.head()
+        self.frames = 0
+        self.skipped = 0
+        self.retries = 0
+
+    @property
+    def alive(self):
+        return HEADER.unpack_from(self._map, 0)[-1] == 0
+
+    def head(self):
+        """Sequence number of the newest complete frame (0 = none yet)."""
+        return U64.unpack_from(self._map, HEAD_OFFSET)[0]
+
+    def new_buffer(self):
+        return bytearray(self.frame_size)
+
+    def _copy(self, seq, out):
+        """Copy frame seq into out; its timestamp, or None if overwritten."""
+        offset = SLOTS_OFFSET + (seq % self.slots) * self._stride
+        start = offset + SLOT_DATA
+        for _ in range(3):
+            lock, slot_seq, timestamp = SLOT.unpack_from(self._map, offset)
+            if slot_seq != seq:
+                return None
+            if lock & 1:
+                self.retries += 1
+                continue
+            out[:self.frame_size] = self._view[start:start + self.frame_size]
+            if U64.unpack_from(self._map, offset)[0] == lock:
+                return timestamp
+            self.retries += 1
+        return None
+
+    def _take(self, seq, out):
+        timestamp = self._copy(seq, out)
+        if timestamp is None:
+            return None
+        if seq > self.last_seq + 1:
+            self.skipped += seq - self.last_seq - 1
+        self.last_seq = seq
+        self.frames += 1
+        return seq, timestamp
+
+    def read_latest(self, out):
+        """Newest frame if it wasn't read yet: (seq, timestamp) or None."""
+        seq = self.head()
+        if seq <= self.last_seq:
+            return None
+        return self._take(seq, out)
+
+    def read_next(self, out, timeout=0.0):
+        """Next frame in order, skipping ahead if the ring lapped this reader.
+
+        Polls for up to timeout seconds; returns (seq, timestamp) or None.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            head = self.head()
+            if head > self.last_seq:
+                # Oldest frame that can still be in the ring
+                seq = max(self.last_seq + 1, head - self.slots + 2)
+                for candidate in range(seq, head + 1):
+                    info = self._take(candidate, out)
+                    if info:
+                        return info
+            if time.monotonic() >= deadline or not self.alive:
+                return None
+            time.sleep(0.002)
+
+    def close(self):
+        if self._map is not None:
+            self._view.release()
+            self._map.close()
+            self._map = None
@@ -0,0 +1,419 @@
+"""Per-frame processing stage between decode and the webcam outputs.
+
+run_webcam.sh puts this stage between two ffmpeg processes when plugins are
+enabled in the output profile:
+
+    gphoto2 | ffmpeg (decode, y4m) | frame_stage.py | ffmpeg (outputs)
+
+Frames travel as YUV4MPEG2 (I420), are read into one preallocated buffer and
+handed to the plugins as NumPy plane views, so no memory is allocated per
+frame. Every plugin has a time budget: a plugin that goes over it is first
+degraded (if it knows how) and otherwise skipped on the next frame, so the
+output framerate holds. Per-plugin timings are written to a JSON stats file
+once per second, and with --ring the frames are also published to a
+shared-memory ring for other local readers (utils/frame_ring.py).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+try:
+    from utils.autoframe import AutoFramer, load_detector
+    from utils.frame_ring import FrameRingWriter
+except ImportError:  # run as a script from utils/
+    from autoframe import AutoFramer, load_detector
+    from frame_ring import FrameRingWriter
+
+# Frames an over-budget plugin sits out before it is tried again
+SKIP_AFTER_OVERRUN = 1
+# Frames under half the budget before a degraded plugin is restored
+RESTORE_AFTER = 30
+
+
+class Frame:
+    """One I420 frame backed by a single reusable buffer."""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        cw, ch = (width + 1) // 2, (height + 1) // 2
+        self.size = width * height + 2 * cw * ch
+        self.buffer = bytearray(self.size)
+        data = np.frombuffer(self.buffer, dtype=np.uint8)
+        self.y = data[:width * height].reshape(height, width)
+        self.u = data[width * height:width * height + cw * ch].reshape(ch, cw)
+        self.v = data[width * height + cw * ch:].reshape(ch, cw)
+        self.planes = (self.y, self.u, self.v)
+        self.index = 0
+
+
+class Plugin:
+    """Base class: process(frame) edits the planes in place."""
+
+    name = "plugin"
+    can_degrade = False
+
+    def __init__(self, arg=None):
+        self.arg = arg
+        self.budget = 0.004
+        self.degraded = False
+        self.skip = 0
+        self.calls = 0
+        self.skipped = 0
+        self.overruns = 0
+        self.total = 0.0
+        self.worst = 0.0
+        self._calm = 0
+
+    def setup(self, frame):
+        """Allocate scratch buffers once the frame size is known."""
+
+    def process(self, frame):
+        raise NotImplementedError
+
+    def stats(self):
+        return {
+            "avg_ms": 1000 * self.total / self.calls if self.calls else 0.0,
+            "max_ms": 1000 * self.worst,
+            "budget_ms": 1000 * self.budget,
+            "calls": self.calls,
+            "skipped": self.skipped,
+            "overruns": self.overruns,
+            "degraded": self.degraded,
+        }
+
+
+class MirrorPlugin(Plugin):
+    name = "mirror"
+
+    def setup(self, frame):
+        self._scratch = [np.empty_like(p) for p in frame.planes]
+
+    def process(self, frame):
+        for plane, scratch in zip(frame.planes, self._scratch):
+            np.copyto(scratch, plane[:, ::-1])
+            np.copyto(plane, scratch)
+
+
+# Per-plane curves for the colour LUT presets, built once
+def _curve(fn):
+    x = np.arange(256, dtype=np.float32)
+    return np.clip(fn(x), 0, 255).astype(np.uint8)
+
+
+LUT_PRESETS = {
+    "warm": (lambda x: x, lambda x: x - 8, lambda x: x + 10),
+    "cool": (lambda x: x, lambda x: x + 10, lambda x: x - 8),
+    "contrast": (lambda x: (x - 128) * 1.25 + 128, lambda x: x, lambda x: x),
+    "mono": (lambda x: x, lambda x: x * 0 + 128, lambda x: x * 0 + 128),
+}
+
+
+class LutPlugin(Plugin):
+    """Colour look-up table on the Y, U and V planes (luma only when degraded)."""
+
+    name = "lut"
+    can_degrade = True
+
+    def setup(self, frame):
+        preset = LUT_PRESETS.get(self.arg or "warm", LUT_PRESETS["warm"])
+        self._luts = [_curve(fn) for fn in preset]
+        self._scratch = [np.empty_like(p) for p in frame.planes]
+
+    def process(self, frame):
+        planes = frame.planes[:1] if self.degraded else frame.planes
+        for plane, lut, scratch in zip(planes, self._luts, self._scratch):
+            np.take(lut, plane, out=scratch, mode="clip")
+            np.copyto(plane, scratch)
+
+
+class ImagePlugin(Plugin):
+    """Alpha-blends a picture (PNG, SVG...) into the frame.
+
+    The picture is converted to YUVA 4:2:0 once by ffmpeg. When degraded only
+    the luma plane is blended.
+    """
+
+    name = "overlay"
+    can_degrade = True
+    opacity = 1.0
+    corner = None  # None = full frame
+
+    def setup(self, frame):
+        self._region = None
+        if not self.arg or not os.path.exists(self.arg):
+            print(f"[Stage] {self.name}: image not found: {self.arg}", file=sys.stderr)
+            return
+        if self.corner:
+            w = frame.width // 5 // 2 * 2
+            h = -2  # keep aspect ratio, even height
+        else:
+            w, h = frame.width, frame.height
+        raw = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", self.arg,
+             "-vf", f"scale={w}:{h}", "-frames:v", "1", "-pix_fmt", "yuva420p",
+             "-f", "rawvideo", "-"],
+            capture_output=True
+        ).stdout
+        if not raw:
+            print(f"[Stage] {self.name}: could not read {self.arg}", file=sys.stderr)
+            return
+        h = len(raw) * 2 // (w * 5)
+        cw, ch = w // 2, h // 2
+        data = np.frombuffer(raw, dtype=np.uint8)
+        y = data[:w * h].reshape(h, w)
+        u = data[w * h:w * h + cw * ch].reshape(ch, cw)
+        v = data[w * h + cw * ch:w * h + 2 * cw * ch].reshape(ch, cw)
+        # Alpha scaled to 0..256 so that src * a + dst * (256 - a) >> 8 is exact
+        a = data[w * h + 2 * cw * ch:].reshape(h, w).astype(np.uint16)
+        a = (a * round(self.opacity * 256) + 127) // 255
+
+        margin = frame.height // 30 // 2 * 2
+        x0, y0 = (frame.width - w - margin, frame.height - h - margin) if self.corner else (0, 0)
+        self._region = (y0, x0, h, w)
+        # Premultiplied source and inverse alpha, per plane, kept as uint16
+        alphas = (a, a[::2, ::2])
+        self._src = [y * alphas[0], u * alphas[1], v * alphas[1]]
+        self._inv = [256 - alphas[0], 256 - alphas[1], 256 - alphas[1]]
+        self._scratch = [np.empty(s.shape, dtype=np.uint16) for s in self._src]
+
+    def process(self, frame):
+        if self._region is None:
+            return
+        y0, x0, h, w = self._region
+        views = (frame.y[y0:y0 + h, x0:x0 + w],
+                 frame.u[y0 // 2:(y0 + h) // 2, x0 // 2:(x0 + w) // 2],
+                 frame.v[y0 // 2:(y0 + h) // 2, x0 // 2:(x0 + w) // 2])
+        count = 1 if self.degraded else 3
+        for i in range(count):
+            tmp = self._scratch[i]
+            np.multiply(views[i], self._inv[i], out=tmp)
+            np.add(tmp, self._src[i], out=tmp)
+            np.right_shift(tmp, 8, out=tmp)
+            np.copyto(views[i], tmp, casting="unsafe")
+
+
+class WatermarkPlugin(ImagePlugin):
+    name = "watermark"
+    opacity = 0.6
+    corner = "bottom-right"
+
+
+class AutoFramePlugin(Plugin):
+    """Crops to the presenter (utils/autoframe.py) and scales back to full size.
+
+    Bilinear scaling; nearest-neighbour when degraded.
+    """
+
+    name = "autoframe"
+    can_degrade = True
+    framer = None
+
+    def setup(self, frame):
+        detector = load_detector()
+        if detector is None:
+            print(f"[Stage] {self.name}: OpenCV not available, frames left as they are", file=sys.stderr)
+            return
+        import cv2
+        self._cv2 = cv2
+        self.framer = AutoFramer(frame.width, frame.height, detector)
+        self._scratch = [np.empty_like(p) for p in frame.planes]
+
+    def process(self, frame):
+        if self.framer is None:
+            return
+        x, y, w, h = self.framer.update(frame.y, time.monotonic())
+        if (w, h) == (frame.width, frame.height):
+            return
+        cv2 = self._cv2
+        interpolation = cv2.INTER_NEAREST if self.degraded else cv2.INTER_LINEAR
+        for plane, scratch, div in zip(frame.planes, self._scratch, (1, 2, 2)):
+            crop = plane[y // div:(y + h) // div, x // div:(x + w) // div]
+            cv2.resize(crop, (scratch.shape[1], scratch.shape[0]), dst=scratch, interpolation=interpolation)
+            np.copyto(plane, scratch)
+
+    def stats(self):
+        stats = super().stats()
+        if self.framer:
+            stats.update(self.framer.stats())
+        return stats
+
+
+PLUGINS = {cls.name: cls for cls in (MirrorPlugin, LutPlugin, ImagePlugin, WatermarkPlugin, AutoFramePlugin)}
+
+
+def split_spec(spec):
+    """Items of a plugin spec; "\\," and "\\\\" stand for a comma and a backslash
+    inside an item (output_profiles.plugin_spec writes them)."""
+    items, item, chars = [], [], iter(spec or "")
+    for char in chars:
+        if char == "\\":
+            item.append(next(chars, ""))
+        elif char == ",":
+            items.append("".join(item))
+            item = []
+        else:
+            item.append(char)
+    items.append("".join(item))
+    return items
+
+
+def parse_plugins(spec):
+    """"mirror,lut:warm,watermark:/path/logo.png" -> plugin instances."""
+    plugins = []
+    for item in filter(None, (s.strip() for s in split_spec(spec))):
+        name, _, arg = item.partition(":")
+        cls = PLUGINS.get(name)
+        if cls is None:
+            print(f"[Stage] Unknown plugin '{name}', ignored", file=sys.stderr)
+            continue
+        plugins.append(cls(arg or None))
+    return plugins
+
+
+class PluginChain:
+    """Runs the plugins in order and enforces their time budgets."""
+
+    def __init__(self, plugins, fps=30, budget_ms=None):
+        self.plugins = plugins
+        if budget_ms is None:
+            # Half of the frame interval, shared between the plugins
+            budget_ms = 500.0 / fps / max(1, len(plugins))
+        for plugin in plugins:
+            plugin.budget = budget_ms / 1000.0
+        self.frames = 0
+
+    def setup(self, frame):
+        for plugin in self.plugins:
+            plugin.setup(frame)
+
+    def run(self, frame):
+        self.frames += 1
+        for plugin in self.plugins:
+            if plugin.skip:
+                plugin.skip -= 1
+                plugin.skipped += 1
+                continue
+            t0 = time.perf_counter()
+            plugin.process(frame)
+            elapsed = time.perf_counter() - t0
+            plugin.calls += 1
+            plugin.total += elapsed
+            plugin.worst = max(plugin.worst, elapsed)
+
+            if elapsed > plugin.budget:
+                plugin.overruns += 1
+                plugin._calm = 0
+                if plugin.can_degrade and not plugin.degraded:
+                    plugin.degraded = True
+                    print(f"[Stage] {plugin.name} over budget "
+                          f"({elapsed * 1000:.1f} ms), degraded", file=sys.stderr)
+                else:
+                    plugin.skip = SKIP_AFTER_OVERRUN
+            elif plugin.degraded and elapsed < plugin.budget / 2:
+                plugin._calm += 1
+                if plugin._calm >= RESTORE_AFTER:
+                    plugin.degraded = False
+                    plugin._calm = 0
+                    print(f"[Stage] {plugin.name} back to full quality", file=sys.stderr)
+
+    def stats(self):
+        return {plugin.name: plugin.stats() for plugin in self.plugins}
+
+
+class Y4MReader:
+    """Reads YUV4MPEG2 (C420) frames into a reusable Frame."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.header = stream.readline()
+        if not self.header.startswith(b"YUV4MPEG2"):
+            raise ValueError("input is not YUV4MPEG2")
+        params = {tok[:1]: tok[1:] for tok in self.header.split()[1:]}
+        self.width = int(params[b"W"])
+        self.height = int(params[b"H"])
+        num, _, den = params.get(b"F", b"30:1").partition(b":")
+        self.fps = int(num) / int(den or 1)
+        chroma = params.get(b"C", b"420")
+        if not chroma.startswith(b"420"):
+            raise ValueError(f"unsupported chroma {chroma.decode()} (need 420)")
+
+    def read_into(self, frame):
+        if not self.stream.readline().startswith(b"FRAME"):
+            return False
+        view = memoryview(frame.buffer)
+        got = 0
+        while got < frame.size:
+            n = self.stream.readinto(view[got:])
+            if not n:
+                return False
+            got += n
+        frame.index += 1
+        return True
+
+
+def run(reader, writer, chain, stats_path=None, ring_path=None):
+    frame = Frame(reader.width, reader.height)
+    chain.setup(frame)
+    ring = None
+    if ring_path:
+        # Processed frames are also shared with local readers
+        ring = FrameRingWriter(ring_path, reader.width, reader.height, reader.fps)
+    if writer:
+        writer.write(reader.header)
+    last_report = time.monotonic()
+    frames_at_report = 0
+    try:
+        while reader.read_into(frame):
+            chain.run(frame)
+            if ring:
+                ring.publish(frame.buffer)
+            if writer:
+                writer.write(b"FRAME\n")
+                writer.write(frame.buffer)
+            now = time.monotonic()
+            if stats_path and now - last_report >= 1.0:
+                fps = (chain.frames - frames_at_report) / (now - last_report)
+                _write_stats(stats_path, chain, fps)
+                last_report, frames_at_report = now, chain.frames
+        if writer:
+            writer.flush()
+    finally:
+        if ring:
+            ring.close()
+    return frame
+
+
+def _write_stats(path, chain, fps):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"frames": chain.frames, "fps": fps, "plugins": chain.stats()}, f)
+    os.replace(tmp, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    # The spec comes in the environment: it may hold any file name, which
+    # run_webcam.sh would otherwise have to quote for its shell strings
+    parser.add_argument("--plugins", default=os.environ.get("PLUGINS", ""),
+                        help="e.g. autoframe,mirror,lut:warm,watermark:/path/logo.png (default: $PLUGINS)")
+    parser.add_argument("--budget-ms", type=float, help="time budget per plugin and frame")
+    parser.add_argument("--stats", help="JSON file for per-plugin timings")
+    parser.add_argument("--ring", help="publish the frames to this shared-memory ring")
+    args = parser.parse_args(argv)
+
+    reader = Y4MReader(sys.stdin.buffer)
+    chain = PluginChain(parse_plugins(args.plugins), reader.fps, args.budget_ms)
+    try:
+        run(reader, sys.stdout.buffer, chain, args.stats, args.ring)
+    except BrokenPipeError:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,399 @@
+"""Virtual webcam devices on demand through a privileged helper.
+
+Loading v4l2loopback with a fixed number of devices needs a password
+prompt (bigsudo modprobe) and a reload whenever the parameters are wrong.
+Instead, this module run as root is a small D-Bus activated helper on the
+system bus that keeps the module loaded (devices=0) and adds or removes
+single devices through the module's control node, /dev/v4l2loopback:
+
+    big-digicam --Add("Canon EOS 600D")--> helper --LOOPBACK_CTL_ADD--> /dev/video10
+
+An ioctl takes well under a millisecond; the reply waits only for udev to
+create the device node. Callers are checked with polkit (active local
+sessions need no password, see org.biglinux.big-digicam.policy), once per
+connection. Devices belong to the caller's bus connection: when the app
+exits or crashes the helper removes them, and a device still open by
+another program (a video call) is removed as soon as it is closed.
+
+FakeLoopback stands in for the kernel module: with --fake the helper runs
+the same protocol on the session bus without root, the module or polkit.
+"""
+import argparse
+import errno
+import fcntl
+import os
+import struct
+import subprocess
+import tempfile
+import time
+
+BUS_NAME = "org.biglinux.BigDigicam.Loopback"
+OBJECT_PATH = "/org/biglinux/BigDigicam/Loopback"
+INTERFACE = BUS_NAME
+POLKIT_ACTION = "org.biglinux.big-digicam.loopback"
+ERROR_FAILED = f"{INTERFACE}.Error.Failed"
+ERROR_DENIED = f"{INTERFACE}.Error.NotAuthorized"
+
+INTROSPECTION = f"""
+<node>
+  <interface name="{INTERFACE}">
+    <method name="Add">
+      <arg type="s" name="label" direction="in"/>
+      <arg type="i" name="number" direction="out"/>
+      <arg type="s" name="device" direction="out"/>
+    </method>
+    <method name="Remove">
+      <arg type="i" name="number" direction="in"/>
+    </method>
+    <method name="List">
+      <arg type="a(iss)" name="devices" direction="out"/>
+    </method>
+  </interface>
+</node>
+"""
+
+CONTROL_NODE = "/dev/v4l2loopback"
+# linux/v4l2loopback.h
+CTL_ADD = 0x4C80
+CTL_REMOVE = 0x4C81
+# struct v4l2_loopback_config: output_nr, unused (capture_nr), card_label,
+# min/max width/height, max_buffers, max_openers, debug, announce_all_caps
+CONFIG = struct.Struct("<ii32sIIIIiiii")
+MAX_BUFFERS = 4
+LABEL_MAX = 31
+DEFAULT_LABEL = "Canon DSLR Webcam"
+
+# One main output plus the extra outputs of a profile, and a compositor
+MAX_PER_OWNER = 5
+MAX_DEVICES = 16
+# Seconds to wait for udev to create /dev/videoN
+NODE_TIMEOUT = 2.0
+# Seconds between attempts to remove devices that were still open
+ORPHAN_RETRY = 5
+# The helper exits after this many idle seconds without devices
+IDLE_EXIT = 60
+CALL_TIMEOUT_MS = 10000
+
+
+class LoopbackError(Exception):
+    pass
+
+
+class KernelLoopback:
+    """v4l2loopback's control node (root only)."""
+
+    def __init__(self):
+        if not os.path.exists(CONTROL_NODE):
+            # Loaded once with no devices of its own; the helper adds them
+            subprocess.run(["modprobe", "v4l2loopback", "devices=0", "exclusive_caps=1",
+                            f"max_buffers={MAX_BUFFERS}"], check=False)
+            _wait_for(CONTROL_NODE)
+        self.fd = os.open(CONTROL_NODE, os.O_RDWR)
+
+    def add(self, label):
+        config = bytearray(CONFIG.pack(
+            -1, -1, label.encode()[:LABEL_MAX],
+            0, 0, 0, 0,           # sizes: module defaults
+            MAX_BUFFERS, -1, -1,  # max_openers, debug: module defaults
+            0,                    # announce_all_caps=0 is exclusive_caps=1 (for browsers)
+        ))
+        number = fcntl.ioctl(self.fd, CTL_ADD, config)
+        path = self.path(number)
+        _wait_for(path)
+        return number, path
+
+    def remove(self, number):
+        fcntl.ioctl(self.fd, CTL_REMOVE, number)
+
+    def path(self, number):
+        return f"/dev/video{number}"
+
+
+class FakeLoopback:
+    """Stand-in for the kernel module: devices are files in a temp directory.
+
+    Numbers in busy behave like devices kept open by a program (EBUSY).
+    """
+
+    def __init__(self, first=50):
+        self.dir = tempfile.mkdtemp(prefix="big-digicam-loopback-")
+        self.next = first
+        self.labels = {}
+        self.busy = set()
+
+    def add(self, label):
+        number = self.next
+        self.next += 1
+        self.labels[number] = label
+        path = self.path(number)
+        open(path, "w").close()
+        return number, path
+
+    def remove(self, number):
+        if number not in self.labels:
+            raise OSError(errno.EINVAL, "no such device")
+        if number in self.busy:
+            raise OSError(errno.EBUSY, "device in use")
+        del self.labels[number]
+        os.unlink(self.path(number))
+
+    def path(self, number):
+        return os.path.join(self.dir, f"video{number}")
+
+
+def _wait_for(path, timeout=NODE_TIMEOUT):
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path) and time.monotonic() < deadline:
+        time.sleep(0.002)
+
+
+class LoopbackService:
+    """The helper's bookkeeping: which connection owns which device.
+
+    owner is the caller's unique bus name. Kept free of D-Bus so the rules
+    can be exercised directly (see the loopback benchmark).
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.owners = {}      # owner -> {number: (path, label)}
+        self.orphans = set()  # released while still open somewhere
+
+    def count(self):
+        return sum(len(devices) for devices in self.owners.values()) + len(self.orphans)
+
+    def add(self, owner, label):
+        devices = self.owners.get(owner, {})
+        if len(devices) >= MAX_PER_OWNER:
+            raise LoopbackError(f"at most {MAX_PER_OWNER} devices per client")
+        if self.count() >= MAX_DEVICES:
+            raise LoopbackError(f"at most {MAX_DEVICES} devices")
+        label = (label.strip() or DEFAULT_LABEL)[:LABEL_MAX]
+        try:
+            number, path = self.backend.add(label)
+        except OSError as e:
+            raise LoopbackError(f"could not add a device: {e.strerror or e}")
+        self.owners.setdefault(owner, {})[number] = (path, label)
+        return number, path
+
+    def remove(self, owner, number):
+        if number not in self.owners.get(owner, {}):
+            raise LoopbackError(f"device {number} does not belong to this client")
+        del self.owners[owner][number]
+        if not self.owners[owner]:
+            del self.owners[owner]
+        self._remove(number)
+
+    def release(self, owner):
+        """Remove every device of owner (its connection went away)."""
+        self._remove_all(self.owners.pop(owner, {}))
+
+    def retry_orphans(self):
+        numbers = list(self.orphans)
+        self.orphans.difference_update(numbers)
+        self._remove_all(numbers)
+        return bool(self.orphans)
+
+    def _remove_all(self, numbers):
+        """Try every device, then report the ones that failed together."""
+        errors = []
+        for number in numbers:
+            try:
+                self._remove(number)
+            except LoopbackError as e:
+                errors.append(str(e))
+        if errors:
+            raise LoopbackError("; ".join(errors))
+
+    def _remove(self, number):
+        try:
+            self.backend.remove(number)
+        except OSError as e:
+            if e.errno != errno.EBUSY:
+                raise LoopbackError(f"could not remove device {number}: {e.strerror or e}")
+            self.orphans.add(number)
+
+    def list(self):
+        return [(number, path, owner)
+                for owner, devices in self.owners.items()
+                for number, (path, _label) in devices.items()]
+
+
+class LoopbackClient:
+    """The app's side: blocking D-Bus calls, so use it off the UI thread.
+
+    BIG_DIGICAM_LOOPBACK=session talks to a helper started with --fake on
+    the session bus instead of the system one.
+    """
+
+    def __init__(self, bus=None):
+        from gi.repository import Gio, GLib
+
+        self._Gio, self._GLib = Gio, GLib
+        bus = bus or os.environ.get("BIG_DIGICAM_LOOPBACK", "system")
+        bus_type = Gio.BusType.SESSION if bus == "session" else Gio.BusType.SYSTEM
+        try:
+            self._bus = Gio.bus_get_sync(bus_type, None)
+        except GLib.Error as e:
+            raise LoopbackError(e.message)
+
+    def _call(self, method, args, reply_type):
+        GLib = self._GLib
+        try:
+            reply = self._bus.call_sync(
+                BUS_NAME, OBJECT_PATH, INTERFACE, method, args, GLib.VariantType(reply_type),
+                self._Gio.DBusCallFlags.ALLOW_INTERACTIVE_AUTHORIZATION, CALL_TIMEOUT_MS, None
+            )
+        except GLib.Error as e:
+            # "GDBus.Error:<name>: <message>" for errors sent by the helper
+            message = e.message
+            if message.startswith("GDBus.Error:"):
+                message = message.partition(": ")[2]
+            raise LoopbackError(message)
+        return reply.unpack()
+
+    def add(self, label):
+        """(number, /dev/videoN) of a new device, owned by this connection."""
+        return self._call("Add", self._GLib.Variant("(s)", (label,)), "(is)")
+
+    def remove(self, number):
+        self._call("Remove", self._GLib.Variant("(i)", (number,)), "()")
+
+    def list(self):
+        return self._call("List", None, "(a(iss))")[0]
+
+
+class Helper:
+    """LoopbackService on D-Bus, with polkit checks and owner tracking."""
+
+    def __init__(self, service, bus_type, check_polkit=True):
+        from gi.repository import Gio, GLib
+
+        self.Gio, self.GLib = Gio, GLib
+        self.service = service
+        self.check_polkit = check_polkit
+        self.authorized = set()
+        self.loop = GLib.MainLoop()
+        self.last_call = time.monotonic()
+        self.calls = 0
+        self.bus = Gio.bus_get_sync(bus_type, None)
+        info = Gio.DBusNodeInfo.new_for_xml(INTROSPECTION).interfaces[0]
+        self.bus.register_object(OBJECT_PATH, info, self._on_call)
+        self.bus.signal_subscribe(
+            "org.freedesktop.DBus", "org.freedesktop.DBus", "NameOwnerChanged",
+            "/org/freedesktop/DBus", None, Gio.DBusSignalFlags.NONE, self._on_name_owner_changed
+        )
+        Gio.bus_own_name_on_connection(self.bus, BUS_NAME, Gio.BusNameOwnerFlags.NONE, None,
+                                       lambda *args: self.loop.quit())
+        GLib.timeout_add_seconds(ORPHAN_RETRY, self._on_timer)
+
+    def run(self):
+        self.loop.run()
+
+    def _on_call(self, connection, sender, path, interface, method, params, invocation):
+        self.last_call = time.monotonic()
+        if method == "List":
+            invocation.return_value(self.GLib.Variant("(a(iss))", (self.service.list(),)))
+        elif not self.check_polkit or sender in self.authorized:
+            self._dispatch(sender, method, params.unpack(), invocation)
+        else:
+            self._authorize(sender, method, params.unpack(), invocation)
+
+    def _authorize(self, sender, method, args, invocation):
+        GLib = self.GLib
+        subject = ("system-bus-name", {"name": GLib.Variant("s", sender)})
+        # Flag 1: allow interaction (a password prompt for inactive sessions)
+        request = GLib.Variant("((sa{sv})sa{ss}us)", (subject, POLKIT_ACTION, {}, 1, ""))
+
+        def on_checked(bus, result):
+            try:
+                (allowed, _challenge, _details), = bus.call_finish(result).unpack()
+            except GLib.Error as e:
+                invocation.return_dbus_error(ERROR_DENIED, e.message)
+                return
+            if not allowed:
+                invocation.return_dbus_error(ERROR_DENIED, "not authorized")
+                return
+            # The caller may have left while polkit asked: its NameOwnerChanged
+            # came before it owned anything, and nothing would release a device
+            # added now. The bus answers in order, so a departure after this
+            # reply is still seen by _on_name_owner_changed.
+            bus.call("org.freedesktop.DBus", "/org/freedesktop/DBus", "org.freedesktop.DBus",
+                     "NameHasOwner", GLib.Variant("(s)", (sender,)), GLib.VariantType("(b)"),
+                     self.Gio.DBusCallFlags.NONE, -1, None, on_owner)
+
+        def on_owner(bus, result):
+            try:
+                (present,) = bus.call_finish(result).unpack()
+            except GLib.Error as e:
+                invocation.return_dbus_error(ERROR_FAILED, e.message)
+                return
+            if not present:
+                print(f"[Loopback] {sender} left during the authorization check", flush=True)
+                return
+            self.authorized.add(sender)
+            self._dispatch(sender, method, args, invocation)
+
+        self.bus.call(
+            "org.freedesktop.PolicyKit1", "/org/freedesktop/PolicyKit1/Authority",
+            "org.freedesktop.PolicyKit1.Authority", "CheckAuthorization", request,
+            GLib.VariantType("((bba{ss}))"), self.Gio.DBusCallFlags.NONE, -1, None, on_checked
+        )
+
+    def _dispatch(self, sender, method, args, invocation):
+        GLib = self.GLib
+        self.calls += 1
+        try:
+            if method == "Add":
+                t0 = time.perf_counter()
+                number, path = self.service.add(sender, args[0])
+                print(f"[Loopback] {path} for {sender} in {1000 * (time.perf_counter() - t0):.1f} ms",
+                      flush=True)
+                invocation.return_value(GLib.Variant("(is)", (number, path)))
+            elif method == "Remove":
+                self.service.remove(sender, args[0])
+                invocation.return_value(None)
+        except LoopbackError as e:
+            invocation.return_dbus_error(ERROR_FAILED, str(e))
+
+    def _on_name_owner_changed(self, connection, sender, path, interface, signal, params):
+        name, _old, new = params.unpack()
+        if new or not name.startswith(":"):
+            return
+        self.authorized.discard(name)
+        if name in self.service.owners:
+            print(f"[Loopback] {name} left, removing its devices", flush=True)
+            try:
+                self.service.release(name)
+            except LoopbackError as e:
+                print(f"[Loopback] {e}", flush=True)
+
+    def _on_timer(self):
+        try:
+            self.service.retry_orphans()
+        except LoopbackError as e:
+            print(f"[Loopback] {e}", flush=True)
+        if not self.service.count() and time.monotonic() - self.last_call > IDLE_EXIT:
+            # D-Bus activation starts us again on the next call
+            self.loop.quit()
+            return False
+        return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fake", action="store_true",
+                        help="stand-in devices on the session bus (no root, module or polkit)")
+    args = parser.parse_args(argv)
+
+    from gi.repository import Gio
+
+    if args.fake:
+        helper = Helper(LoopbackService(FakeLoopback()), Gio.BusType.SESSION, check_polkit=False)
+    else:
+        helper = Helper(LoopbackService(KernelLoopback()), Gio.BusType.SYSTEM)
+    helper.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import threading
+import time
+
+
+class OpenCvCapture:
+    """Reads a V4L2 device with OpenCV on its own thread.
+
+    Frames are read straight into two preallocated BGR buffers (OpenCV's
+    native order, shown as-is with Gdk.MemoryFormat.B8G8R8, so there is no
+    colour conversion). The newest frame waits in a single slot: if the UI
+    is slower than the camera, older frames are simply overwritten.
+    """
+
+    def __init__(self, device_index):
+        self.device_index = device_index
+        self.width = 0
+        self.height = 0
+        self.frames_read = 0
+        self._cap = None
+        self._buffers = None
+        self._front = 0
+        self._fresh = False
+        self._lock = threading.Lock()
+        self._running = threading.Event()
+        self._resumed = threading.Event()
+        self._resumed.set()
+        self._thread = None
+
+    def open(self):
+        import cv2
+        self._cap = cv2.VideoCapture(self.device_index, cv2.CAP_V4L2)
+        if not self._cap.isOpened():
+            self._cap = None
+            return False
+        self._running.set()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return True
+
+    def _run(self):
+        import numpy as np
+        back = None
+        while self._running.is_set():
+            # Hidden preview: stop pulling frames until resumed
+            if not self._resumed.wait(0.2):
+                continue
+            if back is None:
+                ret, frame = self._cap.read()
+                if not ret:
+                    time.sleep(0.01)
+                    continue
+                self.height, self.width = frame.shape[:2]
+                self._buffers = [np.empty_like(frame), frame]
+                back = 0
+                self._front = 1
+            else:
+                ret, frame = self._cap.read(self._buffers[back])
+                if not ret:
+                    time.sleep(0.01)
+                    continue
+                if frame is not self._buffers[back]:
+                    # Size changed (new format on the device): adopt it. The
+                    # front buffer is replaced under the lock, so take() never
+                    # sees it change, and its old frame is no longer offered.
+                    buffers = [None, None]
+                    buffers[back] = frame
+                    buffers[1 - back] = np.empty_like(frame)
+                    with self._lock:
+                        self.height, self.width = frame.shape[:2]
+                        self._buffers = buffers
+                        self._fresh = False
+            with self._lock:
+                self._front, back = back, self._front
+                self._fresh = True
+            self.frames_read += 1
+
+    def take(self, consume):
+        """Call consume(buffer, width, height) with the newest unseen frame.
+
+        Runs under the handoff lock, so consume must copy what it needs.
+        Returns its result, or None when no new frame arrived.
+        """
+        with self._lock:
+            if not self._fresh:
+                return None
+            self._fresh = False
+            buf = self._buffers[self._front]
+            return consume(buf, buf.shape[1], buf.shape[0])
+
+    def set_paused(self, paused):
+        if paused:
+            self._resumed.clear()
+        else:
+            self._resumed.set()
+
+    def stop(self):
+        self._running.clear()
+        self._resumed.set()
+        if self._thread:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
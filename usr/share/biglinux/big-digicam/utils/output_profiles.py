@@ -0,0 +1,241 @@
+import os
+
+from utils import roi as roi_filters
+from utils.i18n import _
+from utils.settings import config_dir, load_json, save_json
+
+# Pixel formats offered on the virtual webcam, mapped to ffmpeg pix_fmt names
+PIXEL_FORMATS = {
+    "I420": "yuv420p",
+    "NV12": "nv12",
+    "YUYV": "yuyv422",
+    "MJPEG": "yuvj422p",
+}
+
+# (width, height); (0, 0) keeps the camera's native live view size
+RESOLUTIONS = [(0, 0), (1920, 1080), (1280, 720), (960, 540), (640, 360)]
+FRAMERATES = [30, 25, 24, 15]
+
+# How the 3:2 live view becomes a fixed size of another shape (16:9):
+# "crop" fills the frame and trims the top and bottom, "pad" shows the
+# whole picture between black bars. Never stretched.
+FIT_MODES = ["crop", "pad"]
+
+# "fixed": ffmpeg duplicates/drops frames to hit "fps" exactly (old behaviour).
+# "source": frames keep the camera's arrival timestamps and are never
+# duplicated by ffmpeg; if "min_fps" is set, v4l2loopback repeats the last
+# frame for readers only when the camera falls below that rate.
+PACING_MODES = ["fixed", "source"]
+MIN_FRAMERATES = [0, 5, 10, 15]
+
+# v4l2loopback is loaded with 4 devices: the main output plus up to 3 more
+MAX_EXTRA_OUTPUTS = 3
+
+DEFAULT_PROFILE = {
+    "format": "I420", "width": 0, "height": 0, "fps": 30, "fit": "crop",
+    "pacing": "fixed", "min_fps": 0,
+    "roi": roi_filters.DEFAULT_ROI,
+    # Frame stage plugins, e.g. ["mirror", "lut:warm"] (see utils/frame_stage.py)
+    "plugins": [],
+    # Publish decoded frames to a shared-memory ring (utils/frame_ring.py)
+    "share_frames": False,
+    # More virtual webcams fed by the same decode, each its own size and
+    # rate: [{"width": 640, "height": 360, "fps": 15}, ...]
+    "extra_outputs": [],
+    # Serve the preview stream over HTTP to the LAN (utils/stream_server.py)
+    "network_stream": False,
+}
+
+PROFILES_FILE = "output_profiles.json"
+
+
+def _profiles_path():
+    return os.path.join(config_dir(), PROFILES_FILE)
+
+
+def load_profile(camera_model):
+    """Saved output profile for a camera model, or the default one."""
+    profiles = load_json(_profiles_path(), {})
+    profile = dict(DEFAULT_PROFILE)
+    profile.update(profiles.get(camera_model or "", {}))
+    return profile
+
+
+def save_profile(camera_model, profile):
+    profiles = load_json(_profiles_path(), {})
+    profiles[camera_model or ""] = profile
+    save_json(_profiles_path(), profiles)
+
+
+def describe(profile):
+    size = _("nativa") if not profile["width"] else f"{profile['width']}x{profile['height']}"
+    if profile["pacing"] == "source":
+        rate = _("ritmo da câmera")
+        if profile["min_fps"]:
+            rate += f" (min {profile['min_fps']} fps)"
+    else:
+        rate = f"{profile['fps']} fps"
+    text = f"{profile['format']} {size} @ {rate}"
+    if profile["width"] and profile.get("fit") == "pad":
+        text += f" ({_('com bordas')})"
+    for extra in extra_outputs(profile):
+        text += f" + {describe_output(extra)}"
+    return text
+
+
+def describe_output(output):
+    size = _("nativa") if not output["width"] else f"{output['width']}x{output['height']}"
+    return f"{size}@{output['fps']}"
+
+
+def parse_output(text):
+    """{"width", "height", "fps"} of "640x360@15" ("native@15" keeps the size)."""
+    size, _sep, fps = text.partition("@")
+    width, height = (0, 0) if size == "native" else map(int, size.split("x"))
+    return {"width": width, "height": height, "fps": int(fps or 30)}
+
+
+def extra_outputs(profile):
+    return list(profile.get("extra_outputs") or [])[:MAX_EXTRA_OUTPUTS]
+
+
+def _shares_scaler(profile):
+    return PIXEL_FORMATS.get(profile["format"]) == "yuv420p" and not profile["width"]
+
+
+def roi_scalers(profile):
+    """Scale filter instances that follow the ROI crop in ffmpeg_filter()."""
+    return roi_filters.SCALERS_SHARED if _shares_scaler(profile) else roi_filters.SCALERS_SPLIT
+
+
+def roi_scaler_sizes(profile, crop_size):
+    """Output size of each roi_scalers() instance, for live ROI changes.
+
+    crop_size is the size the native outputs started with (the preview's):
+    they keep it while the crop moves, an encoder can't change size mid-stream.
+    """
+    fixed = (profile["width"], profile["height"]) if profile["width"] else crop_size
+    sizes = {"scale@roi_v4l2": fixed, "scale@roi_preview": crop_size}
+    return {name: sizes[name] for name in roi_scalers(profile)}
+
+
+def _scale_size(width, height):
+    if width:
+        return f"w={width}:h={height}"
+    # Native size: the crop as it is (even, for yuv420p), never scaled back up
+    return "w=trunc(iw/2)*2:h=trunc(ih/2)*2"
+
+
+def _scaler(label, width, height, fit, pix_fmt):
+    """scale filter (label, e.g. "scale@roi_v4l2") to an output's size and
+    pixel format; a fixed size keeps the picture's shape as fit says."""
+    size = _scale_size(width, height)
+    if not width:
+        return f"{label}={size}:flags=bilinear,format={pix_fmt}"
+    # crop and pad keep their input's format, so the scaler still converts
+    # straight to pix_fmt (pad takes an extra conversion only for the
+    # packed formats it can't draw into)
+    if fit == "pad":
+        return (f"{label}={size}:force_original_aspect_ratio=decrease:force_divisible_by=2:"
+                f"flags=bilinear,pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,format={pix_fmt}")
+    return (f"{label}={size}:force_original_aspect_ratio=increase:force_divisible_by=2:"
+            f"flags=bilinear,crop={width}:{height},format={pix_fmt}")
+
+
+def extra_pix_fmt(profile):
+    """Pixel format of the extra outputs: the main one unless it is encoded (MJPEG)."""
+    return "yuv420p" if profile["format"] == "MJPEG" else PIXEL_FORMATS.get(profile["format"], "yuv420p")
+
+
+def ffmpeg_filter(profile, zmq_port=None):
+    """Filter graph for the ffmpeg outputs: [v1] -> v4l2, [v2] -> preview,
+    and [x0], [x1]... -> the extra v4l2 devices.
+
+    The ROI crop comes first, right after decode (cropping only moves data
+    pointers), so the scalers convert just the cropped pixels. Only outputs
+    with a fixed size are scaled; native outputs and the preview keep the
+    crop's size, so zooming in shrinks everything downstream. Scaling and
+    pixel format conversion of each branch are done by one scale filter (a
+    single swscale pass); the preview branch stays yuv420p for mpeg1video.
+    Extra outputs branch off the same cropped frames, so the camera is
+    decoded once however many outputs there are; each branch drops to its
+    own rate (fps) before scaling, so a 15 fps output only scales 15 frames
+    a second. When zmq_port is given the crop and scalers can be changed live.
+    """
+    pix_fmt = PIXEL_FORMATS.get(profile["format"], "yuv420p")
+    roi = profile["roi"]
+    fit = profile.get("fit", "crop")
+    chain = roi_filters.crop_filter(roi)
+    if zmq_port:
+        chain = roi_filters.zmq_filter(zmq_port) + "," + chain
+
+    extras = extra_outputs(profile)
+    if extras:
+        labels = "".join(f"[e{i}]" for i in range(len(extras)))
+        head = f"[0:v]{chain},split={len(extras) + 1}[main]{labels};"
+        for i, extra in enumerate(extras):
+            scaler = _scaler("scale", extra["width"], extra["height"], fit, extra_pix_fmt(profile))
+            head += f"[e{i}]fps={extra['fps']},{scaler}[x{i}];"
+        head += "[main]"
+    else:
+        head = f"[0:v]{chain},"
+
+    width, height = profile["width"], profile["height"]
+
+    if _shares_scaler(profile):
+        # Both branches want the same frames: convert once, then split
+        return f"{head}{_scaler('scale@roi_v4l2', width, height, fit, 'yuv420p')},split=2[v1][v2]"
+
+    return (f"{head}split=2[s1][s2];"
+            f"[s1]{_scaler('scale@roi_v4l2', width, height, fit, pix_fmt)}[v1];"
+            f"[s2]{_scaler('scale@roi_preview', 0, 0, fit, 'yuv420p')}[v2]")
+
+
+def ffmpeg_codec_args(profile):
+    """Codec arguments for the v4l2 output (raw unless MJPEG was chosen)."""
+    if profile["format"] == "MJPEG":
+        return ["-c:v", "mjpeg", "-q:v", "3"]
+    return []
+
+
+def ffmpeg_pacing_args(profile, liveview_fps=None):
+    """(input options, v4l2 output rate options, preview output rate options).
+
+    The preview never runs faster than the camera's live view (liveview_fps,
+    when known): above it every extra frame would be a duplicate to encode.
+    """
+    if profile["pacing"] == "source":
+        # Timestamp frames on arrival from the gphoto2 pipe and pass them on
+        # untouched: no duplicates to convert or encode.
+        passthrough = ["-fps_mode", "passthrough"]
+        return ["-use_wallclock_as_timestamps", "1"], passthrough, passthrough
+    return [], ["-r", str(profile["fps"])], ["-r", str(min(30, liveview_fps or 30))]
+
+
+def plugin_spec(plugins):
+    """Comma separated plugins for frame_stage.py; commas and backslashes
+    in an argument (a watermark's file name) are escaped with a backslash."""
+    return ",".join(p.replace("\\", "\\\\").replace(",", "\\,") for p in plugins)
+
+
+def rate_converted_outputs(profile):
+    """Outputs held at a fixed rate (-r), where ffmpeg duplicates and drops
+    frames; extra outputs always pass frames through."""
+    _in_opts, v4l2_rate, udp_rate = ffmpeg_pacing_args(profile)
+    return sum(1 for rate in (v4l2_rate, udp_rate) if "-r" in rate)
+
+
+def script_env(profile, zmq_port=None, liveview_fps=None):
+    """Environment understood by run_webcam.sh to apply a profile."""
+    in_opts, v4l2_rate, udp_rate = ffmpeg_pacing_args(profile, liveview_fps)
+    return {
+        "OUT_FILTER": ffmpeg_filter(profile, zmq_port),
+        "OUT_CODEC": " ".join(ffmpeg_codec_args(profile)),
+        "IN_OPTS": " ".join(in_opts),
+        "V4L2_RATE": " ".join(v4l2_rate),
+        "UDP_RATE": " ".join(udp_rate),
+        "MIN_FPS": str(profile["min_fps"] if profile["pacing"] == "source" else 0),
+        "PLUGINS": plugin_spec(profile["plugins"]),
+        "SHARE_FRAMES": "1" if profile["share_frames"] else "0",
+        "EXTRA_OUTPUTS": str(len(extra_outputs(profile))),
+    }
@@ -0,0 +1,112 @@
+import json
+import os
+
+# Written by ffmpeg (-progress) in run_webcam.sh
+PROGRESS_FILE = "/tmp/canon_webcam_progress_{port}.txt"
+# Emptied by the reader once its blocks take this much space
+PROGRESS_MAX_BYTES = 1 << 20
+# Written by utils/frame_stage.py when plugins are enabled
+STAGE_FILE = "/tmp/canon_webcam_stage_{port}.json"
+# Written by utils/stream_server.py when the network stream is on
+NET_FILE = "/tmp/canon_webcam_net_{port}.json"
+# Written by utils/compositor.py (one compositor for all instances)
+COMPOSITOR_FILE = "/tmp/canon_webcam_compositor.json"
+
+
+def parse_progress(text):
+    """Last complete key=value block of an ffmpeg -progress stream."""
+    block = {}
+    last = {}
+    for line in text.splitlines():
+        key, sep, value = line.partition("=")
+        if not sep:
+            continue
+        block[key.strip()] = value.strip()
+        if key == "progress":
+            last = block
+            block = {}
+    return last
+
+
+def _int(block, key):
+    try:
+        return int(block.get(key, 0))
+    except ValueError:
+        return 0
+
+
+def stats_from_progress(block, outputs):
+    """Frame counters of one -progress block.
+
+    "frames" is what the virtual webcam received; ffmpeg sums duplicates and
+    drops over the outputs held at a fixed rate (outputs of them, see
+    output_profiles.rate_converted_outputs), so the per-output share is used
+    to estimate how many of those frames really came from the camera.
+    """
+    frames = _int(block, "frame")
+    dup = _int(block, "dup_frames") // max(1, outputs)
+    drop = _int(block, "drop_frames") // max(1, outputs)
+    try:
+        fps = float(block.get("fps", 0))
+    except ValueError:
+        fps = 0.0
+    return {
+        "frames": frames,
+        "fps": fps,
+        "dup": dup,
+        "drop": drop,
+        "real": max(0, frames - dup + drop),
+    }
+
+
+def read_stats(udp_port, outputs):
+    """Current counters of the pipeline serving udp_port, or None.
+
+    outputs is the number of outputs held at a fixed rate. ffmpeg appends
+    a block every second for the whole session, so once the file takes
+    PROGRESS_MAX_BYTES it is emptied here. ffmpeg keeps writing at its own
+    offset, which leaves a hole in front (no space used) and the newest
+    blocks at the end, where they are read.
+    """
+    path = PROGRESS_FILE.format(port=udp_port)
+    try:
+        with open(path, "rb") as f:
+            # Only the tail matters
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - 4096))
+            text = f.read().decode(errors="replace")
+            if os.fstat(f.fileno()).st_blocks * 512 > PROGRESS_MAX_BYTES:
+                os.truncate(path, 0)
+    except OSError:
+        return None
+    block = parse_progress(text.replace("\0", ""))
+    if not block:
+        return None
+    return stats_from_progress(block, outputs)
+
+
+def read_stage_stats(udp_port):
+    """Per-plugin timings of the frame stage, or None when it isn't running."""
+    try:
+        with open(STAGE_FILE.format(port=udp_port)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def read_net_stats(udp_port):
+    """Clients and throughput of the network stream, or None when it is off."""
+    try:
+        with open(NET_FILE.format(port=udp_port)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def read_compositor_stats():
+    """Composite timings and per-camera picture age, or None when it is off."""
+    try:
+        with open(COMPOSITOR_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
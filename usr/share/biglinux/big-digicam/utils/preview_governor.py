@@ -0,0 +1,126 @@
+import time
+
+from utils.sysstat import CpuSampler, load_per_cpu
+
+# Preview quality steps, from best to cheapest. "scale" is applied to the
+# source resolution, "fps" caps the preview rate (None = source rate) and a
+# level with fps 0 pauses the preview entirely. The v4l2loopback output is
+# produced by ffmpeg and is never affected by these levels.
+PREVIEW_LEVELS = [
+    {"name": "full", "scale": 1.0, "fps": None},
+    {"name": "3/4", "scale": 0.75, "fps": None},
+    {"name": "1/2", "scale": 0.5, "fps": None},
+    {"name": "1/2@15", "scale": 0.5, "fps": 15},
+    {"name": "1/4@10", "scale": 0.25, "fps": 10},
+    {"name": "paused", "scale": 0.0, "fps": 0},
+]
+
+# Thresholds
+CPU_HIGH = 0.85        # system busy fraction considered "starving"
+CPU_LOW = 0.60         # below this there is headroom to step back up
+LOAD_HIGH = 1.0        # runnable tasks per CPU
+LATENESS_HIGH = 0.100  # seconds between frame arrival and display
+LATENESS_LOW = 0.030
+FPS_RATIO_LOW = 0.6    # shown fps below 60% of expected means trouble
+
+DOWN_TICKS = 2         # consecutive pressured ticks before stepping down
+UP_TICKS = 5           # consecutive calm ticks before stepping up
+UP_TICKS_MAX = 60
+
+
+class PreviewGovernor:
+    """Degrades the GTK preview in steps when the machine is under pressure.
+
+    Feed it with frame_arrived() from the streaming thread and frame_shown()
+    from the UI thread, and call tick() once per second from the main loop.
+    on_change(level) is called (on the main loop) whenever the level moves.
+    """
+
+    def __init__(self, on_change, source_fps=30):
+        self.on_change = on_change
+        self.source_fps = source_fps
+        self.index = 0
+        self._arrived = 0
+        self._shown = 0
+        self._lateness_sum = 0.0
+        self._cpu = CpuSampler()
+        self._last_tick = time.monotonic()
+        self._pressure_ticks = 0
+        self._calm_ticks = 0
+        self._up_ticks = UP_TICKS
+        self._last_up = None
+        self.fps = 0.0
+        self.lateness = 0.0
+        self.cpu = 0.0
+
+    @property
+    def level(self):
+        return PREVIEW_LEVELS[self.index]
+
+    def frame_arrived(self):
+        self._arrived += 1
+
+    def frame_shown(self, lateness):
+        self._shown += 1
+        self._lateness_sum += lateness
+
+    def _expected_fps(self):
+        fps = self.level["fps"]
+        return min(fps, self.source_fps) if fps else self.source_fps
+
+    def tick(self):
+        now = time.monotonic()
+        elapsed = max(now - self._last_tick, 1e-3)
+        self._last_tick = now
+
+        self.fps = self._shown / elapsed
+        self.lateness = self._lateness_sum / self._shown if self._shown else 0.0
+        self.cpu = self._cpu.sample()
+        load = load_per_cpu()
+        received = self._arrived
+        self._arrived = self._shown = 0
+        self._lateness_sum = 0.0
+
+        paused = self.level["fps"] == 0
+        if paused:
+            # No frames to judge by, only system figures count
+            pressure = self.cpu > CPU_HIGH or load > LOAD_HIGH
+            calm = self.cpu < CPU_LOW and load < LOAD_HIGH
+        else:
+            # Only blame the preview for low fps when frames actually arrive
+            starved = received > 0 and self.fps < self._expected_fps() * FPS_RATIO_LOW
+            pressure = (self.cpu > CPU_HIGH or load > LOAD_HIGH
+                        or self.lateness > LATENESS_HIGH or starved)
+            calm = (self.cpu < CPU_LOW and load < LOAD_HIGH
+                    and self.lateness < LATENESS_LOW and not starved)
+
+        if pressure:
+            self._calm_ticks = 0
+            self._pressure_ticks += 1
+            if self._pressure_ticks >= DOWN_TICKS and self.index < len(PREVIEW_LEVELS) - 1:
+                # Stepping down right after stepping up: back off the next try
+                if self._last_up is not None and now - self._last_up < self._up_ticks * 2:
+                    self._up_ticks = min(self._up_ticks * 2, UP_TICKS_MAX)
+                self._set_index(self.index + 1, self._reason(load))
+        elif calm:
+            self._pressure_ticks = 0
+            self._calm_ticks += 1
+            if self._calm_ticks >= self._up_ticks and self.index > 0:
+                self._last_up = now
+                self._set_index(self.index - 1, self._reason(load))
+        else:
+            self._pressure_ticks = 0
+            self._calm_ticks = 0
+        return True
+
+    def _reason(self, load):
+        return (f"fps={self.fps:.1f} lateness={self.lateness * 1000:.0f}ms "
+                f"cpu={self.cpu * 100:.0f}% load={load:.2f}")
+
+    def _set_index(self, index, reason):
+        old = self.level["name"]
+        self.index = index
+        self._pressure_ticks = 0
+        self._calm_ticks = 0
+        print(f"[Governor] Preview {old} -> {self.level['name']} ({reason})")
+        self.on_change(self.level)
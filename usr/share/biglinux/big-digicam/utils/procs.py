@@ -0,0 +1,206 @@
+"""Process registry read straight from /proc (no pgrep/pkill/fuser).
+
+Processes are matched by the base name of argv[0] plus exact argv
+elements, and only among processes owned by the current user unless
+asked otherwise. One scan of /proc is shared by every lookup made within
+TTL seconds.
+"""
+import os
+import signal
+import time
+
+TTL = 0.5
+
+_cache = (0.0, [])
+
+
+class Process:
+    __slots__ = ("pid", "uid", "argv")
+
+    def __init__(self, pid, uid, argv):
+        self.pid = pid
+        self.uid = uid
+        self.argv = argv
+
+    @property
+    def name(self):
+        return os.path.basename(self.argv[0]) if self.argv else ""
+
+    def __repr__(self):
+        return f"<Process {self.pid} {' '.join(self.argv)[:60]}>"
+
+
+def _pids():
+    return [int(name) for name in os.listdir("/proc") if name.isdigit()]
+
+
+def _scan():
+    procs = []
+    for pid in _pids():
+        try:
+            uid = os.stat(f"/proc/{pid}").st_uid
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                raw = f.read()
+        except OSError:
+            continue  # exited meanwhile, or not ours to read
+        if not raw:
+            continue  # kernel thread or zombie
+        argv = [arg.decode(errors="replace") for arg in raw.rstrip(b"\0").split(b"\0")]
+        procs.append(Process(pid, uid, argv))
+    return procs
+
+
+def processes(max_age=TTL):
+    """All processes with a command line, from a scan at most max_age old."""
+    global _cache
+    stamp, procs = _cache
+    now = time.monotonic()
+    if now - stamp > max_age:
+        procs = _scan()
+        _cache = (now, procs)
+    return procs
+
+
+def invalidate():
+    global _cache
+    _cache = (0.0, [])
+
+
+def find(name, args=(), uid=None, max_age=TTL):
+    """Processes whose argv[0] base name is name and whose argv contains
+    every element of args exactly. uid defaults to the current user; pass
+    -1 for any owner."""
+    if uid is None:
+        uid = os.getuid()
+    wanted = set(args)
+    return [
+        proc for proc in processes(max_age)
+        if proc.name == name
+        and (uid == -1 or proc.uid == uid)
+        and wanted.issubset(proc.argv)
+        and proc.pid != os.getpid()
+    ]
+
+
+def running(name, args=(), uid=None):
+    return bool(find(name, args, uid))
+
+
+def terminate(procs, sig=signal.SIGTERM, timeout=0.0):
+    """Signal the processes; with a timeout, SIGKILL those still alive after it.
+
+    Returns the number of processes signalled.
+    """
+    signalled = []
+    for proc in procs:
+        try:
+            os.kill(proc.pid, sig)
+            signalled.append(proc.pid)
+        except OSError:
+            pass
+    count = len(signalled)
+    if timeout and signalled:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            signalled = [pid for pid in signalled if os.path.exists(f"/proc/{pid}")]
+            if not signalled:
+                break
+            time.sleep(0.05)
+        for pid in signalled:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except OSError:
+                pass
+    invalidate()
+    return count
+
+
+# Processes of the live view pipeline started by script/run_webcam.sh
+
+def live_view_args(usb_port=None):
+    """argv elements of the gphoto2 live view reader of one camera."""
+    args = ["--stdout", "--capture-movie"]
+    if usb_port:
+        args += ["--port", usb_port]
+    return args
+
+
+def udp_url(udp_port):
+    """Preview stream output of the pipeline's ffmpeg (as run_webcam.sh writes it)."""
+    return f"udp://127.0.0.1:{udp_port}?pkt_size=1316"
+
+
+def relay_port(udp_port):
+    """Local UDP port the preview stream is teed to for the network stream."""
+    return udp_port + 1000
+
+
+def live_view_readers(usb_port=None):
+    return find("gphoto2", live_view_args(usb_port))
+
+
+def reader_loops(idle_flag):
+    """run_webcam.sh's shells that restart an ended reader (utils/demand.py);
+    the idle flag path is part of their command line."""
+    return [proc for proc in find("bash") if any(idle_flag in arg for arg in proc.argv)]
+
+
+def stream_encoders(udp_port):
+    url = udp_url(udp_port)
+    # With the network stream on, the URL is part of a tee output spec
+    return [proc for proc in find("ffmpeg") if any(url in arg for arg in proc.argv)]
+
+
+def stream_servers(udp_port):
+    """The network stream relay (utils/stream_server.py) of the pipeline."""
+    return find("python3", ["--udp", str(relay_port(udp_port))])
+
+
+def backend_streams(port):
+    """Live view readers of the other camera backends (python3 -m utils.backends stream)."""
+    return find("python3", ["utils.backends", "stream", "--port", port])
+
+
+def compositors():
+    """The multi-camera compositor (utils/compositor.py), shared by all instances."""
+    return [proc for proc in find("python3")
+            if any(arg.endswith("/compositor.py") for arg in proc.argv)]
+
+
+def open_file_holders(*paths):
+    """Pids with any of paths open (readable /proc/<pid>/fd only, like fuser)."""
+    holders = set()
+    for pid in _pids():
+        try:
+            fds = os.listdir(f"/proc/{pid}/fd")
+        except OSError:
+            continue
+        for fd in fds:
+            try:
+                if os.readlink(f"/proc/{pid}/fd/{fd}") in paths:
+                    holders.add(pid)
+                    break
+            except OSError:
+                continue
+    return holders
+
+
+def mapping_holders(path):
+    """Pids with path mapped into memory."""
+    holders = set()
+    for pid in _pids():
+        try:
+            with open(f"/proc/{pid}/maps") as f:
+                if path in f.read():
+                    holders.add(pid)
+        except OSError:
+            continue
+    return holders
+
+
+def parent_pid(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return int(f.read().rpartition(")")[2].split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
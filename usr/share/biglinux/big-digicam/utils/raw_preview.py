@@ -0,0 +1,199 @@
+"""Previews of RAW photos from the JPEGs embedded in them.
+
+CR2, NEF, ARW, DNG, PEF, ORF and RW2 files are TIFF containers that carry,
+next to the sensor data, JPEG renditions made by the camera (a small
+thumbnail and a screen-sized or full-size preview). They are found by
+walking the TIFF IFDs of a memory-mapped file, so only the directory
+entries and the chosen JPEG are read from disk; nothing is demosaiced.
+CR3 (ISO media boxes) and RAF (a Fuji header pointing at the JPEG) are
+read the same way through their own headers. A RAW whose JPEGs can't be
+found just has no preview; the file itself is kept. Developing the RAW
+itself is left to external tools (darktable, RawTherapee...).
+"""
+import glob
+import mmap
+import os
+import struct
+
+RAW_EXTENSIONS = (".cr2", ".cr3", ".nef", ".nrw", ".arw", ".sr2", ".dng", ".pef",
+                  ".raf", ".orf", ".rw2")
+JPEG_EXTENSIONS = (".jpg", ".jpeg")
+PHOTO_EXTENSIONS = JPEG_EXTENSIONS + RAW_EXTENSIONS
+
+# The preview is the smallest embedded JPEG at least this wide
+PREVIEW_MIN_WIDTH = 1024
+
+TAG_COMPRESSION = 259
+TAG_STRIP_OFFSETS = 273
+TAG_STRIP_BYTE_COUNTS = 279
+TAG_SUB_IFDS = 330
+TAG_JPEG_OFFSET = 513
+TAG_JPEG_LENGTH = 514
+TAG_RW2_JPEG = 46             # Panasonic: the whole JPEG is the tag's value
+COMPRESSION_JPEG = (6, 7)
+# TIFF magic numbers: standard, Olympus ORF ("RO", "RS"), Panasonic RW2
+TIFF_MAGICS = (42, 0x4F52, 0x5352, 0x55)
+RAF_MAGIC = b"FUJIFILMCCD-RAW"
+RAF_JPEG = 84                 # big-endian offset and length of the JPEG
+# CR3 preview boxes (inside a Canon uuid box): where the JPEG length sits;
+# the JPEG itself starts 24 bytes into the box
+CR3_BOXES = {b"THMB": 16, b"PRVW": 20}
+CR3_SEARCH = 1 << 20          # the boxes sit in the first megabyte
+
+# Bytes per value of each TIFF field type
+TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8, 13: 4}
+# JPEG frame markers a normal decoder handles (baseline, extended, progressive).
+# Lossless JPEG (SOF3), used for the sensor data of CR2/DNG, is left out.
+DECODABLE_SOF = (0xC0, 0xC1, 0xC2)
+MAX_IFDS = 64
+
+
+def is_raw(path):
+    return path.lower().endswith(RAW_EXTENSIONS)
+
+
+def _ifd(buf, offset, endian):
+    """({tag: integer values}, next IFD offset) of the IFD at offset."""
+    (count,) = struct.unpack_from(endian + "H", buf, offset)
+    entries = {}
+    for i in range(count):
+        tag, kind, n, value = struct.unpack_from(endian + "HHI4s", buf, offset + 2 + 12 * i)
+        if kind == 3:
+            fmt = "H"
+        elif kind in (4, 13):
+            fmt = "I"
+        elif kind == 7 and tag == TAG_RW2_JPEG and n > 4:
+            entries[tag] = (struct.unpack(endian + "I", value)[0], n)  # (offset, length)
+            continue
+        else:
+            continue  # only short/long values are needed here
+        size = TYPE_SIZES[kind] * n
+        if size <= 4:
+            entries[tag] = struct.unpack_from(f"{endian}{n}{fmt}", value)
+        else:
+            (pointer,) = struct.unpack(endian + "I", value)
+            if pointer + size <= len(buf):
+                entries[tag] = struct.unpack_from(f"{endian}{n}{fmt}", buf, pointer)
+    (next_ifd,) = struct.unpack_from(endian + "I", buf, offset + 2 + 12 * count)
+    return entries, next_ifd
+
+
+def _raf_jpegs(buf):
+    return [struct.unpack_from(">II", buf, RAF_JPEG)] if len(buf) >= RAF_JPEG + 8 else []
+
+
+def _cr3_jpegs(buf):
+    found = []
+    for box, length_at in CR3_BOXES.items():
+        pos = buf.find(box, 0, CR3_SEARCH)
+        if pos >= 4 and pos + 24 <= len(buf):
+            start = pos - 4
+            (length,) = struct.unpack_from(">I", buf, start + length_at)
+            found.append((start + 24, length))
+    return found
+
+
+def _tiff_jpegs(buf):
+    if buf[:2] == b"II":
+        endian = "<"
+    elif buf[:2] == b"MM":
+        endian = ">"
+    else:
+        return []
+    magic, first = struct.unpack_from(endian + "HI", buf, 2)
+    if magic not in TIFF_MAGICS:
+        return []
+
+    found = []
+    pending, visited = [first], set()
+    while pending and len(visited) < MAX_IFDS:
+        offset = pending.pop()
+        if offset in visited or not 8 <= offset < len(buf) - 2:
+            continue
+        visited.add(offset)
+        try:
+            entries, next_ifd = _ifd(buf, offset, endian)
+        except struct.error:
+            continue
+        pending.append(next_ifd)
+        pending.extend(entries.get(TAG_SUB_IFDS, ()))
+
+        if TAG_JPEG_OFFSET in entries and TAG_JPEG_LENGTH in entries:
+            found.append((entries[TAG_JPEG_OFFSET][0], entries[TAG_JPEG_LENGTH][0]))
+        if TAG_RW2_JPEG in entries:
+            found.append(entries[TAG_RW2_JPEG])
+        strips = entries.get(TAG_STRIP_OFFSETS, ())
+        if entries.get(TAG_COMPRESSION, (1,))[0] in COMPRESSION_JPEG and len(strips) == 1:
+            found.append((strips[0], entries.get(TAG_STRIP_BYTE_COUNTS, (0,))[0]))
+    return found
+
+
+def embedded_jpegs(buf):
+    """[(offset, length)] of the JPEG streams in a RAW file (none if unknown)."""
+    if buf[:len(RAF_MAGIC)] == RAF_MAGIC:
+        found = _raf_jpegs(buf)
+    elif buf[4:8] == b"ftyp":
+        found = _cr3_jpegs(buf)
+    else:
+        found = _tiff_jpegs(buf)
+    return [
+        (offset, length) for offset, length in dict.fromkeys(found)
+        if length > 4 and offset + length <= len(buf) and buf[offset:offset + 2] == b"\xff\xd8"
+    ]
+
+
+def jpeg_size(buf, offset, length):
+    """(width, height) of a decodable JPEG stream, or None."""
+    pos, end = offset + 2, offset + length
+    while pos + 9 <= end:
+        if buf[pos] != 0xFF:
+            return None
+        marker = buf[pos + 1]
+        if marker == 0xFF:
+            pos += 1  # fill byte
+            continue
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            if marker not in DECODABLE_SOF:
+                return None
+            height, width = struct.unpack_from(">HH", buf, pos + 5)
+            return width, height
+        if marker == 0xDA:
+            return None  # scan data before any frame header
+        (segment,) = struct.unpack_from(">H", buf, pos + 2)
+        pos += 2 + segment
+    return None
+
+
+def shot_files(base):
+    """Every file of one shot (base.cr2, base.jpg...): RAW first, then JPEG.
+
+    Files are matched by base name only, so a format not listed here is
+    still kept; it just gets no preview.
+    """
+    return sorted(glob.glob(f"{glob.escape(base)}.*"),
+                  key=lambda f: (not is_raw(f), not f.lower().endswith(JPEG_EXTENSIONS), f))
+
+
+def previews(path, min_width=PREVIEW_MIN_WIDTH):
+    """(thumbnail JPEG bytes, preview JPEG bytes) embedded in a RAW file.
+
+    The thumbnail is the smallest decodable JPEG, the preview the smallest
+    one at least min_width wide (or the largest there is). Both are None
+    when the file has no usable JPEG.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None, None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            sized = []
+            for offset, length in embedded_jpegs(buf):
+                size = jpeg_size(buf, offset, length)
+                if size:
+                    sized.append((size[0] * size[1], size[0], offset, length))
+            if not sized:
+                return None, None
+            sized.sort()
+            thumb = sized[0]
+            preview = next((s for s in sized if s[1] >= min_width), sized[-1])
+            return (bytes(buf[thumb[2]:thumb[2] + thumb[3]]),
+                    bytes(buf[preview[2]:preview[2] + preview[3]]))
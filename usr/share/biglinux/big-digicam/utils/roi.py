@@ -0,0 +1,138 @@
+import subprocess
+
+# Region of interest (digital zoom + pan). "zoom" >= 1.0 divides the frame
+# size, "x"/"y" place the crop window from 0.0 (left/top) to 1.0 (right/bottom).
+DEFAULT_ROI = {"zoom": 1.0, "x": 0.5, "y": 0.5}
+ZOOM_MAX = 4.0
+
+# Instance names of the filters that receive live commands
+CROP_FILTER = "crop@roi"
+SCALERS_SHARED = ["scale@roi_v4l2"]
+SCALERS_SPLIT = ["scale@roi_v4l2", "scale@roi_preview"]
+
+_has_zmq_filter = None
+
+
+def zmq_port(udp_port):
+    return udp_port + 10000
+
+
+def zmq_filter(port):
+    # Quoted so the ':' of the address survive the filtergraph parser
+    return f"zmq=bind_address='tcp\\://127.0.0.1\\:{port}'"
+
+
+def ffmpeg_has_zmq():
+    """True when this ffmpeg build has the zmq filter (--enable-libzmq)."""
+    global _has_zmq_filter
+    if _has_zmq_filter is None:
+        try:
+            res = subprocess.run(["ffmpeg", "-hide_banner", "-filters"],
+                                 capture_output=True, text=True, timeout=5)
+            _has_zmq_filter = any(line.split()[1:2] == ["zmq"] for line in res.stdout.splitlines())
+        except (OSError, subprocess.TimeoutExpired):
+            _has_zmq_filter = False
+    return _has_zmq_filter
+
+
+def crop_filter(roi):
+    """Crop placed right after decode, so every later stage sees fewer pixels."""
+    zoom = max(1.0, min(ZOOM_MAX, roi["zoom"]))
+    return (f"{CROP_FILTER}=w=iw/{zoom:.4f}:h=ih/{zoom:.4f}:"
+            f"x=(iw-ow)*{roi['x']:.4f}:y=(ih-oh)*{roi['y']:.4f}")
+
+
+def crop_commands(roi):
+    """zmq commands moving the crop window; expressions avoid knowing iw/ih."""
+    zoom = max(1.0, min(ZOOM_MAX, roi["zoom"]))
+    return [
+        f"{CROP_FILTER} w iw/{zoom:.4f}",
+        f"{CROP_FILTER} h ih/{zoom:.4f}",
+        f"{CROP_FILTER} x (iw-ow)*{roi['x']:.4f}",
+        f"{CROP_FILTER} y (ih-oh)*{roi['y']:.4f}",
+    ]
+
+
+def scale_commands(sizes):
+    """Re-arm the scalers after the crop changed.
+
+    sizes maps each scaler to the (width, height) its output was started
+    with. A crop command updates the link size in place, so the scale filter
+    does not notice the new input on its own; setting its output size
+    (unchanged) makes it rebuild its swscale context for the new crop.
+    """
+    commands = []
+    for name, (w, h) in sizes.items():
+        commands += [f"{name} w {w}", f"{name} h {h}"]
+    return commands
+
+
+def stage_savings(full_size, stages):
+    """Pixels per second each stage no longer handles thanks to the crop.
+
+    full_size is the uncropped frame; stages maps a stage name to the
+    (width, height) and fps measured at that stage.
+    """
+    full = full_size[0] * full_size[1]
+    return {name: max(0, full - w * h) * fps for name, ((w, h), fps) in stages.items()}
+
+
+class RoiController:
+    """Moves the crop window of a running ffmpeg through its zmq filter.
+
+    All commands of one update go out back to back on a DEALER socket, so the
+    zmq filter applies them together before the next frame. Requires pyzmq;
+    without it (or without a zmq-enabled ffmpeg) the ROI is only applied
+    when the webcam is (re)started.
+    """
+
+    def __init__(self, udp_port, scalers, live):
+        self.endpoint = f"tcp://127.0.0.1:{zmq_port(udp_port)}"
+        self.scalers = scalers
+        self.live = live
+        self._socket = None
+        if live:
+            try:
+                import zmq
+                self._zmq = zmq
+            except ImportError:
+                print("[ROI] pyzmq not installed, zoom applies on next start")
+                self.live = False
+
+    def _connect(self):
+        if self._socket is None:
+            zmq = self._zmq
+            self._socket = zmq.Context.instance().socket(zmq.DEALER)
+            self._socket.setsockopt(zmq.LINGER, 0)
+            self._socket.connect(self.endpoint)
+        return self._socket
+
+    def apply(self, roi, sizes):
+        """Send a new ROI; returns False when it can't be applied live.
+
+        sizes maps scaler names to their output size (see scale_commands).
+        """
+        sizes = {name: sizes.get(name) for name in self.scalers}
+        if not self.live or not all(sizes.values()):
+            return False
+        sock = self._connect()
+        self._drain_replies()
+        for command in crop_commands(roi) + scale_commands(sizes):
+            sock.send_multipart([b"", command.encode()])
+        return True
+
+    def _drain_replies(self):
+        # Replies of the previous update ("0 Success" or "<errno> <message>")
+        zmq = self._zmq
+        while True:
+            try:
+                _, reply = self._socket.recv_multipart(zmq.NOBLOCK)
+            except zmq.Again:
+                return
+            if not reply.startswith(b"0 "):
+                print(f"[ROI] ffmpeg rejected command: {reply.decode(errors='replace')}")
+
+    def close(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
@@ -0,0 +1,249 @@
+"""Low-latency shutter: one gphoto2 shell session kept open between shots.
+
+A normal capture is a new gphoto2 process that opens the camera, lets it
+autofocus at shutter time, writes the picture to the SD card and only
+then downloads it. In this mode the session (gphoto2 --shell) stays open
+while the photo mode is on:
+
+- the capture target is the camera's internal RAM for the session (the
+  previous target is restored when it closes), so the download starts as
+  soon as the picture is taken;
+- focus can be armed before the shot (button pressed and held, or the
+  pointer over it) and the shutter fires on release, without focusing
+  again. The commands come from the camera's capabilities
+  ("shutter_arm", "shutter_fire", "shutter_disarm"; Canon uses the
+  eosremoterelease half/full press).
+
+Shutter lag is measured from the release to the camera reporting the new
+picture, and the app adds the time until the thumbnail is on screen.
+"""
+import asyncio
+import os
+import re
+import signal
+import time
+
+from utils.settings import config_dir, load_json, save_json
+
+SETTINGS_FILE = "shutter.json"
+DEFAULTS = {"enabled": False, "arm_on_hover": False}
+
+# lcd prints this; sent after each batch of commands, it marks its end
+MARKER = "Local directory now"
+NEW_FILE = re.compile(r"New file is in location|FILEADDED")
+SAVING = re.compile(r"Saving file as (.+?)\s*$")
+ERROR = "*** Error"
+OPEN_TIMEOUT = 15
+COMMAND_TIMEOUT = 30
+# Downloads taken as camera file name plus time, renamed by the app
+FILENAME = "lowlag-%Y%m%d-%H%M%S-%f.%C"
+
+
+def load_settings():
+    settings = dict(DEFAULTS)
+    settings.update(load_json(os.path.join(config_dir(), SETTINGS_FILE), {}))
+    return settings
+
+
+def save_settings(settings):
+    save_json(os.path.join(config_dir(), SETTINGS_FILE), settings)
+
+
+class ShutterError(RuntimeError):
+    pass
+
+
+class Shot:
+    """One capture: files downloaded and when each step happened (monotonic)."""
+
+    def __init__(self, released, armed):
+        self.released = released
+        self.armed = armed        # focus was armed before the release
+        self.shutter = None       # camera reported the new picture
+        self.downloaded = None
+        self.files = []
+
+    @property
+    def lag(self):
+        return (self.shutter or self.downloaded) - self.released
+
+
+def parse_choices(lines):
+    """(current value, [choices]) of get-config output."""
+    current, choices = None, []
+    for line in lines:
+        key, _, value = line.partition(":")
+        key = key.split(">")[-1].strip()  # the shell prompt may precede it
+        if key == "Current":
+            current = value.strip()
+        elif key == "Choice":
+            choices.append(value.strip().partition(" ")[2])
+    return current, choices
+
+
+class ShutterSession:
+    """gphoto2 --shell on one camera. Methods are coroutines for the task runner.
+
+    One command batch at a time: callers keep them in the camera's lane.
+    """
+
+    def __init__(self, camera_args, directory, caps):
+        self.camera_args = list(camera_args)
+        self.directory = os.path.abspath(directory)
+        self.caps = caps
+        self.proc = None
+        self.armed = False
+        self.restore = None       # set-config-index command restoring the capture target
+
+    @property
+    def open(self):
+        return self.proc is not None and self.proc.returncode is None
+
+    async def start(self):
+        # Line buffered, or the replies would sit in gphoto2's stdio buffer
+        self.proc = await asyncio.create_subprocess_exec(
+            "stdbuf", "-oL", "gphoto2", *self.camera_args,
+            "--filename", os.path.join(self.directory, FILENAME), "--force-overwrite", "--shell",
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT, cwd=self.directory, start_new_session=True
+        )
+        try:
+            await asyncio.wait_for(self._start(), OPEN_TIMEOUT)
+        except BaseException:
+            self.kill()
+            raise
+
+    async def _start(self):
+        if self.caps["viewfinder_off"]:
+            try:
+                await self.run(["set-config viewfinder=0"])
+            except ShutterError as e:
+                # Not on this body, or refused: captures work without it
+                print(f"[Shutter] Viewfinder left as is: {e}")
+        commands = []
+        current, choices = parse_choices(await self.run(["get-config capturetarget"]))
+        if choices:
+            target = self.caps["best_target"] if self.caps["best_target"] in choices else choices[0]
+            commands.append(f"set-config-index capturetarget={choices.index(target)}")
+            if current in choices and current != target:
+                self.restore = f"set-config-index capturetarget={choices.index(current)}"
+        if commands:
+            await self.run(commands)
+        print(f"[Shutter] Session open, capture target {choices and target or 'unknown'}"
+              f"{f' (was {current})' if self.restore else ''}")
+
+    async def run(self, commands, on_line=None):
+        """Send commands, return their output lines; raise ShutterError on errors."""
+        if not self.open:
+            raise ShutterError("shutter session is closed")
+        batch = "".join(f"{command}\n" for command in commands) + f"lcd {self.directory}\n"
+        self.proc.stdin.write(batch.encode())
+        await self.proc.stdin.drain()
+        lines, errors = [], []
+        while True:
+            raw = await self.proc.stdout.readline()
+            if not raw:
+                raise ShutterError("gphoto2 exited: " + " ".join(lines[-5:]))
+            line = raw.decode(errors="replace").rstrip()
+            if MARKER in line:
+                break
+            lines.append(line)
+            if ERROR in line:
+                errors.append(line)
+            if on_line:
+                on_line(line)
+        if errors:
+            raise ShutterError("; ".join(errors))
+        return lines
+
+    async def arm(self):
+        """Focus now, so the release fires without focusing again."""
+        if self.armed or not self.caps["shutter_arm"]:
+            return False
+        try:
+            await asyncio.wait_for(self.run(self.caps["shutter_arm"]), COMMAND_TIMEOUT)
+        except ShutterError as e:
+            # No such setting on this body: shots still work, focusing on release
+            print(f"[Shutter] Focus can't be armed ahead, disabled for this session: {e}")
+            self.caps = dict(self.caps, shutter_arm=[])
+            return False
+        self.armed = True
+        return True
+
+    async def disarm(self):
+        if not self.armed:
+            return
+        self.armed = False
+        if self.caps["shutter_disarm"]:
+            await asyncio.wait_for(self.run(self.caps["shutter_disarm"]), COMMAND_TIMEOUT)
+
+    async def fire(self, released):
+        """Take a picture; released is when the button was let go."""
+        shot = Shot(released, self.armed)
+        try:
+            await self._collect(self.caps["shutter_fire"], shot)
+            if shot.armed and self.caps["shutter_disarm"]:
+                # The armed focus is still held after the shot (Canon's half press)
+                await asyncio.wait_for(self.run(self.caps["shutter_disarm"]), COMMAND_TIMEOUT)
+        finally:
+            self.armed = False
+        if not shot.files:
+            raise ShutterError("no file received from the camera")
+        return shot
+
+    async def drain(self, shot):
+        """Files the camera still had after fire() (the JPEG of RAW+JPEG).
+
+        Run after the first file is on screen, off the shutter's critical path.
+        """
+        count = len(shot.files)
+        if self.caps["shutter_drain"]:
+            await self._collect(self.caps["shutter_drain"], shot)
+        return shot.files[count:]
+
+    async def _collect(self, commands, shot):
+        def on_line(line):
+            if shot.shutter is None and NEW_FILE.search(line):
+                shot.shutter = time.monotonic()
+            match = SAVING.search(line)
+            if match:
+                path = match.group(1)
+                shot.files.append(path if os.path.isabs(path) else os.path.join(self.directory, path))
+                shot.downloaded = shot.downloaded or time.monotonic()
+
+        await asyncio.wait_for(self.run(commands, on_line), COMMAND_TIMEOUT)
+
+    async def close(self):
+        """Restore the capture target and end the session."""
+        if not self.open:
+            return
+        try:
+            await asyncio.wait_for(self.disarm(), COMMAND_TIMEOUT)
+            if self.restore:
+                await asyncio.wait_for(self.run([self.restore]), COMMAND_TIMEOUT)
+            self.proc.stdin.write(b"exit\n")
+            await asyncio.wait_for(self.proc.wait(), 5)
+        except (ShutterError, OSError, asyncio.TimeoutError) as e:
+            print(f"[Shutter] Unclean close: {e}")
+            self.kill()
+        self.proc = None
+
+    def close_nowait(self):
+        """Send the restore and exit without waiting (app shutdown, any thread).
+
+        Written straight to the pipe, since the event loop may not run again.
+        """
+        if not self.open:
+            return
+        commands = ((self.restore + "\n") if self.restore else "") + "exit\n"
+        try:
+            os.write(self.proc.stdin.get_extra_info("pipe").fileno(), commands.encode())
+        except (OSError, AttributeError):
+            self.kill()
+
+    def kill(self):
+        if self.proc and self.proc.returncode is None:
+            try:
+                os.killpg(self.proc.pid, signal.SIGTERM)
+            except OSError:
+                pass
@@ -0,0 +1,291 @@
+"""Network stream of the live view: one encode served to any number of clients.
+
+With the network stream on, run_webcam.sh tees the preview's MPEG-TS
+(mpeg1video, encoded once) to a second local UDP port; this relay
+receives it there and serves it over HTTP:
+
+    http://<host>:<port>/stream.ts   (VLC, ffmpeg/ffplay, OBS media source...)
+
+Each client has its own bounded send queue. A client that falls more than
+QUEUE_BYTES behind is disconnected, so a slow client never holds back the
+others or the pipeline. A new client starts at the next datagram carrying
+a PAT, so its player can sync at once.
+
+Everything runs on one thread with non-blocking sockets (selectors), and
+counters are written to a JSON stats file once per second.
+"""
+import argparse
+import collections
+import itertools
+import json
+import os
+import selectors
+import socket
+import time
+
+# HTTP port of the first instance; instance N (UDP port 5000 + N) uses base + N
+HTTP_BASE_PORT = 8090
+# Backlog of a client before it is dropped (~3 s of the 5 Mbit/s stream)
+QUEUE_BYTES = 2 * 1024 * 1024
+# Kernel send buffer per client, small so the queue above is what bounds it
+SOCKET_BUFFER = 256 * 1024
+MAX_CLIENTS = 32
+HEADER_LIMIT = 8192
+TS_PACKET = 188
+# Buffers handed to one sendmsg() call
+SEND_BATCH = 64
+
+RESPONSE = (b"HTTP/1.0 200 OK\r\nContent-Type: video/mp2t\r\n"
+            b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n")
+NOT_FOUND = b"HTTP/1.0 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+BUSY = b"HTTP/1.0 503 Service Unavailable\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+PATHS = ("/", "/stream.ts")
+
+
+def http_port(udp_port):
+    return HTTP_BASE_PORT + udp_port - 5000
+
+
+def lan_address():
+    """This machine's address on the LAN (nothing is sent), or 127.0.0.1."""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+        try:
+            # A UDP connect only picks the route and source address
+            probe.connect(("192.0.2.1", 9))
+            return probe.getsockname()[0]
+        except OSError:
+            return "127.0.0.1"
+
+
+def stream_url(udp_port):
+    return f"http://{lan_address()}:{http_port(udp_port)}/stream.ts"
+
+
+def has_pat(datagram):
+    """True if the datagram starts a PAT (TS packet of PID 0 with a section start)."""
+    for i in range(0, len(datagram) - TS_PACKET + 1, TS_PACKET):
+        if datagram[i] == 0x47 and datagram[i + 1] & 0x5F == 0x40 and datagram[i + 2] == 0:
+            return True
+    return False
+
+
+class Client:
+    __slots__ = ("sock", "addr", "request", "queue", "queued", "streaming", "synced",
+                 "sent", "since", "events")
+
+    def __init__(self, sock, addr):
+        self.sock = sock
+        self.addr = addr
+        self.request = b""
+        self.queue = collections.deque()    # memoryviews still to send
+        self.queued = 0
+        self.streaming = False
+        self.synced = False
+        self.sent = 0
+        self.since = time.monotonic()
+        self.events = selectors.EVENT_READ
+
+
+class StreamServer:
+    def __init__(self, udp_port, port, host="0.0.0.0", queue_bytes=QUEUE_BYTES, stats_path=None):
+        self.queue_bytes = queue_bytes
+        self.stats_path = stats_path
+        self.port = port
+        self.sel = selectors.DefaultSelector()
+
+        self.udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.udp.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1024 * 1024)
+        self.udp.bind(("127.0.0.1", udp_port))
+        self.udp.setblocking(False)
+        self.sel.register(self.udp, selectors.EVENT_READ, "udp")
+
+        self.listener = socket.create_server((host, port))
+        self.listener.setblocking(False)
+        self.sel.register(self.listener, selectors.EVENT_READ, "accept")
+
+        self.clients = {}
+        self.served = 0
+        self.dropped = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def serve_forever(self):
+        last_report = time.monotonic()
+        while True:
+            for key, mask in self.sel.select(timeout=1.0):
+                if key.data == "udp":
+                    self._on_datagrams()
+                elif key.data == "accept":
+                    self._on_accept()
+                else:
+                    self._on_client(key.data, mask)
+            now = time.monotonic()
+            if now - last_report >= 1.0:
+                self._write_stats(now - last_report)
+                last_report = now
+
+    def _on_accept(self):
+        while True:
+            try:
+                sock, addr = self.listener.accept()
+            except BlockingIOError:
+                return
+            sock.setblocking(False)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER)
+            client = Client(sock, addr)
+            self.clients[sock] = client
+            self.sel.register(sock, selectors.EVENT_READ, client)
+
+    def _on_client(self, client, mask):
+        if mask & selectors.EVENT_READ:
+            try:
+                data = client.sock.recv(4096)
+            except BlockingIOError:
+                data = None
+            except OSError:
+                data = b""
+            if data == b"":
+                self._close(client)
+                return
+            if data and not client.streaming:
+                self._on_request(client, data)
+        if mask & selectors.EVENT_WRITE and client.sock in self.clients:
+            self._flush(client)
+
+    def _on_request(self, client, data):
+        client.request += data
+        if b"\r\n\r\n" not in client.request:
+            if len(client.request) > HEADER_LIMIT:
+                self._close(client)
+            return
+        parts = client.request.split(b"\r\n", 1)[0].split()
+        path = parts[1].split(b"?")[0].decode(errors="replace") if len(parts) > 1 else ""
+        if parts[:1] != [b"GET"] or path not in PATHS:
+            self._reply_and_close(client, NOT_FOUND)
+        elif sum(c.streaming for c in self.clients.values()) >= MAX_CLIENTS:
+            self._reply_and_close(client, BUSY)
+        else:
+            client.streaming = True
+            client.request = b""
+            self.served += 1
+            self._enqueue(client, RESPONSE)
+            print(f"[Stream] Client {client.addr[0]}:{client.addr[1]} connected "
+                  f"({self._streaming_count()} watching)", flush=True)
+
+    def _reply_and_close(self, client, response):
+        try:
+            client.sock.send(response)
+        except OSError:
+            pass
+        self._close(client)
+
+    def _on_datagrams(self):
+        while True:
+            try:
+                data = self.udp.recv(65536)
+            except BlockingIOError:
+                return
+            self.bytes_in += len(data)
+            pat = None
+            for client in list(self.clients.values()):
+                if not client.streaming:
+                    continue
+                if not client.synced:
+                    if pat is None:
+                        pat = has_pat(data)
+                    if not pat:
+                        continue
+                    client.synced = True
+                if client.queued + len(data) > self.queue_bytes:
+                    self.dropped += 1
+                    print(f"[Stream] Client {client.addr[0]}:{client.addr[1]} too slow "
+                          f"({client.queued // 1024} KiB behind), dropped", flush=True)
+                    self._close(client)
+                    continue
+                self._enqueue(client, data)
+
+    def _enqueue(self, client, data):
+        was_empty = not client.queue
+        client.queue.append(memoryview(data))
+        client.queued += len(data)
+        if was_empty:
+            # Try at once; only wait for writability when the socket is full
+            self._flush(client)
+
+    def _flush(self, client):
+        while client.queue:
+            try:
+                sent = client.sock.sendmsg(itertools.islice(client.queue, SEND_BATCH))
+            except BlockingIOError:
+                break
+            except OSError:
+                self._close(client)
+                return
+            client.sent += sent
+            client.queued -= sent
+            self.bytes_out += sent
+            while sent:
+                head = client.queue[0]
+                if sent >= len(head):
+                    sent -= len(head)
+                    client.queue.popleft()
+                else:
+                    client.queue[0] = head[sent:]
+                    sent = 0
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if client.queue else 0)
+        if events != client.events:
+            client.events = events
+            self.sel.modify(client.sock, events, client)
+
+    def _close(self, client):
+        if self.clients.pop(client.sock, None) is None:
+            return
+        self.sel.unregister(client.sock)
+        client.sock.close()
+        if client.streaming:
+            print(f"[Stream] Client {client.addr[0]}:{client.addr[1]} left after "
+                  f"{time.monotonic() - client.since:.0f}s, {client.sent / 1e6:.1f} MB", flush=True)
+
+    def _streaming_count(self):
+        return sum(1 for c in self.clients.values() if c.streaming)
+
+    def _write_stats(self, elapsed):
+        if not self.stats_path:
+            return
+        stats = {
+            "port": self.port,
+            "clients": self._streaming_count(),
+            "served": self.served,
+            "dropped": self.dropped,
+            "in_kbps": 8 * self.bytes_in / elapsed / 1000,
+            "out_kbps": 8 * self.bytes_out / elapsed / 1000,
+            "backlog_kb": max((c.queued for c in self.clients.values()), default=0) // 1024,
+        }
+        self.bytes_in = self.bytes_out = 0
+        tmp = f"{self.stats_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(stats, f)
+        os.replace(tmp, self.stats_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--udp", type=int, required=True, help="local UDP port ffmpeg tees the stream to")
+    parser.add_argument("--http", type=int, required=True, help="HTTP port to serve on")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--queue-kb", type=int, default=QUEUE_BYTES // 1024,
+                        help="backlog after which a client is dropped")
+    parser.add_argument("--stats", help="JSON file for the counters")
+    args = parser.parse_args(argv)
+
+    server = StreamServer(args.udp, args.http, args.host, args.queue_kb * 1024, args.stats)
+    print(f"[Stream] Serving http://{args.host}:{args.http}/stream.ts", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import os
+import time
+
+
+def _read_cpu_times():
+    """Return (busy, total) jiffies from the aggregate line of /proc/stat."""
+    try:
+        with open("/proc/stat") as f:
+            fields = f.readline().split()[1:]
+    except OSError:
+        return 0, 0
+    values = [int(v) for v in fields]
+    # idle + iowait count as free time
+    idle = values[3] + (values[4] if len(values) > 4 else 0)
+    total = sum(values[:8])
+    return total - idle, total
+
+
+class CpuSampler:
+    """System-wide CPU busy fraction (0.0 - 1.0) between successive samples."""
+
+    def __init__(self):
+        self._busy, self._total = _read_cpu_times()
+
+    def sample(self):
+        busy, total = _read_cpu_times()
+        d_busy = busy - self._busy
+        d_total = total - self._total
+        self._busy, self._total = busy, total
+        if d_total <= 0:
+            return 0.0
+        return max(0.0, min(1.0, d_busy / d_total))
+
+
+class ProcessCpuMeter:
+    """CPU used by this process (and optionally its children) over wall time.
+
+    The result is expressed in percent of one core, like `top` does.
+    """
+
+    def __init__(self, include_children=False):
+        self.include_children = include_children
+        self.reset()
+
+    def _cpu(self):
+        t = os.times()
+        cpu = t.user + t.system
+        if self.include_children:
+            cpu += t.children_user + t.children_system
+        return cpu
+
+    def reset(self):
+        self._cpu0 = self._cpu()
+        self._wall0 = time.monotonic()
+
+    def elapsed(self):
+        return time.monotonic() - self._wall0
+
+    def percent(self):
+        wall = self.elapsed()
+        if wall <= 0:
+            return 0.0
+        return 100.0 * (self._cpu() - self._cpu0) / wall
+
+
+def process_cpu_seconds(pid):
+    """user + system CPU seconds of another process, from /proc/<pid>/stat."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # The command name may contain spaces; fields resume after ")"
+            fields = f.read().rpartition(")")[2].split()
+    except OSError:
+        return 0.0
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+class PidCpuMeter:
+    """CPU used by a set of other processes over wall time, in % of one core."""
+
+    def __init__(self, pids=()):
+        self.pids = set(pids)
+        self.reset()
+
+    def _cpu(self):
+        return sum(process_cpu_seconds(pid) for pid in self.pids)
+
+    def reset(self, pids=None):
+        if pids is not None:
+            self.pids = set(pids)
+        self._cpu0 = self._cpu()
+        self._wall0 = time.monotonic()
+
+    def elapsed(self):
+        return time.monotonic() - self._wall0
+
+    def percent(self):
+        wall = self.elapsed()
+        if wall <= 0:
+            return 0.0
+        return 100.0 * (self._cpu() - self._cpu0) / wall
+
+
+def load_per_cpu():
+    """1-minute load average normalised by the number of CPUs."""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except OSError:
+        return 0.0
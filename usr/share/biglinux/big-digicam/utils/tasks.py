@@ -0,0 +1,233 @@
+"""Cancellable camera operations on one asyncio loop.
+
+Every camera operation (detection, capture, webcam start, config access)
+is a coroutine submitted here, and its subprocesses are started with
+run_process(). Operations in the same lane (one lane per camera port) run
+one at a time in submission order, while different cameras run in
+parallel. Each operation can have a deadline and can be cancelled: the
+gphoto2/ffmpeg process group it is waiting on is terminated at once. Tags
+let a user action cancel background work, such as a hot-plug scan, before
+it starts its own.
+
+With PyGObject 3.50+ the asyncio loop is the GLib main loop itself
+(gi.events), so coroutines and completion callbacks run on the UI thread
+and blocking calls must go through asyncio.to_thread(). With older
+PyGObject the loop runs in its own thread and completion callbacks are
+handed to the UI with the dispatch function (GLib.idle_add).
+"""
+import asyncio
+import contextlib
+import os
+import signal
+import subprocess
+import threading
+import time
+
+# Seconds between SIGTERM and SIGKILL for a cancelled process group
+KILL_GRACE = 1.0
+
+# Process groups started by run_process() and not finished yet
+_groups = set()
+
+
+class Operation:
+    """Handle of a submitted operation.
+
+    After on_done(op) is called exactly one of these holds: op.cancelled,
+    op.error set (TimeoutError when the deadline passed), or op.result.
+    """
+
+    def __init__(self, runner, name, lane, tags, deadline, on_done):
+        self.runner = runner
+        self.name = name
+        self.lane = lane
+        self.tags = set(tags)
+        self.deadline = deadline
+        self.on_done = on_done
+        self.submitted = time.monotonic()
+        self.started = None      # when it got its lane
+        self.finished = None
+        self.result = None
+        self.error = None
+        self.cancelled = False
+        self._task = None
+
+    @property
+    def waited(self):
+        """Seconds spent queued behind other operations of the lane."""
+        return (self.started or self.finished or time.monotonic()) - self.submitted
+
+    def cancel(self):
+        self.runner.call(self._cancel)
+
+    def _cancel(self):
+        self.cancelled = True
+        if self._task:
+            self._task.cancel()
+
+
+class TaskRunner:
+    def __init__(self, dispatch=None, glib_loop=True):
+        self.dispatch = dispatch
+        self.native = False
+        self.loop = None
+        self._lanes = {}
+        self._ops = set()
+        if glib_loop and os.environ.get("BIG_DIGICAM_TASKS") != "thread":
+            try:
+                from gi.events import GLibEventLoopPolicy
+                policy = GLibEventLoopPolicy()
+                asyncio.set_event_loop_policy(policy)
+                self.loop = policy.get_event_loop()
+                self.native = True
+            except ImportError:
+                pass
+        if self.loop is None:
+            self.loop = asyncio.new_event_loop()
+            threading.Thread(target=self.loop.run_forever, name="camera-tasks", daemon=True).start()
+        print(f"[Tasks] asyncio loop {'on the GLib main loop' if self.native else 'in a thread'}")
+
+    def call(self, func, *args):
+        """Run func(*args) on the loop (safe from any thread)."""
+        self.loop.call_soon_threadsafe(func, *args)
+
+    def submit(self, name, coro_func, *args, lane=None, deadline=None, tags=(), on_done=None):
+        """Schedule coro_func(*args); returns its Operation at once."""
+        op = Operation(self, name, lane, tags, deadline, on_done)
+        self.call(self._start, op, coro_func, args)
+        return op
+
+    def cancel(self, tag=None):
+        """Cancel the pending and running operations with tag (all if None)."""
+        self.call(self._cancel_tagged, tag)
+
+    def _cancel_tagged(self, tag):
+        for op in list(self._ops):
+            if tag is None or tag in op.tags:
+                op._cancel()
+
+    def _start(self, op, coro_func, args):
+        if op.cancelled:
+            op.finished = time.monotonic()
+            self._deliver(op)
+            return
+        self._ops.add(op)
+        op._task = self.loop.create_task(self._run(op, coro_func, args))
+        # Not in _run: a task cancelled before its first step never runs it
+        op._task.add_done_callback(lambda task: self._finish(op, task))
+
+    async def _run(self, op, coro_func, args):
+        try:
+            # Operations without a lane (no camera involved) never queue
+            if op.lane is None:
+                lock = contextlib.nullcontext()
+            else:
+                lock = self._lanes.setdefault(op.lane, asyncio.Lock())
+            async with lock:
+                op.started = time.monotonic()
+                if op.deadline:
+                    op.result = await asyncio.wait_for(coro_func(*args), op.deadline)
+                else:
+                    op.result = await coro_func(*args)
+        except asyncio.CancelledError:
+            op.cancelled = True
+        except asyncio.TimeoutError:
+            op.error = TimeoutError(f"{op.name}: deadline of {op.deadline:g}s exceeded")
+        except Exception as e:
+            op.error = e
+
+    def _finish(self, op, task):
+        if task.cancelled():
+            op.cancelled = True
+        self._ops.discard(op)
+        op.finished = time.monotonic()
+        self._deliver(op)
+
+    def _deliver(self, op):
+        if not op.on_done:
+            return
+        if self.native or not self.dispatch:
+            op.on_done(op)
+        else:
+            self.dispatch(op.on_done, op)
+
+    def close(self):
+        """Cancel everything and stop its processes before returning.
+
+        On quit the loop may never run the cancellations, so the process
+        groups are signalled here, from the calling thread.
+        """
+        self.cancel()
+        groups = list(_groups)
+        for sig in (signal.SIGTERM, signal.SIGKILL):
+            groups = [pgid for pgid in groups if _signal_group(pgid, sig)]
+            deadline = time.monotonic() + KILL_GRACE
+            while groups and time.monotonic() < deadline:
+                time.sleep(0.05)
+                groups = [pgid for pgid in groups if _group_alive(pgid)]
+            if not groups:
+                return
+
+
+def _signal_group(pgid, sig):
+    try:
+        os.killpg(pgid, sig)
+        return True
+    except OSError:
+        return False
+
+
+def _group_alive(pgid):
+    """True while a member of the group still runs (zombies don't count)."""
+    # Reap the leader if it exited (the loop may not do it any more)
+    with contextlib.suppress(ChildProcessError):
+        os.waitpid(pgid, os.WNOHANG)
+    for pid in filter(str.isdigit, os.listdir("/proc")):
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                # "pid (comm) state ppid pgrp ...": comm may contain spaces
+                fields = f.read().rsplit(")", 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        if int(fields[2]) == pgid and fields[0] != "Z":
+            return True
+    return False
+
+
+async def _kill_group(proc):
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        try:
+            os.killpg(proc.pid, sig)
+        except OSError:
+            return
+        try:
+            await asyncio.wait_for(proc.wait(), KILL_GRACE)
+            return
+        except asyncio.TimeoutError:
+            continue
+
+
+async def run_process(argv, timeout=None, env=None):
+    """subprocess.run(argv, capture_output=True, text=True) that can be cancelled.
+
+    The command gets its own process group; on cancellation or timeout the
+    whole group (gphoto2 and anything it piped into) is terminated.
+    Raises subprocess.TimeoutExpired like subprocess.run.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        *argv, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        env=env, start_new_session=True
+    )
+    _groups.add(proc.pid)
+    try:
+        out, err = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        await _kill_group(proc)
+        raise subprocess.TimeoutExpired(argv, timeout)
+    except asyncio.CancelledError:
+        await _kill_group(proc)
+        raise
+    finally:
+        _groups.discard(proc.pid)
+    return subprocess.CompletedProcess(argv, proc.returncode,
+                                       out.decode(errors="replace"), err.decode(errors="replace"))
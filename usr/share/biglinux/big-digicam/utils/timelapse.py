@@ -0,0 +1,270 @@
+"""Intervalometer and timelapse assembly.
+
+Shots are scheduled on an absolute grid (start + k * interval), so the time
+a capture and its download take is absorbed by the wait before the next
+shot instead of adding up the way sleep(interval) after each capture
+would. A shot that overruns its slot starts the next one at once; the
+grid itself never moves.
+
+The video can be built while shooting: each frame is piped into one ffmpeg
+(image2pipe) as soon as it is downloaded, so there is no long encoding pass
+at the end.
+"""
+import json
+import os
+import queue
+import random
+import subprocess
+import threading
+import time
+
+from utils.raw_preview import JPEG_EXTENSIONS, is_raw, previews as raw_previews, shot_files
+from utils.settings import config_dir, load_json, save_json
+
+SETTINGS_FILE = "timelapse.json"
+DEFAULTS = {"interval": 10, "frames": 120, "fps": 24, "stream": True}
+
+LOG_NAME = "timelapse-log.jsonl"
+# Width of the video; RAW frames use their embedded preview of at least this
+VIDEO_WIDTH = 1920
+
+
+def load_settings():
+    settings = dict(DEFAULTS)
+    settings.update(load_json(os.path.join(config_dir(), SETTINGS_FILE), {}))
+    return settings
+
+
+def save_settings(settings):
+    save_json(os.path.join(config_dir(), SETTINGS_FILE), settings)
+
+
+def camera_shooter(camera_args, directory, pre_config=(), timeout=60):
+    """shoot(index) -> [files] for one gphoto2 capture into directory.
+
+    pre_config the camera refuses (e.g. a viewfinder setting it lacks) is
+    dropped for this shot and the following ones. A capture taking longer
+    than timeout seconds fails.
+    """
+    pre_config = list(pre_config)
+
+    def capture(index):
+        return subprocess.run(
+            ["gphoto2", *camera_args, *pre_config, "--capture-image-and-download",
+             "--filename", os.path.join(directory, f"frame{index:05d}.%C"),
+             "--force-overwrite", "--keep"],
+            capture_output=True, text=True, timeout=timeout
+        )
+
+    def shoot(index):
+        res = capture(index)
+        error = (res.stderr or res.stdout).strip()
+        if res.returncode != 0 and pre_config and "viewfinder" in error:
+            pre_config.clear()
+            res = capture(index)
+            error = (res.stderr or res.stdout).strip()
+        if res.returncode != 0:
+            raise RuntimeError(error)
+        return frame_files(directory, index)
+    return shoot
+
+
+def frame_files(directory, index):
+    return shot_files(os.path.join(directory, f"frame{index:05d}"))
+
+
+class SimulatedCamera:
+    """Stand-in for a camera: each shot takes a random time and writes a JPEG.
+
+    durations is the (min, max) capture+download time in seconds; the
+    default mirrors what take_photo sees on real bodies (2-60 s), pass a
+    smaller range to test quickly. jpeg is the image written for every shot.
+    """
+
+    def __init__(self, directory, jpeg, durations=(2.0, 60.0), seed=None):
+        self.directory = directory
+        self.jpeg = jpeg
+        self.durations = durations
+        self.random = random.Random(seed)
+
+    def __call__(self, index):
+        time.sleep(self.random.uniform(*self.durations))
+        path = os.path.join(self.directory, f"frame{index:05d}.jpg")
+        with open(path, "wb") as f:
+            f.write(self.jpeg)
+        return [path]
+
+
+class Intervalometer:
+    """Runs shoot(index) every interval seconds, frames times, in a thread.
+
+    on_frame(index, files, record) is called from the thread after each shot
+    (files is empty when the shot failed) and on_done(stats) at the end.
+    Every shot is also appended to log_path as one JSON line.
+    """
+
+    def __init__(self, shoot, interval, frames, on_frame=None, on_done=None, log_path=None):
+        self.shoot = shoot
+        self.interval = float(interval)
+        self.frames = int(frames)
+        self.on_frame = on_frame
+        self.on_done = on_done
+        self.log_path = log_path
+        self.records = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def join(self, timeout=None):
+        if self._thread:
+            self._thread.join(timeout)
+
+    @property
+    def running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    def _run(self):
+        start = time.monotonic()
+        log = open(self.log_path, "a") if self.log_path else None
+        try:
+            for index in range(self.frames):
+                deadline = start + index * self.interval
+                if self._stop.wait(max(0.0, deadline - time.monotonic())):
+                    break
+                began = time.monotonic()
+                error = None
+                try:
+                    files = self.shoot(index)
+                except Exception as e:
+                    files, error = [], str(e)
+                ended = time.monotonic()
+                record = {
+                    "index": index,
+                    "jitter_ms": round(1000 * (began - deadline), 1),
+                    "overhead_s": round(ended - began, 3),
+                    "late": ended > deadline + self.interval,
+                    "files": [os.path.basename(f) for f in files],
+                }
+                if error:
+                    record["error"] = error
+                self.records.append(record)
+                if log:
+                    log.write(json.dumps(record) + "\n")
+                    log.flush()
+                if self.on_frame:
+                    self.on_frame(index, files, record)
+        finally:
+            if log:
+                log.close()
+            stats = summarize(self.records, self.interval)
+            print(f"[Timelapse] {stats['shots']} shots, jitter avg {stats['jitter_avg_ms']:.1f} ms "
+                  f"max {stats['jitter_max_ms']:.1f} ms, overhead avg {stats['overhead_avg_s']:.2f}s, "
+                  f"{stats['late']} overran, {stats['failed']} failed")
+            if self.on_done:
+                self.on_done(stats)
+
+
+def summarize(records, interval):
+    jitter = [r["jitter_ms"] for r in records]
+    overhead = [r["overhead_s"] for r in records]
+    return {
+        "shots": len(records),
+        "interval": interval,
+        "jitter_avg_ms": sum(jitter) / len(jitter) if jitter else 0.0,
+        "jitter_max_ms": max(jitter, default=0.0),
+        "overhead_avg_s": sum(overhead) / len(overhead) if overhead else 0.0,
+        "late": sum(1 for r in records if r["late"]),
+        "failed": sum(1 for r in records if "error" in r),
+    }
+
+
+def video_frame(files):
+    """File of a shot to encode: the camera JPEG of a RAW+JPEG pair, else the RAW."""
+    jpegs = [f for f in files if f.lower().endswith(JPEG_EXTENSIONS)]
+    raws = [f for f in files if is_raw(f)]
+    return (jpegs or raws or files or [None])[0]
+
+
+def frame_jpeg(path):
+    """JPEG bytes to encode for a downloaded frame (embedded preview for RAW)."""
+    if is_raw(path):
+        return raw_previews(path, min_width=VIDEO_WIDTH)[1]
+    if not path.lower().endswith(JPEG_EXTENSIONS):
+        return None  # a format the encoder can't take: the frame is skipped
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def encoder_cmd(output, fps, width=VIDEO_WIDTH):
+    return [
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+        "-f", "image2pipe", "-framerate", str(fps), "-c:v", "mjpeg", "-i", "-",
+        # Frames can change size (RAW previews, camera settings): scale all
+        "-vf", f"scale={width}:-2,format=yuv420p",
+        "-c:v", "libx264", "-preset", "veryfast", "-crf", "20",
+        "-movflags", "+faststart", output,
+    ]
+
+
+class StreamingAssembler:
+    """Feeds frames into one running ffmpeg as they arrive.
+
+    add() only queues the file; a writer thread reads it and pipes it to
+    the encoder, so encoding overlaps the wait for the next shot.
+    """
+
+    def __init__(self, output, fps):
+        self.output = output
+        self.frames = 0
+        self.proc = subprocess.Popen(encoder_cmd(output, fps), stdin=subprocess.PIPE,
+                                     stderr=subprocess.PIPE)
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def add(self, path):
+        self._queue.put(path)
+
+    def _run(self):
+        while True:
+            path = self._queue.get()
+            if path is None:
+                break
+            try:
+                data = frame_jpeg(path)
+                if data:
+                    self.proc.stdin.write(data)
+                    self.frames += 1
+            except (OSError, ValueError) as e:
+                print(f"[Timelapse] Could not encode {path}: {e}")
+        try:
+            self.proc.stdin.close()
+        except OSError:
+            pass
+
+    def finish(self):
+        """Wait for the encoder; returns the video path or raises RuntimeError."""
+        self._queue.put(None)
+        self._thread.join()
+        _out, err = self.proc.communicate()
+        if self.proc.returncode != 0:
+            raise RuntimeError(err.decode(errors="replace").strip())
+        return self.output
+
+
+def assemble(directory, output, fps):
+    """One encoding pass over every frame in directory (the non-streaming mode)."""
+    assembler = StreamingAssembler(output, fps)
+    shots = {}
+    for name in sorted(os.listdir(directory)):
+        if name.startswith("frame"):
+            shots.setdefault(name.split(".")[0], []).append(os.path.join(directory, name))
+    for files in shots.values():
+        assembler.add(video_frame(files))
+    return assembler.finish()
@@ -0,0 +1,155 @@
+"""Span tracing of detection, capture and startup, exported as Chrome trace JSON.
+
+Enabled with BIG_DIGICAM_TRACE=1 (or set_enabled). Finished spans go to a
+bounded ring in memory; export() writes them for chrome://tracing or
+https://ui.perfetto.dev. Spans nest by time on their thread:
+
+    with tracing.span("detect_camera"):
+        with tracing.span("auto_detect"):
+            ...
+
+A span that starts in one callback and ends in another (startup until the
+first frame) uses start() and .end(). When tracing is disabled, span() and
+start() return one shared object that does nothing.
+"""
+import collections
+import json
+import os
+import threading
+import time
+
+CAPACITY = 4096
+
+_enabled = os.environ.get("BIG_DIGICAM_TRACE", "") not in ("", "0")
+_events = collections.deque(maxlen=CAPACITY)
+_threads = {}
+
+
+def enabled():
+    return _enabled
+
+
+def set_enabled(value):
+    global _enabled
+    _enabled = bool(value)
+
+
+class _Span:
+    __slots__ = ("name", "args", "t0", "thread")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self.thread = threading.current_thread()
+        self.t0 = time.perf_counter_ns()
+
+    def end(self, **args):
+        """Close the span (shown on the thread that started it)."""
+        if args:
+            self.args.update(args)
+        _record(self.name, self.t0, time.perf_counter_ns() - self.t0, self.args, self.thread)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.end()
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def end(self, **args):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL = _NullSpan()
+
+
+def _record(name, t0, duration, args, thread=None):
+    thread = thread or threading.current_thread()
+    if thread.ident not in _threads:
+        _threads[thread.ident] = thread.name
+    # deque.append is atomic, no lock needed between threads
+    _events.append((name, t0, duration, thread.ident, args))
+
+
+def span(name, **args):
+    """Context manager timing a block (a no-op when tracing is disabled)."""
+    if not _enabled:
+        return _NULL
+    return _Span(name, args)
+
+
+def start(name, **args):
+    """Span ended later with .end(), possibly from another callback."""
+    if not _enabled:
+        return _NULL
+    return _Span(name, args)
+
+
+def instant(name, **args):
+    if _enabled:
+        _record(name, time.perf_counter_ns(), None, args)
+
+
+def import_marks(path, prefix=""):
+    """Spans from "<phase> <epoch microseconds>" lines a script appended to path.
+
+    Each phase lasts until the next mark; a final "end" mark closes the
+    last one. The wall clock stamps are moved onto the span clock.
+    """
+    if not _enabled:
+        return
+    try:
+        with open(path) as f:
+            marks = [line.split() for line in f if line.strip()]
+    except OSError:
+        return
+    offset = time.perf_counter_ns() - time.time_ns()
+    stamps = []
+    for mark in marks:
+        try:
+            stamps.append((mark[0], int(mark[1]) * 1000 + offset))
+        except (IndexError, ValueError):
+            continue
+    for (name, t0), (_next, t1) in zip(stamps, stamps[1:]):
+        _record(prefix + name, t0, t1 - t0, {})
+
+
+def clear():
+    _events.clear()
+
+
+def chrome_trace():
+    """The recorded spans as a Chrome trace event dict."""
+    pid = os.getpid()
+    events = [
+        {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+        for tid, name in list(_threads.items())
+    ]
+    for name, t0, duration, tid, args in list(_events):
+        event = {"name": name, "pid": pid, "tid": tid, "ts": t0 / 1000, "args": args}
+        if duration is None:
+            event.update(ph="i", s="t")
+        else:
+            event.update(ph="X", dur=duration / 1000)
+        events.append(event)
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def export(path):
+    """Write the ring as Chrome trace JSON; returns the number of spans written."""
+    trace = chrome_trace()
+    with open(path, "w") as f:
+        json.dump(trace, f)
+    return sum(1 for event in trace["traceEvents"] if event["ph"] != "M")
@@ -0,0 +1,125 @@
+"""Main-loop stall watchdog.
+
+A heartbeat timer on the main loop expects to run every period_ms; how
+late it actually runs is how long the loop was busy with something else
+(the iteration latency). A beat more than stall_ms late is a stall: a
+callback blocked the UI for longer than a frame.
+
+To show what blocked it, a sampler thread sleeps until the moment the
+next beat would count as stalled. If the beat has not happened by then,
+it takes the main thread's stack (sys._current_frames) while the stall
+is still going on, and the stack is logged with the stall once the loop
+comes back.
+
+Enabled with BIG_DIGICAM_WATCHDOG=1; off by default, since the heartbeat
+wakes the process 20 times a second.
+"""
+import os
+import sys
+import threading
+import time
+import traceback
+
+# Longest acceptable main-loop iteration (one frame at 60 Hz)
+STALL_MS = 16
+PERIOD_MS = 50
+# Upper bounds (ms) of the latency histogram buckets
+BUCKETS = (2, 4, 8, 16, 33, 100, 250, 1000)
+STACK_DEPTH = 12
+
+
+def enabled():
+    return os.environ.get("BIG_DIGICAM_WATCHDOG", "") not in ("", "0")
+
+
+class Watchdog:
+    """Measures main-loop latency with a timeout_add(ms, func) heartbeat.
+
+    timeout_add is GLib.timeout_add for the app (any scheduler with the same
+    signature and "return True to repeat" contract works). start() must be
+    called from the thread running the loop.
+    """
+
+    def __init__(self, timeout_add, period_ms=PERIOD_MS, stall_ms=STALL_MS, log=print):
+        self.timeout_add = timeout_add
+        self.period = period_ms / 1000
+        self.stall = stall_ms / 1000
+        self.log = log
+        self.beats = 0
+        self.stalls = []          # (latency ms, stack or None)
+        self.histogram = [0] * (len(BUCKETS) + 1)
+        self.max_ms = 0.0
+        self._expected = None
+        self._main = None
+        self._sample = None
+        self._cond = threading.Condition()
+        self._running = False
+
+    def start(self):
+        self._main = threading.get_ident()
+        self._running = True
+        self._expected = time.monotonic() + self.period
+        self.timeout_add(int(self.period * 1000), self._beat)
+        threading.Thread(target=self._sampler, name="watchdog", daemon=True).start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+
+    def _beat(self):
+        now = time.monotonic()
+        with self._cond:
+            latency = max(0.0, now - self._expected)
+            stack, self._sample = self._sample, None
+            # The next timeout is counted from this dispatch
+            self._expected = now + self.period
+            self.beats += 1
+            self._cond.notify()
+        ms = latency * 1000
+        self.max_ms = max(self.max_ms, ms)
+        self.histogram[next((i for i, b in enumerate(BUCKETS) if ms <= b), len(BUCKETS))] += 1
+        if latency > self.stall:
+            self.stalls.append((ms, stack))
+            self.log(f"[Watchdog] Main loop stalled {ms:.0f} ms"
+                     + (f" in:\n{stack}" if stack else " (no stack sample)"))
+        return self._running
+
+    def _sampler(self):
+        with self._cond:
+            while self._running:
+                beats = self.beats
+                # Sleep until this beat would be a stall, or until it happens
+                self._cond.wait(max(0.0, self._expected + self.stall - time.monotonic()))
+                if not self._running or self.beats != beats:
+                    continue
+                if time.monotonic() < self._expected + self.stall:
+                    continue  # woken early (notify from stop)
+                self._sample = self._stack()
+                # One sample per stall: wait for the loop to come back
+                while self._running and self.beats == beats:
+                    self._cond.wait()
+
+    def _stack(self):
+        frame = sys._current_frames().get(self._main)
+        if frame is None:
+            return None
+        lines = traceback.format_stack(frame, limit=STACK_DEPTH)
+        return "".join(lines).rstrip()
+
+    def report(self):
+        """Latency summary: beats, stalls, worst iteration and histogram."""
+        labels = [f"<={b}ms" for b in BUCKETS] + [f">{BUCKETS[-1]}ms"]
+        return {
+            "beats": self.beats,
+            "stalls": len(self.stalls),
+            "stall_ms": self.stall * 1000,
+            "max_ms": round(self.max_ms, 1),
+            "histogram": {label: n for label, n in zip(labels, self.histogram) if n},
+        }
+
+    def summary(self):
+        r = self.report()
+        buckets = ", ".join(f"{k}: {v}" for k, v in r["histogram"].items())
+        return (f"[Watchdog] {r['beats']} beats, {r['stalls']} stalls over {r['stall_ms']:.0f} ms, "
+                f"worst {r['max_ms']:.1f} ms ({buckets})")